@@ -29,9 +29,12 @@ import logging
 from .service import JtopServer
 # jtop client
 from .jtop import jtop
+# jtop relay
+from .relay import JtopRelay, JTOP_RELAY_PIPE
 # jtop exception
 from .core.exceptions import JtopException
 from .core.common import get_var
+from .core.stream import JTOP_PORT
 # GUI jtop interface
 from .jetson_config import jtop_config
 from .gui import JTOPGUI, ALL, GPU, CPU, ENGINE, MEM, CTRL, INFO, engine_model
@@ -165,6 +168,11 @@ def main():
     parser.add_argument('--loop', dest="loop", help='Automatically switch page every {sec}s'.format(sec=LOOP_SECONDS), action="store_true", default=False)
     parser.add_argument('--color-filter', dest="color_filter",
                         help='Change jtop base colors, you can use also JTOP_COLOR_FILTER=True', action="store_true", default=False)
+    parser.add_argument('--low-power', dest="low_power", help='Redraw the GUI slower, for long running sessions', action="store_true", default=False)
+    parser.add_argument('--relay', dest="relay", nargs='?', const=JTOP_RELAY_PIPE, default=None,
+                        help='Share one jtop service connection with all clients in this container')
+    parser.add_argument('--host', dest="host", help='Connect to a remote jtop service (token in JTOP_TOKEN)', default=None)
+    parser.add_argument('--port', dest="port", help='Port of the remote jtop service', type=int, default=JTOP_PORT)
     parser.add_argument('-r', '--refresh', dest="refresh", help='refresh interval', type=int, default='1000')
     parser.add_argument('-p', '--page', dest="page", help='Open fix page', type=int, default=1)
     parser.add_argument('-v', '--version', action='version', version='%(prog)s {version}'.format(version=get_var(VERSION_RE)))
@@ -208,12 +216,19 @@ def main():
             print(e)
         # Close service
         sys.exit(0)
+    # Convert refresh to second
+    interval = float(args.refresh / 1000.0)
+    # Run jtop relay
+    if args.relay:
+        logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(name)s - %(message)s')
+        relay = JtopRelay(args.relay, interval=interval, host=args.host, port=args.port, token=os.getenv('JTOP_TOKEN'))
+        relay.loop_for_ever()
+        sys.exit(0)
     # Auto-install service when running as root on a bare host
-    _auto_install_if_needed()
+    if args.host is None:
+        _auto_install_if_needed()
     # Initialize logging level
     logging.basicConfig()
-    # Convert refresh to second
-    interval = float(args.refresh / 1000.0)
     # Restore option
     if args.restore:
         try:
@@ -247,7 +262,7 @@ def main():
         # Commented for issues #466 #393
         # locale.setlocale(locale.LC_ALL, '')
         # Open jtop client
-        with jtop(interval=interval) as jetson:
+        with jtop(interval=interval, host=args.host, port=args.port, token=os.getenv('JTOP_TOKEN')) as jetson:
             # Call the curses wrapper
             color_filter = bool(os.getenv('JTOP_COLOR_FILTER', args.color_filter))
             # Build list pages available
@@ -261,7 +276,7 @@ def main():
                 pages += [CTRL]
             pages += [INFO]
             curses.wrapper(JTOPGUI, jetson, pages, init_page=args.page,
-                           loop=args.loop, seconds=LOOP_SECONDS, color_filter=color_filter)
+                           loop=args.loop, seconds=LOOP_SECONDS, color_filter=color_filter, low_power=args.low_power)
             # Write warnings
             if 'L4T' in jetson.board['hardware']:
                 warning_messages(jetson, args.no_warnings)
@@ -269,7 +284,7 @@ def main():
         pass
     except JtopException as e:
         print(e)
-        if not os.path.isfile('/etc/systemd/system/jtop.service'):
+        if args.host is None and not os.path.isfile('/etc/systemd/system/jtop.service'):
             print("\nThe jtop service is not installed. To set it up, run:")
             print("  sudo jtop --install-service")
             print("or simply:")
@@ -0,0 +1,127 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import os
+import sys
+import time
+import curses
+import signal
+import argparse
+# Logging
+import logging
+from .core.common import get_var
+from .core.exceptions import JtopException
+from .core.stream import StreamServer, JTOP_PORT, client_ssl_context
+from .core.fleet import FleetAggregator, FLEET_PORT, parse_node
+from .gui import JTOPGUI, FLEET
+# Create logger
+logger = logging.getLogger(__name__)
+# Version match
+VERSION_RE = re.compile(r""".*__version__ = ["'](.*?)['"]""", re.S)
+COPYRIGHT_RE = re.compile(r""".*__copyright__ = ["'](.*?)['"]""", re.S)
+
+
+def read_nodes(args):
+    nodes = list(args.nodes)
+    if args.file:
+        with open(args.file) as f:
+            for line in f:
+                line = line.split('#')[0].strip()
+                if line:
+                    nodes += [line]
+    return [parse_node(node, args.node_port) for node in nodes]
+
+
+class FleetPublisher(object):
+    """
+    Publish the fleet summary at most once for every interval
+    """
+
+    def __init__(self, server, interval):
+        self._server = server
+        self._interval = interval
+        self._last = 0.0
+
+    def __call__(self, fleet):
+        now = time.time()
+        if now - self._last < self._interval:
+            return
+        self._last = now
+        self._server.publish(fleet.summary())
+
+
+def exit_signal(signum, frame):
+    sys.exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Collect the stats from many jtop services, the token is read from JTOP_TOKEN',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('nodes', nargs='*', help='List of nodes [name=]host[:port]')
+    parser.add_argument('-f', '--file', dest="file", help='File with a node for each line', default=None)
+    parser.add_argument('--node-port', dest="node_port", help='Default port of the jtop services', type=int, default=JTOP_PORT)
+    parser.add_argument('--host', dest="host", help='Address where the fleet summary is published', default='127.0.0.1')
+    parser.add_argument('--port', dest="port", help='Port where the fleet summary is published, 0 to disable', type=int, default=FLEET_PORT)
+    parser.add_argument('--cafile', dest="cafile", help='Certificate authority of the jtop services (TLS)', default=None)
+    parser.add_argument('--certfile', dest="certfile", help='Client certificate (mutual TLS)', default=None)
+    parser.add_argument('--keyfile', dest="keyfile", help='Client key (mutual TLS)', default=None)
+    parser.add_argument('--no-gui', dest="no_gui", help='Run without the fleet interface', action="store_true", default=False)
+    parser.add_argument('-r', '--refresh', dest="refresh", help='refresh interval', type=int, default='1000')
+    parser.add_argument('-v', '--version', action='version', version='%(prog)s {version}'.format(version=get_var(VERSION_RE)))
+    # Parse arguments
+    args = parser.parse_args()
+    nodes = read_nodes(args)
+    if not nodes:
+        parser.error("No nodes, add nodes from command line or with --file")
+    logging.basicConfig(level=logging.INFO if args.no_gui else logging.ERROR, format='[%(levelname)s] %(name)s - %(message)s')
+    signal.signal(signal.SIGTERM, exit_signal)
+    interval = float(args.refresh / 1000.0)
+    token = os.getenv('JTOP_TOKEN')
+    ssl_context = None
+    if args.cafile or args.certfile:
+        ssl_context = client_ssl_context(args.cafile, args.certfile, args.keyfile)
+    # Start aggregator
+    fleet = FleetAggregator(nodes, interval=interval, token=token, ssl_context=ssl_context)
+    server = None
+    if args.port:
+        server = StreamServer(fleet, (args.host, args.port), token=token)
+        server.start()
+        fleet.attach(FleetPublisher(server, interval))
+    fleet.start()
+    try:
+        if args.no_gui:
+            print("Software part of jetson-stats {version} - {copyright}".format(version=get_var(VERSION_RE), copyright=get_var(COPYRIGHT_RE)))
+            print("Collecting {nodes} nodes".format(nodes=len(nodes)))
+            while fleet.ok():
+                pass
+        else:
+            curses.wrapper(JTOPGUI, fleet, [FLEET], init_page=1, fleet=True)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    except JtopException as e:
+        print(e)
+    finally:
+        fleet.close(timeout=1.0)
+        if server is not None:
+            server.close(timeout=1.0)
+
+
+if __name__ == "__main__":
+    main()
+# EOF
@@ -116,6 +116,110 @@ def cat(path):
         return f.readline().rstrip('\x00')
 
 
+class CachedFile(object):
+    """
+    File opened only once and read from the beginning every time, for sysfs and procfs
+    files read at every update. If the read fail the file is opened again at the next read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def read(self):
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'r')
+            self._file.seek(0)
+            return self._file.read()
+        except (OSError, ValueError):
+            self.close()
+            raise
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def least_squares_slope(samples):
+    """
+    Slope with the least squares of a list of (time, value)
+    """
+    if len(samples) < 2:
+        return 0.0
+    mean_t = sum(sample[0] for sample in samples) / len(samples)
+    mean_value = sum(sample[1] for sample in samples) / len(samples)
+    num = sum((t - mean_t) * (value - mean_value) for t, value in samples)
+    den = sum((t - mean_t) ** 2 for t, _ in samples)
+    return num / den if den > 0 else 0.0
+
+
+def read_trans_stat(text):
+    """
+    Decode devfreq **trans_stat**, return the time in each frequency (kHz) and the number of transitions
+
+        From  :   To
+              :  306000000  510000000   time(ms)
+    * 306000000:         0         4       1200
+      510000000:         3         0        800
+    Total transition : 7
+    """
+    states = {}
+    transitions = None
+    for line in text.splitlines():
+        if line.startswith("Total transition"):
+            transitions = int(line.split(':')[1])
+            continue
+        if ':' not in line:
+            continue
+        freq, values = line.split(':', 1)
+        freq = freq.replace('*', '').strip()
+        values = values.split()
+        if freq.isdigit() and values:
+            states[int(freq) // 1000] = int(values[-1])
+    return states, transitions
+
+
+class DevfreqResidency(object):
+    """
+    Time spent in each frequency of a devfreq device between two updates, from **trans_stat**
+    """
+
+    def __init__(self, path):
+        self._file = CachedFile(os.path.join(path, "trans_stat"))
+        self._last = None
+
+    def reset(self):
+        self._last = None
+
+    def update(self, now):
+        """
+        Return the residency as compact arrays: **freq** in kHz, **time** in percent
+        and **transitions** per second. Empty if there are not two reads.
+        """
+        try:
+            states, transitions = read_trans_stat(self._file.read())
+        except (OSError, ValueError):
+            self._last = None
+            return {}
+        if not states:
+            return {}
+        last, self._last = self._last, (now, states, transitions)
+        if last is None or now <= last[0]:
+            return {}
+        delta = {freq: value - last[1].get(freq, value) for freq, value in states.items()}
+        total = sum(delta.values())
+        residency = {'freq': sorted(delta)}
+        residency['time'] = [100.0 * delta[freq] / total if total > 0 else 0.0 for freq in residency['freq']]
+        if transitions is not None and last[2] is not None:
+            residency['transitions'] = (transitions - last[2]) / (now - last[0])
+        return residency
+
+    def close(self):
+        self._file.close()
+
+
 def locate_commands(name, commands):
     for cmd in commands:
         if os.path.exists(cmd):
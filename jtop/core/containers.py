@@ -0,0 +1,203 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import re
+import json
+import time
+from .common import CachedFile
+from .pressure import read_pressure
+# Logging
+import logging
+# Create logger
+logger = logging.getLogger(__name__)
+# cgroup v2 mount, on hybrid systems the v2 hierarchy is in unified
+CGROUP_PATH = "/sys/fs/cgroup"
+DOCKER_CONTAINERS_PATH = "/var/lib/docker/containers"
+# Container ID at the end of the cgroup, like /system.slice/docker-<id>.scope or /docker/<id>
+CONTAINER_ID_RE = re.compile(r'[/-]([0-9a-f]{64})(?:\.scope)?$')
+# Runtime from the cgroup path, the first match wins
+CONTAINER_RUNTIMES = [('docker', 'docker'), ('containerd', 'containerd'), ('libpod', 'podman'), ('crio', 'crio'), ('kubepods', 'kubernetes')]
+
+
+def get_cgroup_root(root=CGROUP_PATH):
+    for path in [root, os.path.join(root, "unified")]:
+        if os.path.isfile(os.path.join(path, "cgroup.controllers")):
+            return path
+    return None
+
+
+def read_container_id(cgroup):
+    """
+    Return runtime and ID of the container of a cgroup, None if the cgroup is not a container
+    """
+    match = CONTAINER_ID_RE.search(cgroup)
+    if not match:
+        return None
+    runtime = next((runtime for name, runtime in CONTAINER_RUNTIMES if name in cgroup), 'container')
+    return runtime, match.group(1)
+
+
+def read_docker_name(container_id, path=DOCKER_CONTAINERS_PATH):
+    try:
+        with open(os.path.join(path, container_id, "config.v2.json"), 'r') as f:
+            return json.load(f).get('Name', '').lstrip('/')
+    except (OSError, ValueError):
+        return ''
+
+
+def read_keys(text):
+    # Flat keyed file, like cpu.stat: "usage_usec 1234"
+    values = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            values[fields[0]] = int(fields[1])
+    return values
+
+
+def read_io_stat(text):
+    """
+    Bytes read and written on all devices from io.stat: "259:0 rbytes=1 wbytes=2 rios=3 wios=4 ..."
+    """
+    io = {'rbytes': 0, 'wbytes': 0}
+    for line in text.splitlines():
+        for field in line.split()[1:]:
+            name, _, value = field.partition('=')
+            if name in io:
+                io[name] += int(value)
+    return io
+
+
+class CgroupStat(object):
+    """
+    Counters of a cgroup v2, the files are opened once and the rates are from the previous update
+    """
+
+    def __init__(self, path):
+        self._cpu = CachedFile(os.path.join(path, "cpu.stat"))
+        self._memory = CachedFile(os.path.join(path, "memory.current"))
+        self._pressure = CachedFile(os.path.join(path, "memory.pressure"))
+        self._io = CachedFile(os.path.join(path, "io.stat"))
+        self._last = None
+
+    @staticmethod
+    def _read(cached, decode):
+        try:
+            return decode(cached.read())
+        except (OSError, ValueError):
+            # Controller not enabled for this cgroup
+            return None
+
+    def update(self, now):
+        status = {}
+        cpu = self._read(self._cpu, read_keys) or {}
+        io = self._read(self._io, read_io_stat) or {}
+        memory = self._read(self._memory, int)
+        if memory is not None:
+            status['memory'] = memory // 1024
+        pressure = self._read(self._pressure, read_pressure)
+        if pressure:
+            status['pressure'] = {kind: values['avg10'] for kind, values in pressure.items()}
+        last, self._last = self._last, (now, cpu, io)
+        if last is None or now <= last[0]:
+            return status
+        interval = now - last[0]
+        # Percent of one CPU, like top
+        if 'usage_usec' in cpu and 'usage_usec' in last[1]:
+            status['cpu'] = (cpu['usage_usec'] - last[1]['usage_usec']) / (interval * 10000.0)
+        if 'throttled_usec' in cpu and 'throttled_usec' in last[1]:
+            status['throttled'] = (cpu['throttled_usec'] - last[1]['throttled_usec']) / (interval * 10000.0)
+        if io and last[2]:
+            status['io'] = {'read': (io['rbytes'] - last[2]['rbytes']) / interval,
+                            'write': (io['wbytes'] - last[2]['wbytes']) / interval}
+        return status
+
+    def close(self):
+        for cached in [self._cpu, self._memory, self._pressure, self._io]:
+            cached.close()
+
+
+class ContainerService(object):
+    """
+    Resources used from each container and from each cgroup with GPU processes.
+
+    The cgroup of each process comes from the TaskTable, updated incrementally,
+    the counters of a cgroup are opened when the first process is in the cgroup and closed with the last one.
+    """
+
+    def __init__(self, tasks, root=CGROUP_PATH, docker_path=DOCKER_CONTAINERS_PATH):
+        self._tasks = tasks
+        self._root = get_cgroup_root(root)
+        self._docker_path = docker_path
+        # Container of each cgroup, resolved once
+        self._containers = {}
+        self._stats = {}
+        if self._root is None:
+            logger.info("cgroup v2 not available, containers without counters")
+
+    def _container(self, cgroup):
+        if cgroup not in self._containers:
+            container = read_container_id(cgroup)
+            if container is not None:
+                runtime, container_id = container
+                name = read_docker_name(container_id, self._docker_path) if runtime == 'docker' else ''
+                container = {'runtime': runtime, 'id': container_id[:12], 'name': name or container_id[:12]}
+            self._containers[cgroup] = container
+        return self._containers[cgroup]
+
+    def get_status(self, processes, now=None):
+        now = time.time() if now is None else now
+        # GPU processes: process[0] PID and process[8] GPU memory, process[12] is the cgroup
+        gpu = {}
+        for process in processes:
+            task = self._tasks.tasks.get(str(process[0]))
+            if task is None:
+                continue
+            process[12] = task[2]
+            gpu[task[2]] = gpu.get(task[2], 0) + process[8]
+        # All containers and all cgroups with GPU processes
+        groups = {}
+        cgroups = set()
+        for pid, task in self._tasks.tasks.items():
+            cgroup = task[2]
+            cgroups.add(cgroup)
+            if cgroup in gpu or self._container(cgroup) is not None:
+                groups.setdefault(cgroup, []).append(int(pid))
+        # Remove the cgroups without processes
+        for cgroup in [cgroup for cgroup in self._containers if cgroup not in cgroups]:
+            del self._containers[cgroup]
+        for cgroup in [cgroup for cgroup in self._stats if cgroup not in groups]:
+            self._stats.pop(cgroup).close()
+        containers = {}
+        for cgroup, pids in groups.items():
+            status = {'pids': sorted(pids), 'gpu': gpu.get(cgroup, 0)}
+            container = self._container(cgroup)
+            if container is not None:
+                status.update(container)
+            if self._root is not None:
+                if cgroup not in self._stats:
+                    self._stats[cgroup] = CgroupStat(self._root + cgroup)
+                status.update(self._stats[cgroup].update(now))
+            containers[cgroup] = status
+        return containers
+
+    def close(self):
+        for stat in self._stats.values():
+            stat.close()
+        self._stats = {}
+# EOF
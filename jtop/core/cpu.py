@@ -17,9 +17,11 @@
 
 import os
 import re
+import time
 from copy import deepcopy
 # Logging
 import logging
+from .common import CachedFile
 # Create logger
 logger = logging.getLogger(__name__)
 # All regular exceptions
@@ -126,6 +128,115 @@ def read_system_cpu(path, cpu_status={}):
     return cpu_status
 
 
+def read_time_in_state(text):
+    # Each line is "<frequency kHz> <time in 10ms>"
+    states = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            states[int(fields[0])] = int(fields[1])
+    return states
+
+
+def read_cluster(path):
+    # Cluster of the core from the topology, otherwise the first core of the cpufreq policy
+    cluster_path = os.path.join(path, "topology", "cluster_id")
+    if os.path.isfile(cluster_path):
+        with open(cluster_path, 'r') as f:
+            cluster = int(f.read())
+        if cluster >= 0:
+            return cluster
+    related_path = os.path.join(path, "cpufreq", "related_cpus")
+    if os.path.isfile(related_path):
+        with open(related_path, 'r') as f:
+            cpus = [int(cpu) for cpu in f.read().split()]
+        if cpus:
+            return min(cpus)
+    return 0
+
+
+class CPUResidency(object):
+    """
+    Residency of a core in each idle state and in each frequency, from the difference between two reads of
+    cpuidle **time** and **usage** and cpufreq **stats/time_in_state** and **stats/total_trans**
+    """
+
+    def __init__(self, path):
+        self._idle = {}
+        path_idle = os.path.join(path, "cpuidle")
+        if os.path.isdir(path_idle):
+            for state in sorted(item for item in os.listdir(path_idle) if CPU_SYS_STATE_REG.search(item)):
+                with open(os.path.join(path_idle, state, "name"), 'r') as f:
+                    name = f.read().strip()
+                self._idle[name] = (CachedFile(os.path.join(path_idle, state, "time")),
+                                    CachedFile(os.path.join(path_idle, state, "usage")))
+        path_stats = os.path.join(path, "cpufreq", "stats")
+        self._time_in_state = None
+        self._total_trans = None
+        if os.path.isfile(os.path.join(path_stats, "time_in_state")):
+            self._time_in_state = CachedFile(os.path.join(path_stats, "time_in_state"))
+        if os.path.isfile(os.path.join(path_stats, "total_trans")):
+            self._total_trans = CachedFile(os.path.join(path_stats, "total_trans"))
+        self._last = None
+
+    def _read(self):
+        values = {'idle': {}, 'freq': {}, 'trans': None}
+        for name, (time_file, usage_file) in self._idle.items():
+            values['idle'][name] = (int(time_file.read()), int(usage_file.read()))
+        if self._time_in_state is not None:
+            values['freq'] = read_time_in_state(self._time_in_state.read())
+        if self._total_trans is not None:
+            values['trans'] = int(self._total_trans.read())
+        return values
+
+    def reset(self):
+        self._last = None
+
+    def update(self, now):
+        try:
+            values = self._read()
+        except (OSError, ValueError):
+            # Offline core
+            self._last = None
+            return {}
+        last, self._last = self._last, (now, values)
+        if last is None or now <= last[0]:
+            return {}
+        delta = now - last[0]
+        residency = {'idle': {}, 'usage': {}, 'freq': {}}
+        for name, (time_us, usage) in values['idle'].items():
+            time_last, usage_last = last[1]['idle'].get(name, (time_us, usage))
+            residency['idle'][name] = min(100.0 * (time_us - time_last) / (delta * 1000000.0), 100.0)
+            residency['usage'][name] = (usage - usage_last) / delta
+        freq_delta = {freq: value - last[1]['freq'].get(freq, value) for freq, value in values['freq'].items()}
+        freq_total = sum(freq_delta.values())
+        if freq_total > 0:
+            residency['freq'] = {freq: 100.0 * value / freq_total for freq, value in freq_delta.items()}
+        if values['trans'] is not None and last[1]['trans'] is not None:
+            residency['transitions'] = (values['trans'] - last[1]['trans']) / delta
+        return residency
+
+
+def cluster_residency(cpu_list, clusters):
+    """
+    Average residency of the online cores of each cluster
+    """
+    status = {}
+    for cluster in sorted(set(clusters)):
+        cores = [idx for idx, value in enumerate(clusters) if value == cluster]
+        residencies = [cpu_list[idx]['residency'] for idx in cores if cpu_list[idx].get('residency')]
+        data = {'cpus': cores}
+        for key in ['idle', 'usage', 'freq']:
+            names = set(name for residency in residencies for name in residency[key])
+            data[key] = {name: sum(residency[key].get(name, 0.0) for residency in residencies) / len(residencies)
+                         for name in sorted(names)}
+        transitions = [residency['transitions'] for residency in residencies if 'transitions' in residency]
+        if transitions:
+            data['transitions'] = sum(transitions) / len(transitions)
+        status[cluster] = data
+    return status
+
+
 class CPUService(object):
 
     def __init__(self):
@@ -149,6 +260,10 @@ class CPUService(object):
                     for item in os.listdir(path_system_cpu) if os.path.isdir(os.path.join(path_system_cpu, item)) and CPU_SYS_REG.search(item)}
         # Sort CPU list in a list by CPU name
         self._cpu = [cpu_list[i] for i in sorted(cpu_list)]
+        # Idle and frequency residency for each core, built when the core is online
+        for cpu in self._cpu:
+            cpu['residency'] = None
+            cpu['cluster'] = read_cluster(cpu['path'])
         # Status CPU service at start
         logger.info("Found {cpu} CPU".format(cpu=len(cpu_list)))
         # Build CPU total info
@@ -163,6 +278,8 @@ class CPUService(object):
         # reset estimation status cpu
         for cpu in self._cpu:
             cpu['last_cpu'] = [0.0] * len(CPU_STAT_LABEL)
+            if cpu['residency'] is not None:
+                cpu['residency'].reset()
         # Build CPU total info
         self._cpu_total = {'last_cpu': [0.0] * len(CPU_STAT_LABEL)}
 
@@ -216,10 +333,19 @@ class CPUService(object):
         # Status CPU
         cpu_list = [{} for i in range(len(self._cpu))]
         cpu_online = []
+        now = time.time()
         # Add cpu status with frequency and idle config
         for cpu, data in enumerate(self._cpu):
             # store all data
             cpu_list[cpu] = read_system_cpu(data['path'], cpu_list[cpu])
+            # Residency from the previous update
+            if cpu_list[cpu]['online']:
+                # An offline core doesn't have cpufreq, the stats files are found again when it is back online
+                if data['residency'] is None:
+                    data['residency'] = CPUResidency(data['path'])
+                cpu_list[cpu]['residency'] = data['residency'].update(now)
+            else:
+                data['residency'] = None
             # Add model in CPU output
             cpu_list[cpu]['model'] = self._list_cpu.get(cpu, {}).get("model name", "")
             # Check status CPU
@@ -239,5 +365,6 @@ class CPUService(object):
         # https://www.linuxhowtos.org/System/procstat.htm
         # https://stackoverflow.com/questions/9229333/how-to-get-overall-cpu-usage-e-g-57-on-linux
         total, cpu_list = self.get_utilization(cpu_list)
-        return {'total': total, 'cpu': cpu_list}
+        clusters = cluster_residency(cpu_list, [data['cluster'] for data in self._cpu])
+        return {'total': total, 'cpu': cpu_list, 'cluster': clusters}
 # EOF
@@ -0,0 +1,228 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+# Logging
+import logging
+from .common import cat
+from .exceptions import JtopException
+from .gpu import KNOWN_GPU_DEVICE_NAMES
+# Create logger
+logger = logging.getLogger(__name__)
+# Paths from the sysfs root
+DVFS_CPU_PATH = "devices/system/cpu"
+DVFS_DEVFREQ_PATH = "class/devfreq"
+DVFS_EMC_PATH = "kernel/debug/bpmp/debug/clk/emc"
+# Devfreq devices used for the memory controller
+DVFS_EMC_DEVFREQ = ['bwmgr']
+
+
+def write_value(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+class DVFSLimit(object):
+    """
+    Minimum and maximum frequency of a cpufreq or devfreq device.
+
+    Max clocks fix the minimum frequency to the maximum frequency allowed, like jetson_clocks
+    the maximum frequency is not changed and the nvpmodel limits are preserved.
+    """
+
+    def __init__(self, name, engine, min_path, max_path):
+        self.name = name
+        self.engine = engine
+        self._min_path = min_path
+        self._max_path = max_path
+
+    def read(self):
+        return {'min': int(cat(self._min_path)), 'max': int(cat(self._max_path))}
+
+    def write(self, state):
+        # The kernel refuse a minimum over the maximum, write first the limit that keep min <= max
+        current = self.read()
+        if state['max'] < current['min']:
+            write_value(self._min_path, state['min'])
+            write_value(self._max_path, state['max'])
+        else:
+            write_value(self._max_path, state['max'])
+            write_value(self._min_path, state['min'])
+
+    def check(self, state):
+        return self.read() == state
+
+    def target(self):
+        current = self.read()
+        return {'min': current['max'], 'max': current['max']}
+
+    def frequencies(self):
+        """ Frequencies available, empty if the device doesn't have a frequency table """
+        folder = os.path.dirname(self._max_path)
+        for name in ["scaling_available_frequencies", "available_frequencies"]:
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                return sorted(int(freq) for freq in cat(path).split())
+        return []
+
+    def set_max(self, value):
+        write_value(self._max_path, value)
+
+
+class EMCLimit(object):
+    """
+    Memory controller clock from the BPMP debugfs, the rate is locked at the max rate
+    """
+
+    def __init__(self, path):
+        self.name = 'EMC'
+        self.engine = 'EMC'
+        self._lock_path = os.path.join(path, "mrq_rate_locked")
+        self._rate_path = os.path.join(path, "rate")
+        self._max_path = os.path.join(path, "max_rate")
+
+    def read(self):
+        return {'lock': int(cat(self._lock_path)), 'rate': int(cat(self._rate_path))}
+
+    def write(self, state):
+        write_value(self._lock_path, state['lock'])
+        write_value(self._rate_path, state['rate'])
+
+    def check(self, state):
+        # Without lock the rate is managed from the memory controller
+        status = self.read()
+        return status['lock'] == state['lock'] and (not state['lock'] or status['rate'] == state['rate'])
+
+    def target(self):
+        return {'lock': 1, 'rate': int(cat(self._max_path))}
+
+
+def dvfs_limits(root):
+    limits = []
+    # CPU frequencies, offline CPUs don't have cpufreq
+    path_cpu = os.path.join(root, DVFS_CPU_PATH)
+    if os.path.isdir(path_cpu):
+        cpus = [item for item in os.listdir(path_cpu) if item.startswith('cpu') and item[3:].isdigit()]
+        for cpu in sorted(cpus, key=lambda name: int(name[3:])):
+            path = os.path.join(path_cpu, cpu, "cpufreq")
+            min_path = os.path.join(path, "scaling_min_freq")
+            max_path = os.path.join(path, "scaling_max_freq")
+            if os.path.isfile(min_path) and os.path.isfile(max_path):
+                limits += [DVFSLimit(cpu, 'CPU', min_path, max_path)]
+    # GPU and engines with devfreq
+    path_devfreq = os.path.join(root, DVFS_DEVFREQ_PATH)
+    if os.path.isdir(path_devfreq):
+        for item in sorted(os.listdir(path_devfreq)):
+            path = os.path.join(path_devfreq, item)
+            min_path = os.path.join(path, "min_freq")
+            max_path = os.path.join(path, "max_freq")
+            if not os.path.isfile(min_path) or not os.path.isfile(max_path):
+                continue
+            engine = item
+            name_path = os.path.join(path, "device", "of_node", "name")
+            if os.path.isfile(name_path):
+                name = cat(name_path).strip().lower()
+                if name in KNOWN_GPU_DEVICE_NAMES or 'gpu' in name:
+                    engine = 'GPU'
+            if item in DVFS_EMC_DEVFREQ:
+                engine = 'EMC'
+            limits += [DVFSLimit(item, engine, min_path, max_path)]
+    # Memory controller
+    path_emc = os.path.join(root, DVFS_EMC_PATH)
+    if all(os.path.isfile(os.path.join(path_emc, name)) for name in ["mrq_rate_locked", "rate", "max_rate"]):
+        limits += [EMCLimit(path_emc)]
+    return limits
+
+
+class DVFSEngine(object):
+    """
+    Native jetson_clocks, read and write all DVFS limits from sysfs without run the jetson_clocks script.
+
+    A profile is a dictionary with the state of each limit, it can be saved and loaded from a file.
+    All profiles are applied in a transaction: if a limit cannot be written or verified
+    all limits already written are restored.
+    """
+
+    def __init__(self, root="/sys"):
+        self._limits = dvfs_limits(root)
+        for limit in self._limits:
+            logger.debug("DVFS limit {name} ({engine})".format(name=limit.name, engine=limit.engine))
+
+    def exists(self):
+        return any(limit.engine == 'CPU' for limit in self._limits)
+
+    @property
+    def engines(self):
+        """
+        List of engines, CPU, GPU and EMC have the same names of the jetson_clocks script.
+        The other devfreq devices keep their devfreq name and are not checked from jetson_clocks_alive
+        """
+        engines = []
+        for limit in self._limits:
+            if limit.engine not in engines:
+                engines += [limit.engine]
+        return engines
+
+    def snapshot(self):
+        return {limit.name: limit.read() for limit in self._limits}
+
+    def max_profile(self):
+        return {limit.name: limit.target() for limit in self._limits}
+
+    def check(self, profile):
+        """
+        Read again all limits of the profile, True if all of them are in the profile state
+        """
+        try:
+            return all(limit.check(profile[limit.name]) for limit in self._limits if limit.name in profile)
+        except (OSError, ValueError):
+            return False
+
+    def apply(self, profile):
+        previous = self.snapshot()
+        written = []
+        try:
+            for limit in self._limits:
+                if limit.name not in profile:
+                    continue
+                written += [limit]
+                limit.write(profile[limit.name])
+            # Verify the new status
+            for limit in written:
+                if not limit.check(profile[limit.name]):
+                    raise JtopException("{name} is {status} instead of {profile}".format(
+                        name=limit.name, status=limit.read(), profile=profile[limit.name]))
+        except (OSError, ValueError, JtopException) as e:
+            logger.error("DVFS profile not applied: {error}. Rollback".format(error=e))
+            for limit in reversed(written):
+                try:
+                    limit.write(previous[limit.name])
+                except (OSError, ValueError) as error:
+                    logger.error("Rollback {name} failed: {error}".format(name=limit.name, error=error))
+            raise JtopException("DVFS profile not applied: {error}".format(error=e))
+
+    @staticmethod
+    def save(path, profile):
+        with open(path, 'w') as f:
+            json.dump(profile, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+# EOF
@@ -0,0 +1,140 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+# Logging
+import logging
+# Create logger
+logger = logging.getLogger(__name__)
+# Rails attributed with the CPU time or the GPU utilization of each process, from the rail name
+ENERGY_RESOURCES = ['CPU', 'GPU']
+# Intervals longer than this (in seconds) are not attributed, like a service suspended
+ENERGY_MAX_INTERVAL = 10.0
+# Time (in seconds) the energy of a cgroup is kept after its last process is closed
+ENERGY_CGROUP_RETENTION = 300.0
+
+
+def rail_resources(name):
+    """
+    Resources powered from a rail, like VDD_CPU_CV -> ['CPU'] and VDD_CPU_GPU_CV -> ['CPU', 'GPU']
+    """
+    return [resource for resource in ENERGY_RESOURCES if resource in name.upper()]
+
+
+def split_energy(energy, shares):
+    """
+    Split energy across all keys with the share of each one, nothing if all shares are zero
+    """
+    total = sum(shares.values())
+    if total <= 0:
+        return {}
+    return {key: energy * share / total for key, share in shares.items() if share > 0}
+
+
+class EnergyService(object):
+    """
+    Attribute the energy of the CPU and GPU rails to each process.
+
+    Each update the energy of a rail (power * interval) is split across the processes
+    with their share of the resource: CPU time for the CPU rails,
+    GPU utilization (when available, otherwise GPU memory) for the GPU rails.
+    The energy is cumulative for each process (PID and start time, a PID can be reused) and each cgroup, in joules,
+    the energy of a cgroup is kept for ENERGY_CGROUP_RETENTION seconds after its last process is closed.
+    """
+
+    def __init__(self, tasks, retention=ENERGY_CGROUP_RETENTION):
+        # All processes with CPU time and cgroup, updated from the service
+        self._tasks = tasks
+        self._retention = retention
+        # (pid, starttime): energy of each resource
+        self._energy = {}
+        self._cgroups = {}
+        # cgroup: time of its last process closed
+        self._closed = {}
+        self._unattributed = 0.0
+        self._last = None
+
+    def _running(self, key):
+        task = self._tasks.tasks.get(key[0])
+        return task is not None and task[0] == key[1]
+
+    def _prune(self, now):
+        # Remove the processes closed, their energy is stored in the cgroup
+        for key in [key for key in self._energy if not self._running(key)]:
+            del self._energy[key]
+        # Remove the cgroups without processes after the retention, like the scopes of sessions and containers closed
+        cgroups = set(task[2] for task in self._tasks.tasks.values())
+        for cgroup in self._cgroups:
+            if cgroup in cgroups:
+                self._closed.pop(cgroup, None)
+            else:
+                self._closed.setdefault(cgroup, now)
+        for cgroup in [cgroup for cgroup, closed in self._closed.items() if now - closed >= self._retention]:
+            del self._cgroups[cgroup]
+            del self._closed[cgroup]
+
+    def _cpu_shares(self):
+        return {pid: delta for pid, delta in self._tasks.delta.items() if delta > 0}
+
+    @staticmethod
+    def _gpu_shares(processes):
+        # process[0] PID, process[8] GPU memory, process[11] GPU utilization (Thor)
+        utilization = {str(process[0]): process[11].get('sm', 0) for process in processes if len(process) > 11 and process[11]}
+        if utilization:
+            return utilization
+        return {str(process[0]): process[8] for process in processes}
+
+    def _add(self, pid, resource, energy):
+        task = self._tasks.tasks.get(pid)
+        if task is None:
+            self._unattributed += energy
+            return
+        counters = self._energy.setdefault((pid, task[0]), {'CPU': 0.0, 'GPU': 0.0})
+        counters[resource] += energy
+        self._cgroups[task[2]] = self._cgroups.get(task[2], 0.0) + energy
+
+    def get_status(self, power, processes, now=None):
+        now = time.time() if now is None else now
+        self._prune(now)
+        shares = {'CPU': self._cpu_shares(), 'GPU': self._gpu_shares(processes)}
+        last, self._last = self._last, now
+        if last is None or not 0 < now - last <= ENERGY_MAX_INTERVAL:
+            return self._status()
+        interval = now - last
+        for name, rail in power.get('rail', {}).items():
+            resources = rail_resources(name)
+            if not resources:
+                continue
+            # A rail with more resources is split in equal parts, mW * s -> J
+            energy = rail.get('power', 0) * interval / 1000.0 / len(resources)
+            for resource in resources:
+                split = split_energy(energy, shares[resource])
+                if not split:
+                    self._unattributed += energy
+                for pid, value in split.items():
+                    self._add(pid, resource, value)
+        return self._status()
+
+    def _status(self):
+        processes = {}
+        for (pid, _), counters in self._energy.items():
+            task = self._tasks.tasks[pid]
+            processes[int(pid)] = {'name': task[1], 'cgroup': task[2], 'cpu': counters['CPU'], 'gpu': counters['GPU'],
+                                   'total': counters['CPU'] + counters['GPU']}
+        return {'processes': processes, 'cgroups': dict(self._cgroups), 'closed': sorted(self._closed),
+                'unattributed': self._unattributed}
+# EOF
@@ -16,11 +16,16 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+from threading import Lock
 # Logging
 import logging
+from .common import CachedFile
+from .timer_reader import TimerReader
 # from .exceptions import JtopException
 # Create logger
 logger = logging.getLogger(__name__)
+# Sample rate of the engines clock rate between two updates
+ENGINE_SAMPLE_INTERVAL = 0.1
 
 
 def read_engine(path):
@@ -99,6 +104,12 @@ class EngineService(object):
                                 break
                     else:
                         self.engines_path[name.upper()] = sorted(matching)
+        # Histogram of the clock rate sampled between two updates
+        self._rates = {local_path: CachedFile(local_path + "/clk_rate")
+                       for paths in self.engines_path.values() for local_path in paths if os.access(local_path + "/clk_rate", os.R_OK)}
+        self._histogram = {}
+        self._lock = Lock()
+        self._sampler = TimerReader(self._sample)
         # Print all engines found
         if self.engines_path:
             engines_string = ' '.join(name for name in self.engines_path)
@@ -106,7 +117,33 @@ class EngineService(object):
         else:
             logger.warn("Not engines found!")
 
+    def _sample(self):
+        for local_path, rate in self._rates.items():
+            try:
+                freq = int(rate.read()) // 1000
+            except (OSError, ValueError):
+                continue
+            with self._lock:
+                histogram = self._histogram.setdefault(local_path, {})
+                histogram[freq] = histogram.get(freq, 0) + 1
+
+    def _get_histogram(self, local_path):
+        """
+        Share of samples at each clock rate since the last update, as compact arrays:
+        **freq** in kHz and **time** in percent
+        """
+        with self._lock:
+            histogram = self._histogram.pop(local_path, {})
+        total = sum(histogram.values())
+        if not total:
+            return {}
+        freq = sorted(histogram)
+        return {'freq': freq, 'time': [100.0 * histogram[value] / total for value in freq]}
+
     def get_status(self):
+        # The sampler start with the first update of the service
+        if self._rates:
+            self._sampler.open(interval=ENGINE_SAMPLE_INTERVAL)
         status = {}
         # Read status from all engines
         for engine in self.engines_path:
@@ -115,5 +152,14 @@ class EngineService(object):
                 name_engine = os.path.basename(local_path).upper()
                 logger.debug("Status [{engine}] in {path}".format(engine=name_engine, path=local_path))
                 status[engine][name_engine] = read_engine(local_path)
+                status[engine][name_engine]['histogram'] = self._get_histogram(local_path)
         return status
+
+    def close(self):
+        # Stop the sampler when the service stops the updates, it starts again with the next update
+        self._sampler.close()
+        for rate in self._rates.values():
+            rate.close()
+        with self._lock:
+            self._histogram = {}
 # EOF
@@ -24,19 +24,25 @@
 
 import re
 import os
+import time
+from threading import Lock
 # Logging
 import logging
 # Launch command
 from .command import Command
 from .common import cat, GenericInterface
 from .exceptions import JtopException
+from .jobs import completed_job
 from .hw_detect import is_thor
+from .timer_reader import TimerReader
+from .fan_control import FanController, FAN_CONTROL_INTERVAL
 # Create logger
 logger = logging.getLogger(__name__)
 
 COMMAND_TIMEOUT = 4.0
 FAN_MANUAL_NAME = 'manual'
 FAN_TEMP_CONTROL_NAME = 'temp_control'
+FAN_CLOSED_LOOP_NAME = 'closed_loop'
 FAN_PWM_RE = re.compile(r'^pwm\d+$')
 FAN_PWM_ENABLE_RE = re.compile(r'^pwm\d+_enable$')
 FAN_NVFAN_NAME_RE = re.compile(r'^<FAN (?P<num>\d+)>$')
@@ -365,8 +371,8 @@ class Fan(GenericInterface):
             raise JtopException("Profile \"{profile}\" does not exist for Fan \"{name}\". Available: {all_profiles}".format(
                 profile=profile, name=name, all_profiles=all_profiles))
         if profile == self._data[name]['profile']:
-            return
-        self._controller.put({'fan': {'command': 'profile', 'name': name, 'profile': profile}})
+            return completed_job()
+        return self._controller.put({'fan': {'command': 'profile', 'name': name, 'profile': profile}})
 
     def get_profile(self, name):
         if name not in self._data:
@@ -397,8 +403,8 @@ class Fan(GenericInterface):
         if idx >= len(self._data[name]['speed']) or idx < 0:
             raise JtopException("Fan \"{name}\" have only {len} fans".format(name=name, len=len(self._data[name]['speed'])))
         if speed == self._data[name]['speed'][idx]:
-            return
-        self._controller.put({'fan': {'command': 'speed', 'name': name, 'speed': speed, 'idx': idx}})
+            return completed_job()
+        return self._controller.put({'fan': {'command': 'speed', 'name': name, 'speed': speed, 'idx': idx}})
 
     def get_speed(self, name, idx=0):
         if name not in self._data:
@@ -421,6 +427,28 @@ class Fan(GenericInterface):
             name = list(self._data.keys())[0]
             self.set_speed(name, value)
 
+    def set_curve(self, name, curve):
+        """
+        Set the curve of the closed loop controller, used when the fan profile is **closed_loop**.
+        All missing fields are the default values in :py:data:`~jtop.core.fan_control.FAN_CURVE_DEFAULT`
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                jetson.fan.set_curve('pwmfan', {'points': [[45, 20], [70, 100]], 'sensors': ['tj']})
+                jetson.fan.set_profile('pwmfan', 'closed_loop')
+        """
+        if name not in self._data:
+            raise JtopException("Fan \"{name}\" does not exist".format(name=name))
+        if FAN_CLOSED_LOOP_NAME not in self.all_profiles(name):
+            raise JtopException("Fan \"{name}\" doesn't have a closed loop controller".format(name=name))
+        return self._controller.put({'fan': {'command': 'curve', 'name': name, 'curve': curve}})
+
+    def get_closed_loop(self, name):
+        if name not in self._data:
+            raise JtopException("Fan \"{name}\" does not exist".format(name=name))
+        return self._data[name].get('closed_loop', {})
+
     def get_rpm(self, name, idx=0):
         if name not in self._data:
             raise JtopException("Fan \"{name}\" does not exist".format(name=name))
@@ -455,9 +483,14 @@ def check_config(config):
 
 class FanService(object):
 
-    def __init__(self, config):
+    def __init__(self, config, temperature=None):
         self._config = config
         check_config(config)
+        # Closed loop controllers
+        self._temperature = temperature
+        self._controllers = {}
+        self._controllers_lock = Lock()
+        self._timer = TimerReader(self._control_loop)
 
         root_dir = "/sys/class/hwmon"
         if os.getenv('JTOP_TESTING', False):
@@ -483,6 +516,12 @@ class FanService(object):
                     logger.info("Fan temp controller %s found in %s", name, control)
                 self._fan_list[name]['profile'] += [FAN_MANUAL_NAME]
 
+        # The service can drive the PWM with a closed loop controller
+        if self._temperature is not None:
+            for name, fan in self._fan_list.items():
+                if fan['pwm'] and 'profile' in fan:
+                    self._fan_list[name]['profile'] += [FAN_CLOSED_LOOP_NAME]
+
         if not self._fan_list:
             logger.warning("No fan found")
 
@@ -508,6 +547,8 @@ class FanService(object):
         if name not in self._fan_list:
             logger.error("Fan \"%s\" does not exist", name)
             return ""
+        if name in self._controllers:
+            return FAN_CLOSED_LOOP_NAME
         profile = FAN_MANUAL_NAME
         if self._nvfancontrol:
             if nvfancontrol_is_active():
@@ -527,10 +568,20 @@ class FanService(object):
         if name not in self._fan_list:
             logger.error("Fan \"%s\" does not exist", name)
             return False
+        if name in self._controllers and profile != FAN_CLOSED_LOOP_NAME:
+            self._control_stop(name)
         if profile == self.get_profile(name):
             logger.warning("Fan %s profile %s already active", name, profile)
             return True
-        if self._nvfancontrol:
+        if profile == FAN_CLOSED_LOOP_NAME:
+            if profile not in self._fan_list[name]['profile']:
+                logger.error("Profile %s doesn't exist", profile)
+                return False
+            # The kernel or nvfancontrol must release the PWM
+            if not self.set_profile(name, FAN_MANUAL_NAME):
+                return False
+            self._control_start(name)
+        elif self._nvfancontrol:
             is_active = nvfancontrol_is_active()
             if profile in self._fan_list[name]['profile']:
                 if profile == FAN_MANUAL_NAME:
@@ -584,7 +635,9 @@ class FanService(object):
             fan_config[name] = {}
         fan_config[name]['speed'] = (speed, index)
         self._config.set('fan', fan_config)
+        self._write_speed(name, speed, index)
 
+    def _write_speed(self, name, speed, index):
         pwm = ValueToPWM(speed)
         pwm_path = self._fan_list[name]['pwm'][index]
         try:
@@ -594,6 +647,60 @@ class FanService(object):
         except OSError as e:
             logger.error("I cannot set fan speed: %s - error %s", speed, e)
 
+    def get_curve(self, name):
+        return self._config.get('fan', {}).get(name, {}).get('curve', {})
+
+    def set_curve(self, name, curve):
+        if name not in self._fan_list:
+            raise JtopException("Fan \"{name}\" does not exist".format(name=name))
+        # Check the curve before to store
+        controller = FanController(curve)
+        fan_config = self._config.get('fan', {})
+        if name not in fan_config:
+            fan_config[name] = {}
+        fan_config[name]['curve'] = curve
+        self._config.set('fan', fan_config)
+        with self._controllers_lock:
+            if name in self._controllers:
+                controller._duty = self._controllers[name].status.get('duty', 0.0)
+                self._controllers[name] = controller
+        logger.info("Fan %s curve %s", name, controller.curve['mode'])
+
+    def _control_start(self, name):
+        speed = [PWMtoValue(float(cat(pwm))) for pwm in self._fan_list[name]['pwm']]
+        controller = FanController(self.get_curve(name), duty=max(speed))
+        with self._controllers_lock:
+            self._controllers[name] = controller
+        self._timer.open(interval=FAN_CONTROL_INTERVAL)
+        logger.info("Fan %s closed loop %s started", name, controller.curve['mode'])
+
+    def _control_stop(self, name):
+        with self._controllers_lock:
+            self._controllers.pop(name, None)
+            running = bool(self._controllers)
+        if not running:
+            self._timer.close()
+        logger.info("Fan %s closed loop stopped", name)
+
+    def _control_loop(self):
+        temperatures = self._temperature.get_status()
+        now = time.time()
+        with self._controllers_lock:
+            controllers = list(self._controllers.items())
+        for name, controller in controllers:
+            sensors = controller.curve['sensors']
+            temps = [values['temp'] for sensor, values in temperatures.items()
+                     if values['online'] and (not sensors or sensor in sensors)]
+            if not temps:
+                logger.error("Fan %s no thermal zones available for the closed loop", name)
+                continue
+            speed = controller.update(max(temps), now)
+            for index in range(len(self._fan_list[name]['pwm'])):
+                self._write_speed(name, speed, index)
+
+    def close(self):
+        self._timer.close()
+
     def get_status(self):
         fan_status = {}
         for name, data in self._fan_list.items():
@@ -609,6 +716,8 @@ class FanService(object):
                     pass
             if 'kickstart_pwm' in data:
                 fan_status[name]['kickstart_pwm'] = data['kickstart_pwm']
+            if name in self._controllers:
+                fan_status[name]['closed_loop'] = self._controllers[name].status
 
         if self._nvfancontrol:
             nvfan_query = {}
@@ -636,4 +745,7 @@ class FanService(object):
                     fan_status[name]['profile'] = FAN_TEMP_CONTROL_NAME if control_value else FAN_MANUAL_NAME
                 else:
                     fan_status[name]['profile'] = FAN_MANUAL_NAME
+        for name in fan_status:
+            if name in self._controllers:
+                fan_status[name]['profile'] = FAN_CLOSED_LOOP_NAME
         return fan_status
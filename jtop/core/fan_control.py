@@ -0,0 +1,157 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+# Logging
+import logging
+from .exceptions import JtopException
+# Create logger
+logger = logging.getLogger(__name__)
+# Control modes
+FAN_CONTROL_CURVE = 'curve'
+FAN_CONTROL_PID = 'pid'
+# Update rate of the fan controller in seconds
+FAN_CONTROL_INTERVAL = 1.0
+# Default fan curve, temperatures in Celsius and speed in percentage
+FAN_CURVE_DEFAULT = {
+    'mode': FAN_CONTROL_CURVE,
+    # Thermal zones, the hottest is used. Empty for all thermal zones
+    'sensors': [],
+    # Piecewise-linear curve [temperature, speed]
+    'points': [[40.0, 0.0], [60.0, 40.0], [80.0, 100.0]],
+    # The speed decrease only when the temperature is lower than the hysteresis
+    'hysteresis': 3.0,
+    # Max speed change in percentage per second
+    'slew': 20.0,
+    # PID target temperature and gains [kp, ki, kd]
+    'target': 70.0,
+    'pid': [4.0, 0.2, 1.0],
+    # Speed limits
+    'min': 0.0,
+    'max': 100.0,
+}
+
+
+def check_curve(curve):
+    """
+    Merge a fan curve with the default values and check all fields
+    """
+    if not isinstance(curve, dict):
+        raise JtopException("Fan curve must be a dictionary")
+    unknown = [key for key in curve if key not in FAN_CURVE_DEFAULT]
+    if unknown:
+        raise JtopException("Fan curve unknown fields: {fields}".format(fields=", ".join(unknown)))
+    config = copy.deepcopy(FAN_CURVE_DEFAULT)
+    config.update(copy.deepcopy(curve))
+    if config['mode'] not in [FAN_CONTROL_CURVE, FAN_CONTROL_PID]:
+        raise JtopException("Fan control mode \"{mode}\" does not exist".format(mode=config['mode']))
+    try:
+        config['points'] = sorted([float(temp), float(speed)] for temp, speed in config['points'])
+        config['pid'] = [float(gain) for gain in config['pid']]
+        for key in ['hysteresis', 'slew', 'target', 'min', 'max']:
+            config[key] = float(config[key])
+    except (TypeError, ValueError) as e:
+        raise JtopException("Fan curve not valid: {error}".format(error=e))
+    if not config['points'] or len(config['pid']) != 3:
+        raise JtopException("Fan curve requires at least one point and three PID gains")
+    if not 0.0 <= config['min'] <= config['max'] <= 100.0:
+        raise JtopException("Fan speed limits must be 0 <= min <= max <= 100")
+    if config['hysteresis'] < 0 or config['slew'] <= 0:
+        raise JtopException("Fan hysteresis must be positive and slew greater than zero")
+    return config
+
+
+def curve_speed(points, temp):
+    """
+    Speed of a piecewise-linear curve, constant before the first point and after the last point
+    """
+    if temp <= points[0][0]:
+        return points[0][1]
+    for (temp0, speed0), (temp1, speed1) in zip(points, points[1:]):
+        if temp <= temp1:
+            return speed0 + (speed1 - speed0) * (temp - temp0) / (temp1 - temp0)
+    return points[-1][1]
+
+
+class FanController(object):
+    """
+    Closed-loop fan controller: from a temperature return the new speed of the fan.
+
+    With the **curve** mode the speed follow a piecewise-linear curve, the temperature used on the curve
+    decrease only when it is lower than the hysteresis. With the **pid** mode the speed is the output
+    of a PID on the target temperature. In both modes the speed change is limited from the slew rate.
+
+    The control error in the status is the temperature minus the target with the **pid** mode,
+    and the speed of the curve minus the current speed with the **curve** mode.
+    """
+
+    def __init__(self, curve, duty=0.0):
+        self.curve = check_curve(curve)
+        self._duty = float(duty)
+        self._time = None
+        self._temp = None
+        self._integral = 0.0
+        self._error = None
+        self._status = {}
+
+    def _curve(self, temp):
+        # Hysteresis, follow the temperature when increase and wait to decrease
+        if self._temp is None or temp > self._temp:
+            self._temp = temp
+        elif temp < self._temp - self.curve['hysteresis']:
+            self._temp = temp + self.curve['hysteresis']
+        return curve_speed(self.curve['points'], self._temp)
+
+    def _pid(self, temp, dt):
+        kp, ki, kd = self.curve['pid']
+        error = temp - self.curve['target']
+        derivative = (error - self._error) / dt if self._error is not None and dt > 0 else 0.0
+        integral = self._integral + error * dt
+        request = kp * error + ki * integral + kd * derivative
+        # Anti windup, integrate only when the output is not saturated
+        if self.curve['min'] < request < self.curve['max']:
+            self._integral = integral
+        self._error = error
+        return error, request
+
+    def update(self, temp, now):
+        dt = now - self._time if self._time is not None else 0.0
+        self._time = now
+        if self.curve['mode'] == FAN_CONTROL_PID:
+            error, request = self._pid(temp, dt)
+        else:
+            request = self._curve(temp)
+        request = min(max(request, self.curve['min']), self.curve['max'])
+        # Slew rate, on the first update the fan move to the request
+        step = self.curve['slew'] * dt if dt > 0 else abs(request - self._duty)
+        self._duty += min(max(request - self._duty, -step), step)
+        if self.curve['mode'] != FAN_CONTROL_PID:
+            # Speed of the curve not reached yet, from the slew rate
+            error = request - self._duty
+        self._status = {
+            'mode': self.curve['mode'],
+            'temp': temp,
+            'error': error,
+            'request': request,
+            'duty': self._duty,
+        }
+        return self._duty
+
+    @property
+    def status(self):
+        return self._status
+# EOF
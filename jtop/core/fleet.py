@@ -0,0 +1,583 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import ssl
+import time
+import socket
+import selectors
+from array import array
+from math import isnan
+from threading import Thread, Lock, Event
+# Logging
+import logging
+from .stream import (JTOP_PORT, STREAM_VERSION, FRAME_HELLO, FRAME_AUTH, FRAME_INIT, FRAME_SNAPSHOT, FRAME_ALIVE, FRAME_ERROR,
+                     READ_SIZE, FrameReader, StreamException, pack_frame, decode_payload, auth_digest)
+# Create logger
+logger = logging.getLogger(__name__)
+# Port where the aggregator publish the fleet summary
+FLEET_PORT = 9880
+# Downsampled history for each node
+FLEET_HISTORY_TIME = 3600.0
+FLEET_HISTORY_STEP = 10.0
+# Snapshots received in this time are decoded together
+BATCH_TIME = 0.05
+# Time between two alive messages to each node
+ALIVE_TIME = 2.0
+# Delay before to reconnect a node, doubled on each failure
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 60.0
+SELECT_TIMEOUT = 1.0
+# Without a throttle threshold from the sensor, a board over this temperature is throttling
+THROTTLE_TEMPERATURE = 90.0
+# Metrics stored for each node, the other fields of the summary are not in history
+FLEET_METRICS = ['temp', 'power', 'cpu', 'gpu', 'ram']
+# Status nodes
+NODE_CONNECTING = 'connecting'
+NODE_ONLINE = 'online'
+NODE_STALE = 'stale'
+NODE_OFFLINE = 'offline'
+NODE_ERROR = 'error'
+NAN = float('nan')
+
+
+def parse_node(text, port=JTOP_PORT):
+    """
+    Decode a node in format **[name=]host[:port]**, IPv6 address must be in square brackets
+    """
+    name, _, address = text.strip().rpartition('=')
+    if address.startswith('['):
+        host, _, tail = address[1:].partition(']')
+        if tail.startswith(':'):
+            port = int(tail[1:])
+    elif address.count(':') == 1:
+        host, port = address.split(':')
+        port = int(port)
+    else:
+        host = address
+    return name if name else address, (host, port)
+
+
+def node_summary(stats, throttle_temperature=THROTTLE_TEMPERATURE):
+    """
+    Extract from a jtop snapshot the few values used for fleet queries
+    """
+    summary = {'temp': NAN, 'sensor': '', 'throttling': False, 'power': NAN, 'cpu': NAN, 'gpu': NAN, 'ram': NAN,
+               'uptime': stats.get('uptime', 0.0)}
+    # Hottest sensor
+    for name, sensor in stats.get('temperature', {}).items():
+        if not sensor.get('online', False):
+            continue
+        temp = sensor.get('temp', NAN)
+        if isnan(summary['temp']) or temp > summary['temp']:
+            summary['temp'] = temp
+            summary['sensor'] = name
+        limit = sensor.get('max', 0.0)
+        if temp >= (limit if limit > 0 else throttle_temperature):
+            summary['throttling'] = True
+    # Total power in milliwatt
+    total = stats.get('power', {}).get('tot', {})
+    if 'power' in total:
+        summary['power'] = float(total['power'])
+    # CPU and GPU load
+    if 'total' in stats.get('cpu', {}):
+        summary['cpu'] = 100.0 - stats['cpu']['total'].get('idle', 100.0)
+    loads = [gpu['status']['load'] for gpu in stats.get('gpu', {}).values() if 'load' in gpu.get('status', {})]
+    if loads:
+        summary['gpu'] = max(loads)
+    # RAM
+    ram = stats.get('mem', {}).get('RAM', {})
+    if ram.get('tot'):
+        summary['ram'] = 100.0 * ram.get('used', 0) / ram['tot']
+    return summary
+
+
+class FleetNode(object):
+    """
+    Status of a jtop service in the fleet, with its last snapshot and a downsampled history
+    """
+
+    def __init__(self, name, address, history_time, history_step):
+        self.name = name
+        self.address = address
+        self.status = NODE_OFFLINE
+        self.error = ''
+        self.init = {}
+        self.stats = {}
+        self.summary = node_summary({})
+        self.last_update = 0.0
+        # Connection
+        self.sock = None
+        self.reader = None
+        self.out = bytearray()
+        self.connected = False
+        self.handshake = False
+        self.pending = None
+        self.last_alive = 0.0
+        self.last_seen = 0.0
+        self.next_connect = 0.0
+        self.reconnect = RECONNECT_MIN
+        self.snapshots = 0
+        self.skipped = 0
+        # History
+        self.step = history_step
+        self.capacity = max(int(history_time // history_step), 1)
+        self.column = None
+        self.history = {metric: array('d', [NAN] * self.capacity) for metric in FLEET_METRICS}
+
+    def update(self, stats, timestamp, throttle_temperature):
+        # Summary first, a wrong snapshot does not change the node
+        self.summary = node_summary(stats, throttle_temperature)
+        self.stats = stats
+        self.last_update = timestamp
+        # Each column of history keep the peak of its period
+        column = int(timestamp // self.step)
+        if self.column is None or column > self.column:
+            first = column if self.column is None else max(self.column + 1, column - self.capacity + 1)
+            for idx in range(first, column + 1):
+                for ring in self.history.values():
+                    ring[idx % self.capacity] = NAN
+            self.column = column
+        elif column < self.column - self.capacity + 1:
+            return
+        idx = column % self.capacity
+        for metric, ring in self.history.items():
+            value = self.summary[metric]
+            if not isnan(value) and (isnan(ring[idx]) or value > ring[idx]):
+                ring[idx] = value
+
+    def get_history(self, metric):
+        if self.column is None:
+            return []
+        values = []
+        ring = self.history[metric]
+        for column in range(self.column - self.capacity + 1, self.column + 1):
+            value = ring[column % self.capacity]
+            if not isnan(value):
+                values.append((column * self.step, value))
+        return values
+
+
+class FleetAggregator(Thread):
+    """
+    Collect the stats from many jtop services.
+
+    All connections are served from one thread with a selector, snapshots are decoded in batch
+    and only the last snapshot received from each node is decoded.
+    Host names are resolved when a node connects, use IP addresses for large fleets.
+    """
+
+    def __init__(self, nodes=None, interval=1.0, token=None, ssl_context=None, throttle_temperature=THROTTLE_TEMPERATURE,
+                 history_time=FLEET_HISTORY_TIME, history_step=FLEET_HISTORY_STEP):
+        super(FleetAggregator, self).__init__()
+        self.daemon = True
+        self._interval = float(interval)
+        self._token = token
+        self._ssl_context = ssl_context
+        self._throttle_temperature = throttle_temperature
+        self._history_time = history_time
+        self._history_step = history_step
+        self._lock = Lock()
+        self._nodes = {}
+        self._listeners = []
+        self._selector = selectors.DefaultSelector()
+        self._running = Event()
+        self._error = None
+        self._batch_start = None
+        self._removed = []
+        self._wake_r, self._wake_w = socket.socketpair()
+        # A full wake up pipe already wakes up the selector
+        self._wake_w.setblocking(False)
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        for name, address in nodes or []:
+            self.add_node(name, address)
+
+    @property
+    def interval(self):
+        return self._interval
+
+    def add_node(self, name, address=None):
+        """
+        Add a node, without **address** the node is updated only with :func:`~ingest`
+        """
+        with self._lock:
+            if name in self._nodes:
+                raise ValueError("Node {name} already in fleet".format(name=name))
+            self._nodes[name] = FleetNode(name, address, self._history_time, self._history_step)
+        self._wake()
+
+    def remove_node(self, name):
+        with self._lock:
+            node = self._nodes.pop(name, None)
+            if node is not None and node.sock is not None:
+                # The connection is closed from the aggregator thread
+                self._removed.append(node)
+        self._wake()
+
+    def ingest(self, name, stats):
+        """
+        Update a node from an exported stream (e.g. a jtop observer with **snapshot=True**)
+        """
+        with self._lock:
+            if name not in self._nodes:
+                self._nodes[name] = FleetNode(name, None, self._history_time, self._history_step)
+            node = self._nodes[name]
+            node.status = NODE_ONLINE
+            node.last_seen = time.time()
+            node.update(stats, time.time(), self._throttle_temperature)
+        self._notify()
+
+    def attach(self, listener):
+        """
+        The listener is called with the aggregator after each batch of new snapshots
+        """
+        self._listeners.append(listener)
+
+    def detach(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            try:
+                listener(self)
+            except Exception:
+                logger.error("Fleet listener {listener} failed".format(listener=listener), exc_info=1)
+
+    def _status(self, node, now):
+        if node.status == NODE_ONLINE and now - node.last_seen > max(self._interval, node.init.get('interval', 0.0)) * 3 + 1.0:
+            return NODE_STALE
+        return node.status
+
+    @property
+    def nodes(self):
+        """
+        Summary of all nodes: status, hottest sensor, throttling, power (mW), CPU, GPU and RAM usage (%)
+        """
+        now = time.time()
+        with self._lock:
+            return [dict(node.summary, name=node.name, status=self._status(node, now), error=node.error,
+                         model=node.init.get('board', {}).get('hardware', {}).get('Model', ''))
+                    for node in self._nodes.values()]
+
+    def node(self, name):
+        """
+        Last snapshot of a node
+        """
+        with self._lock:
+            return self._nodes[name].stats
+
+    def history(self, name, metric):
+        """
+        Downsampled history of a node, list of (time, peak value)
+        """
+        with self._lock:
+            return self._nodes[name].get_history(metric)
+
+    def top(self, n=10, metric='temp'):
+        """
+        The **n** online nodes with the highest value of **metric**
+        """
+        nodes = [node for node in self.nodes if node['status'] == NODE_ONLINE and not isnan(node.get(metric, NAN))]
+        return sorted(nodes, key=lambda node: node[metric], reverse=True)[:n]
+
+    def throttling(self):
+        return [node for node in self.nodes if node['status'] == NODE_ONLINE and node['throttling']]
+
+    def total_power(self):
+        """
+        Sum of the power of all online nodes (mW)
+        """
+        return sum(node['power'] for node in self.nodes if node['status'] == NODE_ONLINE and not isnan(node['power']))
+
+    def summary(self, n=10):
+        nodes = self.nodes
+        online = [node for node in nodes if node['status'] == NODE_ONLINE]
+        return {
+            'nodes': len(nodes),
+            'online': len(online),
+            'total_power': sum(node['power'] for node in online if not isnan(node['power'])),
+            'throttling': [node['name'] for node in online if node['throttling']],
+            'top': [(node['name'], node['temp']) for node in self.top(n)],
+            'status': {node['name']: node for node in nodes},
+        }
+
+    def stream_init(self, interval):
+        return {'fleet': True, 'interval': self._interval, 'nodes': [node['name'] for node in self.nodes]}
+
+    def stream_control(self, control, name):
+        logger.warning("Control from {name} not available on fleet".format(name=name))
+
+    def stream_alive(self):
+        pass
+
+    def ok(self, spin=False):
+        if not spin:
+            time.sleep(self._interval)
+        if self._error is not None:
+            raise self._error
+        return self._running.is_set()
+
+    def start(self):
+        self._running.set()
+        super(FleetAggregator, self).start()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\x00')
+        except OSError:
+            pass
+
+    def run(self):
+        try:
+            while self._running.is_set():
+                now = time.time()
+                timeout = SELECT_TIMEOUT
+                with self._lock:
+                    nodes = list(self._nodes.values())
+                for node in nodes:
+                    if node.sock is None and node.address is not None:
+                        if now >= node.next_connect:
+                            self._connect(node, now)
+                        else:
+                            timeout = min(timeout, node.next_connect - now)
+                    elif node.sock is not None and node.status == NODE_ONLINE and now - node.last_alive >= ALIVE_TIME:
+                        node.last_alive = now
+                        self._send(node, pack_frame(FRAME_ALIVE, {}))
+                if self._batch_start is not None:
+                    timeout = max(0.0, min(timeout, self._batch_start + BATCH_TIME - now))
+                for key, mask in self._selector.select(timeout=timeout):
+                    if key.data is None:
+                        self._read_wake()
+                        continue
+                    node = key.data
+                    if mask & selectors.EVENT_WRITE:
+                        self._write(node)
+                    if mask & selectors.EVENT_READ and node.sock is not None:
+                        self._read(node)
+                # Decode all snapshots received
+                if self._batch_start is not None and time.time() - self._batch_start >= BATCH_TIME:
+                    self._decode_batch()
+                # Disconnect removed nodes
+                with self._lock:
+                    removed, self._removed = self._removed, []
+                for node in removed:
+                    if node.sock is not None:
+                        self._disconnect(node, NODE_OFFLINE)
+        except Exception as e:
+            logger.error("Fleet aggregator error {error}".format(error=e), exc_info=1)
+            self._error = e
+        finally:
+            for node in list(self._nodes.values()):
+                if node.sock is not None:
+                    self._disconnect(node, NODE_OFFLINE)
+
+    def _read_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _connect(self, node, now):
+        node.status = NODE_CONNECTING
+        node.reader = FrameReader()
+        node.out = bytearray()
+        node.pending = None
+        try:
+            family, socktype, proto, _, address = socket.getaddrinfo(node.address[0], node.address[1], type=socket.SOCK_STREAM)[0]
+            sock = socket.socket(family, socktype, proto)
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.connect_ex(address)
+        except OSError as e:
+            self._failed(node, e, now)
+            return
+        node.sock = sock
+        node.connected = False
+        node.handshake = False
+        self._selector.register(sock, selectors.EVENT_READ | selectors.EVENT_WRITE, node)
+
+    def _failed(self, node, error, now, status=NODE_OFFLINE):
+        node.error = str(error)
+        node.next_connect = now + node.reconnect
+        node.reconnect = min(node.reconnect * 2.0, RECONNECT_MAX)
+        if node.sock is not None:
+            self._disconnect(node, status)
+        else:
+            node.status = status
+        logger.debug("Node {name} failed: {error}".format(name=node.name, error=error))
+
+    def _disconnect(self, node, status):
+        try:
+            self._selector.unregister(node.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            node.sock.close()
+        except OSError:
+            pass
+        node.sock = None
+        node.pending = None
+        node.status = status
+        if node.next_connect <= time.time():
+            node.next_connect = time.time() + node.reconnect
+
+    def _connected(self, node):
+        error = node.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            self._failed(node, OSError(error, "Connection failed"), time.time())
+            return False
+        if self._ssl_context is not None:
+            node.sock = self._ssl_context.wrap_socket(node.sock, server_hostname=node.address[0], do_handshake_on_connect=False)
+            node.handshake = True
+            self._selector.modify(node.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, node)
+        node.connected = True
+        return True
+
+    def _do_handshake(self, node):
+        try:
+            node.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._selector.modify(node.sock, selectors.EVENT_READ, node)
+            return
+        except ssl.SSLWantWriteError:
+            self._selector.modify(node.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, node)
+            return
+        except (ssl.SSLError, OSError) as e:
+            self._failed(node, e, time.time(), NODE_ERROR)
+            return
+        node.handshake = False
+        self._update_events(node)
+
+    def _write(self, node):
+        if not node.connected and not self._connected(node):
+            return
+        if node.handshake:
+            self._do_handshake(node)
+            return
+        while node.out:
+            try:
+                sent = node.sock.send(node.out)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                break
+            except OSError as e:
+                self._failed(node, e, time.time())
+                return
+            del node.out[:sent]
+        self._update_events(node)
+
+    def _update_events(self, node):
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if node.out else 0)
+        try:
+            self._selector.modify(node.sock, events, node)
+        except (KeyError, ValueError):
+            pass
+
+    def _send(self, node, frame):
+        node.out += frame
+        self._write(node)
+
+    def _read(self, node):
+        if not node.connected and not self._connected(node):
+            return
+        if node.handshake:
+            self._do_handshake(node)
+            return
+        while True:
+            try:
+                data = node.sock.recv(READ_SIZE)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                break
+            except OSError as e:
+                self._failed(node, e, time.time())
+                return
+            if not data:
+                self._failed(node, "Connection closed", time.time())
+                return
+            node.reader.feed(data)
+            node.last_seen = time.time()
+            if not (isinstance(node.sock, ssl.SSLSocket) and node.sock.pending()):
+                break
+        try:
+            for kind, flags, payload in node.reader.raw_frames():
+                if kind == FRAME_SNAPSHOT:
+                    # Only the last snapshot is decoded
+                    if node.pending is not None:
+                        node.skipped += 1
+                    node.pending = (flags, payload)
+                    if self._batch_start is None:
+                        self._batch_start = time.time()
+                    continue
+                self._message(node, kind, decode_payload(flags, payload))
+                if node.sock is None:
+                    return
+        except StreamException as e:
+            self._failed(node, e, time.time(), NODE_ERROR)
+
+    def _message(self, node, kind, message):
+        if kind == FRAME_HELLO:
+            if message.get('version') != STREAM_VERSION:
+                self._failed(node, "Mismatch stream version", time.time(), NODE_ERROR)
+                return
+            digest = None
+            if message.get('auth'):
+                if self._token is None:
+                    self._failed(node, "jtop service require a token", time.time(), NODE_ERROR)
+                    return
+                digest = auth_digest(self._token, message['nonce'])
+            self._send(node, pack_frame(FRAME_AUTH, {'digest': digest, 'interval': self._interval, 'name': 'jtop-aggregator'}))
+        elif kind == FRAME_INIT:
+            with self._lock:
+                node.init = message
+                node.status = NODE_ONLINE
+                node.error = ''
+                node.reconnect = RECONNECT_MIN
+        elif kind == FRAME_ERROR:
+            # Wait the max delay before to retry
+            node.reconnect = RECONNECT_MAX
+            self._failed(node, message.get('message', 'Error from jtop service'), time.time(), NODE_ERROR)
+
+    def _decode_batch(self):
+        now = time.time()
+        self._batch_start = None
+        with self._lock:
+            nodes = [node for node in self._nodes.values() if node.pending is not None]
+            for node in nodes:
+                flags, payload = node.pending
+                node.pending = None
+                try:
+                    stats = decode_payload(flags, payload)
+                    node.update(stats, now, self._throttle_temperature)
+                except Exception as e:
+                    # A wrong snapshot must not stop the update of the other nodes
+                    logger.warning("Node {name} wrong snapshot: {error}".format(name=node.name, error=e))
+                    node.error = str(e)
+                    continue
+                node.snapshots += 1
+        if nodes:
+            self._notify()
+
+    def close(self, timeout=None):
+        self._running.clear()
+        self._wake()
+        if self.is_alive():
+            self.join(timeout)
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+# EOF
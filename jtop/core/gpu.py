@@ -16,10 +16,11 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import time
 # Logging
 import logging
 from typing import Any, Callable, Dict, Optional, TypeVar
-from .common import cat, GenericInterface
+from .common import cat, GenericInterface, DevfreqResidency
 from .exceptions import JtopException
 from .command import Command
 from .hw_detect import is_thor, is_jetpack7
@@ -457,11 +458,13 @@ class GPU(GenericInterface):
         :param value: Enable/Disable 3D scaling
         :type value: bool
         :raises JtopException: if GPU doesn't exist
+        :return: Job completed when the service apply the change
+        :rtype: ControlJob
         """
         if name not in self._data:
             raise JtopException(f"GPU \"{name}\" does not exist")
         # Set new 3D scaling
-        self._controller.put({'gpu': {'command': '3d_scaling', 'name': name, 'value': value}})
+        return self._controller.put({'gpu': {'command': '3d_scaling', 'name': name, 'value': value}})
 
     def get_scaling_3D(self, name):
         """
@@ -513,7 +516,7 @@ class GPU(GenericInterface):
         if name not in self._data:
             raise JtopException("GPU \"{name}\" does not exist".format(name=name))
         # Set new 3D scaling
-        self._controller.put({'gpu': {'command': 'railgate', 'name': name, 'value': value}})
+        return self._controller.put({'gpu': {'command': 'railgate', 'name': name, 'value': value}})
 
     def get_railgate(self, name):
         if name not in self._data:
@@ -532,6 +535,8 @@ class GPUService(object):
     def __init__(self):
         self._gpu_list = {}
         self._nvml_device_count = 0
+        # Frequency residency of each integrated GPU from devfreq trans_stat
+        self._residency = {}
         # When True, get_status() keeps re-probing sysfs to recover from an
         # early-boot fallback to NVML (see _initialize_gpu_method).
         self._sysfs_retry = False
@@ -696,6 +701,7 @@ class GPUService(object):
 
         # Use traditional method for older Jetpack versions
         gpu_list = {}
+        now = time.time()
         # Read iGPU frequency
         for name, data in self._gpu_list.items():
             # Initialize GPU status
@@ -706,6 +712,10 @@ class GPUService(object):
                 gpu['status'] = igpu_read_status(data['path'])
                 # Read frequency
                 gpu['freq'] = igpu_read_freq(data['frq_path'])
+                # Time in each frequency from the previous update
+                if data['frq_path'] not in self._residency:
+                    self._residency[data['frq_path']] = DevfreqResidency(data['frq_path'])
+                gpu['residency'] = self._residency[data['frq_path']].update(now)
                 # Read power control status
                 if os.access(data['path'] + "/power/control", os.R_OK):
                     with open(data['path'] + "/power/control", 'r') as f:
@@ -26,6 +26,8 @@ from threading import Thread
 from .command import Command
 from .common import get_uptime
 from .exceptions import JtopException
+from .jobs import completed_job
+from .dvfs import DVFSEngine
 # Create logger
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,8 @@ COMMAND_TIMEOUT = 3.0
 CONFIG_DEFAULT_BOOT = False
 CONFIG_DEFAULT_DELAY = 60  # In seconds
 CONFIG_DEFAULT_L4T_FILE = "l4t_dfs.conf"
+CONFIG_DEFAULT_NATIVE = False
+CONFIG_DEFAULT_DVFS_FILE = "dvfs_profile.json"
 # Type Engine
 JC_ENGINES = re.compile(r'^(?P<name>[^ ]+) .* MaxFreq=(?P<frq>[^ ]+) .*')
 
@@ -145,6 +149,8 @@ class JetsonClocks(object):
         :type enable: bool
         :raises ValueError: if enable is not a boolean
         :raises JtopException: if jetson_clocks is in uncontrolled status
+        :return: Job completed when jetson_clocks is started or stopped
+        :rtype: ControlJob
         """
         if not isinstance(enable, bool):
             raise ValueError("Use a boolean")
@@ -152,10 +158,11 @@ class JetsonClocks(object):
             raise JtopException("I cannot set jetson_clocks.\nPlease shutdown manually jetson_clocks")
         # Check if service is not started otherwise skip
         if self._thread in ['booting', 'activating', 'deactivating', 'uncontrolled']:
-            return
+            return completed_job(False)
         # Set new jetson_clocks configuration
         if enable is not self._enable:
-            self._controller.put({'jc': {'enable': enable}})
+            return self._controller.put({'jc': {'enable': enable}})
+        return completed_job()
 
     def get_enable(self):
         """
@@ -191,14 +198,16 @@ class JetsonClocks(object):
         :param value: Boolean status for enable and disable jetson_clocks on boot
         :type value: bool
         :raises ValueError: if value is not a boolean
+        :return: Job completed when the service apply the change
+        :rtype: ControlJob
         """
         if not isinstance(value, bool):
             raise ValueError("Use a boolean")
         # Don't send a message if value is the same
         if value is self._boot:
-            return
+            return completed_job()
         # Set new jetson_clocks configuration
-        self._controller.put({'jc': {'boot': value}})
+        return self._controller.put({'jc': {'boot': value}})
 
     def get_boot(self):
         """
@@ -291,7 +300,7 @@ class JetsonClocks(object):
         This method clear the jetson_clocks configuration that use jtop.
         """
         # Clear jetson_clocks configuration
-        self._controller.put({'jc': {'clear': True}})
+        return self._controller.put({'jc': {'clear': True}})
 
     def __nonzero__(self):
         return self._enable
@@ -333,6 +342,8 @@ class JetsonClocksService(object):
 
     def __init__(self, config, fan):
         self._data = {}
+        # Status reported while the jetson_clocks thread is running
+        self._enable = False
         # Status thread enable/disable
         self._thread_status = 'inactive'
         # Initialization Jetson Clocks Object thread
@@ -350,6 +361,9 @@ class JetsonClocksService(object):
         # Config file
         jetson_clocks_file = config.get('jetson_clocks', {}).get('l4t_file', CONFIG_DEFAULT_L4T_FILE)
         self._config_l4t = os.path.join(config.path, jetson_clocks_file)
+        self._config_dvfs = os.path.join(config.path, CONFIG_DEFAULT_DVFS_FILE)
+        # Profile stored before to start jetson_clocks
+        self._profile = None
         # Jetson Clocks path
         self._jetson_clocks_bin = ''
         for path in PATH_JETSON_CLOCKS:
@@ -359,6 +373,14 @@ class JetsonClocksService(object):
                 break
         if not self._jetson_clocks_bin:
             logger.warning("jetson_clocks not available")
+        # Native jetson_clocks, the script is used as fallback
+        self._dvfs = None
+        if self._jetson_clocks_bin and config.get('jetson_clocks', {}).get('native', CONFIG_DEFAULT_NATIVE):
+            root = "/fake_sys" if os.getenv('JTOP_TESTING', False) else "/sys"
+            dvfs = DVFSEngine(root)
+            if dvfs.exists():
+                self._dvfs = dvfs
+                logger.info("Native jetson_clocks for {engines}".format(engines=dvfs.engines))
 
     def exists(self):
         return True if self._jetson_clocks_bin else False
@@ -367,11 +389,11 @@ class JetsonClocksService(object):
         self._data = data
         self._nvpmodel = nvpmodel
         # List of all engines required
-        self._engines_list = self.show()
+        self._engines_list = self._dvfs.engines if self._dvfs is not None else self.show()
         # Check if jetson_clocks is alive
         is_enabled = self.get_enable()
         # Check if exist configuration file
-        if not os.path.isfile(self._config_l4t):
+        if not self.is_config():
             if is_enabled:
                 self._thread_status = 'uncontrolled'
                 logger.warning("I can't store jetson_clocks configuration is already running!")
@@ -427,6 +449,8 @@ class JetsonClocksService(object):
         return config.get('boot', CONFIG_DEFAULT_BOOT)
 
     def is_config(self):
+        if self._dvfs is not None:
+            return os.path.isfile(self._config_dvfs)
         return os.path.isfile(self._config_l4t)
 
     def is_running(self):
@@ -435,6 +459,12 @@ class JetsonClocksService(object):
                 self._thread_status = 'inactive'
         return self._thread_status
 
+    def wait(self, timeout=None):
+        """ Wait the end of the jetson_clocks thread, return False if it is still running """
+        if self._jetson_clocks_thread is not None:
+            self._jetson_clocks_thread.join(timeout)
+        return self.is_running() == 'inactive'
+
     def _fix_fan(self, status_fan):
         # Fix fan speed
         for name in status_fan:
@@ -470,7 +500,8 @@ class JetsonClocksService(object):
         if reset_nvpmodel and self._nvpmodel.exists():
             nvpmodel_id = self._nvpmodel.get_nvpmodel_id()
         # Start jetson_clocks
-        Command.run_command([self._jetson_clocks_bin], repeat=5, timeout=COMMAND_TIMEOUT)
+        if not self._native_start():
+            Command.run_command([self._jetson_clocks_bin], repeat=5, timeout=COMMAND_TIMEOUT)
         # Fix fan speed
         self._fix_fan(status_fan)
         # Reset nvpmodel
@@ -486,7 +517,8 @@ class JetsonClocksService(object):
         if reset_nvpmodel and self._nvpmodel.exists():
             nvpmodel_id = self._nvpmodel.get_nvpmodel_id()
         # Run jetson_clocks
-        Command.run_command([self._jetson_clocks_bin, '--restore', self._config_l4t], repeat=5, timeout=COMMAND_TIMEOUT)
+        if not self._native_stop():
+            Command.run_command([self._jetson_clocks_bin, '--restore', self._config_l4t], repeat=5, timeout=COMMAND_TIMEOUT)
         # Fix fan speed
         self._fix_fan(status_fan)
         # Reset nvpmodel
@@ -494,6 +526,39 @@ class JetsonClocksService(object):
             self._nvpmodel.set_nvpmodel_id(nvpmodel_id, False)
         logger.info("jetson_clocks stopped")
 
+    def _native_verify(self, enable, profile, previous):
+        # Read again the DVFS limits, a driver can change a limit after it is written
+        if self._dvfs.check(profile):
+            return True
+        logger.error("Native jetson_clocks not {status}. Rollback".format(status="started" if enable else "stopped"))
+        self._dvfs.apply(previous)
+        return False
+
+    def _native_start(self):
+        if self._dvfs is None:
+            return False
+        previous = self._dvfs.snapshot()
+        try:
+            profile = self._dvfs.max_profile()
+            self._dvfs.apply(profile)
+            return self._native_verify(True, profile, previous)
+        except (OSError, ValueError, JtopException) as e:
+            logger.error("{error}, run {cmd}".format(error=e, cmd=self._jetson_clocks_bin))
+            return False
+
+    def _native_stop(self):
+        if self._dvfs is None:
+            return False
+        previous = self._dvfs.snapshot()
+        try:
+            if self._profile is None:
+                self._profile = DVFSEngine.load(self._config_dvfs)
+            self._dvfs.apply(self._profile)
+            return self._native_verify(False, self._profile, previous)
+        except (OSError, ValueError, JtopException) as e:
+            logger.error("{error}, run {cmd} --restore".format(error=e, cmd=self._jetson_clocks_bin))
+            return False
+
     def _error_status(self):
         # Catch exception if exist
         if self._error:
@@ -529,13 +594,28 @@ class JetsonClocksService(object):
 
     def store(self):
         if self.is_config():
-            logger.error("Configuration already stored in {file}".format(file=self._config_l4t))
+            logger.error("Configuration already stored in {file}".format(file=self._config_dvfs if self._dvfs is not None else self._config_l4t))
             return False
         if self.get_enable():
             self._thread_status = 'uncontrolled'
             logger.error("jetson_clocks is running. I cannot store configuration")
             return False
         # Store configuration jetson_clocks
+        if self._dvfs is not None:
+            try:
+                self._profile = self._dvfs.snapshot()
+                DVFSEngine.save(self._config_dvfs, self._profile)
+            except (OSError, ValueError) as e:
+                logger.error("I cannot store DVFS profile: {error}".format(error=e))
+                return False
+            logger.info("Store DVFS profile in {file}".format(file=self._config_dvfs))
+            # Configuration for the jetson_clocks script, used as fallback
+            if not os.path.isfile(self._config_l4t):
+                self._store_l4t()
+            return True
+        return self._store_l4t()
+
+    def _store_l4t(self):
         cmd = Command([self._jetson_clocks_bin, '--store', self._config_l4t])
         try:
             message = cmd(timeout=COMMAND_TIMEOUT)
@@ -546,17 +626,23 @@ class JetsonClocksService(object):
         return True if message else False
 
     def clear(self):
-        if os.path.isfile(self._config_l4t):
-            logger.info("Clear jetson_clocks config in {path}".format(path=self._config_l4t))
-            # Remove configuration file
-            os.remove(self._config_l4t)
-            return True
-        return False
+        cleared = False
+        self._profile = None
+        for path in [self._config_dvfs, self._config_l4t]:
+            if os.path.isfile(path):
+                logger.info("Clear jetson_clocks config in {path}".format(path=path))
+                # Remove configuration file
+                os.remove(path)
+                cleared = True
+        return cleared
 
     def get_status(self, data):
         self._data = data
+        # The status changes only when the thread is completed, enable and thread are always consistent
+        if self._jetson_clocks_thread is None or not self._jetson_clocks_thread.is_alive():
+            self._enable = self.get_enable()
         return {
-            'enable': self.get_enable(),
+            'enable': self._enable,
             'thread': self.is_running(),
             'config': self.is_config(),
             'boot': self.get_boot(),
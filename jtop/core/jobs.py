@@ -0,0 +1,198 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import uuid
+from threading import Lock
+from concurrent.futures import Future, ThreadPoolExecutor
+# Logging
+import logging
+from .exceptions import JtopException
+# Create logger
+logger = logging.getLogger(__name__)
+# Status of a control job
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_ERROR = 'error'
+# Number of workers for long control operations
+CONTROL_WORKERS = 4
+
+
+def new_job_id():
+    return uuid.uuid4().hex[:16]
+
+
+def completed_job(result=None):
+    """
+    Job already completed, for controls that don't need to be sent to the service
+    """
+    job = ControlJob()
+    job._update({'status': JOB_DONE, 'progress': 1.0, 'result': result})
+    return job
+
+
+class ControlJob(Future):
+    """
+    Future of a control message sent to the jtop service.
+
+    The job is completed when the service finish the operation, :py:attr:`status` and
+    :py:attr:`progress` are updated while the operation is running.
+
+    .. code-block:: python
+
+        with jtop() as jetson:
+            job = jetson.memory.swap_set(16)
+            # Wait the swap is ready
+            job.result(timeout=120)
+
+    If the operation fail or the connection with the service is lost :py:func:`result` raise a :class:`JtopException`
+    """
+
+    def __init__(self, job_id=None):
+        super(ControlJob, self).__init__()
+        self.id = job_id if job_id is not None else new_job_id()
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+
+    def _update(self, message):
+        if self.done():
+            return
+        self.status = message.get('status', self.status)
+        self.progress = message.get('progress', self.progress)
+        if self.status == JOB_DONE:
+            self.set_result(message.get('result'))
+        elif self.status == JOB_ERROR:
+            self.set_exception(JtopException(message.get('error', 'Control operation failed')))
+
+    def _fail(self, error):
+        if self.done():
+            return
+        self.status = JOB_ERROR
+        self.set_exception(JtopException(error))
+
+
+class ControlExecutor(object):
+    """
+    Run the control operations of the service.
+
+    Long operations run in a worker pool, operations on the same resource are executed in order.
+    Each update of a job is sent with the **notify** function: :code:`{'id', 'status', 'progress'}`
+    and :code:`result` or :code:`error` when the job is completed.
+    """
+
+    def __init__(self, notify, workers=CONTROL_WORKERS):
+        self._notify = notify
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jtop-control')
+        self._lock = Lock()
+        self._resources = {}
+        # Parts of the jobs with more operations: part id -> (name, group)
+        self._parts = {}
+
+    def split(self, job_id, names):
+        """
+        Split the job of a control message with more operations, one part for each name.
+        The job is completed when all parts are completed, the result is a dictionary with the result of each part
+        and the job fails if one part fails.
+        """
+        if job_id is None or len(names) < 2:
+            return {name: job_id for name in names}
+        group = {'id': job_id, 'pending': set(names), 'progress': {}, 'results': {}, 'errors': []}
+        parts = {}
+        with self._lock:
+            for name in names:
+                parts[name] = "{job}:{name}".format(job=job_id, name=name)
+                self._parts[parts[name]] = (name, group)
+        return parts
+
+    def _merge(self, job_id, status, progress, kwargs):
+        # Update of a part, return the update of its job
+        with self._lock:
+            if job_id not in self._parts:
+                return job_id, status, progress, kwargs
+            name, group = self._parts[job_id]
+            group['progress'][name] = progress
+            if status in [JOB_DONE, JOB_ERROR]:
+                del self._parts[job_id]
+                group['pending'].discard(name)
+                if status == JOB_DONE:
+                    group['results'][name] = kwargs.get('result')
+                else:
+                    group['errors'].append("{name}: {error}".format(name=name, error=kwargs.get('error')))
+            parts = len(group['pending']) + len(group['results']) + len(group['errors'])
+            progress = sum(group['progress'].values()) / parts
+            if group['pending']:
+                return group['id'], JOB_RUNNING, progress, {}
+            if group['errors']:
+                return group['id'], JOB_ERROR, 1.0, {'error': ", ".join(group['errors'])}
+            return group['id'], JOB_DONE, 1.0, {'result': group['results']}
+
+    def _update(self, job_id, status, progress, **kwargs):
+        if job_id is None:
+            return
+        job_id, status, progress, kwargs = self._merge(job_id, status, progress, kwargs)
+        message = {'id': job_id, 'status': status, 'progress': progress}
+        message.update(kwargs)
+        try:
+            self._notify(message)
+        except Exception as e:
+            logger.error("Job {id} notify error {error}".format(id=job_id, error=e))
+
+    def _resource(self, name):
+        with self._lock:
+            if name not in self._resources:
+                self._resources[name] = Lock()
+            return self._resources[name]
+
+    def _execute(self, job_id, fn, progress):
+        try:
+            result = fn(progress)
+        except Exception as e:
+            logger.error("Job {id} failed: {error}".format(id=job_id, error=e))
+            self._update(job_id, JOB_ERROR, 1.0, error=str(e))
+            return
+        self._update(job_id, JOB_DONE, 1.0, result=result)
+
+    def run(self, job_id, fn):
+        """
+        Run a fast operation in the caller thread, **fn** is called without arguments
+        """
+        self._execute(job_id, lambda progress: fn(), None)
+
+    def error(self, job_id, message):
+        logger.error(message)
+        self._update(job_id, JOB_ERROR, 1.0, error=message)
+
+    def submit(self, job_id, resource, fn):
+        """
+        Run a long operation in the worker pool and return immediately.
+        **fn** is called with a progress function, a number between 0 and 1
+        """
+        self._update(job_id, JOB_QUEUED, 0.0)
+
+        def progress(value):
+            self._update(job_id, JOB_RUNNING, float(value))
+
+        def worker():
+            with self._resource(resource):
+                progress(0.0)
+                self._execute(job_id, fn, progress)
+        return self._pool.submit(worker)
+
+    def close(self):
+        # Jobs already running are not interrupted (e.g. a swapfile creation)
+        self._pool.shutdown(wait=False)
+# EOF
@@ -17,65 +17,104 @@
 
 import os
 import re
+import time
 import stat
 import shlex
 # Logging
 import logging
 import subprocess as sp
-from .processes import read_process_table
+from .processes import NvmapTable
 from .engine import read_engine
-from .common import cat, GenericInterface
+from .common import cat, GenericInterface, CachedFile, DevfreqResidency
 from .command import Command
+from .exceptions import JtopException
 from .hw_detect import is_thor
 # Create logger
 logger = logging.getLogger(__name__)
 # Memory regular exception
-MEMINFO_REG = re.compile(r'(?P<key>[^:]+):\s+(?P<value>.+)\s+(?P<unit>.)B')
 FSTAB_RE = re.compile(r'^(?P<path>[^ ]+) +(?P<mount>[^ ]+) +(?P<type>[^ ]+) +(?P<options>[^ ]+) +(?P<dump>\d+) +(?P<pass>\d+)$')
-BUDDYINFO_REG = re.compile(r'Node\s+(?P<numa_node>\d+).*zone\s+(?P<zone>\w+)\s+(?P<nr_free>.*)')
 SWAP_REG = re.compile(r'(?P<name>[^ ]+)\s+(?P<type>[^ ]+)\s+(?P<size>\d+)\s+(?P<used>\d+)\s+(?P<prio>-?\d+)')
+ZRAM_DEVICE_RE = re.compile(r'^zram\d+$')
 # Swap configuration
 PATH_FSTAB = '/etc/fstab'
 CONFIG_DEFAULT_SWAP_DIRECTORY = ''
 CONFIG_DEFAULT_SWAP_NAME = 'swfile'
-
-
-def meminfo():
-    # Read meminfo and decode
-    # https://access.redhat.com/solutions/406773
+# zram devices, the default priority is over the disk swaps like nvzramconfig
+ZRAM_CONTROL_PATH = "class/zram-control"
+ZRAM_BLOCK_PATH = "block"
+ZRAM_PRIORITY = 5
+# Priority range of swapon, -1 is the kernel default
+ZRAM_PRIORITY_MIN = -1
+ZRAM_PRIORITY_MAX = 32767
+# Columns of zram mm_stat, sizes in bytes and the others in pages
+ZRAM_MM_STAT = ['orig_data_size', 'compr_data_size', 'mem_used_total', 'mem_limit', 'mem_used_max', 'same_pages', 'pages_compacted', 'huge_pages']
+ZRAM_BD_STAT = ['bd_count', 'bd_reads', 'bd_writes']
+# Counters from /proc/vmstat: page faults, major faults, swap in/out, compaction stalls and OOM kills
+VMSTAT_KEYS = ['pgfault', 'pgmajfault', 'pswpin', 'pswpout', 'compact_stall', 'oom_kill']
+
+
+def read_meminfo(text):
+    """
+    Decode /proc/meminfo, only the fields in kB
+    https://access.redhat.com/solutions/406773
+    """
     status_mem = {}
-    with open("/proc/meminfo", 'r') as fp:
-        for line in fp:
-            # Search line
-            match = re.search(MEMINFO_REG, line.strip())
-            if match:
-                parsed_line = match.groupdict()
-                status_mem[parsed_line['key']] = int(parsed_line['value'])
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        fields = value.split()
+        if len(fields) == 2 and fields[1] == 'kB':
+            status_mem[key] = int(fields[0])
     return status_mem
 
 
-def buddyinfo(page_size):
-    # Read status free memory
-    # http://andorian.blogspot.com/2014/03/making-sense-of-procbuddyinfo.html
-    buddyhash = {}
-    with open("/proc/buddyinfo", 'r') as fp:
-        buddyinfo = fp.readlines()
-    for line in buddyinfo:
-        # Decode line
-        parsed_line = re.match(BUDDYINFO_REG, line.strip()).groupdict()
-        # detect buddy size
-        numa_node = int(parsed_line["numa_node"])
-        free_fragments = [int(i) for i in parsed_line["nr_free"].split()]
-        max_order = len(free_fragments)
-        fragment_sizes = [page_size * 2**order for order in range(0, max_order)]
-        usage_in_bytes = [free * fragmented for free, fragmented in zip(free_fragments, fragment_sizes)]
-        data = {
-            "zone": parsed_line["zone"],
-            "nr_free": free_fragments,
-            "sz_fragment": fragment_sizes,
-            "usage": usage_in_bytes}
-        buddyhash[numa_node] = buddyhash[numa_node] + [data] if numa_node in buddyhash else [data]
-    return buddyhash
+def read_buddyinfo(text):
+    """
+    Number of free blocks of the largest order, summed over all zones
+    http://andorian.blogspot.com/2014/03/making-sense-of-procbuddyinfo.html
+
+        Node 0, zone      DMA     20     11      6 ...      4
+    """
+    large_free_bank = 0
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) > 4 and fields[0] == 'Node':
+            large_free_bank += int(fields[-1])
+    return large_free_bank
+
+
+def read_vmstat(text, keys=VMSTAT_KEYS):
+    # Each line is "<name> <counter>"
+    vmstat = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(' ')
+        if name in keys:
+            vmstat[name] = int(value)
+    return vmstat
+
+
+class PagingRate(object):
+    """
+    Rate of the /proc/vmstat counters between two updates
+    """
+
+    def __init__(self):
+        self._last = None
+
+    def update(self, vmstat, now):
+        last, self._last = self._last, (now, vmstat)
+        if last is None or now <= last[0]:
+            return {}
+        delta = now - last[0]
+        paging = {}
+        for key, value in vmstat.items():
+            if key not in last[1]:
+                continue
+            if key == 'oom_kill':
+                # Number of processes killed, not a rate
+                paging[key] = value - last[1][key]
+            else:
+                paging[key] = (value - last[1][key]) / delta
+        return paging
 
 
 def read_swapon():
@@ -111,6 +150,178 @@ def read_swapon():
     return table
 
 
+def read_comp_algorithm(text):
+    # All algorithms available, the current one is in brackets: "lzo lzo-rle [lz4] zstd"
+    algorithms = [name.strip('[]') for name in text.split()]
+    current = [name.strip('[]') for name in text.split() if name.startswith('[')]
+    return current[0] if current else '', algorithms
+
+
+def read_zram(path):
+    """
+    Status of a zram device from sysfs, all sizes in **kB**
+    https://docs.kernel.org/admin-guide/blockdev/zram.html
+    """
+    zram = {}
+    if os.path.isfile(os.path.join(path, "comp_algorithm")):
+        zram['algorithm'], zram['algorithms'] = read_comp_algorithm(cat(os.path.join(path, "comp_algorithm")))
+    if os.path.isfile(os.path.join(path, "disksize")):
+        zram['disksize'] = int(cat(os.path.join(path, "disksize"))) // 1024
+    if os.path.isfile(os.path.join(path, "mm_stat")):
+        values = [int(value) for value in cat(os.path.join(path, "mm_stat")).split()]
+        mm_stat = dict(zip(ZRAM_MM_STAT, values))
+        zram['orig'] = mm_stat.get('orig_data_size', 0) // 1024
+        zram['compr'] = mm_stat.get('compr_data_size', 0) // 1024
+        zram['mem_used'] = mm_stat.get('mem_used_total', 0) // 1024
+        zram['mem_limit'] = mm_stat.get('mem_limit', 0) // 1024
+        zram['same_pages'] = mm_stat.get('same_pages', 0)
+        zram['huge_pages'] = mm_stat.get('huge_pages', 0)
+        zram['ratio'] = float(zram['orig']) / zram['compr'] if zram['compr'] > 0 else 1.0
+    if os.path.isfile(os.path.join(path, "bd_stat")):
+        values = [int(value) for value in cat(os.path.join(path, "bd_stat")).split()]
+        bd_stat = dict(zip(ZRAM_BD_STAT, values))
+        # Backing device counters are in 4K pages
+        zram['bd'] = {'count': bd_stat.get('bd_count', 0) * 4, 'reads': bd_stat.get('bd_reads', 0) * 4,
+                      'writes': bd_stat.get('bd_writes', 0) * 4}
+    return zram
+
+
+def zram_effective(swap_table):
+    """
+    Memory added from all swaps in **kB**: the disk swaps add their size,
+    a zram device adds its size less the RAM needed to store it at the current compression ratio
+    """
+    effective = 0
+    for swap in swap_table.values():
+        if 'zram' in swap:
+            # Data stored for each byte of RAM used, with the allocator overhead
+            zram = swap['zram']
+            ratio = float(zram['orig']) / zram['mem_used'] if zram.get('mem_used') else zram.get('ratio', 1.0)
+            effective += int(swap['size'] - swap['size'] / max(ratio, 1.0))
+        else:
+            effective += swap['size']
+    return effective
+
+
+def write_sysfs(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+def check_zram_device(device):
+    # The device name from a client is used in sysfs paths
+    if not isinstance(device, str) or not ZRAM_DEVICE_RE.match(device):
+        raise JtopException("{device} is not a zram device".format(device=device))
+
+
+def check_zram_options(size, priority):
+    # Size and priority from a client are used in sysfs and in the swapon command line
+    if isinstance(size, bool) or not isinstance(size, (int, float)) or not size > 0:
+        raise JtopException("zram size {size} must be a positive number".format(size=size))
+    if isinstance(priority, bool) or not isinstance(priority, int) or not ZRAM_PRIORITY_MIN <= priority <= ZRAM_PRIORITY_MAX:
+        raise JtopException("zram priority {priority} must be an integer between {min} and {max}".format(
+            priority=priority, min=ZRAM_PRIORITY_MIN, max=ZRAM_PRIORITY_MAX))
+
+
+def zram_remove(device, root="/sys"):
+    """
+    Remove a device created from zram-control, nothing without zram-control
+    """
+    path_control = os.path.join(root, ZRAM_CONTROL_PATH, "hot_remove")
+    if os.path.isfile(path_control):
+        try:
+            write_sysfs(path_control, device[len('zram'):])
+        except OSError as e:
+            logger.warning("{device} not removed: {error}".format(device=device, error=e))
+
+
+def zram_set(size, algorithm=None, priority=ZRAM_PRIORITY, device=None, progress=None, root="/sys"):
+    """
+    Create a zram swap of **size** GB, if the device is already a swap it is resized.
+    The device is reset: the algorithm can be changed only on an empty device.
+    A device created from zram-control is removed if it cannot be activated.
+    """
+    if progress is None:
+        def progress(value):
+            pass
+    check_zram_options(size, priority)
+    path_block = os.path.join(root, ZRAM_BLOCK_PATH)
+    created = False
+    if device is None:
+        path_control = os.path.join(root, ZRAM_CONTROL_PATH, "hot_add")
+        if os.path.isfile(path_control):
+            device = "zram{idx}".format(idx=int(cat(path_control)))
+            created = True
+        else:
+            # Without zram-control use the first device not initialized
+            devices = sorted(item for item in os.listdir(path_block) if ZRAM_DEVICE_RE.match(item)) if os.path.isdir(path_block) else []
+            devices = [item for item in devices if int(cat(os.path.join(path_block, item, "disksize"))) == 0]
+            if not devices:
+                raise JtopException("No zram device available, load the zram module")
+            device = devices[0]
+    check_zram_device(device)
+    try:
+        _zram_setup(os.path.join(path_block, device), device, size, algorithm, priority, progress)
+    except Exception:
+        if created:
+            logger.info("Remove {device}".format(device=device))
+            try:
+                write_sysfs(os.path.join(path_block, device, "reset"), 1)
+            except OSError:
+                pass
+            zram_remove(device, root)
+        raise
+    return device
+
+
+def _zram_setup(path, device, size, algorithm, priority, progress):
+    if not os.path.isdir(path):
+        raise JtopException("{device} does not exist".format(device=device))
+    # Check the algorithm before to reset a swap already active
+    if algorithm:
+        _, algorithms = read_comp_algorithm(cat(os.path.join(path, "comp_algorithm")))
+        if algorithm not in algorithms:
+            raise JtopException("Algorithm {algorithm} not available: {algorithms}".format(algorithm=algorithm, algorithms=algorithms))
+    dev = "/dev/{device}".format(device=device)
+    logger.info("Set zram {device} {size}GB algorithm={algorithm} priority={priority}".format(
+        device=device, size=size, algorithm=algorithm, priority=priority))
+    # Resize: disable the swap and reset the device
+    if int(cat(os.path.join(path, "disksize"))) > 0:
+        if dev in read_swapon():
+            sp.call(shlex.split('swapoff {dev}'.format(dev=dev)))
+        write_sysfs(os.path.join(path, "reset"), 1)
+    progress(0.3)
+    if algorithm:
+        # The algorithm must be set before the size
+        write_sysfs(os.path.join(path, "comp_algorithm"), algorithm)
+    write_sysfs(os.path.join(path, "disksize"), int(size * 1024 ** 3))
+    progress(0.5)
+    if sp.call(shlex.split('mkswap {dev}'.format(dev=dev))) != 0:
+        raise JtopException("mkswap {dev} failed".format(dev=dev))
+    progress(0.7)
+    if sp.call(shlex.split('swapon -p {priority} {dev}'.format(priority=priority, dev=dev))) != 0:
+        raise JtopException("swapon {dev} failed".format(dev=dev))
+    progress(0.9)
+
+
+def zram_deactivate(device, remove=False, root="/sys"):
+    """
+    Disable a zram swap and reset the device, with **remove** the device is removed from zram-control.
+    Remove only the devices created from jtop, not the devices of nvzramconfig
+    """
+    check_zram_device(device)
+    path = os.path.join(root, ZRAM_BLOCK_PATH, device)
+    if not os.path.isdir(path):
+        raise JtopException("{device} does not exist".format(device=device))
+    dev = "/dev/{device}".format(device=device)
+    if dev in read_swapon():
+        sp.call(shlex.split('swapoff {dev}'.format(dev=dev)))
+    write_sysfs(os.path.join(path, "reset"), 1)
+    if remove:
+        zram_remove(device, root)
+    logger.info("Deactivate {device}".format(device=device))
+
+
 def read_fstab():
     fstab = {}
     with open(PATH_FSTAB, "r") as fp:
@@ -269,9 +480,12 @@ class Memory(GenericInterface):
     def clear_cache(self):
         """
         Clear the memory cache
+
+        :return: Job completed when the cache is cleared
+        :rtype: ControlJob
         """
         # Set new swap size configuration
-        self._controller.put({'clear_cache': ''})
+        return self._controller.put({'clear_cache': ''})
 
     def swap_is_enable(self, path):
         """
@@ -296,6 +510,8 @@ class Memory(GenericInterface):
         :param on_boot: Set this swap on boot, defaults False
         :type on_boot: bool, optional
         :raises ValueError: value is not an :py:class:`int` or a :py:class:`float`
+        :return: Job completed when the swap is active, the service is not blocked while the swap is created
+        :rtype: ControlJob
         """
         if not isinstance(value, (int, float)):
             raise ValueError("Need a Number")
@@ -303,7 +519,7 @@ class Memory(GenericInterface):
         if not path:
             path = self._init
         # Set new swap size configuration
-        self._controller.put({'swap': {'command': 'set', 'path': path, 'size': value, 'boot': on_boot}})
+        return self._controller.put({'swap': {'command': 'set', 'path': path, 'size': value, 'boot': on_boot}})
 
     def swap_deactivate(self, path=''):
         """
@@ -311,20 +527,59 @@ class Memory(GenericInterface):
 
         :param path: Path swap
         :type path: str, optional
+        :return: Job completed when the swap is removed
+        :rtype: ControlJob
         """
         # if path_swap is empty load from default configuration
         if not path:
             path = self._init
         # Set new swap size configuration
-        self._controller.put({'swap': {'command': 'unset', 'path': path}})
+        return self._controller.put({'swap': {'command': 'unset', 'path': path}})
+
+    def zram_set(self, value, algorithm=None, priority=ZRAM_PRIORITY, device=None):
+        """
+        Create a zram swap, compressed in RAM, or resize a zram device already active.
+        On boards with eMMC a zram swap is faster than a swapfile and does not wear the flash.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                # 4GB compressed with zstd, used before the disk swaps
+                jetson.memory.zram_set(4, algorithm='zstd').result(timeout=10)
+
+        :param value: Size in **G** of the zram device (uncompressed data)
+        :type value: int
+        :param algorithm: Compression algorithm, like *lz4* or *zstd*, defaults to the kernel default
+        :type algorithm: str, optional
+        :param priority: Swap priority between -1 and 32767, higher priority swaps are used first, defaults to 5
+        :type priority: int, optional
+        :param device: Name of the zram device (like *zram0*), defaults to a new device
+        :type device: str, optional
+        :raises ValueError: value is not an :py:class:`int` or a :py:class:`float`
+        :return: Job completed when the zram swap is active
+        :rtype: ControlJob
+        """
+        if not isinstance(value, (int, float)):
+            raise ValueError("Need a Number")
+        return self._controller.put({'swap': {'command': 'zram', 'size': value, 'algorithm': algorithm,
+                                              'priority': priority, 'device': device}})
+
+    def zram_deactivate(self, device):
+        """
+        Disable a zram swap and reset the device, a device created from :func:`~zram_set` is also removed
+
+        :param device: Name of the zram device (like *zram0*)
+        :type device: str
+        :return: Job completed when the zram swap is removed
+        :rtype: ControlJob
+        """
+        return self._controller.put({'swap': {'command': 'zram_unset', 'device': device}})
 
 
 class MemoryService(object):
 
     def __init__(self, config):
         self._config = config
-        # Extract memory page size
-        self._page_size = os.sysconf("SC_PAGE_SIZE")
         # board type
         self._root_path = "/sys/kernel"
         if os.getenv('JTOP_TESTING', False):
@@ -333,7 +588,21 @@ class MemoryService(object):
         self._is_emc = True if read_emc(self._root_path) else False
         if self._is_emc:
             logger.info("Found EMC!")
+        # EMC frequency residency when the memory controller is a devfreq device
+        self._emc_residency = None
+        path_devfreq = self._root_path + "/../class/devfreq/bwmgr"
+        if self._is_emc and os.path.isfile(path_devfreq + "/trans_stat"):
+            self._emc_residency = DevfreqResidency(path_devfreq)
+        # zram devices, only the devices created from jtop are removed
+        self._sys_path = os.path.dirname(self._root_path)
+        self._zram_created = set()
+        # procfs files read at every update
+        self._meminfo = CachedFile("/proc/meminfo")
+        self._buddyinfo = CachedFile("/proc/buddyinfo")
+        self._vmstat = CachedFile("/proc/vmstat")
+        self._paging = PagingRate()
         self._is_iram = os.path.isdir(self._root_path + "/debug/nvmap/iram")
+        self._iram_clients = NvmapTable(self._root_path + "/debug/nvmap/iram/clients")
         if self._is_iram:
             logger.info("Found IRAM!")
         # Initialization memory
@@ -354,42 +623,59 @@ class MemoryService(object):
         return True if out else False
 
     @staticmethod
-    def swap_set(size, path_swap, on_boot):
+    def swap_set(size, path_swap, on_boot, progress=None):
         if os.path.isfile(path_swap):
             logger.error("{path_swap} already exist".format(path_swap=path_swap))
-            return
+            return False
+        if progress is None:
+            def progress(value):
+                pass
         # Load swap configuration
         logger.info("Activate {path_swap} auto={on_boot}".format(path_swap=path_swap, on_boot=on_boot))
         # Create a swapfile for Ubuntu at the current directory location
         sp.call(shlex.split('fallocate -l {size}G {path_swap}'.format(size=size, path_swap=path_swap)))
+        progress(0.4)
         # Change permissions so that only root can use it
         # https://www.tutorialspoint.com/python/os_chmod.htm
         # Equivalent permission 600 srw-------
         os.chmod(path_swap, stat.S_IREAD | stat.S_IWRITE)
         # Set up the Linux swap area
         sp.call(shlex.split('mkswap {path_swap}'.format(path_swap=path_swap)))
+        progress(0.6)
         # Now start using the swapfile
         sp.call(shlex.split('swapon {path_swap}'.format(path_swap=path_swap)))
+        progress(0.9)
         # Add not on boot return
         if not on_boot:
-            return
+            return True
         # Find if is already on boot
         swap_string_boot = "{path_swap} none swap sw 0 0".format(path_swap=path_swap)
         fstab = read_fstab()
         if path_swap in fstab:
             logger.warn("{path_swap} Already on boot".format(path_swap=path_swap))
-            return
+            return True
         # Append swap line
         file_object = open(PATH_FSTAB, 'a')
         file_object.write("{swap_string_boot}\n".format(swap_string_boot=swap_string_boot))
         file_object.close()
+        return True
+
+    def zram_set(self, size, algorithm=None, priority=ZRAM_PRIORITY, device=None, progress=None):
+        new_device = zram_set(size, algorithm, priority, device, progress, root=self._sys_path)
+        if device is None:
+            self._zram_created.add(new_device)
+        return new_device
+
+    def zram_deactivate(self, device):
+        zram_deactivate(device, device in self._zram_created, root=self._sys_path)
+        self._zram_created.discard(device)
 
     @staticmethod
     def swap_deactivate(path_swap):
         # Check if exist swap
         if not os.path.isfile(path_swap):
             logger.error("{path_swap} Does not exist".format(path_swap=path_swap))
-            return
+            return False
         # Disable swap
         sp.call(shlex.split('swapoff {path_swap}'.format(path_swap=path_swap)))
         # Remove swap
@@ -400,7 +686,7 @@ class MemoryService(object):
         swap_string_boot = "{path_swap} none swap sw 0 0".format(path_swap=path_swap)
         fstab = read_fstab()
         if path_swap not in fstab:
-            return
+            return True
         # Check if is on boot
         logger.info("Removing {path_swap} from fstab".format(path_swap=path_swap))
         with open(PATH_FSTAB, "r") as f:
@@ -411,17 +697,14 @@ class MemoryService(object):
                     f.write(line)
         # Run script
         logger.info("Removed {path_swap} from boot".format(path_swap=path_swap))
+        return True
 
     def get_status(self, mem_total):
         memory = {}
-        # Measure the largest free bank for 4MB
-        mem_size = buddyinfo(self._page_size)
-        # Count only the biggest Large free bank (lfb)
-        large_free_bank = 0
-        for _, data in mem_size.items():
-            large_free_bank += sum([zone['nr_free'][-1] for zone in data])
+        # Count only the biggest Large free bank (lfb) for 4MB
+        large_free_bank = read_buddyinfo(self._buddyinfo.read())
         # Status Memory
-        status_mem = meminfo()
+        status_mem = read_meminfo(self._meminfo.read())
         # Read memory use
         # NvMapMemUsed: Is the shared memory between CPU and GPU
         # This key is always available on Jetson (not really always)
@@ -461,23 +744,34 @@ class MemoryService(object):
         fstab = read_fstab()
         for name in swap_table:
             swap_table[name]['boot'] = name in fstab
+            if swap_table[name]['type'] == 'zram':
+                swap_table[name]['zram'] = read_zram(os.path.join(self._sys_path, ZRAM_BLOCK_PATH, os.path.basename(name)))
         # Add fields for swap
         memory['SWAP'] = {
             'tot': swap_total,
             'used': swap_total - swap_free,
             'cached': swap_cached,
             'table': swap_table,
+            'effective': zram_effective(swap_table),
         }
+        # Paging rates from the previous update
+        try:
+            vmstat = read_vmstat(self._vmstat.read())
+        except (OSError, ValueError):
+            vmstat = {}
+        memory['PAGING'] = self._paging.update(vmstat, time.time())
         # Read EMC status
         if self._is_emc:
             memory['EMC'] = read_emc(self._root_path)
+            if self._emc_residency is not None and memory['EMC']:
+                memory['EMC']['residency'] = self._emc_residency.update(time.time())
         # Read IRAM if available
         if self._is_iram:
             size = 0
             if os.path.isfile(self._root_path + "/debug/nvmap/iram/size"):
                 # Convert from Hex to decimal - Number in bytes
                 size = int(cat(self._root_path + "/debug/nvmap/iram/size"), 16) // 1024
-            used_total, _ = read_process_table(self._root_path + "/debug/nvmap/iram/clients")
+            used_total, _ = self._iram_clients.read()
             memory['IRAM'] = {
                 'tot': size,
                 'used': used_total,
@@ -16,6 +16,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import re
+import os
 import time
 from threading import Thread
 # Logging
@@ -24,6 +25,7 @@ import logging
 from .command import Command
 # Import exceptions
 from .exceptions import JtopException
+from .jobs import completed_job
 # Fix connection refused for python 2.7
 try:
     FileNotFoundError
@@ -41,6 +43,12 @@ NV_POWER_MODE_RE = re.compile(r'NV Power Mode: (?P<name>\w+)')
 COMMAND_TIMEOUT = 4.0
 NVP_TIMER_WAIT_JETSON_CLOCKS = 0.5
 NVP_COUNTER_ALIVE_JETSON_CLOCKS = 5
+# Native nvpmodel
+NVPMODEL_CONF = '/etc/nvpmodel.conf'
+NVPMODEL_STATUS = '/var/lib/nvpmodel/status'
+CONFIG_DEFAULT_NATIVE = False
+# nvpmodel use -1 (or the max int) for the max frequency available
+NVP_FREQ_MAX = [-1, 2147483647]
 
 
 def nvpmodel_decode():
@@ -76,6 +84,159 @@ def nvpmodel_decode():
     return default, list(nvpm.values()), nvpm_masks_list
 
 
+def nvpmodel_conf_decode(path):
+    """
+    Decode the nvpmodel configuration file, same output of **nvpmodel -p**
+
+    * **default** - ID of the default power mode
+    * **params** - For each parameter the type (FILE or CLOCK) and the path of each argument
+    * **modes** - List of power modes with ID, name and all settings (param, argument, value)
+
+    Raise a :class:`JtopException` if the IDs are not a sequence from 0 or the default mode does not exist
+    """
+    default = None
+    params = {}
+    modes = []
+    section = None
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('<') and line.endswith('>'):
+                words = line[1:-1].split()
+                fields = dict(word.split('=', 1) for word in words[1:] if '=' in word)
+                if words[0] == 'PARAM':
+                    section = {'type': fields.get('TYPE', 'FILE'), 'args': {}}
+                    params[fields['NAME']] = section
+                elif words[0] == 'POWER_MODEL':
+                    section = {'id': int(fields['ID']), 'name': fields['NAME'], 'settings': []}
+                    modes.append(section)
+                elif words[0] == 'PM_CONFIG':
+                    default = int(fields['DEFAULT'])
+                    section = None
+                else:
+                    # Fan and other sections are not used
+                    section = None
+                continue
+            if section is None:
+                continue
+            words = line.split()
+            if 'settings' in section and len(words) >= 3:
+                section['settings'].append((words[0], words[1], ' '.join(words[2:])))
+            elif 'args' in section and len(words) >= 2:
+                section['args'][words[0]] = words[1]
+    modes = sorted(modes, key=lambda mode: mode['id'])
+    # Power modes are read with the ID as index, like nvpmodel -p
+    ids = [mode['id'] for mode in modes]
+    if not modes or ids != list(range(len(modes))):
+        raise JtopException("NV Power Mode IDs {ids} are not a sequence from 0".format(ids=ids))
+    if default is None:
+        default = modes[0]['id']
+    elif default not in ids:
+        raise JtopException("Default NV Power Mode {default} does not exist".format(default=default))
+    return {'default': default, 'params': params, 'modes': modes}
+
+
+def nvpmodel_mode_info(conf, mode):
+    """
+    Summary of a power mode: CPU online, limits of each clock and EMC cap
+    """
+    info = {'id': mode['id'], 'name': mode['name'], 'cpu_online': [], 'clocks': {}, 'emc': None, 'tpc_pg_mask': None}
+    for param, arg, value in mode['settings']:
+        if param == 'CPU_ONLINE':
+            info['cpu_online'].append(int(value))
+        elif param == 'TPC_POWER_GATING':
+            info['tpc_pg_mask'] = value
+        elif conf['params'].get(param, {}).get('type') == 'CLOCK':
+            limit = 'min' if arg == 'MIN_FREQ' else 'max'
+            if param == 'EMC' and limit == 'max':
+                info['emc'] = int(value)
+            else:
+                info['clocks'].setdefault(param, {})[limit] = int(value)
+    return info
+
+
+def nvpmodel_status_read(path):
+    """ Read the current power mode from the nvpmodel status file (e.g. pmode:0002 fmode:quiet) """
+    with open(path, 'r') as f:
+        for word in f.read().split():
+            if word.startswith('pmode:'):
+                return int(word[6:])
+    raise ValueError("pmode not in {path}".format(path=path))
+
+
+def nvpmodel_status_write(path, level):
+    fields = []
+    if os.path.isfile(path):
+        with open(path, 'r') as f:
+            fields = [word for word in f.read().split() if not word.startswith('pmode:')]
+    with open(path, 'w') as f:
+        f.write(' '.join(["pmode:{level:04d}".format(level=level)] + fields) + '\n')
+
+
+def _write_sysfs(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+def _max_frequency(param):
+    path = param['args'].get('FREQ_TABLE')
+    if path is None or not os.path.isfile(path):
+        return None
+    with open(path, 'r') as f:
+        return max(int(freq) for freq in f.read().split())
+
+
+def nvpmodel_conf_apply(conf, level):
+    """
+    Set a power mode writing the same sysfs files of **nvpmodel -m**.
+    CPU are switched online before to set the frequencies and the minimum is always lower than maximum.
+    """
+    mode = next((mode for mode in conf['modes'] if mode['id'] == level), None)
+    if mode is None:
+        raise JtopException("NV Power Mode {level} does not exist".format(level=level))
+    clocks = {}
+    for name, arg, value in mode['settings']:
+        param = conf['params'].get(name)
+        if param is None:
+            raise JtopException("Parameter {name} not defined".format(name=name))
+        if param['type'] == 'CLOCK':
+            clocks.setdefault(name, {})[arg] = int(value)
+            continue
+        path = param['args'].get(arg)
+        if path is None:
+            raise JtopException("Argument {arg} not defined for {name}".format(arg=arg, name=name))
+        # Not all boards can switch off all CPU (e.g. cpu0)
+        if not os.path.isfile(path):
+            logger.debug("{path} does not exist, skipped".format(path=path))
+            continue
+        _write_sysfs(path, value)
+    for name, limits in clocks.items():
+        param = conf['params'][name]
+        values = {}
+        for arg, value in limits.items():
+            if arg not in param['args']:
+                continue
+            if value in NVP_FREQ_MAX:
+                value = _max_frequency(param)
+                if value is None:
+                    continue
+            values[arg] = value
+        # The kernel refuse a minimum over the maximum, like DVFSLimit.write
+        # write first the minimum only if the new maximum is under the current minimum
+        order = ['MAX_FREQ', 'MIN_FREQ']
+        min_path = param['args'].get('MIN_FREQ')
+        if 'MAX_FREQ' in values and min_path is not None and os.path.isfile(min_path):
+            with open(min_path, 'r') as f:
+                if values['MAX_FREQ'] < int(f.read().strip()):
+                    order = ['MIN_FREQ', 'MAX_FREQ']
+        for arg in order:
+            if arg in values:
+                _write_sysfs(param['args'][arg], values[arg])
+    logger.info("NV Power Mode {name}({level}) set".format(name=mode['name'], level=level))
+
+
 def nvpmodel_query():
     """ Read nvpmodel to know the status of the board """
     try:
@@ -167,6 +328,7 @@ class NVPModel(object):
         self._controller = controller
         self._nvp_models = nvpmodel['models']
         self._nvp_default = nvpmodel['default']
+        self._nvp_modes = nvpmodel.get('modes', [])
         self._status = []
         self._running = False
         self._nvpmodel_now = {}
@@ -269,6 +431,8 @@ class NVPModel(object):
         :type force: bool, optional
         :raises ValueError: the variable is not an int
         :raises JtopException: nvpmodel name doesn't' exist
+        :return: Job completed when the new NV Power Model is set
+        :rtype: ControlJob
         """
         if not isinstance(nvpmodel_id, int):
             raise ValueError("Use an int")
@@ -276,9 +440,9 @@ class NVPModel(object):
         if nvpmodel_id < 0 or nvpmodel_id > len(self._nvp_models) - 1:
             raise JtopException("NV Power Model ID {id} does not exists! Range [0, {max}]".format(id=nvpmodel_id, max=len(self._nvp_models) - 1))
         if nvpmodel_id == self._nvpmodel_now['id'] and not force:
-            return
+            return completed_job()
         # Send new nvpmodel
-        self._controller.put({'nvp': {'id': nvpmodel_id, 'force': force}})
+        return self._controller.put({'nvp': {'id': nvpmodel_id, 'force': force}})
 
     def get_nvpmodel_id(self):
         """
@@ -352,17 +516,19 @@ class NVPModel(object):
         :type force: bool, optional
         :raises ValueError: the variable is not a string
         :raises JtopException: nvpmodel name doesn't' exist
+        :return: Job completed when the new NV Power Model is set
+        :rtype: ControlJob
         """
         if not isinstance(nvpmodel_name, str):
             raise ValueError("Use a string")
         if nvpmodel_name not in self._nvp_models:
             raise JtopException("NV Power Model {name} does not exists! Check all NVPmode available".format(name=nvpmodel_name))
         if nvpmodel_name == self._nvpmodel_now['name'] and not force:
-            return
+            return completed_job()
         # Convert in nvpmodel id and send
         nvpmodel_id = self._nvp_models.index(nvpmodel_name)
         # Send new nvpmodel
-        self._controller.put({'nvp': {'id': nvpmodel_id, 'force': force}})
+        return self._controller.put({'nvp': {'id': nvpmodel_id, 'force': force}})
 
     def get_nvpmodel_name(self):
         """
@@ -407,6 +573,34 @@ class NVPModel(object):
         """
         return self._nvp_default
 
+    def get_mode_info(self, nvpmodel_id):
+        """
+        Return the limits of a NV Power Mode, decoded from :code:`/etc/nvpmodel.conf` by the jtop service.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                if jetson.ok():
+                    info = jetson.nvpmodel.get_mode_info(jetson.nvpmodel.id)
+                    print(info)
+
+        output
+
+        .. code-block:: python
+            :class: no-copybutton
+
+            # {'id': 0, 'name': 'MAXN', 'cpu_online': [1, 1, 1, 1], 'clocks': {'CPU_A78_0': {'min': 0, 'max': -1}, ...},
+            #  'emc': 0, 'tpc_pg_mask': None}
+
+        Frequencies have the same units of the nvpmodel configuration, **-1** is the maximum frequency available.
+
+        :param nvpmodel_id: nvpmodel ID
+        :type nvpmodel_id: int
+        :return: NV Power Mode limits or **None** if the configuration file is not available
+        :rtype: dict
+        """
+        return next((mode for mode in self._nvp_modes if mode['id'] == nvpmodel_id), None)
+
     def __add__(self, number):
         return self._nvpmodel_now['id'] + number
 
@@ -441,17 +635,26 @@ class NVPModel(object):
 
 class NVPModelService(object):
 
-    def __init__(self, jetson_clocks):
+    def __init__(self, jetson_clocks, config=None):
         self._is_nvpmodel = True
         # Initialize thread
         self._nvp_mode_set_thread = None
         # Initialize jetson_clocks config
         self._jetson_clocks = jetson_clocks
+        # Native nvpmodel from the configuration file
+        self._conf = None
+        self._modes = []
+        self._native = False
+        if config is not None:
+            self._native = config.get('nvpmodel', {}).get('native', CONFIG_DEFAULT_NATIVE)
         try:
-            # Read all NVP modes and masks available for this board
-            self._default, self._nvp_models, self._nvp_masks = nvpmodel_decode()
+            if os.path.isfile(NVPMODEL_CONF):
+                self._decode_conf()
+            else:
+                # Read all NVP modes and masks available for this board
+                self._default, self._nvp_models, self._nvp_masks = nvpmodel_decode()
             # Read current nvpmodel
-            self._nvpmodel_now = nvpmodel_query()
+            self._nvpmodel_now = self._query()
             logger.info("nvpmodel running in [{id}]{name} - Default: {default}".format(
                 name=self._nvpmodel_now['name'],
                 id=self._nvpmodel_now['id'],
@@ -460,26 +663,71 @@ class NVPModelService(object):
             current_mask = self._nvp_masks[self._nvpmodel_now['id']]
             # list of all nvpmodel status that can be changed from the current
             self._nvp_status = [current_mask == mask for idx, mask in enumerate(self._nvp_masks)]
-        except (OSError, Command.CommandException):
+        except (OSError, Command.CommandException, JtopException):
             self._is_nvpmodel = False
             logger.warning("nvpmodel not available")
 
+    def _decode_conf(self):
+        try:
+            conf = nvpmodel_conf_decode(NVPMODEL_CONF)
+        except (OSError, ValueError, KeyError, JtopException) as e:
+            logger.warning("{path} not decoded: {error}".format(path=NVPMODEL_CONF, error=e))
+            self._default, self._nvp_models, self._nvp_masks = nvpmodel_decode()
+            return
+        # Same index of the nvpmodel ID, like nvpmodel -p
+        self._conf = conf
+        self._modes = [nvpmodel_mode_info(conf, mode) for mode in conf['modes']]
+        self._nvp_models = [mode['name'] for mode in self._modes]
+        masks = [mode['tpc_pg_mask'] for mode in self._modes]
+        self._nvp_masks = masks if any(mask is not None for mask in masks) else [True] * len(masks)
+        default = next(mode for mode in self._modes if mode['id'] == conf['default'])
+        self._default = {'name': default['name'], 'id': default['id']}
+        logger.info("nvpmodel decoded from {path} (native {native})".format(path=NVPMODEL_CONF, native=self._native))
+
+    def _query(self):
+        # Current mode from the nvpmodel status file, without run nvpmodel -q
+        if self._conf is not None and os.path.isfile(NVPMODEL_STATUS):
+            try:
+                nvpmodel_id = nvpmodel_status_read(NVPMODEL_STATUS)
+                return {'name': self._nvp_models[nvpmodel_id], 'id': nvpmodel_id}
+            except (OSError, ValueError, IndexError) as e:
+                logger.warning("{path} not readable: {error}".format(path=NVPMODEL_STATUS, error=e))
+        return nvpmodel_query()
+
     def exists(self):
         return self._is_nvpmodel
 
     def get_all_nvpmodels(self):
         return self._nvp_models
 
-    def _thread_set_nvp_model(self, nvpmodel_id, force):
-        if not self._jetson_clocks.exists():
-            # Set NV Power Mode
-            status = set_nvpmodel_level(nvpmodel_id, force)
-            # Update status
-            self._nvp_status[nvpmodel_id] = status
+    def get_modes(self):
+        return self._modes
+
+    def _set_level(self, nvpmodel_id, force):
+        # A mode with a different mask need a reboot, only nvpmodel can do it
+        same_mask = self._nvp_masks[nvpmodel_id] == self._nvp_masks[self._nvpmodel_now['id']]
+        if self._native and self._conf is not None and same_mask:
+            start = time.time()
+            try:
+                nvpmodel_conf_apply(self._conf, nvpmodel_id)
+                nvpmodel_status_write(NVPMODEL_STATUS, nvpmodel_id)
+                logger.info("NVPmodel native ID {id} in {time:.1f}ms".format(id=nvpmodel_id, time=(time.time() - start) * 1000))
+                return True
+            except (OSError, ValueError, JtopException) as e:
+                logger.error("Native nvpmodel failed: {error}, run nvpmodel".format(error=e))
+        return set_nvpmodel_level(nvpmodel_id, force)
+
+    def _wait_jetson_clocks(self, status):
+        # Wait the jetson_clocks thread, the native jetson_clocks is already verified
+        if not self._jetson_clocks.wait(NVP_TIMER_WAIT_JETSON_CLOCKS * NVP_COUNTER_ALIVE_JETSON_CLOCKS):
+            logger.error("NVPmodel jetson_clocks didn't change status in time")
             return
-        if not self._jetson_clocks.is_config():
+        logger.info("NVPmodel has switched {status} jetson_clocks".format(status=status))
+
+    def _thread_set_nvp_model(self, nvpmodel_id, force):
+        if not self._jetson_clocks.exists() or not self._jetson_clocks.is_config():
             # Set NV Power Mode
-            status = set_nvpmodel_level(nvpmodel_id, force)
+            status = self._set_level(nvpmodel_id, force)
             # Update status
             self._nvp_status[nvpmodel_id] = status
             return
@@ -488,20 +736,9 @@ class NVPModelService(object):
         # Switch off jetson_clocks if is running
         if old_status:
             self._jetson_clocks.set_enable(False)
-            # Check jetson_clocks is off
-            counter = 0
-            while self._jetson_clocks.get_enable():
-                logger.info("[{counter}] NVPmodel waiting jetson_clocks setting off. Sleep for {time}s".format(
-                    counter=counter, time=NVP_TIMER_WAIT_JETSON_CLOCKS))
-                time.sleep(NVP_TIMER_WAIT_JETSON_CLOCKS)
-                if counter > NVP_COUNTER_ALIVE_JETSON_CLOCKS:
-                    logger.error("NVPmodel jetson_clocks didn't change status in time")
-                    break
-                counter += 1
-            if counter <= NVP_COUNTER_ALIVE_JETSON_CLOCKS:
-                logger.info("NVPmodel has switched off jetson_clocks")
+            self._wait_jetson_clocks('off')
         # Set NV Power Mode
-        status = set_nvpmodel_level(nvpmodel_id, force)
+        status = self._set_level(nvpmodel_id, force)
         # Update status
         self._nvp_status[nvpmodel_id] = status
         # Status message
@@ -509,21 +746,10 @@ class NVPModelService(object):
             logger.info("NVPmodel started ID {id}".format(id=nvpmodel_id))
         else:
             logger.error("Error to set NVPmodel ID {id}".format(id=nvpmodel_id))
-        # Switch off jetson_clocks if is running
+        # Switch on jetson_clocks if was running
         if old_status:
             self._jetson_clocks.set_enable(True)
-            # Check jetson_clocks is off
-            counter = 0
-            while not self._jetson_clocks.get_enable():
-                logger.info("[{counter}] NVPmodel waiting jetson_clocks setting on. Sleep for {time}s".format(
-                    counter=counter, time=NVP_TIMER_WAIT_JETSON_CLOCKS))
-                time.sleep(NVP_TIMER_WAIT_JETSON_CLOCKS)
-                if counter > NVP_COUNTER_ALIVE_JETSON_CLOCKS:
-                    logger.error("NVPmodel jetson_clocks didn't change status in time")
-                    break
-                counter += 1
-            if counter <= NVP_COUNTER_ALIVE_JETSON_CLOCKS:
-                logger.info("NVPmodel has switched on jetson_clocks")
+            self._wait_jetson_clocks('on')
 
     def set_nvpmodel_id(self, nvpmodel_id, force):
         if self.is_running():
@@ -584,7 +810,7 @@ class NVPModelService(object):
         running = self.is_running()
         # If thread is not running update status
         if not running:
-            self._nvpmodel_now = nvpmodel_query()
+            self._nvpmodel_now = self._query()
         return {
             'status': self._nvp_status,
             'thread': running,
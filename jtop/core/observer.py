@@ -0,0 +1,128 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import time
+from collections import deque
+from threading import Thread, Condition, current_thread
+# Logging
+import logging
+# Create logger
+logger = logging.getLogger(__name__)
+# List of policies when the observer queue is full
+POLICY_DROP = 'drop'
+POLICY_COALESCE = 'coalesce'
+OBSERVER_POLICIES = [POLICY_DROP, POLICY_COALESCE]
+
+
+class ObserverWorker(object):
+    """
+    Run an observer in its own thread with a bounded queue of snapshots.
+
+    The jtop reader thread only push a snapshot in the queue and never wait the callback,
+    a slow observer drop snapshots (or coalesce them) without delaying the other observers.
+    With the coalesce policy only the latest snapshot is queued and queue_size is not used.
+    """
+
+    def __init__(self, observer, jetson, queue_size=1, policy=POLICY_COALESCE, max_rate=None, snapshot=False, on_error=None):
+        if policy not in OBSERVER_POLICIES:
+            raise ValueError("Policy {policy} not available, use: {policies}".format(policy=policy, policies=OBSERVER_POLICIES))
+        if queue_size < 1:
+            raise ValueError("Queue size must be at least 1")
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError("Max rate must be a positive value")
+        self._observer = observer
+        self._jetson = jetson
+        self._policy = policy
+        self._snapshot = snapshot
+        self._on_error = on_error
+        self._min_period = 1.0 / float(max_rate) if max_rate is not None else 0.0
+        # With coalesce only the last snapshot is relevant, queue_size is for the drop policy
+        maxlen = 1 if policy == POLICY_COALESCE else queue_size
+        self._queue = deque(maxlen=maxlen)
+        self._condition = Condition()
+        self._running = True
+        # Statistics
+        self._stats = {
+            'calls': 0,
+            'dropped': 0,
+            'queue': 0,
+            'duration': 0.0,
+            'latency': 0.0,
+            'latency_max': 0.0,
+        }
+        # Start worker
+        self._thread = Thread(target=self._run, args=[])
+        self._thread.daemon = True
+        self._thread.start()
+
+    def push(self, stats):
+        with self._condition:
+            # When the queue is full the deque discard the oldest element
+            if len(self._queue) == self._queue.maxlen:
+                self._stats['dropped'] += 1
+            self._queue.append((time.time(), stats))
+            self._stats['queue'] = len(self._queue)
+            self._condition.notify()
+
+    def _run(self):
+        last_call = 0.0
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    break
+            # Rate limit, in the meantime new snapshots are queued following the policy
+            delay = last_call + self._min_period - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with self._condition:
+                if not self._running:
+                    break
+                timestamp, stats = self._queue.popleft()
+                self._stats['queue'] = len(self._queue)
+            last_call = time.time()
+            try:
+                self._observer(stats if self._snapshot else self._jetson)
+            except Exception:
+                logger.error("Observer {observer} failed".format(observer=self._observer), exc_info=1)
+                if self._on_error is not None:
+                    self._on_error(sys.exc_info())
+                break
+            end = time.time()
+            # Update statistics
+            latency = end - timestamp
+            with self._condition:
+                self._stats['calls'] += 1
+                self._stats['duration'] = end - last_call
+                self._stats['latency'] = latency
+                self._stats['latency_max'] = max(self._stats['latency_max'], latency)
+
+    def get_stats(self):
+        with self._condition:
+            return dict(self._stats)
+
+    def close(self, timeout=None):
+        with self._condition:
+            self._running = False
+            self._queue.clear()
+            self._condition.notify()
+        # An observer can detach itself from its own callback
+        if self._thread.is_alive() and self._thread is not current_thread():
+            self._thread.join(timeout)
+# EOF
@@ -253,6 +253,20 @@ class PowerService(object):
         # Sort all power sensors
         self._power_sensor = dict(sorted(self._power_sensor.items(), key=lambda item: item[0]))
 
+    def get_total_power(self):
+        """
+        Instant total power in milliwatt, read only the input rail when available
+        """
+        names = [name for name in ["POM_5V_IN", "VDD_IN"] if name in self._power_sensor]
+        names = names[:1] if names else list(self._power_sensor.keys())
+        total = 0
+        for name in names:
+            values = read_power_status(self._power_sensor[name])
+            if not values:
+                continue
+            total += values['power'] if 'power' in values else values['volt'] * values['curr'] // 1000
+        return total if names else None
+
     def reset_avg_power(self):
         # Reset dictionary
         self._power_avg = {}
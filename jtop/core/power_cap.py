@@ -0,0 +1,215 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from threading import Lock
+# Logging
+import logging
+from .dvfs import dvfs_limits
+from .exceptions import JtopException
+from .timer_reader import TimerReader
+# Create logger
+logger = logging.getLogger(__name__)
+# Engines clamped from the power cap
+POWER_CAP_ENGINES = ['CPU', 'GPU']
+# Update rate of the power cap loop in seconds
+POWER_CAP_INTERVAL = 0.1
+# Time constant of the moving average power in seconds
+POWER_CAP_WINDOW = 2.0
+# Change of the frequency level per second with 100% of error
+POWER_CAP_GAIN = 2.0
+
+
+class PowerCapLimit(object):
+    """
+    Max frequency of a DVFS device clamped from the power cap.
+
+    The ceiling is the max frequency set from nvpmodel when the cap starts (or resumes after a new nvpmodel),
+    a max frequency changed from other tools is overwritten and the min frequency is never crossed.
+    While jetson_clocks is active (min frequency raised to the max frequency) the device is not clamped.
+    """
+
+    def __init__(self, limit):
+        self.name = limit.name
+        self._limit = limit
+        self._frequencies = limit.frequencies()
+        status = limit.read()
+        self.ceiling = status['max']
+        self.minimum = status['min']
+        self.current = self.ceiling
+        self.suspended = False
+
+    def apply(self, level):
+        status = self._limit.read()
+        # jetson_clocks fix the min frequency to the max frequency
+        suspended = status['min'] == status['max'] and status['min'] > self.minimum
+        if suspended != self.suspended:
+            logger.info("{name} power cap {status}, jetson_clocks {active}".format(
+                name=self.name, status="suspended" if suspended else "resumed", active="active" if suspended else "off"))
+            self.suspended = suspended
+        if suspended:
+            self.current = status['max']
+            return self.current
+        if status['max'] != self.current:
+            logger.warning("{name} max frequency changed outside the power cap to {freq}, ceiling {ceiling}".format(
+                name=self.name, freq=status['max'], ceiling=self.ceiling))
+        floor = min(status['min'], self.ceiling)
+        target = floor + level * (self.ceiling - floor)
+        # Nearest frequency available under the target
+        frequencies = [freq for freq in self._frequencies if floor <= freq <= target]
+        freq = frequencies[-1] if frequencies else (int(target) if not self._frequencies else floor)
+        if freq != status['max']:
+            self._limit.set_max(freq)
+        self.current = freq
+        return freq
+
+    def restore(self):
+        self._limit.set_max(self.ceiling)
+        self.current = self.ceiling
+
+
+class PowerCap(object):
+    """
+    Power cap of the board: keep the moving average of the total power under a cap,
+    clamping the max frequency of CPU and GPU with a feedback loop.
+
+    All max frequencies move together on a level between 0 (min frequency) and 1 (nvpmodel max frequency).
+    """
+
+    def __init__(self, read_power, root="/sys", engines=POWER_CAP_ENGINES):
+        self._read_power = read_power
+        self._root = root
+        self._engines = engines
+        self._limits = []
+        self._lock = Lock()
+        self._timer = TimerReader(self._loop)
+        self._cap = None
+        self._window = POWER_CAP_WINDOW
+        self._avg = None
+        self._level = 1.0
+        self._time = None
+        self._paused = False
+        self._found = any(limit.engine in engines for limit in dvfs_limits(root))
+
+    def exists(self):
+        return self._found
+
+    def set_cap(self, cap, window=POWER_CAP_WINDOW):
+        """
+        Set the power cap in milliwatt, **None** to remove the cap and restore all max frequencies
+        """
+        if cap is None:
+            self._stop()
+            return
+        if cap <= 0 or window <= 0:
+            raise JtopException("Power cap and window must be greater than zero")
+        if not self.exists():
+            raise JtopException("No CPU or GPU frequency available for the power cap")
+        with self._lock:
+            if self._cap is None:
+                # Read the ceilings only when the cap start
+                self._read_limits()
+                self._avg = None
+                self._level = 1.0
+                self._time = None
+            self._cap = float(cap)
+            self._window = float(window)
+            paused = self._paused
+        logger.info("Power cap {cap}mW (window {window}s)".format(cap=cap, window=window))
+        if not paused:
+            self._timer.open(interval=POWER_CAP_INTERVAL)
+
+    def _read_limits(self):
+        self._limits = [PowerCapLimit(limit) for limit in dvfs_limits(self._root) if limit.engine in self._engines]
+
+    def _restore(self):
+        for limit in self._limits:
+            try:
+                limit.restore()
+            except OSError as e:
+                logger.error("Power cap {name} not restored: {error}".format(name=limit.name, error=e))
+
+    def pause(self):
+        """
+        Restore the max frequencies without removing the cap, used while nvpmodel change the max frequencies.
+        With :func:`~resume` the ceilings are read again
+        """
+        self._timer.close()
+        with self._lock:
+            if self._cap is not None and not self._paused:
+                self._restore()
+            self._paused = True
+
+    def resume(self):
+        with self._lock:
+            self._paused = False
+            if self._cap is None:
+                return
+            self._read_limits()
+            self._time = None
+        logger.info("Power cap ceilings {ceiling}".format(ceiling={limit.name: limit.ceiling for limit in self._limits}))
+        self._timer.open(interval=POWER_CAP_INTERVAL)
+
+    def _stop(self):
+        self._timer.close()
+        with self._lock:
+            if self._cap is None:
+                return
+            if not self._paused:
+                self._restore()
+            self._cap = None
+        logger.info("Power cap removed")
+
+    def _loop(self):
+        self.update(time.time())
+
+    def update(self, now):
+        power = self._read_power()
+        with self._lock:
+            if self._cap is None or self._paused or power is None:
+                return
+            dt = max(now - self._time, 0.0) if self._time is not None else 0.0
+            self._time = now
+            # Exponential moving average with the window as time constant
+            alpha = min(dt / self._window, 1.0)
+            self._avg = power if self._avg is None else self._avg + alpha * (power - self._avg)
+            error = (self._cap - self._avg) / self._cap
+            self._level = min(max(self._level + POWER_CAP_GAIN * error * dt, 0.0), 1.0)
+            for limit in self._limits:
+                try:
+                    limit.apply(self._level)
+                except (OSError, ValueError) as e:
+                    logger.error("Power cap {name} not applied: {error}".format(name=limit.name, error=e))
+
+    def get_status(self):
+        with self._lock:
+            if self._cap is None:
+                return {}
+            avg = self._avg if self._avg is not None else 0.0
+            return {
+                'cap': int(self._cap),
+                'avg': int(avg),
+                'headroom': int(self._cap - avg),
+                'level': self._level,
+                'ceiling': {limit.name: limit.ceiling for limit in self._limits},
+                'max': {limit.name: limit.current for limit in self._limits},
+                'jetson_clocks': any(limit.suspended for limit in self._limits),
+            }
+
+    def close(self):
+        self._stop()
+# EOF
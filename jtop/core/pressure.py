@@ -0,0 +1,225 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import time
+import select
+from collections import deque
+from threading import Thread, Lock
+# Logging
+import logging
+from .common import CachedFile
+from .exceptions import JtopException
+# Create logger
+logger = logging.getLogger(__name__)
+# Pressure Stall Information from the kernel
+# https://docs.kernel.org/accounting/psi.html
+PRESSURE_PATH = "/proc/pressure"
+PRESSURE_RESOURCES = ['cpu', 'memory', 'io']
+PRESSURE_KINDS = ['some', 'full']
+# Number of pressure events stored
+PRESSURE_EVENTS = 20
+# Kernel limits of the trigger window in milliseconds
+PRESSURE_WINDOW_MIN = 500
+PRESSURE_WINDOW_MAX = 10000
+# Default triggers, stall time in milliseconds over a window in milliseconds.
+# Without CAP_SYS_RESOURCE the kernel accepts only windows multiple of 2 seconds
+PRESSURE_TRIGGERS_DEFAULT = [
+    {'resource': 'memory', 'kind': 'some', 'stall': 300, 'window': 2000},
+    {'resource': 'memory', 'kind': 'full', 'stall': 100, 'window': 2000},
+]
+
+
+def read_pressure(text):
+    """
+    Decode a pressure file, each line is like:
+
+        some avg10=0.31 avg60=0.12 avg300=0.02 total=1024
+
+    The averages are in percent, total is the stall time in microseconds
+    """
+    pressure = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        values = {}
+        for field in fields[1:]:
+            name, value = field.split('=')
+            values[name] = int(value) if name == 'total' else float(value)
+        pressure[fields[0]] = values
+    return pressure
+
+
+def check_trigger(trigger):
+    if trigger.get('resource') not in PRESSURE_RESOURCES:
+        raise JtopException("Pressure resource must be one of {resources}".format(resources=PRESSURE_RESOURCES))
+    if trigger.get('kind') not in PRESSURE_KINDS:
+        raise JtopException("Pressure kind must be one of {kinds}".format(kinds=PRESSURE_KINDS))
+    window = trigger.get('window', 0)
+    if not PRESSURE_WINDOW_MIN <= window <= PRESSURE_WINDOW_MAX:
+        raise JtopException("Pressure window must be between {min}ms and {max}ms".format(min=PRESSURE_WINDOW_MIN, max=PRESSURE_WINDOW_MAX))
+    if not 0 < trigger.get('stall', 0) <= window:
+        raise JtopException("Pressure stall must be greater than zero and not over the window")
+
+
+class PressureService(object):
+    """
+    Pressure Stall Information of CPU, memory and IO.
+
+    Every update reads the averages and the stall time since the previous update.
+    Kernel triggers are registered on the pressure files, a thread waits the triggers
+    and each pressure spike is an event sent immediately, without waiting the next update.
+    """
+
+    def __init__(self, root=PRESSURE_PATH, on_event=None):
+        self._root = root
+        self._on_event = on_event
+        self._files = {}
+        for resource in PRESSURE_RESOURCES:
+            path = os.path.join(root, resource)
+            if os.path.isfile(path):
+                self._files[resource] = CachedFile(path)
+        self._last = {}
+        self._triggers = []
+        self._events = deque(maxlen=PRESSURE_EVENTS)
+        self._lock = Lock()
+        self._thread = None
+        self._wake = None
+        if self._files:
+            logger.info("Pressure Stall Information: {resources}".format(resources=' '.join(self._files)))
+        else:
+            logger.warning("Pressure Stall Information not available")
+
+    def exists(self):
+        return bool(self._files)
+
+    def get_triggers(self):
+        return [trigger for _, trigger in self._triggers]
+
+    def set_triggers(self, triggers):
+        """
+        Replace all triggers, a trigger is a dictionary with *resource*, *kind*, *stall* and *window* in milliseconds.
+        Return the triggers rejected from the kernel, each one with its *error*
+        """
+        for trigger in triggers:
+            check_trigger(trigger)
+        self._stop()
+        registered = []
+        rejected = []
+        for trigger in triggers:
+            if trigger['resource'] not in self._files:
+                logger.warning("Pressure {resource} not available".format(resource=trigger['resource']))
+                rejected += [dict(trigger, error="{resource} not available".format(resource=trigger['resource']))]
+                continue
+            fd = None
+            try:
+                fd = os.open(os.path.join(self._root, trigger['resource']), os.O_RDWR | os.O_NONBLOCK)
+                # Stall and window are written in microseconds
+                os.write(fd, "{kind} {stall} {window}\0".format(
+                    kind=trigger['kind'], stall=int(trigger['stall'] * 1000), window=int(trigger['window'] * 1000)).encode())
+            except OSError as e:
+                if fd is not None:
+                    os.close(fd)
+                logger.error("Pressure trigger {trigger} not registered: {error}".format(trigger=trigger, error=e))
+                rejected += [dict(trigger, error=str(e))]
+                continue
+            registered += [(fd, dict(trigger))]
+        self._triggers = registered
+        if not self._triggers:
+            return rejected
+        wake_r, self._wake = os.pipe()
+        self._thread = Thread(target=self._poll, args=(wake_r, ))
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info("Pressure triggers: {triggers}".format(triggers=self.get_triggers()))
+        return rejected
+
+    def _stop(self):
+        if self._thread is not None:
+            os.write(self._wake, b'\x00')
+            self._thread.join()
+            os.close(self._wake)
+            self._thread = None
+        # Closing the file remove the trigger from the kernel
+        for fd, _ in self._triggers:
+            os.close(fd)
+        self._triggers = []
+
+    def _poll(self, wake):
+        triggers = dict(self._triggers)
+        poller = select.poll()
+        for fd in triggers:
+            poller.register(fd, select.POLLPRI)
+        poller.register(wake, select.POLLIN)
+        try:
+            while True:
+                for fd, mask in poller.poll():
+                    if fd == wake:
+                        return
+                    if mask & select.POLLERR:
+                        logger.error("Pressure trigger {trigger} removed".format(trigger=triggers[fd]))
+                        poller.unregister(fd)
+                    elif mask & select.POLLPRI:
+                        self._event(triggers[fd])
+        finally:
+            os.close(wake)
+
+    def _event(self, trigger):
+        event = dict(trigger, time=time.time())
+        # Averages when the trigger fire, read without the cached file used from the updates
+        try:
+            with open(os.path.join(self._root, trigger['resource']), 'r') as f:
+                event.update(read_pressure(f.read()).get(trigger['kind'], {}))
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            self._events.append(event)
+        logger.debug("Pressure event {event}".format(event=event))
+        if self._on_event is not None:
+            try:
+                self._on_event(event)
+            except Exception as e:
+                logger.error("Pressure event not sent: {error}".format(error=e))
+
+    def get_status(self, now=None):
+        now = time.time() if now is None else now
+        status = {}
+        for resource, pressure_file in self._files.items():
+            try:
+                pressure = read_pressure(pressure_file.read())
+            except (OSError, ValueError):
+                continue
+            last, self._last[resource] = self._last.get(resource), (now, pressure)
+            for kind, values in pressure.items():
+                # Percentage of time stalled since the previous update
+                if last is not None and now > last[0] and 'total' in last[1].get(kind, {}):
+                    delta = values['total'] - last[1][kind]['total']
+                    values['stall'] = min(100.0 * delta / ((now - last[0]) * 1000000.0), 100.0)
+            status[resource] = pressure
+        if not status:
+            return {}
+        with self._lock:
+            status['events'] = [dict(event) for event in self._events]
+        return status
+
+    def close(self):
+        self._stop()
+        for pressure_file in self._files.values():
+            pressure_file.close()
+# EOF
@@ -15,10 +15,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re
 import os
 import pwd
-from .common import cat
+import zlib
+from collections import deque
+from threading import Lock
+from .common import cat, least_squares_slope
+from .exceptions import JtopException
 from .hw_detect import is_thor
 from .process_types import PROCESS_TYPE_GRAPHIC
 # Logging
@@ -26,8 +29,93 @@ import logging
 # Create logger
 logger = logging.getLogger(__name__)
 
-MEM_TABLE_REG = re.compile(r'^(?P<user>\w+)\s+(?P<process>[^ ]+)\s+(?P<PID>\d+)\s+(?P<size>\d+)(?P<unit>\w)\n')
-TOT_TABLE_REG = re.compile(r'total\s+(?P<size>\d+)(?P<unit>\w)')
+# Empty lines and the indented mappings of each client in a nvmap table
+NVMAP_SKIP = (b'', b' ', b'\t')
+NVMAP_BUFFER_SIZE = 64 * 1024
+# Per-process memory mode: smaps_rollup and GPU memory trend every 5 seconds
+PROCESS_MEMORY_INTERVAL = 5.0
+# Leak detector: samples in the trend (5 minutes), min samples and min growth in kB before a leak
+LEAK_SAMPLES = 60
+LEAK_MIN_SAMPLES = 12
+LEAK_MIN_GROWTH = 1024
+# Share of the intervals in the recent half of the trend with the memory strictly increasing
+LEAK_MIN_RISING = 0.8
+
+
+def parse_process_table(data):
+    """
+    Decode a nvmap clients table, the rows of the same PID are summed.
+    Return the total and a list of [PID, user, process, size] with size in kB.
+
+        CLIENT                        PROCESS      PID        SIZE
+        user                   gst-launch-1.0     5968      95744K
+                  0x00000000ec000000  0x0000000000100000  ...
+        total                                               95744K
+    """
+    clients = {}
+    total = {}
+    for line in data.split(b'\n'):
+        # Fast path: skip the indented mappings of each client
+        if line[:1] in NVMAP_SKIP:
+            continue
+        fields = line.split()
+        if len(fields) == 4 and fields[2].isdigit() and fields[3][:-1].isdigit():
+            pid = fields[2]
+            if pid in clients:
+                clients[pid][3] += int(fields[3][:-1])
+            else:
+                clients[pid] = [pid.decode(), fields[0].decode(), fields[1].decode('utf-8', 'replace'), int(fields[3][:-1])]
+        elif len(fields) == 2 and fields[0] == b'total' and fields[1][:-1].isdigit():
+            total = int(fields[1][:-1])
+    return total, list(clients.values())
+
+
+class NvmapTable(object):
+    """
+    Reader of a nvmap clients table (like :code:`iovmm/maps` or :code:`iram/clients`).
+    The file is read with one bulk read in a reusable buffer and it is decoded only if the content is changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._buffer = bytearray(NVMAP_BUFFER_SIZE)
+        self._file = None
+        self._last = None
+
+    def _read(self):
+        if self._file is None:
+            self._file = open(self.path, 'rb', buffering=0)
+        self._file.seek(0)
+        size = 0
+        while True:
+            with memoryview(self._buffer) as view:
+                nbytes = self._file.readinto(view[size:])
+            if not nbytes:
+                return memoryview(self._buffer)[:size]
+            size += nbytes
+            # Buffer full, double the size and read the rest
+            if size == len(self._buffer):
+                self._buffer.extend(bytearray(len(self._buffer)))
+
+    def read(self):
+        """
+        Return the total and the list of clients, the same objects of the previous read if the table is not changed
+        """
+        try:
+            data = self._read()
+        except (OSError, ValueError):
+            self.close()
+            raise
+        key = (len(data), zlib.crc32(data))
+        if self._last is None or self._last[0] != key:
+            self._last = (key, parse_process_table(data.tobytes()))
+        data.release()
+        return self._last[1]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
 
 def read_process_table(path_table):
@@ -43,30 +131,128 @@ def read_process_table(path_table):
     :return: list of all processes
     :type spin: list
     """
-    table = []
-    total = {}
-    with open(path_table, "r") as fp:
-        for line in fp:
-            # Search line
-            match = re.search(MEM_TABLE_REG, line)
-            if match:
-                parsed_line = match.groupdict()
-                data = [
-                    parsed_line['PID'],
-                    parsed_line['user'],
-                    parsed_line['process'],
-                    int(parsed_line['size']),
-                ]
-                table += [data]
+    with open(path_table, "rb") as fp:
+        return parse_process_table(fp.read())
+
+
+def read_smaps_rollup(text):
+    """
+    Decode :code:`/proc/[PID]/smaps_rollup`, all values in **kB**.
+    PSS splits the shared pages (like the CUDA libraries) between all processes that map them.
+    """
+    fields = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(':')
+        value = value.split()
+        if len(value) == 2 and value[1] == 'kB':
+            fields[name] = int(value[0])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'anon': fields.get('Pss_Anon', fields.get('Anonymous', 0)),
+        'file': fields.get('Pss_File', 0),
+        'shmem': fields.get('Pss_Shmem', 0),
+        'swap': fields.get('SwapPss', fields.get('Swap', 0)),
+    }
+
+
+def leak_trend(samples):
+    """
+    Trend of a list of (time, memory in kB): the slope in kB/s with the least squares and the growth.
+
+    Only the recent half of the trend is checked, the first half is the warm-up (e.g. the allocations at start).
+    It is a leak when in the recent half the memory never decreases, grows in most of the intervals
+    (LEAK_MIN_RISING) and at least LEAK_MIN_GROWTH, with at least LEAK_MIN_SAMPLES samples in the trend.
+    """
+    if not samples:
+        return {'slope': 0.0, 'growth': 0, 'leak': False}
+    slope = least_squares_slope(samples)
+    growth = samples[-1][1] - samples[0][1]
+    leak = False
+    if len(samples) >= LEAK_MIN_SAMPLES:
+        recent = samples[len(samples) // 2:]
+        steps = [new[1] - old[1] for old, new in zip(recent, recent[1:])]
+        rising = sum(1 for step in steps if step > 0)
+        monotonic = all(step >= 0 for step in steps)
+        sustained = rising >= LEAK_MIN_RISING * len(steps)
+        leak = monotonic and sustained and recent[-1][1] - recent[0][1] >= LEAK_MIN_GROWTH and least_squares_slope(recent) > 0
+    return {'slope': slope, 'growth': growth, 'leak': leak}
+
+
+def read_proc_stat(text):
+    """
+    Decode :code:`/proc/[PID]/stat`, return name, CPU time (utime + stime) in clock ticks and start time.
+    The name is between parentheses and can have spaces.
+    """
+    start = text.index('(')
+    end = text.rindex(')')
+    fields = text[end + 2:].split()
+    # Fields after the name start from #3 state: utime #14, stime #15, starttime #22
+    return text[start + 1:end], int(fields[11]) + int(fields[12]), int(fields[19])
+
+
+def read_cgroup(text):
+    """
+    Path of the process in the cgroup v2 hierarchy (line "0::/path"), otherwise the first controller
+    """
+    lines = [line.split(':', 2) for line in text.splitlines() if line.count(':') >= 2]
+    unified = [path for hierarchy, controllers, path in lines if hierarchy == '0' and not controllers]
+    if unified:
+        return unified[0]
+    return lines[0][2] if lines else '/'
+
+
+class TaskTable(object):
+    """
+    All processes in :code:`/proc` with name, cgroup and CPU time.
+    The table is updated incrementally: the cgroup is read only for the new processes.
+    """
+
+    def __init__(self, proc_path="/proc"):
+        self._proc_path = proc_path
+        # pid: [starttime, name, cgroup, CPU ticks]
+        self.tasks = {}
+        # CPU ticks of each process from the previous update
+        self.delta = {}
+
+    def _read_task(self, pid):
+        path = os.path.join(self._proc_path, pid)
+        # Raw read, this file is read for all processes at every update
+        fd = os.open(os.path.join(path, 'stat'), os.O_RDONLY)
+        try:
+            name, ticks, starttime = read_proc_stat(os.read(fd, 4096).decode('utf-8', 'replace'))
+        finally:
+            os.close(fd)
+        task = self.tasks.get(pid)
+        # New process or PID reused
+        if task is None or task[0] != starttime:
+            try:
+                with open(os.path.join(path, 'cgroup'), 'r') as f:
+                    cgroup = read_cgroup(f.read())
+            except OSError:
+                cgroup = '/'
+            # The first read has not a previous CPU time
+            self.tasks[pid] = [starttime, name, cgroup, ticks]
+            return 0
+        delta = ticks - task[3]
+        task[3] = ticks
+        return delta
+
+    def update(self):
+        delta = {}
+        for pid in os.listdir(self._proc_path):
+            if not pid.isdigit():
                 continue
-            # Find total on table
-            match = re.search(TOT_TABLE_REG, line)
-            if match:
-                parsed_line = match.groupdict()
-                total = int(parsed_line['size'])
+            try:
+                delta[pid] = self._read_task(pid)
+            except (OSError, ValueError, IndexError):
+                # Process closed while reading
                 continue
-    # return total and table
-    return total, table
+        # Remove the processes closed
+        for pid in [pid for pid in self.tasks if pid not in delta]:
+            del self.tasks[pid]
+        self.delta = delta
+        return self.tasks
 
 
 class ProcessService(object):
@@ -80,16 +266,26 @@ class ProcessService(object):
             logger.warning("Running in JTOP_TESTING folder={root_dir}".format(root_dir=self._root_path))
         # nvmap (nvgpu stack, e.g. Orin): per-process GPU memory via debugfs
         self._isJetson = os.path.isfile(self._root_path + "/debug/nvmap/iovmm/maps")
+        self._nvmap = NvmapTable(self._root_path + "/debug/nvmap/iovmm/maps") if self._isJetson else None
         # nvidia.ko stack (Thor): use NVML for per-process GPU memory
         self._isThor = is_thor()
         if self._isThor:
-            from .thor_gpu import nvml_process_table
+            from .thor_gpu import nvml_process_table, NVMLProcessUtilization
             self._nvml_process_table = nvml_process_table
+            self._nvml_utilization = NVMLProcessUtilization()
         else:
             self._nvml_process_table = None
-        # Get the clock ticks per second and page size
+            self._nvml_utilization = None
+        # Get the clock ticks per second and page size in kB
         self._clk_tck = os.sysconf('SC_CLK_TCK')
-        # self._page_size = os.sysconf('SC_PAGE_SIZE')
+        self._page_size = os.sysconf('SC_PAGE_SIZE') // 1024
+        # Per-process memory mode, disabled by default
+        self._memory_mode = False
+        self._memory_interval = PROCESS_MEMORY_INTERVAL
+        self._memory = {}
+        self._trend = {}
+        # The memory mode is changed from the control thread
+        self._memory_lock = Lock()
         # Initialization memory
         logger.info("Process service started")
 
@@ -116,7 +312,7 @@ class ProcessService(object):
         # VmRSS is the resident set size of the process, which is the portion of the process's memory
         # that is held in RAM and is not swapped out to disk. This is the amount of memory that the process is currently using.
         mem_raw = cat(os.path.join('/proc', pid, 'statm')).split()
-        vm_rss = int(mem_raw[1]) * 4
+        vm_rss = int(mem_raw[1]) * self._page_size
         # CPU percent
         # https://stackoverflow.com/questions/16726779/how-do-i-get-the-total-cpu-usage-of-an-application-from-proc-pid-stat
         utime = float(stat[13])
@@ -137,9 +333,43 @@ class ProcessService(object):
             vm_rss,                 # MEM process
             gpu_mem_usage,          # GPU mem usage
             process_name,           # Process name
+            {},                     # Memory breakdown
+            {},                     # GPU utilization
+            '',                     # cgroup
         ]
         return process
 
+    def set_memory_mode(self, enable, interval=PROCESS_MEMORY_INTERVAL):
+        try:
+            interval = float(interval)
+        except (TypeError, ValueError):
+            interval = 0.0
+        if interval <= 0:
+            raise JtopException("Process memory interval must be greater than zero")
+        logger.info("Process memory mode {status} interval={interval}s".format(status=enable, interval=interval))
+        with self._memory_lock:
+            self._memory_mode = bool(enable)
+            self._memory_interval = interval
+            self._memory = {}
+            self._trend = {}
+
+    def _get_memory(self, pid, gpu_mem_usage, now):
+        # smaps_rollup walks all mappings of the process, read at a slower cadence
+        last = self._memory.get(pid)
+        if last is not None and now - last[0] < self._memory_interval:
+            return last[1]
+        try:
+            with open(os.path.join('/proc', str(pid), 'smaps_rollup'), 'r') as f:
+                memory = read_smaps_rollup(f.read())
+        except OSError:
+            # Process closed or kernel without smaps_rollup
+            memory = {}
+        trend = self._trend.setdefault(pid, deque(maxlen=LEAK_SAMPLES))
+        trend.append((now, gpu_mem_usage))
+        memory['gpu'] = leak_trend(list(trend))
+        self._memory[pid] = (now, memory)
+        return memory
+
     def get_status(self):
         total = {}
         table = []
@@ -149,10 +379,24 @@ class ProcessService(object):
             # nvidia.ko stack (Thor): nvmap absent, NVML gives compute+graphics
             total, raw = self._nvml_process_table()
             table = [self.get_process_info(prc[0], prc[3], prc[2], uptime, prc[4]) for prc in raw if prc]
+            # SM, memory, encoder and decoder utilization of each process
+            utilization = self._nvml_utilization.update()
+            if self._nvml_utilization.supported:
+                for process in [p for p in table if p]:
+                    process[11] = utilization.get(process[0], {'sm': 0, 'mem': 0, 'enc': 0, 'dec': 0})
         elif self._isJetson:
             # nvgpu stack (Orin): nvmap debugfs is the authoritative source
-            total, raw = read_process_table(self._root_path + "/debug/nvmap/iovmm/maps")
+            total, raw = self._nvmap.read()
             table = [self.get_process_info(prc[0], prc[3], prc[2], uptime) for prc in raw]
         table = [p for p in table if p]
+        with self._memory_lock:
+            if self._memory_mode:
+                for process in table:
+                    process[10] = self._get_memory(process[0], process[8], uptime)
+                # Remove closed processes
+                pids = set(process[0] for process in table)
+                for pid in [pid for pid in self._memory if pid not in pids]:
+                    del self._memory[pid]
+                    self._trend.pop(pid, None)
         return total, table
 # EOF
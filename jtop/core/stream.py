@@ -0,0 +1,850 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import ssl
+import hmac
+import time
+import zlib
+import socket
+import struct
+import hashlib
+import selectors
+from threading import Thread, Lock, Event
+# Logging
+import logging
+from .exceptions import JtopException
+from .jobs import ControlJob, JOB_DONE, JOB_ERROR
+# Load queue library for python 2 and python 3
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # pyright: ignore[reportMissingImports]
+# Create logger
+logger = logging.getLogger(__name__)
+# Stream protocol
+STREAM_VERSION = 1
+JTOP_PORT = 9870
+# Frame types
+FRAME_HELLO = 1
+FRAME_AUTH = 2
+FRAME_INIT = 3
+FRAME_SNAPSHOT = 4
+FRAME_CONTROL = 5
+FRAME_ALIVE = 6
+FRAME_ERROR = 7
+FRAME_JOB = 8
+FRAME_EVENT = 9
+# Frame flags
+FLAG_COMPRESSED = 0x01
+# Frame header: payload size, type and flags
+FRAME_HEADER = struct.Struct('>IBB')
+FRAME_MAX_SIZE = 64 * 1024 * 1024
+# Max frame size (also after decompression) from a client not authenticated yet
+FRAME_AUTH_MAX_SIZE = 64 * 1024
+# Max nesting of lists and dictionaries in a payload
+DECODE_MAX_DEPTH = 32
+# Payload smaller than this size are never compressed
+COMPRESS_MIN_SIZE = 512
+# Max bytes waiting for a client before to skip snapshots
+CLIENT_MAX_BACKLOG = 4 * 1024 * 1024
+# Without messages from a client for this time the connection is closed (in seconds)
+CLIENT_LEASE = 10.0
+# A client renew the lease only if it did not send any frame for this time (in seconds)
+CLIENT_ALIVE = CLIENT_LEASE / 4.0
+SELECT_TIMEOUT = 1.0
+READ_SIZE = 65536
+# Binary codec
+_INT32 = struct.Struct('>i')
+_INT64 = struct.Struct('>q')
+_DOUBLE = struct.Struct('>d')
+_UINT8 = struct.Struct('>B')
+_UINT32 = struct.Struct('>I')
+
+
+class StreamException(JtopException):
+    """
+    raise when the stream with a jtop service fail
+    """
+    pass
+
+
+def _encode(obj, write):
+    if obj is None:
+        write(b'N')
+    elif obj is True:
+        write(b'T')
+    elif obj is False:
+        write(b'F')
+    elif isinstance(obj, int):
+        if -2147483648 <= obj <= 2147483647:
+            write(b'i' + _INT32.pack(obj))
+        elif -9223372036854775808 <= obj <= 9223372036854775807:
+            write(b'q' + _INT64.pack(obj))
+        else:
+            data = str(obj).encode('ascii')
+            write(b'I' + _UINT32.pack(len(data)) + data)
+    elif isinstance(obj, float):
+        write(b'd' + _DOUBLE.pack(obj))
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        if len(data) < 256:
+            write(b'u' + _UINT8.pack(len(data)) + data)
+        else:
+            write(b's' + _UINT32.pack(len(data)) + data)
+    elif isinstance(obj, (bytes, bytearray)):
+        write(b'b' + _UINT32.pack(len(obj)) + bytes(obj))
+    elif isinstance(obj, (list, tuple)):
+        write(b'l' + _UINT32.pack(len(obj)))
+        for item in obj:
+            _encode(item, write)
+    elif isinstance(obj, dict):
+        write(b'm' + _UINT32.pack(len(obj)))
+        for key, value in obj.items():
+            _encode(key, write)
+            _encode(value, write)
+    else:
+        # Same behavior of DateTimeEncoder, all other objects are sent as string
+        _encode(str(obj), write)
+
+
+def encode(obj):
+    """
+    Encode in a compact binary format: None, bool, int, float, str, bytes, list and dict
+    """
+    parts = []
+    _encode(obj, parts.append)
+    return b''.join(parts)
+
+
+def _decode(data, idx, depth=0):
+    tag = data[idx:idx + 1]
+    idx += 1
+    if tag == b'N':
+        return None, idx
+    elif tag == b'T':
+        return True, idx
+    elif tag == b'F':
+        return False, idx
+    elif tag == b'i':
+        return _INT32.unpack_from(data, idx)[0], idx + 4
+    elif tag == b'q':
+        return _INT64.unpack_from(data, idx)[0], idx + 8
+    elif tag == b'I':
+        size = _UINT32.unpack_from(data, idx)[0]
+        idx += 4
+        return int(bytes(data[idx:idx + size]).decode('ascii')), idx + size
+    elif tag == b'd':
+        return _DOUBLE.unpack_from(data, idx)[0], idx + 8
+    elif tag == b'u':
+        size = data[idx]
+        idx += 1
+        return bytes(data[idx:idx + size]).decode('utf-8'), idx + size
+    elif tag == b's':
+        size = _UINT32.unpack_from(data, idx)[0]
+        idx += 4
+        return bytes(data[idx:idx + size]).decode('utf-8'), idx + size
+    elif tag == b'b':
+        size = _UINT32.unpack_from(data, idx)[0]
+        idx += 4
+        return bytes(data[idx:idx + size]), idx + size
+    elif tag == b'l':
+        if depth >= DECODE_MAX_DEPTH:
+            raise StreamException("Too many nested objects in stream")
+        size = _UINT32.unpack_from(data, idx)[0]
+        idx += 4
+        items = []
+        for _ in range(size):
+            item, idx = _decode(data, idx, depth + 1)
+            items.append(item)
+        return items, idx
+    elif tag == b'm':
+        if depth >= DECODE_MAX_DEPTH:
+            raise StreamException("Too many nested objects in stream")
+        size = _UINT32.unpack_from(data, idx)[0]
+        idx += 4
+        items = {}
+        for _ in range(size):
+            key, idx = _decode(data, idx, depth + 1)
+            if isinstance(key, (list, dict)):
+                raise StreamException("Wrong key type {type} in stream".format(type=type(key).__name__))
+            value, idx = _decode(data, idx, depth + 1)
+            items[key] = value
+        return items, idx
+    raise StreamException("Wrong tag {tag} in stream".format(tag=tag))
+
+
+def decode(data):
+    try:
+        obj, idx = _decode(data, 0)
+    except StreamException:
+        raise
+    except (struct.error, IndexError, TypeError, ValueError, RuntimeError) as e:
+        raise StreamException("Corrupted stream: {error}".format(error=e))
+    if idx != len(data):
+        raise StreamException("Corrupted stream: {size} bytes not decoded".format(size=len(data) - idx))
+    return obj
+
+
+def pack_frame(kind, obj, compress=0):
+    """
+    Build a frame with the encoded object, the payload is compressed with zlib
+    if the compress level is not zero and the payload is big enough
+    """
+    payload = encode(obj)
+    flags = 0
+    if compress and len(payload) >= COMPRESS_MIN_SIZE:
+        compressed = zlib.compress(payload, compress)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_COMPRESSED
+    return FRAME_HEADER.pack(len(payload), kind, flags) + payload
+
+
+class FrameReader(object):
+    """
+    Split a stream of bytes in frames, frames (and decompressed payloads) bigger than **max_size** are refused
+    """
+
+    def __init__(self, max_size=FRAME_MAX_SIZE):
+        self._buffer = bytearray()
+        self.max_size = max_size
+
+    def feed(self, data):
+        self._buffer += data
+
+    def raw_frames(self):
+        """
+        Frames without decoding the payload, a list of (type, flags, payload)
+        """
+        while len(self._buffer) >= FRAME_HEADER.size:
+            size, kind, flags = FRAME_HEADER.unpack_from(self._buffer, 0)
+            if size > self.max_size:
+                raise StreamException("Frame too big {size} bytes".format(size=size))
+            end = FRAME_HEADER.size + size
+            if len(self._buffer) < end:
+                return
+            payload = bytes(self._buffer[FRAME_HEADER.size:end])
+            del self._buffer[:end]
+            yield kind, flags, payload
+
+    def frames(self):
+        for kind, flags, payload in self.raw_frames():
+            yield kind, decode_payload(flags, payload, self.max_size)
+
+
+def decode_payload(flags, payload, max_size=FRAME_MAX_SIZE):
+    if flags & FLAG_COMPRESSED:
+        decompressor = zlib.decompressobj()
+        try:
+            payload = decompressor.decompress(payload, max_size)
+        except zlib.error as e:
+            raise StreamException("Corrupted frame: {error}".format(error=e))
+        if decompressor.unconsumed_tail:
+            raise StreamException("Frame too big after decompression, limit {size} bytes".format(size=max_size))
+    return decode(payload)
+
+
+def auth_digest(token, nonce):
+    return hmac.new(token.encode('utf-8'), nonce, hashlib.sha256).hexdigest()
+
+
+def server_ssl_context(certfile, keyfile, cafile=None):
+    """
+    TLS context for the server, with a **cafile** all clients must have a certificate signed from this authority
+    """
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(certfile, keyfile)
+    if cafile:
+        context.load_verify_locations(cafile)
+        context.verify_mode = ssl.CERT_REQUIRED
+    return context
+
+
+def client_ssl_context(cafile=None, certfile=None, keyfile=None):
+    """
+    TLS context for a client, **certfile** and **keyfile** are needed for mutual TLS
+    """
+    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=cafile)
+    if certfile:
+        context.load_cert_chain(certfile, keyfile)
+    return context
+
+
+class StreamClient(object):
+    """
+    Status of a client connected to the stream server
+    """
+
+    def __init__(self, sock, address, handshake):
+        self.sock = sock
+        self.address = address
+        self.name = "{address}".format(address=address)
+        # Small frames only until the client is authenticated
+        self.reader = FrameReader(FRAME_AUTH_MAX_SIZE)
+        self.out = bytearray()
+        self.snapshot = None
+        self.nonce = os.urandom(16)
+        self.handshake = handshake
+        self.authenticated = False
+        self.waiting_init = False
+        self.closing = False
+        self.interval = 0.0
+        self.last_snapshot = 0.0
+        self.last_seen = time.time()
+        self.dropped = 0
+
+
+class StreamServer(Thread):
+    """
+    Stream server, all clients are served from one thread with a selector.
+
+    Snapshots are encoded (and compressed) only once and pushed to each client at its own rate,
+    a slow client skip snapshots without delaying the others. Job updates and events are pushed to all clients
+    without rate limit.
+
+    The **backend** must implement:
+
+    * **stream_init(interval)** - Return the initialization message, or None if not ready
+    * **stream_control(control, name)** - Run a control message from a client
+    * **stream_alive()** - Called while at least one client is connected
+    """
+
+    def __init__(self, backend, address, token=None, ssl_context=None, compress=6, lease=CLIENT_LEASE):
+        super(StreamServer, self).__init__()
+        self.daemon = True
+        self._backend = backend
+        self._address = address
+        self._token = token
+        self._ssl_context = ssl_context
+        self._compress = compress
+        self._lease = lease
+        self._selector = selectors.DefaultSelector()
+        self._clients = {}
+        self._lock = Lock()
+        self._snapshot = None
+        self._notices = []
+        self._running = Event()
+        self._sock = None
+        self._wake_r, self._wake_w = socket.socketpair()
+        # A full wake up pipe already wakes up the selector
+        self._wake_w.setblocking(False)
+
+    @property
+    def address(self):
+        if self._sock is None:
+            return self._address
+        return self._sock.getsockname()
+
+    def start(self):
+        if isinstance(self._address, str):
+            if os.path.exists(self._address):
+                os.remove(self._address)
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._sock = socket.socket(socket.AF_INET6 if ':' in self._address[0] else socket.AF_INET, socket.SOCK_STREAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(self._address)
+        self._sock.listen(64)
+        self._sock.setblocking(False)
+        self._selector.register(self._sock, selectors.EVENT_READ, None)
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._running.set()
+        logger.info("Stream server listening on {address}".format(address=self.address))
+        super(StreamServer, self).start()
+
+    def publish(self, data):
+        """
+        Publish a new snapshot to all clients, the snapshot is encoded only once
+        """
+        frame = pack_frame(FRAME_SNAPSHOT, data, self._compress)
+        with self._lock:
+            self._snapshot = frame
+        self._wake()
+
+    def notify(self, job):
+        """
+        Push the update of a control job to all clients
+        """
+        frame = pack_frame(FRAME_JOB, job)
+        with self._lock:
+            self._notices.append(frame)
+        self._wake()
+
+    def event(self, event):
+        """
+        Push an event from the service to all clients, like the jobs without rate limit
+        """
+        frame = pack_frame(FRAME_EVENT, event)
+        with self._lock:
+            self._notices.append(frame)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\x00')
+        except (BlockingIOError, OSError):
+            pass
+
+    @property
+    def clients(self):
+        with self._lock:
+            return [{'name': client.name, 'interval': client.interval, 'dropped': client.dropped}
+                    for client in self._clients.values() if client.authenticated]
+
+    def run(self):
+        last_alive = 0.0
+        try:
+            while self._running.is_set():
+                waiting = any(client.waiting_init for client in self._clients.values())
+                events = self._selector.select(timeout=0.05 if waiting else SELECT_TIMEOUT)
+                for key, mask in events:
+                    if key.fileobj is self._sock:
+                        self._accept()
+                    elif key.fileobj is self._wake_r:
+                        self._read_wake()
+                    else:
+                        client = key.data
+                        if mask & selectors.EVENT_READ:
+                            self._read(client)
+                        if mask & selectors.EVENT_WRITE and client.sock.fileno() >= 0:
+                            self._write(client)
+                now = time.time()
+                # Send initialization when the backend is ready
+                for client in list(self._clients.values()):
+                    if client.waiting_init:
+                        self._send_init(client)
+                    # Close clients without messages
+                    if now - client.last_seen > self._lease:
+                        logger.info("Stream client {name} lease expired".format(name=client.name))
+                        self._close_client(client)
+                # Keep alive the backend
+                if now - last_alive >= SELECT_TIMEOUT and any(client.authenticated for client in self._clients.values()):
+                    self._backend.stream_alive()
+                    last_alive = now
+        except Exception as e:
+            logger.error("Stream server error {error}".format(error=e), exc_info=1)
+        finally:
+            for client in list(self._clients.values()):
+                self._close_client(client)
+
+    def _accept(self):
+        try:
+            sock, address = self._sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        handshake = False
+        if self._ssl_context is not None:
+            sock = self._ssl_context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+            handshake = True
+        client = StreamClient(sock, address if address else 'local', handshake)
+        with self._lock:
+            self._clients[sock.fileno()] = client
+        self._selector.register(sock, selectors.EVENT_READ, client)
+        logger.debug("Stream client {name} connected".format(name=client.name))
+        if not handshake:
+            self._send_hello(client)
+
+    def _send_hello(self, client):
+        self._send(client, pack_frame(FRAME_HELLO, {
+            'version': STREAM_VERSION,
+            'nonce': client.nonce,
+            'auth': self._token is not None,
+        }))
+
+    def _read_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        with self._lock:
+            frame, self._snapshot = self._snapshot, None
+            notices, self._notices = self._notices, []
+        now = time.time()
+        for client in list(self._clients.values()):
+            if not client.authenticated or client.waiting_init:
+                continue
+            for notice in notices:
+                self._send(client, notice)
+            if frame is None:
+                continue
+            # Client rate, 10% of tolerance to not skip snapshots with jitter
+            if now - client.last_snapshot < client.interval * 0.9:
+                continue
+            client.last_snapshot = now
+            if client.out:
+                # The client is still reading, replace the old snapshot
+                if client.snapshot is not None or len(client.out) > CLIENT_MAX_BACKLOG:
+                    client.dropped += 1
+                client.snapshot = frame
+            else:
+                self._send(client, frame)
+
+    def _do_handshake(self, client):
+        try:
+            client.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._selector.modify(client.sock, selectors.EVENT_READ, client)
+            return
+        except ssl.SSLWantWriteError:
+            self._selector.modify(client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, client)
+            return
+        except (ssl.SSLError, OSError) as e:
+            logger.warning("Stream client {name} TLS error {error}".format(name=client.name, error=e))
+            self._close_client(client)
+            return
+        client.handshake = False
+        self._selector.modify(client.sock, selectors.EVENT_READ, client)
+        self._send_hello(client)
+
+    def _read(self, client):
+        if client.handshake:
+            self._do_handshake(client)
+            return
+        while True:
+            try:
+                data = client.sock.recv(READ_SIZE)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                break
+            except OSError:
+                data = b''
+            if not data:
+                self._close_client(client)
+                return
+            client.reader.feed(data)
+            # TLS sockets can have data already decrypted
+            if not (isinstance(client.sock, ssl.SSLSocket) and client.sock.pending()):
+                break
+        client.last_seen = time.time()
+        try:
+            for kind, message in client.reader.frames():
+                self._message(client, kind, message)
+        except StreamException as e:
+            logger.warning("Stream client {name}: {error}".format(name=client.name, error=e))
+            self._close_client(client)
+
+    def _message(self, client, kind, message):
+        if client.closing:
+            return
+        if not isinstance(message, dict):
+            raise StreamException("Wrong message {kind} from stream client".format(kind=kind))
+        if kind == FRAME_AUTH:
+            if self._token is not None:
+                digest = message.get('digest')
+                if not isinstance(digest, str):
+                    digest = ''
+                if not hmac.compare_digest(digest, auth_digest(self._token, client.nonce)):
+                    logger.warning("Stream client {name} authentication failed".format(name=client.name))
+                    # Close the connection when the error is sent
+                    client.closing = True
+                    self._send(client, pack_frame(FRAME_ERROR, {'message': "Authentication with jetson-stats server failed"}))
+                    return
+            try:
+                interval = float(message.get('interval', 0.0))
+            except (TypeError, ValueError):
+                raise StreamException("Wrong interval from stream client")
+            client.authenticated = True
+            client.reader.max_size = FRAME_MAX_SIZE
+            client.interval = interval
+            if message.get('name'):
+                client.name = "{name}@{address}".format(name=message['name'], address=client.address)
+            client.waiting_init = True
+            self._send_init(client)
+            logger.info("Stream client {name} connected at {interval}s".format(name=client.name, interval=client.interval))
+        elif not client.authenticated:
+            self._close_client(client)
+        elif kind == FRAME_CONTROL:
+            self._backend.stream_control(message, client.name)
+        elif kind == FRAME_ALIVE:
+            pass
+        else:
+            logger.warning("Stream client {name} unknown frame {kind}".format(name=client.name, kind=kind))
+
+    def _send_init(self, client):
+        init = self._backend.stream_init(client.interval)
+        if init is None:
+            return
+        client.waiting_init = False
+        self._send(client, pack_frame(FRAME_INIT, init, self._compress))
+
+    def _send(self, client, frame):
+        client.out += frame
+        self._write(client)
+
+    def _write(self, client):
+        if client.handshake:
+            self._do_handshake(client)
+            return
+        while client.out or client.snapshot is not None:
+            if not client.out:
+                client.out += client.snapshot
+                client.snapshot = None
+            try:
+                sent = client.sock.send(client.out)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                break
+            except OSError:
+                self._close_client(client)
+                return
+            del client.out[:sent]
+        if client.closing and not client.out:
+            self._close_client(client)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.out else 0)
+        try:
+            self._selector.modify(client.sock, events, client)
+        except (KeyError, ValueError):
+            pass
+
+    def _close_client(self, client):
+        with self._lock:
+            for fileno, item in list(self._clients.items()):
+                if item is client:
+                    del self._clients[fileno]
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+        logger.debug("Stream client {name} disconnected".format(name=client.name))
+
+    def close(self, timeout=None):
+        self._running.clear()
+        self._wake()
+        if self.is_alive():
+            self.join(timeout)
+        try:
+            self._selector.unregister(self._sock)
+        except (KeyError, ValueError):
+            pass
+        if self._sock is not None:
+            self._sock.close()
+            if isinstance(self._address, str) and os.path.exists(self._address):
+                os.remove(self._address)
+        self._wake_r.close()
+        self._wake_w.close()
+
+
+class StreamQueue(object):
+    """
+    Control queue for a stream connection, same interface of the service queue
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._init = queue.Queue()
+
+    def put(self, control):
+        """
+        Send a control message, return a :class:`ControlJob` completed when the service run it
+        """
+        if not control:
+            # The lease is renewed from any frame, skip alive when not needed
+            if time.time() - self._connection.last_send >= CLIENT_ALIVE:
+                self._connection.send(FRAME_ALIVE, {})
+        elif 'interval' in control:
+            # The interval is sent on authentication, the initialization is already available
+            return
+        else:
+            # A relay forward the job of its client
+            job = self._connection.add_job(control.get('job'))
+            self._connection.send(FRAME_CONTROL, dict(control, job=job.id))
+            return job
+
+    def get(self, timeout=None):
+        try:
+            init = self._init.get(timeout=timeout)
+        except queue.Empty:
+            init = None
+        if init is None:
+            self._connection.check()
+            raise JtopException("jtop service does not reply")
+        return init
+
+    def empty(self):
+        return True
+
+
+class StreamData(object):
+    """
+    Last snapshot received, same interface of the service shared dictionary
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._data = {}
+
+    def copy(self):
+        self._connection.check()
+        return dict(self._data)
+
+
+class StreamConnection(object):
+    """
+    Connection to a stream server, with the same interface of the service manager:
+    **connect()**, **get_queue()**, **sync_data()** and **sync_event()**
+    """
+
+    def __init__(self, address, interval=1.0, token=None, ssl_context=None, name=None, timeout=5.0):
+        self._address = address
+        self._interval = interval
+        self._token = token
+        self._ssl_context = ssl_context
+        self._name = name
+        self._timeout = timeout
+        self._sock = None
+        self._lock = Lock()
+        self._error = None
+        self.last_send = 0.0
+        # Called for each job update received
+        self.on_job = None
+        # Called for each event received
+        self.on_event = None
+        self._jobs = {}
+        self._event = Event()
+        self._queue = StreamQueue(self)
+        self._data = StreamData(self)
+        self._thread = None
+
+    def connect(self):
+        if isinstance(self._address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.create_connection(self._address, timeout=self._timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self._timeout)
+        if isinstance(self._address, str):
+            sock.connect(self._address)
+        if self._ssl_context is not None:
+            server_hostname = self._address[0] if not isinstance(self._address, str) else None
+            sock = self._ssl_context.wrap_socket(sock, server_hostname=server_hostname)
+        self._sock = sock
+        reader = FrameReader()
+        # Wait hello and authenticate
+        kind, hello = self._read_frame(reader)
+        if kind != FRAME_HELLO:
+            raise StreamException("Wrong handshake with jtop service")
+        if hello.get('version') != STREAM_VERSION:
+            raise StreamException("Mismatch stream version with jtop service")
+        digest = None
+        if hello.get('auth'):
+            if self._token is None:
+                raise JtopException("jtop service require a token")
+            digest = auth_digest(self._token, hello['nonce'])
+        self.send(FRAME_AUTH, {'digest': digest, 'interval': self._interval, 'name': self._name})
+        # After the handshake the socket is blocking without timeout
+        sock.settimeout(None)
+        self._thread = Thread(target=self._reader, args=(reader, ))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read_frame(self, reader):
+        while True:
+            for frame in reader.frames():
+                return frame
+            data = self._sock.recv(READ_SIZE)
+            if not data:
+                raise EOFError("Connection closed from jtop service")
+            reader.feed(data)
+
+    def _reader(self, reader):
+        try:
+            while True:
+                # Decode all frames already received before to read again
+                for kind, message in reader.frames():
+                    self._message(kind, message)
+                data = self._sock.recv(READ_SIZE)
+                if not data:
+                    raise EOFError("Connection closed from jtop service")
+                reader.feed(data)
+        except Exception as e:
+            self._error = e
+        finally:
+            # Unlock who is waiting data, initialization or jobs
+            self._event.set()
+            self._queue._init.put(None)
+            with self._lock:
+                jobs, self._jobs = self._jobs, {}
+            for job in jobs.values():
+                job._fail("Lost connection with jtop service")
+
+    def _message(self, kind, message):
+        if kind == FRAME_INIT:
+            self._queue._init.put({'init': message})
+        elif kind == FRAME_SNAPSHOT:
+            self._data._data = message
+            self._event.set()
+        elif kind == FRAME_JOB:
+            with self._lock:
+                job = self._jobs.get(message.get('id'))
+                if job is not None and message.get('status') in [JOB_DONE, JOB_ERROR]:
+                    del self._jobs[job.id]
+            if job is not None:
+                job._update(message)
+            if self.on_job is not None:
+                self.on_job(message)
+        elif kind == FRAME_EVENT:
+            if self.on_event is not None:
+                self.on_event(message)
+        elif kind == FRAME_ERROR:
+            raise JtopException(message.get('message', 'Error from jtop service'))
+
+    def add_job(self, job_id=None):
+        job = ControlJob(job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def send(self, kind, message):
+        frame = pack_frame(kind, message)
+        with self._lock:
+            try:
+                self._sock.sendall(frame)
+            except OSError:
+                raise EOFError("Lost connection with jtop service")
+            self.last_send = time.time()
+
+    def check(self):
+        if self._error is None:
+            return
+        if isinstance(self._error, JtopException):
+            raise self._error
+        raise EOFError(str(self._error))
+
+    def get_queue(self):
+        return self._queue
+
+    def sync_data(self):
+        return self._data
+
+    def sync_event(self):
+        return self._event
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+# EOF
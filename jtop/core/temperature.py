@@ -16,15 +16,25 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-from .common import cat, check_file
+from .common import cat, check_file, least_squares_slope
 import os
 import re
+import time
+from collections import deque
+from threading import Lock
 # Logging
 import logging
 # Create logger
 logger = logging.getLogger(__name__)
 TEMPERATURE_RE = re.compile(r'^temp(?P<num>\d+)_label$')
 TEMPERATURE_OFFLINE = -256
+TRIP_POINT_RE = re.compile(r'^trip_point_(?P<num>\d+)_temp$')
+# Window in seconds for the temperature slope
+TEMPERATURE_WINDOW = 10.0
+# Under this slope in Celsius/s the temperature is stable, no time to trip
+TEMPERATURE_SLOPE_MIN = 0.01
+# Trip points used for the prediction, the active trip points are fan levels
+TRIP_POINT_THROTTLE = ['passive', 'hot', 'critical']
 
 
 def read_temperature(data):
@@ -39,6 +49,32 @@ def read_temperature(data):
     return values
 
 
+def get_thermal_trip_points(zone_path):
+    """
+    All trip points of a thermal zone, sorted by temperature
+    """
+    trips = []
+    for file in os.listdir(zone_path):
+        match = TRIP_POINT_RE.search(file)
+        if not match:
+            continue
+        type_path = os.path.join(zone_path, "trip_point_{num}_type".format(num=match.group('num')))
+        try:
+            temp = float(cat(os.path.join(zone_path, file))) / 1000.0
+            trip_type = cat(type_path).strip() if os.path.isfile(type_path) else 'passive'
+        except (OSError, ValueError):
+            continue
+        trips += [{'type': trip_type, 'temp': temp}]
+    return sorted(trips, key=lambda trip: trip['temp'])
+
+
+def temperature_slope(samples):
+    """
+    Slope in Celsius/s with the least squares of a list of (time, temperature)
+    """
+    return least_squares_slope(samples)
+
+
 def get_virtual_thermal_temperature(thermal_path):
     temperature = {}
     # Find all thermal zone available
@@ -124,6 +160,10 @@ class TemperatureService(object):
 
     def __init__(self):
         self._temperature = {}
+        self._trips = {}
+        self._history = {}
+        # The fan closed loop read the temperatures from another thread
+        self._lock = Lock()
         # Find all temperature available
         sys_folder = "/sys"
         if os.getenv('JTOP_TESTING', False):
@@ -141,14 +181,54 @@ class TemperatureService(object):
             logger.warning("Temperature not folder found!")
         # Sort all sensors
         self._temperature = dict(sorted(self._temperature.items(), key=lambda item: item[0].lower()))
+        # Trip points of all thermal zones
+        for name, sensor in self._temperature.items():
+            zone_path = os.path.dirname(sensor['temp'])
+            if 'thermal_zone' in os.path.basename(zone_path):
+                trips = get_thermal_trip_points(zone_path)
+                if trips:
+                    self._trips[name] = trips
+                    logger.info("Trip points \"{name}\": {trips}".format(name=name, trips=trips))
+            self._history[name] = deque()
+
+    def _slope(self, name, temp, now):
+        with self._lock:
+            history = self._history[name]
+            history.append((now, temp))
+            while history and now - history[0][0] > TEMPERATURE_WINDOW:
+                history.popleft()
+            samples = list(history)
+        return temperature_slope(samples)
+
+    def _predict(self, name, values):
+        trips = self._trips[name]
+        # The first passive and the critical trip points are the max and crit temperatures
+        passive = [trip['temp'] for trip in trips if trip['type'] == 'passive']
+        critical = [trip['temp'] for trip in trips if trip['type'] == 'critical']
+        if passive and 'max' not in values:
+            values['max'] = passive[0]
+        if critical and 'crit' not in values:
+            values['crit'] = critical[0]
+        # Time to the next throttling trip point
+        trip = next((trip for trip in trips if trip['type'] in TRIP_POINT_THROTTLE and trip['temp'] > values['temp']), None)
+        if trip is None:
+            return
+        values['trip'] = trip
+        if values['slope'] >= TEMPERATURE_SLOPE_MIN:
+            values['time_to_trip'] = (trip['temp'] - values['temp']) / values['slope']
 
     def get_status(self):
         status = {}
+        now = time.time()
         # Read temperature from board
         for name, sensor in self._temperature.items():
             values = read_temperature(sensor)
             # Status sensor
             values['online'] = values['temp'] != TEMPERATURE_OFFLINE
+            if values['online']:
+                values['slope'] = self._slope(name, values['temp'], now)
+                if name in self._trips:
+                    self._predict(name, values)
             # Add sensor in dictionary
             status[name] = values
         return status
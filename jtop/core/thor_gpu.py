@@ -137,6 +137,65 @@ def nvml_process_table() -> Tuple[int, List]:
     return total_kb, rows
 
 
+class NVMLProcessUtilization(object):
+    """
+    Per-process GPU utilization on the nvidia.ko stack (Thor) from the NVML process
+    utilization samples. Each update asks only the samples after the last one already seen.
+
+    If the driver does not support the samples the reader is disabled and returns always {}.
+    """
+
+    def __init__(self):
+        self.supported = _NVML
+        self._last_seen: Dict[int, int] = {}
+
+    def update(self) -> Dict[int, Dict[str, int]]:
+        """
+        Return {pid: {'sm', 'mem', 'enc', 'dec'}} in percent, from the newest sample of each PID.
+        PIDs without samples since the last update are not in the output.
+        """
+        if not self.supported:
+            return {}
+        try:
+            _pynvml.nvmlInit()  # idempotent; required after fork
+            count = _pynvml.nvmlDeviceGetCount()
+        except _pynvml.NVMLError as e:
+            logger.debug("NVML init/count failed: %s", e)
+            return {}
+        utilization: Dict[int, Dict[str, int]] = {}
+        for idx in range(count):
+            try:
+                h = _pynvml.nvmlDeviceGetHandleByIndex(idx)
+                samples = _pynvml.nvmlDeviceGetProcessUtilization(h, self._last_seen.get(idx, 0))
+            except AttributeError:
+                logger.info("NVML process utilization not available in this pynvml")
+                self.supported = False
+                return {}
+            except _pynvml.NVMLError as e:
+                value = getattr(e, "value", None)
+                if value == getattr(_pynvml, "NVML_ERROR_NOT_SUPPORTED", None):
+                    logger.info("NVML process utilization not supported on GPU %d", idx)
+                    self.supported = False
+                    return {}
+                # NVML_ERROR_NOT_FOUND: no new samples since the last update
+                if value != getattr(_pynvml, "NVML_ERROR_NOT_FOUND", None):
+                    logger.debug("nvmlDeviceGetProcessUtilization(%d) failed: %s", idx, e)
+                continue
+            newest: Dict[int, Any] = {}
+            for sample in samples:
+                if sample.pid not in newest or sample.timeStamp > newest[sample.pid].timeStamp:
+                    newest[sample.pid] = sample
+                self._last_seen[idx] = max(self._last_seen.get(idx, 0), sample.timeStamp)
+            # A process on more GPUs is the sum of all GPUs
+            for pid, sample in newest.items():
+                util = utilization.setdefault(pid, {"sm": 0, "mem": 0, "enc": 0, "dec": 0})
+                util["sm"] += sample.smUtil
+                util["mem"] += sample.memUtil
+                util["enc"] += sample.encUtil
+                util["dec"] += sample.decUtil
+        return utilization
+
+
 def nvml_gpu_used_kb() -> Optional[int]:
     """
     Cached (1-second TTL) sum of GPU process memory from NVML (in kB).
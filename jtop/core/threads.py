@@ -0,0 +1,170 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+from .common import CachedFile
+from .exceptions import JtopException
+# Logging
+import logging
+# Create logger
+logger = logging.getLogger(__name__)
+# A subscription is removed if a client does not renew it, the client renews every half lease
+THREADS_LEASE = 5.0
+# The lease is at least three times the interval of the client, and at most THREADS_LEASE_MAX seconds
+THREADS_LEASE_GAIN = 3
+THREADS_LEASE_MAX = 300.0
+# Max lease for the clients of a read only stream
+THREADS_LEASE_READ_ONLY = 30.0
+# Max processes expanded at the same time
+THREADS_MAX_PROCESSES = 8
+# Max threads for each process with the files kept open, the others are opened at every read
+THREADS_CACHED = 128
+
+
+def threads_lease(interval):
+    """
+    Lease of a subscription for a client that renews it once for each **interval**
+    """
+    return min(max(THREADS_LEASE, THREADS_LEASE_GAIN * interval), THREADS_LEASE_MAX)
+
+
+def read_thread_stat(text):
+    """
+    Decode :code:`/proc/[PID]/task/[TID]/stat`: name, state, CPU time (utime + stime) in clock ticks and last CPU
+    """
+    start = text.index('(')
+    end = text.rindex(')')
+    fields = text[end + 2:].split()
+    # Fields after the name start from #3 state: utime #14, stime #15, processor #39
+    return text[start + 1:end], fields[0], int(fields[11]) + int(fields[12]), int(fields[36])
+
+
+class ThreadSampler(object):
+    """
+    All threads of a process with the CPU percent, the last CPU, the state and the time waiting on a run queue
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._clk_tck = os.sysconf('SC_CLK_TCK')
+        # tid: [stat, schedstat, CPU ticks, wait time in ns]
+        self._tasks = {}
+        self._last = None
+
+    def update(self, now):
+        try:
+            tids = sorted(os.listdir(self._path), key=int)
+        except OSError:
+            # Process closed
+            self.close()
+            return {}
+        last, self._last = self._last, now
+        interval = now - last if last is not None and now > last else 0.0
+        threads = {}
+        for idx, tid in enumerate(tids):
+            task = self._tasks.get(tid)
+            if task is None:
+                task = [CachedFile(os.path.join(self._path, tid, 'stat')), CachedFile(os.path.join(self._path, tid, 'schedstat')), None, None]
+                self._tasks[tid] = task
+            try:
+                name, state, ticks, cpu = read_thread_stat(task[0].read())
+                # run time, wait time on a run queue (ns) and time slices
+                wait = int(task[1].read().split()[1])
+            except (OSError, ValueError, IndexError):
+                # Thread closed while reading
+                continue
+            finally:
+                if idx >= THREADS_CACHED:
+                    task[0].close()
+                    task[1].close()
+            thread = {'name': name, 'state': state, 'last_cpu': cpu, 'cpu': 0.0, 'delay': 0.0}
+            if interval > 0 and task[2] is not None:
+                thread['cpu'] = 100.0 * (ticks - task[2]) / self._clk_tck / interval
+                thread['delay'] = 100.0 * (wait - task[3]) / 1e9 / interval
+            task[2], task[3] = ticks, wait
+            threads[int(tid)] = thread
+        # Close the threads ended
+        for tid in [tid for tid in self._tasks if int(tid) not in threads]:
+            task = self._tasks.pop(tid)
+            task[0].close()
+            task[1].close()
+        return threads
+
+    def close(self):
+        for task in self._tasks.values():
+            task[0].close()
+            task[1].close()
+        self._tasks = {}
+
+
+class ThreadService(object):
+    """
+    Sample the threads only of the processes expanded from a client.
+    Each client renews the subscription, when no client renews it the process is not sampled anymore.
+    """
+
+    def __init__(self, proc_path="/proc"):
+        self._proc_path = proc_path
+        # pid: [expire, sampler]
+        self._subscriptions = {}
+
+    def subscribe(self, pids, lease=THREADS_LEASE, now=None, lease_max=THREADS_LEASE_MAX):
+        """
+        Expand or renew the processes for **lease** seconds, between THREADS_LEASE and **lease_max**.
+        Raise a :class:`JtopException` with the processes not running or over THREADS_MAX_PROCESSES,
+        all the other processes are expanded
+        """
+        now = time.time() if now is None else now
+        lease = min(max(float(lease), THREADS_LEASE), min(float(lease_max), THREADS_LEASE_MAX))
+        rejected = []
+        for pid in pids:
+            pid = int(pid)
+            if pid <= 0 or not os.path.isdir(os.path.join(self._proc_path, str(pid))):
+                rejected += ["{pid} not running".format(pid=pid)]
+                continue
+            if pid in self._subscriptions:
+                self._subscriptions[pid][0] = max(self._subscriptions[pid][0], now + lease)
+                continue
+            if len(self._subscriptions) >= THREADS_MAX_PROCESSES:
+                logger.warning("Max {max} processes expanded, {pid} skipped".format(max=THREADS_MAX_PROCESSES, pid=pid))
+                rejected += ["{pid} over {max} processes expanded".format(pid=pid, max=THREADS_MAX_PROCESSES)]
+                continue
+            logger.info("Expand process {pid}".format(pid=pid))
+            path = os.path.join(self._proc_path, str(pid), 'task')
+            self._subscriptions[pid] = [now + lease, ThreadSampler(path)]
+        if rejected:
+            raise JtopException("Processes not expanded: {rejected}".format(rejected=", ".join(rejected)))
+
+    def get_status(self, now=None):
+        now = time.time() if now is None else now
+        threads = {}
+        for pid in list(self._subscriptions):
+            expire, sampler = self._subscriptions[pid]
+            if now > expire:
+                logger.info("Collapse process {pid}, subscription expired".format(pid=pid))
+                sampler.close()
+                del self._subscriptions[pid]
+                continue
+            threads[pid] = sampler.update(now)
+        return threads
+
+    def close(self):
+        for _, sampler in self._subscriptions.values():
+            sampler.close()
+        self._subscriptions = {}
+# EOF
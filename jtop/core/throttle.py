@@ -0,0 +1,94 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from collections import deque
+# Logging
+import logging
+# Create logger
+logger = logging.getLogger(__name__)
+# An engine over this load should run at the max frequency
+THROTTLE_LOAD = 80.0
+# Under this ratio between current and max frequency the engine is throttled
+THROTTLE_RATIO = 0.9
+# Number of throttle events stored
+THROTTLE_EVENTS = 20
+
+
+def cpu_throttle(cpu):
+    """
+    Worst ratio between current and max frequency of the loaded CPUs, None if no CPU is loaded
+    """
+    ratios = []
+    for core in cpu.get('cpu', []):
+        freq = core.get('freq', {})
+        if not core.get('online', False) or 'cur' not in freq or not freq.get('max'):
+            continue
+        if 100.0 - core.get('idle', 100.0) < THROTTLE_LOAD:
+            continue
+        ratios += [(float(freq['cur']) / freq['max'], freq['cur'], freq['max'])]
+    return min(ratios) if ratios else None
+
+
+def gpu_throttle(gpu):
+    freq = gpu.get('freq', {})
+    if 'cur' not in freq or not freq.get('max'):
+        return None
+    if gpu.get('status', {}).get('load', 0.0) < THROTTLE_LOAD:
+        return None
+    return (float(freq['cur']) / freq['max'], freq['cur'], freq['max'])
+
+
+class ThrottleService(object):
+    """
+    Detect throttling: an engine under load running under the max frequency.
+
+    For each engine throttled there is an active event, when the engine run again at the max frequency
+    the event is closed and stored in the list of the last events.
+    """
+
+    def __init__(self):
+        self._active = {}
+        self._events = deque(maxlen=THROTTLE_EVENTS)
+
+    def _update(self, engine, status, now):
+        throttled = status is not None and status[0] < THROTTLE_RATIO
+        if throttled:
+            ratio, cur, max_freq = status
+            if engine not in self._active:
+                self._active[engine] = {'engine': engine, 'start': now, 'end': None, 'cur': cur, 'max': max_freq, 'ratio': ratio}
+                self._events.append(self._active[engine])
+                logger.info("{engine} throttled at {cur}/{max}".format(engine=engine, cur=cur, max=max_freq))
+            event = self._active[engine]
+            # Store the worst ratio of this event
+            if ratio < event['ratio']:
+                event.update({'cur': cur, 'max': max_freq, 'ratio': ratio})
+        elif engine in self._active:
+            event = self._active.pop(engine)
+            event['end'] = now
+            logger.info("{engine} throttled for {time:.1f}s".format(engine=engine, time=now - event['start']))
+
+    def get_status(self, cpu, gpu, now=None):
+        now = time.time() if now is None else now
+        self._update('CPU', cpu_throttle(cpu), now)
+        for name, data in gpu.items():
+            self._update(name, gpu_throttle(data), now)
+        return {
+            'active': sorted(self._active.keys()),
+            'events': [dict(event) for event in self._events],
+        }
+# EOF
@@ -25,6 +25,7 @@ from .pengine import ENGINE, engine_model
 from .pmem import MEM
 from .pcontrol import CTRL
 from .pinfo import INFO
+from .pfleet import FLEET
 
 try:
     from jtop.core.hw_detect import is_thor as _is_thor_fn
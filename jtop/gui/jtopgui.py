@@ -22,11 +22,13 @@ import curses
 import logging
 # Timer
 from datetime import datetime, timedelta
+from threading import Event
 # Get variables
 from ..core.common import get_var
 # Graphics elements
 from .lib.colors import NColors
 from .lib.common import check_curses, set_xterm_title
+from .lib.history import get_history
 # Create logger
 logger = logging.getLogger(__name__)
 # Initialization abstract class
@@ -34,6 +36,11 @@ logger = logging.getLogger(__name__)
 ABC = abc.ABCMeta('ABC', (object,), {})
 # Gui refresh rate
 GUI_REFRESH = 1000 // 20
+# Low power mode: input polling rate and min time between two redraws for new data
+GUI_REFRESH_LOW_POWER = 1000 // 2
+GUI_LOW_POWER_FRAME = timedelta(seconds=2)
+# After an input event the GUI is redrawn for a while, e.g. to remove the highlight of a button
+GUI_INPUT_FRAMES = timedelta(milliseconds=200)
 # Copyright small
 COPYRIGHT_SMALL_RE = re.compile(r""".*__cr__ = ["'](.*?)['"]""", re.S)
 
@@ -78,13 +85,24 @@ class JTOPGUI:
         wrapper.
     """
 
-    def __init__(self, stdscr, jetson, pages, init_page=0, start=True, loop=False, seconds=5, color_filter=False):
+    def __init__(self, stdscr, jetson, pages, init_page=0, start=True, loop=False, seconds=5, color_filter=False, low_power=False,
+                 fleet=False):
         # Initialize colors
         NColors(color_filter)
         # Set curses reference, refresh and jetson controller
         self.stdscr = stdscr
         self.jetson = jetson
         self.message = False
+        # Fleet mode, jetson is a fleet aggregator
+        self.fleet = fleet
+        # Low power mode, poll input and redraw new data slower
+        self.low_power = low_power
+        self.refresh = GUI_REFRESH_LOW_POWER if low_power else GUI_REFRESH
+        # New data from jtop, the GUI is redrawn only on new data or input events
+        self._new_data = Event()
+        self._new_data.set()
+        # History shared by all charts
+        self.history = get_history(jetson)
         # Initialize all Object pages
         self.pages = []
         for obj in pages:
@@ -127,24 +145,47 @@ class JTOPGUI:
         self.stdscr.nodelay(1)
         # Using current time
         old = datetime.now()
-        # Here is the loop of our program, we keep clearing and redrawing in this loop
-        while not self.events() and self.jetson.ok(spin=True):
-            # Get page selected
-            page = self.pages[self.n_page]
-            # Check if dialog window is open and disable mouse event on main pages
-            record_mouse = self.mouse
-            if page.dialog_window and page.dialog_window.enable_dialog_window:
-                self.mouse = ()
-            # Draw pages
-            self.draw(page)
-            self.mouse = record_mouse
-            # Draw dialog window if it exists
-            if page.dialog_window:
-                page.dialog_window.show(self.stdscr, self.key, self.mouse)
-            # Increase page automatically if loop enabled
-            if loop and datetime.now() - old >= timedelta(seconds=seconds):
-                self.increase(loop=True)
-                old = datetime.now()
+        last_draw = datetime.min
+        last_input = datetime.min
+        # Notify new data from jtop, when the history of all charts is updated
+        self.history.attach(self._data_ready)
+        self.stdscr.timeout(self.refresh)
+        try:
+            # Here is the loop of our program, we redraw only on new data, input event or resize
+            while not self.events() and self.jetson.ok(spin=True):
+                now = datetime.now()
+                # Increase page automatically if loop enabled
+                if loop and now - old >= timedelta(seconds=seconds):
+                    self.increase(loop=True)
+                    old = now
+                    self._new_data.set()
+                # Check if the GUI need to be redrawn
+                new_data = self._new_data.is_set()
+                if self.low_power and now - last_draw < GUI_LOW_POWER_FRAME:
+                    new_data = False
+                if self.key != -1:
+                    last_input = now
+                if not new_data and now - last_input > GUI_INPUT_FRAMES:
+                    continue
+                self._new_data.clear()
+                last_draw = now
+                # Get page selected
+                page = self.pages[self.n_page]
+                # Check if dialog window is open and disable mouse event on main pages
+                record_mouse = self.mouse
+                if page.dialog_window and page.dialog_window.enable_dialog_window:
+                    self.mouse = ()
+                # Draw pages
+                self.draw(page)
+                self.mouse = record_mouse
+                # Draw dialog window if it exists
+                if page.dialog_window:
+                    page.dialog_window.show(self.stdscr, self.key, self.mouse)
+        finally:
+            self.history.detach(self._data_ready)
+
+    def _data_ready(self):
+        self._new_data.set()
 
     def draw(self, page):
         # First, clear the screen
@@ -158,7 +199,7 @@ class JTOPGUI:
         # Draw the screen
         self.stdscr.refresh()
         # Set a timeout and read keystroke
-        self.stdscr.timeout(GUI_REFRESH)
+        self.stdscr.timeout(self.refresh)
 
     def increase(self, loop=False):
         # check reset
@@ -182,6 +223,9 @@ class JTOPGUI:
             self.n_page = idx - 1
 
     def title_terminal(self):
+        if self.fleet:
+            set_xterm_title("jtop fleet")
+            return
         status = []
         # Title script
         # Reference: https://stackoverflow.com/questions/25872409/set-gnome-terminal-window-title-in-python
@@ -204,7 +248,9 @@ class JTOPGUI:
     def header(self):
         self.title_terminal()
         # Detect if jtop is running on jetson or on other platforms
-        if self.jetson.board['platform']['Machine'] == 'x86_64':
+        if self.fleet:
+            self.stdscr.addstr(0, 0, "Fleet - {nodes} nodes".format(nodes=len(self.jetson.nodes)), curses.A_BOLD)
+        elif self.jetson.board['platform']['Machine'] == 'x86_64':
             self.header_x86()
         elif 'L4T' in self.jetson.board['hardware']:
             self.header_jetson()
@@ -311,6 +357,9 @@ class JTOPGUI:
                 self.decrease(loop=True)
             elif self.key == curses.KEY_RIGHT or self.key == ord('\t'):
                 self.increase(loop=True)
+            elif self.key == ord('z') or self.key == ord('Z'):
+                # Change time window of all charts
+                self.history.next_zoom()
             elif self.key in [ord(str(n)) for n in range(10)]:
                 num = int(chr(self.key))
                 self.set(num)
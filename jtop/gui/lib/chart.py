@@ -14,13 +14,26 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
-
 # Math functions
 import itertools
-from math import ceil
 import curses
-from collections import deque
 from .common import check_curses
+from .history import get_history, History
+# Block glyphs are encoded only once
+BLOCK_FULL = u'\u2588'.encode('utf-8')
+BLOCK_3_4 = u'\u2586'.encode('utf-8')
+BLOCK_LOWER = u'\u2584'.encode('utf-8')
+BLOCK_SMALL = u'\u2581'.encode('utf-8')
+# Cells between the min and the max of a column
+BLOCK_SHADE = u'\u2592'.encode('utf-8')
+
+
+def time_label(seconds):
+    if seconds >= 3600 and seconds % 3600 == 0:
+        return "{time}h".format(time=int(seconds // 3600))
+    if seconds >= 60 and seconds % 60 == 0:
+        return "{time}m".format(time=int(seconds // 60))
+    return "{time}s".format(time=int(seconds) if seconds == int(seconds) else round(seconds, 1))
 
 
 class Chart(object):
@@ -32,6 +45,8 @@ class Chart(object):
     """
     Chart draw object
     http://www.melvilletheatre.com/articles/ncurses-extended-characters/index.html
+
+    The chart is a view of the GUI history, shared by all charts of the session.
     """
 
     def __init__(self, jetson, name, callback, type_value=int, line="*", color_text=curses.COLOR_WHITE, color_chart=[], fill=True, time=10.0, tik=2):
@@ -39,25 +54,28 @@ class Chart(object):
         self.jetson = jetson
         self.name = name
         self.callback = callback
-        # Set shape
-        self.refresh = jetson.interval * 1000
         # Design chart shape
         self.line = line
         self.color_text = color_text
         self.color_chart = color_chart if color_chart else [color_text]
         self.fill = fill
-        # Set timing
+        # Set timing, default window when the chart is not zoomed
         self.time = time
         self.tik = tik
-        # Initialization chart
-        max_record = int(self.time * (float(1.0 / float(self.refresh)) * 1000.0))
-        self.values = deque(max_record * [(len(self.color_chart) * [0])], maxlen=max_record)
         # Initialize default values and unit
         self.unit = "%"
         self.type_value = type_value
         self.max_val = 100
         self.active = True
         self.message = "OFF"
+        # Rendering cache, the chart is drawn on a pad and updated only with new samples
+        self._pad = None
+        self._scratch = None
+        self._layout = None
+        self._unit = None
+        self._last_column = None
+        self._last_time = None
+        self._blank = " " * 1024
         # Initialize all colors
         color_step = len(self.color_chart)
         values = list(range(len(self.color_chart)))[::-1] + [len(self.color_chart)]
@@ -80,8 +98,10 @@ class Chart(object):
             curses.use_default_colors()
         # Update counter colors
         Chart.COLOR_COUNTER += len(self._combinations) + 1
-        # Attach the chart for every update from jtop
-        jetson.attach(self.update)
+        # Register the chart metric in the session history, the same metric keep its history between pages
+        self.history = get_history(jetson)
+        self._key = (getattr(callback, '__qualname__', repr(callback)), name)
+        self.history.register(self._key, name, callback)
 
     @classmethod
     def reset_color_counter(cls):
@@ -94,19 +114,19 @@ class Chart(object):
         self.active = active
         self.message = message
 
-    def update(self, jetson):
-        """ Local update chart """
-        # Call the callback
-        data = self.callback(jetson, self.name)
-        # Get max value if is present
-        self.max_val = data.get("max", self.max_val)
-        # Get unit
-        self.unit = data.get("unit", self.unit)
-        # Get status
-        self.active = data.get("active", self.active)
-        # update the queue
-        value = data.get("value", [0])
-        self.values.append(value)
+    @property
+    def window(self):
+        """ Time window shown (in seconds) """
+        return self.history.zoom or self.time
+
+    def _update_meta(self):
+        max_val, unit, active = self.history.meta(self._key)
+        if max_val is not None:
+            self.max_val = max_val
+        if unit is not None:
+            self.unit = unit
+        if active is not None:
+            self.active = active
 
     def draw_y_axis(self, stdscr, pos_y, pos_x, size_height):
         self._plot_y_axis(stdscr, [0, pos_x + 4], [pos_y, pos_y + size_height])
@@ -122,22 +142,97 @@ class Chart(object):
         if label:
             stdscr.addstr(size_y[0], size_x[0] + len(self.name) + 1, label[:displayX - len(self.name)],
                           curses.color_pair(Chart.OFFSET_COLOR_TEXT) | curses.A_BOLD)
+        # Render on chart pad only what is changed
+        self._render(size_x, size_y, y_label)
+        # Copy the chart pad on screen
+        height, width = stdscr.getmaxyx()
+        max_y = min(size_y[1], height - 1)
+        max_x = min(size_x[1], width - 1)
+        if max_y > size_y[0] and max_x >= size_x[0]:
+            self._pad.overwrite(stdscr, 0, 0, size_y[0] + 1, size_x[0], max_y, max_x)
+
+    def _render(self, size_x, size_y, label):
+        """
+        The chart is rendered on a pad that keep all columns between frames.
+        Each column is a time slot of the window, when new samples arrive the plot is scrolled
+        and only the new columns are drawn.
+        A full render is needed only when shape, window, scale or status of the chart are changed.
+        """
+        self._update_meta()
+        # Local coordinates on pad, the first row on screen is the chart name
+        local_x = [0, size_x[1] - size_x[0]]
+        local_y = [-1, size_y[1] - size_y[0] - 1]
+        size_plot_x = [local_x[0], local_x[1] - 6 if label else local_x[1] - 1]
+        columns = size_plot_x[1] - size_plot_x[0] + 1
+        window = self.window
+        step = window / float(max(columns, 1))
+        # Last column with data
+        last_time = self.history.last_time()
+        last_column = History.column(last_time, step) if last_time is not None else None
+        layout = (size_x[1] - size_x[0], size_y[1] - size_y[0], label, window,
+                  self.max_val, self.active, self.message)
+        if layout != self._layout:
+            self._render_full(local_x, local_y, label, last_column, step)
+            self._layout = layout
+            self._unit = self.unit
+        elif self.active and last_time is not None and last_time != self._last_time:
+            shift = last_column - self._last_column if self._last_column is not None else columns
+            if shift >= columns:
+                self._render_full(local_x, local_y, label, last_column, step)
+            else:
+                self._scroll_values(local_y, size_plot_x, last_column, shift, step)
+        # Y axis labels are redrawn only if the unit is changed
+        if self.unit != self._unit:
+            self._plot_y_axis(self._pad, local_x, local_y, label=label)
+            self._unit = self.unit
+        self._last_column = last_column
+        self._last_time = last_time
+
+    def _render_full(self, size_x, size_y, label, last_column, step):
+        pad_height = size_y[1] - size_y[0]
+        pad_width = size_x[1] - size_x[0] + 1
+        # Build a new pad if the size is changed, one more column avoid errors writing on last cell
+        if self._pad is None or self._pad.getmaxyx() != (pad_height, pad_width + 1):
+            self._pad = curses.newpad(pad_height, pad_width + 1)
+            self._scratch = curses.newpad(pad_height, pad_width + 1)
+        self._pad.erase()
         # Draw ticks and labels
-        self._plot_x_axis(stdscr, size_x, size_y, label=y_label)
+        self._plot_x_axis(self._pad, size_x, size_y, step, label=label)
         # Plot chart shape and labels
-        self._plot_y_axis(stdscr, size_x, size_y, label=y_label)
-        # Plot chart lines
+        self._plot_y_axis(self._pad, size_x, size_y, label=label)
         # Plot values
-        self._plot_values(stdscr, size_x, size_y, label=y_label)
+        if last_column is not None:
+            self._plot_values(self._pad, size_x, size_y, last_column, step, label=label)
         # Add messsage not active
         if not self.active:
-            l_label = size_x[1] - 6 if y_label else size_x[1] - 1
-            # rectangle(stdscr, size_y[0] + 1, size_x[0], size_y[1], l_label)
-            stdscr.hline(size_y[0] + 1, size_x[0], curses.ACS_HLINE, l_label - size_x[0] + 1)
-            # Write message
-            middle_x = (l_label - size_x[0] - len(self.message)) // 2
-            middle_y = (size_y[1] - size_y[0]) // 2
-            stdscr.addstr(size_y[0] + middle_y, size_x[0] + middle_x, self.message, curses.A_BOLD)
+            l_label = size_x[1] - 6 if label else size_x[1] - 1
+            try:
+                self._pad.hline(size_y[0] + 1, size_x[0], curses.ACS_HLINE, l_label - size_x[0] + 1)
+                # Write message
+                middle_x = (l_label - size_x[0] - len(self.message)) // 2
+                middle_y = (size_y[1] - size_y[0]) // 2
+                self._pad.addstr(size_y[0] + middle_y, size_x[0] + middle_x, self.message, curses.A_BOLD)
+            except curses.error:
+                pass
+
+    def _scroll_values(self, size_y, size_plot_x, last_column, shift, step):
+        bottom = size_y[1] - 1
+        # The old last column can have new samples, it is redrawn with the new columns
+        redraw = shift + 1
+        first = size_plot_x[1] - shift
+        # Move the plot on left of shift columns
+        if shift > 0:
+            self._pad.overwrite(self._scratch, 0, size_plot_x[0] + shift, 0, size_plot_x[0], bottom, size_plot_x[1] - shift)
+            self._scratch.overwrite(self._pad, 0, size_plot_x[0], 0, size_plot_x[0], bottom, size_plot_x[1] - shift)
+        # Clear columns to redraw and restore the bottom line
+        for row in range(bottom):
+            self._pad.addstr(row, first, self._blank[:redraw])
+        self._pad.hline(bottom, first, curses.A_UNDERLINE, redraw)
+        # Draw only the new columns
+        height = bottom - size_y[0]
+        for idx, column in enumerate(self.history.columns(self._key, last_column, redraw, step)):
+            if column is not None:
+                self._plot_column(self._pad, first + idx, bottom, height, *column)
 
     def _plot_y_axis(self, stdscr, size_x, size_y, label=True):
         # Plot chart shape and labels
@@ -158,77 +253,81 @@ class Chart(object):
                 except curses.error:
                     pass
 
-    def _plot_x_axis(self, stdscr, size_x, size_y, label=True):
-        displayX = size_x[1] - size_x[0] + 1
-        val = float(displayX - 2) / float(len(self.values))
-        # Draw ticks and labels
-        ten_sec = int(self.tik * 1000 / self.refresh)
-        counter = 0
+    def _plot_x_axis(self, stdscr, size_x, size_y, step, label=True):
         label_y = size_x[1] - 5 if label else size_x[1]
+        # Ticks every tik seconds, or five ticks for a zoomed window
+        tik = self.tik if self.history.zoom is None else self.window / 5.0
         # Draw line
         stdscr.hline(size_y[1] - 1, size_x[0], curses.A_UNDERLINE, label_y - size_x[0])
-        for point in range(displayX):
-            x_val = label_y - point
-            if x_val >= size_x[0]:
-                try:
-                    # Draw tick label
-                    if ((point) / ceil(val)) % ten_sec == 0:
-                        stdscr.addch(size_y[1], x_val, curses.ACS_LLCORNER)
-                    # Draw label
-                    if counter > 0 and ((point - 1) / ceil(val)) % ten_sec == 0:
-                        stdscr.addstr(size_y[1], x_val + 3, "-{time}s".format(time=self.tik * counter))
-                    elif counter == 0 and ((point - 1) / ceil(val)) % ten_sec == 0:
-                        if label:
-                            stdscr.addstr(size_y[1], x_val + 3, "time")
-                        stdscr.addstr(size_y[1], x_val + 1, "0")
-                    # Increase counter
-                    if ((point - 1) / ceil(val)) % ten_sec == 0:
-                        counter += 1
-                except curses.error:
-                    pass
+        try:
+            stdscr.addch(size_y[1], label_y, curses.ACS_LLCORNER)
+            stdscr.addstr(size_y[1], label_y, "0")
+            if label:
+                stdscr.addstr(size_y[1], label_y + 2, "time")
+        except curses.error:
+            pass
+        counter = 1
+        while True:
+            x_val = label_y - int(round(tik * counter / step))
+            if x_val < size_x[0]:
+                break
+            try:
+                # Draw tick and label
+                stdscr.addch(size_y[1], x_val, curses.ACS_LLCORNER)
+                stdscr.addstr(size_y[1], x_val + 2, "-{time}".format(time=time_label(tik * counter)))
+            except curses.error:
+                pass
+            counter += 1
 
-    def _plot_values(self, stdscr, size_x, size_y, label=True):
+    def _plot_values(self, stdscr, size_x, size_y, last_column, step, label=True):
         # Area Plot data
         size_plot_x = [size_x[0], size_x[1] - 6 if label else size_x[1] - 1]
         size_plot_y = [size_y[0], size_y[1] - 1]
         size_y = size_plot_y[1] - size_plot_y[0]
-        list_values = list(self.values)
-        val = ceil(float(size_plot_x[1] - size_plot_x[0]) / float(len(list_values)))
-        points = []
-        for n in list_values:
-            points += [n] * int(val)
-        # Draw all chart
+        columns = size_plot_x[1] - size_plot_x[0] + 1
+        # Draw all chart, each column is the min and max of its time slot
+        for idx, column in enumerate(self.history.columns(self._key, last_column, columns, step)):
+            if column is not None:
+                self._plot_column(stdscr, size_plot_x[0] + idx, size_plot_y[1], size_y, *column)
+
+    def _cell(self, value, size_y):
+        # Values over the max are drawn at full height
+        return min(value * size_y / self.max_val, size_y) if self.max_val else 0
+
+    def _plot_column(self, stdscr, x, bottom, size_y, lows, highs):
         color_step = len(self.color_chart)
-        for idx, values in enumerate(reversed(points)):
-            for chart_idx, value in enumerate(values):
-                color_base = Chart.OFFSET_COLOR_CHART + self._color_obj_counter + chart_idx * color_step
-                color_next = 1 if chart_idx != 0 else 0
-                cell_val = value * size_y / self.max_val
-                cell_val_int = int(cell_val)
-                cell_val_mant = cell_val - cell_val_int
-                if cell_val > 0 and size_plot_x[1] - idx >= size_plot_x[0]:
-                    # Fill chart if request
-                    # https://www.htmlsymbols.xyz/box-drawing
-                    # Full block: \u2588 - 3/4 block \u2586 - Lower block: \u2584 - Small lower block: \u2581
-                    if self.fill:
-                        for n in range(cell_val_int - 1):
-                            stdscr.addstr(size_plot_y[1] - n, size_plot_x[1] - idx, u'\u2588'.encode('utf-8'),
-                                          curses.color_pair(color_base))
-                        # Add head chart
-                        if cell_val < 1.0:
-                            stdscr.addstr(size_plot_y[1] - cell_val_int, size_plot_x[1] - idx, u'\u2581'.encode('utf-8'),
-                                          curses.color_pair(color_base + color_next))
-                        elif cell_val_mant == 0.0:
-                            stdscr.addstr(size_plot_y[1] - cell_val_int + 1, size_plot_x[1] - idx, u'\u2584'.encode('utf-8'),
-                                          curses.color_pair(color_base))
-                        elif cell_val_mant <= 0.5:
-                            stdscr.addstr(size_plot_y[1] - cell_val_int + 1, size_plot_x[1] - idx, u'\u2586'.encode('utf-8'),
-                                          curses.color_pair(color_base + color_next))
-                        elif cell_val_mant < 1.0:
-                            stdscr.addstr(size_plot_y[1] - cell_val_int, size_plot_x[1] - idx, u'\u2581'.encode('utf-8'),
-                                          curses.color_pair(color_base + color_next))
-                            stdscr.addstr(size_plot_y[1] - cell_val_int + 1, size_plot_x[1] - idx, u'\u2588'.encode('utf-8'),
-                                          curses.color_pair(color_base))
-                    else:
-                        stdscr.addstr(size_plot_y[1] - cell_val_int, size_plot_x[1] - idx, self.line, curses.color_pair(Chart.OFFSET_COLOR_TEXT))
+        for chart_idx, (low, value) in enumerate(zip(lows, highs)):
+            # Skip series without value
+            if value != value:
+                continue
+            color_base = Chart.OFFSET_COLOR_CHART + self._color_obj_counter + chart_idx * color_step
+            color_next = 1 if chart_idx != 0 else 0
+            cell_val = self._cell(value, size_y)
+            cell_val_int = int(cell_val)
+            cell_val_mant = cell_val - cell_val_int
+            if cell_val <= 0:
+                continue
+            # Cells over the min of the time slot, a dip in the column
+            cell_low_int = int(self._cell(low, size_y)) if low == low else cell_val_int
+            # Fill chart if request
+            # https://www.htmlsymbols.xyz/box-drawing
+            # Full block: \u2588 - 3/4 block \u2586 - Lower block: \u2584 - Small lower block: \u2581
+            if self.fill:
+                for n in range(cell_val_int - 1):
+                    block = BLOCK_FULL if n < cell_low_int else BLOCK_SHADE
+                    stdscr.addstr(bottom - n, x, block, curses.color_pair(color_base))
+                # Add head chart
+                if cell_val < 1.0:
+                    stdscr.addstr(bottom - cell_val_int, x, BLOCK_SMALL, curses.color_pair(color_base + color_next))
+                elif cell_val_mant == 0.0:
+                    stdscr.addstr(bottom - cell_val_int + 1, x, BLOCK_LOWER, curses.color_pair(color_base))
+                elif cell_val_mant <= 0.5:
+                    stdscr.addstr(bottom - cell_val_int + 1, x, BLOCK_3_4, curses.color_pair(color_base + color_next))
+                elif cell_val_mant < 1.0:
+                    stdscr.addstr(bottom - cell_val_int, x, BLOCK_SMALL, curses.color_pair(color_base + color_next))
+                    stdscr.addstr(bottom - cell_val_int + 1, x, BLOCK_FULL, curses.color_pair(color_base))
+            else:
+                stdscr.addstr(bottom - cell_val_int, x, self.line, curses.color_pair(Chart.OFFSET_COLOR_TEXT))
+                if 0 < cell_low_int < cell_val_int:
+                    stdscr.addstr(bottom - cell_low_int, x, self.line, curses.color_pair(Chart.OFFSET_COLOR_TEXT))
 # EOF
@@ -0,0 +1,202 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from array import array
+from math import ceil, floor
+from threading import Lock
+from weakref import WeakKeyDictionary
+# Time stored in history (in seconds)
+HISTORY_TIME = 3600.0
+# Zoom levels for all charts, None is the chart default window
+ZOOM_LEVELS = [None, 30.0, 300.0, 3600.0]
+NAN = float('nan')
+# One history for each jtop session
+_HISTORIES = WeakKeyDictionary()
+
+
+def get_history(jetson):
+    """
+    Return the history shared by all charts of this jtop session
+    """
+    if jetson not in _HISTORIES:
+        _HISTORIES[jetson] = History(jetson)
+    return _HISTORIES[jetson]
+
+
+def bucket_values(samples, first, size, step):
+    """
+    Downsample a list of samples (time, values) in **size** columns of **step** seconds,
+    starting from the column number **first**. Each column is a pair (min, max) of each series,
+    a column without samples hold the last value before it.
+    """
+    columns = [None] * size
+    last = None
+    idx = 0
+    for column in range(size):
+        start = (first + column) * step
+        end = start + step
+        low = high = None
+        while idx < len(samples) and samples[idx][0] < end:
+            timestamp, values = samples[idx]
+            if timestamp >= start:
+                if high is None:
+                    low = high = values
+                else:
+                    low = [min(a, b) for a, b in zip(low, values)]
+                    high = [max(a, b) for a, b in zip(high, values)]
+            last = values
+            idx += 1
+        if high is not None:
+            columns[column] = (low, high)
+        elif last is not None:
+            columns[column] = (last, last)
+    return columns
+
+
+class History(object):
+    """
+    Columnar history of all metrics shown in the GUI.
+
+    Each metric is stored in ring arrays, one for each series, aligned with a ring of timestamps.
+    The ring hold **history_time** seconds of samples and it is resized when the jtop interval changes.
+    The history is updated once for each new snapshot and survive pages and charts.
+    """
+
+    def __init__(self, jetson, history_time=HISTORY_TIME):
+        self._history_time = history_time
+        self._interval = None
+        self.capacity = 0
+        self._lock = Lock()
+        self._time = array('d')
+        self._count = 0
+        self._metrics = {}
+        self._zoom = 0
+        self._listeners = []
+        self._resize(jetson.interval)
+        # Update history for every new snapshot
+        jetson.attach(self.update)
+
+    def register(self, key, name, callback):
+        with self._lock:
+            if key in self._metrics:
+                # Keep the data already stored and update the callback
+                self._metrics[key]['callback'] = callback
+                return
+            self._metrics[key] = {'name': name, 'callback': callback, 'series': [],
+                                  'max': None, 'unit': None, 'active': None}
+
+    def _resize(self, interval):
+        """
+        Resize all rings for the new interval, the newest samples are kept
+        """
+        self._interval = interval
+        capacity = int(ceil(self._history_time / (interval if interval > 0 else 1.0))) + 1
+        if capacity == self.capacity:
+            return
+        # Positions of the newest samples, from the oldest one
+        counts = range(max(self._count - min(capacity, self.capacity), 0), self._count)
+        self._time = self._ring(self._time, counts, capacity)
+        for metric in self._metrics.values():
+            metric['series'] = [self._ring(ring, counts, capacity) for ring in metric['series']]
+        self.capacity = capacity
+        self._count = len(counts)
+
+    def _ring(self, ring, counts, capacity):
+        values = [ring[count % self.capacity] for count in counts]
+        return array('d', values + [NAN] * (capacity - len(values)))
+
+    def update(self, jetson):
+        timestamp = time.time()
+        # Read all metrics
+        data = {}
+        for key, metric in list(self._metrics.items()):
+            data[key] = metric['callback'](jetson, metric['name'])
+        with self._lock:
+            if jetson.interval != self._interval:
+                self._resize(jetson.interval)
+            idx = self._count % self.capacity
+            self._time[idx] = timestamp
+            for key, values in data.items():
+                metric = self._metrics[key]
+                metric['max'] = values.get('max', metric['max'])
+                metric['unit'] = values.get('unit', metric['unit'])
+                metric['active'] = values.get('active', metric['active'])
+                value = values.get('value', [0])
+                series = metric['series']
+                # New series are filled without values
+                while len(series) < len(value):
+                    series.append(array('d', [NAN] * self.capacity))
+                for n, ring in enumerate(series):
+                    ring[idx] = value[n] if n < len(value) else NAN
+            self._count += 1
+        # Notify the history is updated
+        for listener in list(self._listeners):
+            listener()
+
+    def attach(self, listener):
+        self._listeners.append(listener)
+
+    def detach(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def meta(self, key):
+        metric = self._metrics[key]
+        return metric['max'], metric['unit'], metric['active']
+
+    def last_time(self):
+        with self._lock:
+            if self._count == 0:
+                return None
+            return self._time[(self._count - 1) % self.capacity]
+
+    def samples(self, key, start):
+        """
+        List of (time, values) from the last sample before **start** to the newest one
+        """
+        samples = []
+        with self._lock:
+            series = self._metrics[key]['series']
+            for count in range(self._count - 1, max(self._count - self.capacity, 0) - 1, -1):
+                idx = count % self.capacity
+                timestamp = self._time[idx]
+                samples.append((timestamp, [ring[idx] for ring in series]))
+                if timestamp < start:
+                    break
+        samples.reverse()
+        return samples
+
+    def columns(self, key, last_column, size, step):
+        """
+        Values for **size** columns of **step** seconds, the last one is **last_column**
+        """
+        first = last_column - size + 1
+        return bucket_values(self.samples(key, first * step), first, size, step)
+
+    @staticmethod
+    def column(timestamp, step):
+        return int(floor(timestamp / step))
+
+    @property
+    def zoom(self):
+        return ZOOM_LEVELS[self._zoom]
+
+    def next_zoom(self):
+        self._zoom = (self._zoom + 1) % len(ZOOM_LEVELS)
+        return self.zoom
+# EOF
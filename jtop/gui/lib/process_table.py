@@ -33,6 +33,18 @@ header = [
     ("GPU MEM", {'clm': 12, 'fn': lambda x: size_to_string(x, 'k')}),
     ("Command", {'clm': 20, 'fn': lambda x: x}),
 ]
+# Per-process GPU utilization (SM), only when available (Thor)
+header_gpu_util = ("GPU%", {'clm': 6, 'fn': lambda x: "{:d}".format(x)})
+GPU_UTIL_ITEM = 11
+
+
+def process_value(process, item):
+    # MEM is the PSS with the per-process memory mode
+    if item == 7 and 'pss' in process[10]:
+        return process[10]['pss']
+    if item == GPU_UTIL_ITEM:
+        return process[GPU_UTIL_ITEM].get('sm', 0)
+    return process[item]
 
 
 class ProcessTable(object):
@@ -40,8 +52,12 @@ class ProcessTable(object):
     def __init__(self, stdscr, jetson):
         self.stdscr = stdscr
         self.jetson = jetson
+        # Item of the process to sort
         self.line_sort = 8
         self.type_reverse = True
+        # Group the processes for container (key c)
+        self.group = False
+        self._groups = {}
 
     def draw(self, pos_y, pos_x, width, height, key, mouse):
         # Plot low bar background line
@@ -49,38 +65,71 @@ class ProcessTable(object):
             self.stdscr.addstr(pos_y, 0, " " * width, NColors.igreen())
         except curses.error:
             return 0
+        if key == ord('c'):
+            self.group = not self.group
+        processes = self.jetson.processes
+        is_pss = any('pss' in process[10] for process in processes if len(process) > 10)
+        # Columns with the item in the process list, GPU% before the command
+        columns = list(enumerate(header))
+        if any(process[GPU_UTIL_ITEM] for process in processes if len(process) > GPU_UTIL_ITEM):
+            columns.insert(-1, (GPU_UTIL_ITEM, header_gpu_util))
         title_counter = 0
-        for idx, (title, info) in enumerate(header):
+        for item, (title, info) in columns:
             try:
                 # Check if pressed
                 if mouse and mouse[1] == pos_y and title_counter <= mouse[0] <= title_counter + info['clm']:
-                    if self.line_sort != idx:
-                        self.line_sort = idx
+                    if self.line_sort != item:
+                        self.line_sort = item
                         self.type_reverse = True
                     else:
                         self.type_reverse = not self.type_reverse
                 # Draw title
-                title = "[{}]".format(title) if idx == self.line_sort else title
+                title = "PSS" if item == 7 and is_pss else title
+                title = "[{}]".format(title) if item == self.line_sort else title
                 self.stdscr.addstr(pos_y, title_counter, title, NColors.igreen() | curses.A_BOLD)
                 title_counter += info['clm']
             except curses.error:
                 break
         # Sort table for selected line
         try:
-            sorted_processes = self.jetson.processes
-            sorted_processes = sorted(sorted_processes, key=lambda x: x[self.line_sort], reverse=self.type_reverse)
+            sorted_processes = processes
+            sorted_processes = sorted(sorted_processes, key=lambda x: process_value(x, self.line_sort), reverse=self.type_reverse)
         except IndexError:
             pass
+        lines = [(None, process) for process in sorted_processes]
+        if self.group:
+            lines = self.group_lines(sorted_processes)
+        table = lines
+        lines = self.thread_lines(table)
+        # Click on a process to expand or collapse its threads
+        if mouse and pos_y < mouse[1] <= pos_y + len(lines):
+            _, process = lines[mouse[1] - pos_y - 1]
+            if process is not None and not isinstance(process, tuple):
+                if process[0] in self.jetson.expanded:
+                    self.jetson.collapse_process(process[0])
+                else:
+                    self.jetson.expand_process(process[0])
+                lines = self.thread_lines(table)
         # Draw all processes
         # Instantiate the number of process variable to avoid an unbound local error if the process table is empty.
         nprocess = 0
-        for nprocess, process in enumerate(sorted_processes):
+        for nprocess, (cgroup, process) in enumerate(lines):
+            if process is None:
+                self.draw_group(pos_y + nprocess + 1, width, cgroup)
+                continue
+            if isinstance(process, tuple):
+                self.draw_thread(pos_y + nprocess + 1, width, process)
+                continue
             # Skip unit size process
             counter = 0
-            for (value, (name, info)) in zip(process, header):
+            for item, (name, info) in columns:
+                color = curses.A_NORMAL
+                # GPU memory growing without a release
+                if item == 8 and process[10].get('gpu', {}).get('leak', False):
+                    color = NColors.red() | curses.A_BOLD
                 # Print all values in a nice view
                 try:
-                    self.stdscr.addstr(pos_y + nprocess + 1, counter, info['fn'](value), curses.A_NORMAL)
+                    self.stdscr.addstr(pos_y + nprocess + 1, counter, info['fn'](process_value(process, item)), color)
                     counter += info['clm']
                 except curses.error:
                     break
@@ -88,4 +137,60 @@ class ProcessTable(object):
             if nprocess > height - 2:
                 break
         return nprocess
+
+    def thread_lines(self, lines):
+        # Threads under each process expanded, the busiest first
+        expanded = self.jetson.expanded
+        if not expanded:
+            return lines
+        threads = self.jetson.threads
+        output = []
+        for cgroup, process in lines:
+            output += [(cgroup, process)]
+            if process is not None and process[0] in expanded:
+                items = sorted(threads.get(process[0], {}).items(), key=lambda x: x[1]['cpu'], reverse=True)
+                output += [(cgroup, (tid, thread)) for tid, thread in items]
+        return output
+
+    def draw_thread(self, pos_y, width, thread):
+        tid, thread = thread
+        line = "  {tid:<7} {name:<16} {state} CPU {cpu:5.1f}% core {core:<3} run queue {delay:5.1f}%".format(
+            tid=tid, name=thread['name'][:16], state=thread['state'], cpu=thread['cpu'], core=thread['last_cpu'], delay=thread['delay'])
+        try:
+            self.stdscr.addstr(pos_y, 0, line[:width - 1], curses.A_DIM)
+        except curses.error:
+            pass
+
+    def group_lines(self, sorted_processes):
+        # The group with the first process sorted is the first, item 12 is the cgroup
+        groups = {}
+        for process in sorted_processes:
+            groups.setdefault(process[12] if len(process) > 12 else '', []).append(process)
+        lines = []
+        for cgroup, processes in groups.items():
+            lines += [(cgroup, None)] + [(cgroup, process) for process in processes]
+        self._groups = groups
+        return lines
+
+    def draw_group(self, pos_y, width, cgroup):
+        container = self.jetson.containers.get(cgroup, {})
+        name = container.get('name', cgroup or 'Host')
+        if 'runtime' in container:
+            name = "{runtime}:{name}".format(runtime=container['runtime'], name=name)
+        info = []
+        if 'cpu' in container:
+            info += ["CPU {cpu:.1f}%".format(cpu=container['cpu'])]
+        if 'memory' in container:
+            info += ["MEM {mem}B".format(mem=size_to_string(container['memory'], 'k'))]
+        gpu = container.get('gpu', sum(process[8] for process in self._groups.get(cgroup, [])))
+        info += ["GPU MEM {gpu}B".format(gpu=size_to_string(gpu, 'k'))]
+        if 'io' in container:
+            read = size_to_string(container['io']['read'] / 1024.0, 'k')
+            write = size_to_string(container['io']['write'] / 1024.0, 'k')
+            info += ["IO R {read}B/s W {write}B/s".format(read=read, write=write)]
+        line = "{name} - {info}".format(name=name, info=" ".join(info))
+        try:
+            self.stdscr.addstr(pos_y, 0, line[:width - 1], NColors.cyan() | curses.A_BOLD)
+        except curses.error:
+            pass
 # EOF
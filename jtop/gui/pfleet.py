@@ -0,0 +1,132 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import curses
+from math import isnan
+from datetime import timedelta
+# Page class definition
+from .jtopgui import Page
+# Graphics elements
+from .lib.colors import NColors
+from .lib.common import strfdelta
+from ..core.fleet import NODE_ONLINE
+
+
+def value_to_string(value, fmt):
+    return "-" if isnan(value) else fmt.format(value)
+
+
+header = [
+    ("NODE", 'name', {'clm': 20, 'fn': lambda x: x}),
+    ("STATUS", 'status', {'clm': 11, 'fn': lambda x: x}),
+    ("TEMP", 'temp', {'clm': 8, 'fn': lambda x: value_to_string(x, "{:.1f}C")}),
+    ("POWER", 'power', {'clm': 9, 'fn': lambda x: value_to_string(x / 1000.0, "{:.1f}W")}),
+    ("CPU%", 'cpu', {'clm': 7, 'fn': lambda x: value_to_string(x, "{:.1f}")}),
+    ("GPU%", 'gpu', {'clm': 7, 'fn': lambda x: value_to_string(x, "{:.1f}")}),
+    ("RAM%", 'ram', {'clm': 7, 'fn': lambda x: value_to_string(x, "{:.1f}")}),
+    ("UPTIME", 'uptime', {'clm': 14, 'fn': lambda x: strfdelta(timedelta(seconds=x), "{days}d {hours}:{minutes}:{seconds}")}),
+    ("MODEL", 'model', {'clm': 30, 'fn': lambda x: x}),
+]
+
+
+def sort_key(node, key):
+    value = node[key]
+    # Nodes without value are always on bottom
+    if isinstance(value, float) and isnan(value):
+        return (0, 0.0)
+    return (1, value)
+
+
+class FLEET(Page):
+    """
+    List of all nodes collected from jtop-aggregator
+    """
+
+    def __init__(self, stdscr, fleet):
+        super(FLEET, self).__init__("FLEET", stdscr, fleet)
+        self.line_sort = 2
+        self.type_reverse = True
+        self.first = 0
+
+    def draw(self, key, mouse):
+        # Screen size
+        height, width, first = self.size_page()
+        nodes = self.jetson.nodes
+        online = [node for node in nodes if node['status'] == NODE_ONLINE]
+        power = sum(node['power'] for node in online if not isnan(node['power']))
+        throttling = sum(1 for node in online if node['throttling'])
+        # Fleet status
+        line = first + 1
+        try:
+            self.stdscr.addstr(line, 0, "Nodes:", curses.A_BOLD)
+            self.stdscr.addstr(line, 7, "{online}/{total} online".format(online=len(online), total=len(nodes)))
+            self.stdscr.addstr(line, 30, "Power:", curses.A_BOLD)
+            self.stdscr.addstr(line, 37, "{power:.1f}W".format(power=power / 1000.0))
+            self.stdscr.addstr(line, 52, "Throttling:", curses.A_BOLD)
+            self.stdscr.addstr(line, 64, str(throttling), NColors.red() | curses.A_BOLD if throttling else curses.A_NORMAL)
+        except curses.error:
+            pass
+        line += 2
+        # Plot header table
+        try:
+            self.stdscr.addstr(line, 0, " " * width, NColors.igreen())
+        except curses.error:
+            return
+        title_counter = 0
+        for idx, (title, _, info) in enumerate(header):
+            try:
+                # Check if pressed
+                if mouse and mouse[1] == line and title_counter <= mouse[0] <= title_counter + info['clm']:
+                    if self.line_sort != idx:
+                        self.line_sort = idx
+                        self.type_reverse = True
+                    else:
+                        self.type_reverse = not self.type_reverse
+                title = "[{}]".format(title) if idx == self.line_sort else title
+                self.stdscr.addstr(line, title_counter, title, NColors.igreen() | curses.A_BOLD)
+                title_counter += info['clm']
+            except curses.error:
+                break
+        # Sort and draw all nodes
+        nodes = sorted(nodes, key=lambda node: sort_key(node, header[self.line_sort][1]), reverse=self.type_reverse)
+        rows = height - line - 3
+        self.first = max(0, min(self.first, len(nodes) - rows))
+        for nrow, node in enumerate(nodes[self.first:self.first + rows]):
+            color = curses.A_NORMAL
+            if node['status'] != NODE_ONLINE:
+                color = NColors.yellow()
+            elif node['throttling']:
+                color = NColors.red()
+            counter = 0
+            for _, name, info in header:
+                try:
+                    self.stdscr.addstr(line + nrow + 1, counter, info['fn'](node[name])[:info['clm'] - 1], color)
+                    counter += info['clm']
+                except curses.error:
+                    break
+
+    def keyboard(self, key):
+        # Scroll the list of nodes
+        if key == curses.KEY_DOWN:
+            self.first += 1
+        elif key == curses.KEY_UP:
+            self.first = max(0, self.first - 1)
+        elif key == curses.KEY_NPAGE:
+            self.first += 10
+        elif key == curses.KEY_PPAGE:
+            self.first = max(0, self.first - 10)
+# EOF
@@ -42,6 +42,21 @@ def gpu_gauge(stdscr, pos_y, pos_x, size, gpu_data, idx):
     basic_gauge(stdscr, pos_y, pos_x, size - 10, data, bar=" ")
 
 
+def residency_gauge(stdscr, pos_y, pos_x, size, residency):
+    # Time in each frequency, from the lowest (blue) to the highest (red) frequency
+    colors = [NColors.iblue(), NColors.icyan(), NColors.igreen(), NColors.iyellow(), NColors.ired()]
+    freq, time = residency['freq'], residency['time']
+    avg = int(sum(value * share for value, share in zip(freq, time)) / 100.0)
+    data = {
+        'name': 'Res',
+        'color': NColors.cyan(),
+        'values': [(share, colors[idx * len(colors) // len(freq)]) for idx, share in enumerate(time)],
+        'mleft': unit_to_string(freq[0], 'k', 'Hz'),
+        'mright': "avg {avg}".format(avg=unit_to_string(avg, 'k', 'Hz')),
+    }
+    basic_gauge(stdscr, pos_y, pos_x, size, data, bar=" ")
+
+
 def compact_gpu(stdscr, pos_y, pos_x, width, jetson):
     line_counter = 0
     # Status all GPUs
@@ -137,6 +152,10 @@ class GPU(Page):
             if 'gpu' in name.lower():
                 sensor = self.jetson.temperature[name]
                 color_temperature(self.stdscr, first + 1, 15, name, sensor)
+        # Time in each frequency of the first GPU with residency
+        residency = [gpu_data['residency'] for gpu_data in self.jetson.gpu.values() if gpu_data.get('residency')]
+        if residency:
+            residency_gauge(self.stdscr, first + 1, width // 2, width // 2 - 2, residency[0])
         # Draw all GPU
         for idx, (gpu_name, gpu_data) in enumerate(self.jetson.gpu.items()):
             chart = self.draw_gpus[gpu_name]['chart']
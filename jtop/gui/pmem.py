@@ -156,6 +156,16 @@ def iram_gauge(stdscr, pos_y, pos_x, size, mem_data):
     stdscr.addstr(pos_y, pos_x + size - 11, label_lfb, curses.A_NORMAL)
 
 
+def paging_info(stdscr, pos_y, pos_x, paging):
+    # A swap storm is highlighted in red
+    swap = paging.get('pswpin', 0.0) + paging.get('pswpout', 0.0)
+    color = NColors.red() if swap > 0 or paging.get('oom_kill', 0) > 0 else curses.A_NORMAL
+    value = "faults {pgfault:.0f}/s major {pgmajfault:.0f}/s swap in {pswpin:.0f}/s out {pswpout:.0f}/s compact {compact_stall:.0f}/s OOM {oom_kill}".format(
+        pgfault=paging.get('pgfault', 0.0), pgmajfault=paging.get('pgmajfault', 0.0), pswpin=paging.get('pswpin', 0.0),
+        pswpout=paging.get('pswpout', 0.0), compact_stall=paging.get('compact_stall', 0.0), oom_kill=paging.get('oom_kill', 0))
+    plot_name_info(stdscr, pos_y, pos_x, "Paging", value, color=color)
+
+
 def compact_memory(stdscr, pos_y, pos_x, width, height, jetson):
     line_counter = 1
     # Draw memory gauge
@@ -280,11 +290,16 @@ class MEM(Page):
         # data gauge
         used = size_to_string(swap['used'], 'k')
         total = size_to_string(swap['size'], 'k')
+        # Compression algorithm and ratio
+        zram = swap.get('zram', {})
+        mleft = "P{prio}".format(prio=swap['prio'])
+        if zram.get('orig'):
+            mleft += " {algorithm} x{ratio:.1f}".format(algorithm=zram.get('algorithm', ''), ratio=zram['ratio'])
         data = {
             'name': path.basename(name),
             'color': NColors.cyan(),
             'values': [(swap.get('used', 0) / swap.get('size', 0) * 100.0, NColors.cyan())],
-            'mleft': "P{prio}".format(prio=swap['prio']),
+            'mleft': mleft,
             'mright': "{used}/{total}".format(used=used, total=total),
         }
         try:
@@ -298,7 +313,9 @@ class MEM(Page):
         total = size_to_string(swap_info['tot'], 'k')
         cached = size_to_string(swap_info['cached'], 'k')
         self.stdscr.addstr(pos_y, pos_x + 1, "SWAP", curses.A_BOLD)
-        self.stdscr.addstr(pos_y, pos_x + 6, "{used}/{total} (Cached {cached})".format(used=used, total=total, cached=cached), NColors.red())
+        effective = size_to_string(swap_info.get('effective', swap_info['tot']), 'k')
+        self.stdscr.addstr(pos_y, pos_x + 6, "{used}/{total} (Cached {cached} - Effective {effective})".format(
+            used=used, total=total, cached=cached, effective=effective), NColors.red())
         # Print only zrams
         _, _, _, size_rows = cpu_grid(self.stdscr, self._zrams.items(), self.print_zram, pos_y + 1, pos_x + 1, size_width=width)
         # swap position
@@ -429,6 +446,9 @@ class MEM(Page):
         if 'IRAM' in self.jetson.memory:
             iram_gauge(self.stdscr, first + height // 2 - 1 + line_counter, 1, width - 22, self.jetson.memory['IRAM'])
             line_counter += 1
+        if self.jetson.memory.get('PAGING'):
+            paging_info(self.stdscr, first + height // 2 - 1 + line_counter, 1, self.jetson.memory['PAGING'])
+            line_counter += 1
         # Draw buttons
         self._button_cache.update(first + height // 2, width - 20, key=key, mouse=mouse)
         self.draw_swap_controller(first + height // 2 + 2, width - 20, key, mouse)
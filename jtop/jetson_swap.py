@@ -20,8 +20,9 @@ import os
 import sys
 import argparse
 from .terminal_colors import bcolors
-from .core.memory import MemoryService, read_swapon
+from .core.memory import MemoryService, read_swapon, zram_set, zram_deactivate, ZRAM_PRIORITY
 from .core.common import get_var
+from .core.exceptions import JtopException
 # Version match
 VERSION_RE = re.compile(r""".*__version__ = ["'](.*?)['"]""", re.S)
 COPYRIGHT_RE = re.compile(r""".*__copyright__ = ["'](.*?)['"]""", re.S)
@@ -37,6 +38,10 @@ def main():
     parser.add_argument('-a', '--auto', dest="auto", help='Enable swap on boot', action="store_true", default=False)
     parser.add_argument('-t', '--status', dest="status", help='Check if the swap is currently active', action="store_true", default=False)
     parser.add_argument('--off', dest="off", help='Switch off the swap', action="store_true", default=False)
+    parser.add_argument('-z', '--zram', dest="zram", help='Create (or resize with --device) a zram swap compressed in RAM', action="store_true", default=False)
+    parser.add_argument('--device', dest="device", help='zram device, like zram0', type=str, default=None)
+    parser.add_argument('--algorithm', dest="algorithm", help='zram compression algorithm, like lz4 or zstd', type=str, default=None)
+    parser.add_argument('-p', '--prio', dest="priority", help='zram swap priority', type=int, default=ZRAM_PRIORITY)
     # Parse arguments
     args = parser.parse_args()
     # Copyrights
@@ -61,6 +66,23 @@ def main():
         print(bcolors.fail("Please run with sudo"))
         parser.print_help(sys.stderr)
         sys.exit(1)
+    # zram swap
+    if args.zram:
+        if args.off:
+            if args.device is None:
+                print(bcolors.fail("Select the zram device with --device"))
+                sys.exit(1)
+            print("Switch off zram {device}".format(device=args.device))
+        try:
+            if args.off:
+                zram_deactivate(args.device)
+            else:
+                device = zram_set(args.size, args.algorithm, args.priority, args.device)
+                print("zram {device} [{size}GB] - priority={prio}".format(device=device, size=args.size, prio=args.priority))
+        except JtopException as e:
+            print(bcolors.fail(str(e)))
+            sys.exit(1)
+        sys.exit(0)
     # Define Memory Service
     memory_service = MemoryService
     # Path swap
@@ -16,23 +16,28 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import os
 import re
 import sys
+import time
 import json
 # from warnings import warn
 from datetime import datetime, timedelta
-from multiprocessing import Event, AuthenticationError
+from multiprocessing import Event
 from threading import Thread
-from .service import JtopManager
+from .service import JTOP_PIPE
 from .core.hardware import get_platform_variables
 from .core.memory import Memory
 from .core.fan import Fan
 from .core.gpu import GPU
 from .core.jetson_clocks import JetsonClocks
 from .core.nvpmodel import NVPModel
-from .core.common import compare_versions, get_var, get_local_interfaces, status_disk
+from .core.observer import ObserverWorker, POLICY_COALESCE, POLICY_DROP
+from .core.stream import StreamConnection, JTOP_PORT
+from .core.common import compare_versions, get_key, get_var, get_local_interfaces, status_disk
 from .core.jetson_libraries import get_libraries, get_cuda, get_opencv
 from .core.exceptions import JtopException
+from .core.threads import threads_lease
 # Fix connection refused for python 2.7
 try:
     FileNotFoundError
@@ -48,6 +53,9 @@ if sys.version_info[0] == 2:
 logger = logging.getLogger(__name__)
 # Gain timeout lost connection
 TIMEOUT_GAIN = 3
+# Time to live (in seconds) of properties read from the client
+DISK_TTL = 10.0
+LOCAL_INTERFACES_TTL = 30.0
 # Version match
 VERSION_RE = re.compile(r""".*__version__ = ["'](.*?)['"]""", re.S)
 
@@ -62,21 +70,71 @@ class DateTimeEncoder(json.JSONEncoder):
             return super().default(z)
 
 
+def connect_service(broadcaster, remote=False):
+    """
+    Connect to the jtop service or to a remote stream, all errors are raised as :class:`JtopException`
+    """
+    if remote:
+        try:
+            broadcaster.connect()
+        except (OSError, EOFError) as e:
+            raise JtopException("I can't connect to the remote jtop service: {error}".format(error=e))
+    else:
+        try:
+            broadcaster.connect()
+        except FileNotFoundError as e:
+            if e.errno == 2 or e.errno == 111:  # Message error: 'No such file or directory' or 'Connection refused'
+                raise JtopException("The jtop.service is not active. Please run:\nsudo jtop --install-service")
+            elif e.errno == 13:  # Message error: 'Permission denied'
+                raise JtopException("I can't access jtop.service.\nPlease logout or reboot this board.")
+            else:
+                raise FileNotFoundError(e)
+        except ConnectionRefusedError as e:
+            if e.errno == 111:  # Connection refused
+                # When server is off but socket files exists in /run
+                raise JtopException("The jtop.service is not active. Please run:\nsudo jtop --install-service")
+            else:
+                raise ConnectionRefusedError(e)
+        except PermissionError as e:
+            if e.errno == 13:  # Permission denied
+                raise JtopException("I can't access jtop.service.\nPlease logout or reboot this board.")
+            else:
+                raise PermissionError(e)
+        except EOFError:
+            raise JtopException("The jtop.service closed the connection")
+
+
 class jtop(Thread):
     """
     This class control the access to your board, from here you can control your
     NVIDIA Jetson board or read the jetson_clocks status or change the nvp model.
     """
 
-    def __init__(self, interval=1.0):
+    def __init__(self, interval=1.0, host=None, port=JTOP_PORT, token=None, tls=None):
         """
         When you initialize your jtop you can setup a communication speed **interval**,
         if there is another jtop running this speed will be not used.
 
         When jtop is started you can read the server speed in **interval** property.
 
+        With **host** jtop connect to the remote stream of a jtop service, in this case **interval**
+        is the rate you receive the stats from the service.
+
+        .. code-block:: python
+
+            with jtop(host='192.168.1.10', token='secret') as jetson:
+                print(jetson.stats)
+
         :param interval: Interval to setup the jtop speed (in seconds), defaults to 1.0
         :type interval: float, optional
+        :param host: Address of a remote jtop service or path of a jtop relay, defaults to None (local service or :code:`JTOP_RELAY`)
+        :type host: str, optional
+        :param port: Port of the remote jtop service, defaults to 9870
+        :type port: int, optional
+        :param token: Token to authenticate with the remote jtop service, defaults to None
+        :type token: str, optional
+        :param tls: TLS context for the remote connection, see :func:`~jtop.core.stream.client_ssl_context`, defaults to None
+        :type tls: ssl.SSLContext, optional
         """
         # Initialize Thread super class
         super(jtop, self).__init__()
@@ -88,21 +146,39 @@ class jtop(Thread):
         self._running = False
         # Load interval
         self._interval = float(interval)
-        # Initialize observer
-        self._observers = set()
+        self._server_interval = 0.0
+        # Initialize observer, each observer run in its own worker
+        self._observers = {}
+        # Observers of the events sent immediately from the service
+        self._event_observers = {}
         # Stats read from service
         self._stats = {}
-        # Read stats
-        JtopManager.register('get_queue')
-        JtopManager.register("sync_data")
-        JtopManager.register('sync_event')
-        # Initialize broadcaster manager
-        self._broadcaster = JtopManager()
+        # Cache for properties read from the client
+        self._cache = {}
+        # Processes expanded, the subscription is renewed every half lease
+        self._expanded = set()
+        self._expanded_renew = 0.0
+        # Inside a container connect to the jtop relay
+        if host is None:
+            host = os.getenv('JTOP_RELAY')
+        # Remote connection, a path is the Unix socket of a jtop relay
+        self._remote = host is not None
+        relay = self._remote and host.startswith('/')
         # Initialize board variable
         self._board = {}
-        self._thread_libraries = Thread(target=self._load_jetson_libraries, args=[])
-        self._thread_libraries.daemon = True
-        self._thread_libraries.start()
+        if self._remote:
+            address = host if relay else (host, port)
+            self._broadcaster = StreamConnection(address, interval=self._interval, token=token, ssl_context=tls)
+        else:
+            # The local service is authenticated with a key from the jetson-stats version
+            self._broadcaster = StreamConnection(JTOP_PIPE, interval=self._interval, token=get_key())
+        self._broadcaster.on_event = self._event
+        # Platform and libraries of a remote board are sent from its service
+        self._thread_libraries = None
+        if not self._remote or relay:
+            self._thread_libraries = Thread(target=self._load_jetson_libraries, args=[])
+            self._thread_libraries.daemon = True
+            self._thread_libraries.start()
         # Initialize gpu info
         self._gpu = GPU()
         # Initialize memory controller
@@ -132,7 +208,7 @@ class jtop(Thread):
         # Loaded from script
         logger.debug("Loaded jetson_variables variables")
 
-    def attach(self, observer):
+    def attach(self, observer, queue_size=1, policy=POLICY_COALESCE, max_rate=None, snapshot=False):
         """
         Attach an observer to read the status of jtop. You can add more observer that you want.
 
@@ -145,12 +221,41 @@ class jtop(Thread):
 
         The input of your callback will be the jetson object.
 
-        To detach a function, please look :func:`~detach`
+        Every observer run in its own thread with a bounded queue, a slow observer (like an HTTP push or a disk write)
+        does not delay the reception of new data or the other observers. When the queue is full:
+
+        * **coalesce** - Only the latest snapshot is kept (default), the queue size is not used
+        * **drop** - The oldest snapshot in queue is dropped
+
+        If you need each snapshot and not the latest status, set **snapshot** to True and your observer
+        will receive the raw snapshot dictionary, the same available in :func:`~json`
+
+        .. code-block:: python
+
+            def write_snapshot(stats):
+                pass
+
+            jetson.attach(write_snapshot, queue_size=10, policy='drop', max_rate=0.5, snapshot=True)
+
+        To detach a function, please look :func:`~detach`, the status of each observer is available in :py:attr:`observers`
 
         :param observer: The function to call
         :type observer: function
+        :param queue_size: Maximum number of snapshots waiting for this observer with the *drop* policy, defaults to 1.
+            With *coalesce* only the latest snapshot is waiting
+        :type queue_size: int, optional
+        :param policy: Policy when the queue is full: *coalesce* or *drop*, defaults to 'coalesce'
+        :type policy: str, optional
+        :param max_rate: Maximum number of calls per second, defaults to None (no limit)
+        :type max_rate: float, optional
+        :param snapshot: Send to observer the raw snapshot instead of jetson object, defaults to False
+        :type snapshot: bool, optional
+        :raises ValueError: Wrong policy, queue size or rate
         """
-        self._observers.add(observer)
+        # Replace old worker if the observer is attached again
+        self.detach(observer)
+        self._observers[observer] = ObserverWorker(observer, self, queue_size=queue_size, policy=policy,
+                                                   max_rate=max_rate, snapshot=snapshot, on_error=self._observer_error)
 
     def detach(self, observer):
         """
@@ -161,7 +266,80 @@ class jtop(Thread):
         :param observer:  The function to detach
         :type observer: function
         """
-        self._observers.discard(observer)
+        worker = self._observers.pop(observer, None)
+        if worker is not None:
+            worker.close()
+
+    def attach_event(self, observer, queue_size=10, policy=POLICY_DROP):
+        """
+        Attach an observer to the events sent immediately from the jtop service, without waiting the next snapshot.
+        Like :func:`~attach` the observer runs in its own thread with a bounded queue.
+
+        The observer receive a dictionary with the event, now are available:
+
+        * **pressure** - A Pressure Stall Information trigger, see :py:attr:`~pressure`
+
+        .. code-block:: python
+
+            def on_event(event):
+                if 'pressure' in event:
+                    print("Memory pressure", event['pressure'])
+
+            jetson.attach_event(on_event)
+
+        :param observer: The function to call
+        :type observer: function
+        :param queue_size: Maximum number of events waiting for this observer with the *drop* policy, defaults to 10
+        :type queue_size: int, optional
+        :param policy: Policy when the queue is full: *coalesce* or *drop*, defaults to 'drop'
+        :type policy: str, optional
+        :raises ValueError: Wrong policy or queue size
+        """
+        self.detach_event(observer)
+        self._event_observers[observer] = ObserverWorker(observer, self, queue_size=queue_size, policy=policy,
+                                                         snapshot=True, on_error=self._observer_error)
+
+    def detach_event(self, observer):
+        """
+        Detach an observer of the events, see :func:`~attach_event`
+
+        :param observer:  The function to detach
+        :type observer: function
+        """
+        worker = self._event_observers.pop(observer, None)
+        if worker is not None:
+            worker.close()
+
+    def _event(self, event):
+        for worker in list(self._event_observers.values()):
+            worker.push(event)
+
+    @property
+    def observers(self):
+        """
+        Status of all observers attached, for each observer is available a dictionary:
+
+        =========== =================== ====================================================
+        Name        Type                Description
+        =========== =================== ====================================================
+        calls       :py:class:`int`     Number of calls completed
+        dropped     :py:class:`int`     Number of snapshots dropped or coalesced
+        queue       :py:class:`int`     Number of snapshots waiting in queue
+        duration    :py:class:`float`   Duration last call in **seconds**
+        latency     :py:class:`float`   Time from snapshot received to end last call in **seconds**
+        latency_max :py:class:`float`   Max latency in **seconds**
+        =========== =================== ====================================================
+
+        :return: Dictionary with observer as key and its status
+        :rtype: dict
+        """
+        return {observer: worker.get_stats() for observer, worker in list(self._observers.items())}
+
+    def _observer_error(self, error):
+        # Same behavior of an exception in reader thread, raised in ok()
+        self._error = error
+        self._running = False
+        self._trigger.set()
 
     def restore(self, max_counter=10):
         """
@@ -281,6 +459,7 @@ class jtop(Thread):
         min        :py:class:`int`  Minimum frequency of the core in **kHz** :sup:`A`
         max        :py:class:`int`  Maximum frequency of the core in **kHz** :sup:`A`
         cur        :py:class:`int`  Current frequency of the core in **kHz**
+        histogram  :py:class:`dict` Clock rate sampled since the last update :sup:`B`
         ========== ================ ==============================================
 
         .. note::
@@ -288,6 +467,10 @@ class jtop(Thread):
                 Note **A**
                     Some engines doesn't have a *min* and *max* frequency
 
+                Note **B**
+                    The clock rate is sampled every 100ms, the histogram has two lists: *freq* with all clock rates
+                    in **kHz** and *time* with the percentage of samples at each clock rate
+
         :return: Dictionary of all active engines
         :rtype: dict
         """
@@ -369,7 +552,8 @@ class jtop(Thread):
         :rtype: dict
         """
         # Wait thread end
-        self._thread_libraries.join()
+        if self._thread_libraries is not None:
+            self._thread_libraries.join()
         # Return board status
         return self._board
 
@@ -388,6 +572,7 @@ class jtop(Thread):
         profile       :py:class:`str`     Fan Profile, read :py:func:`~jtop.core.fan.Fan.all_profiles()`
         governor      :py:class:`str`     (Jetson with JP5+) Governor fan
         control       :py:class:`str`     (Jetson with JP5+) Type of controller
+        closed_loop   :py:class:`dict`    *(Optional)* Status of the jtop closed loop: temperature, error, duty
         ============= =================== ====================================================
 
         If you are working with Jetpack 5 or higher, the fan profile map nvfancontrol `nvfancontrol <https://docs.nvidia.com/jetson/archives/r34.1/DeveloperGuide/text/SD/PlatformPowerAndPerformance/JetsonOrinNxSeriesAndJetsonAgxOrinSeries.html#fan-profile-control>`_
@@ -407,6 +592,9 @@ class jtop(Thread):
                     # Set new speed
                     jetson.fan.speed = 90
 
+        The jtop service can also drive the fan with a closed loop controller, profile **closed_loop**,
+        following a curve or a PID on the temperature, read :py:func:`~jtop.core.fan.Fan.set_curve()`
+
         Full documentation on :py:class:`~jtop.core.fan.Fan`
 
         :return: Status Fan
@@ -617,6 +805,7 @@ class jtop(Thread):
         * **SWAP** - It is a dictionary with all information about SWAP
         * **EMC** - It is a dictionary with EMC data, not in all boards this data is available
         * **IRAM** - It is a dictionary with SWAP data, not in all boards this data is available
+        * **PAGING** - It is a dictionary with the paging rates from :code:`/proc/vmstat`
 
         You can also use this property to set a new swap, deactivate or clear cache,
         read all methods available :py:class:`~jtop.core.memory.Memory`
@@ -658,8 +847,22 @@ class jtop(Thread):
         used       :py:class:`int`     Total used SWAP in **KB**
         cached     :py:class:`int`     Cached RAM in **KB**
         table      :py:class:`dict`    Dictionary with all swap available :sup:`B`
+        effective  :py:class:`int`     Memory added from all swaps in **KB**, a zram swap adds its size less the RAM used to store it
         ========== =================== ====================================================
 
+        *PAGING* (empty for the first update)
+
+        ============= =================== ====================================================
+        Name          Type                Description
+        ============= =================== ====================================================
+        pgfault       :py:class:`float`   Page faults per second
+        pgmajfault    :py:class:`float`   Major page faults per second
+        pswpin        :py:class:`float`   Pages swapped in per second
+        pswpout       :py:class:`float`   Pages swapped out per second
+        compact_stall :py:class:`float`   Compaction stalls per second
+        oom_kill      :py:class:`int`     Processes killed from the OOM killer since the last update
+        ============= =================== ====================================================
+
         *EMC* (if available on your device)
 
         ========== =================== ====================================================
@@ -670,6 +873,7 @@ class jtop(Thread):
         cur        :py:class:`int`     Current working frequency in **kHz**
         max        :py:class:`int`     Max EMC frequency usable in **kHz**
         min        :py:class:`int`     Min EMC frequency usable in **kHz**
+        residency  :py:class:`dict`    *(Optional)* Time in each frequency since the last update, like the GPU residency
         ========== =================== ====================================================
 
         *IRAM* (if available on your device)
@@ -708,6 +912,26 @@ class jtop(Thread):
                 size       :py:class:`int`     Size partition in **KB**
                 used       :py:class:`int`     Used part of this partition in **KB**
                 boot       :py:class:`bool`    Check if this swap start on boot
+                zram       :py:class:`dict`    *(Only zram)* Status zram device :sup:`C`
+                ========== =================== ==============================================
+
+            Note **C**
+                Status of a zram device from :code:`mm_stat` and :code:`bd_stat`, all sizes in **KB**
+
+                ========== =================== ==============================================
+                Name       Type                Description
+                ========== =================== ==============================================
+                algorithm  :py:class:`str`     Compression algorithm
+                algorithms :py:class:`list`    Compression algorithms available
+                disksize   :py:class:`int`     Size of the device
+                orig       :py:class:`int`     Data stored, uncompressed
+                compr      :py:class:`int`     Data stored, compressed
+                mem_used   :py:class:`int`     RAM used, with the allocator overhead
+                mem_limit  :py:class:`int`     Max RAM usable, 0 without limit
+                same_pages :py:class:`int`     Pages with the same value in all bytes (not stored)
+                huge_pages :py:class:`int`     Pages not compressible
+                ratio      :py:class:`float`   Compression ratio
+                bd         :py:class:`dict`    *(Optional)* Backing device: *count*, *reads* and *writes* in **KB**
                 ========== =================== ==============================================
 
         :return: memory status
@@ -724,6 +948,7 @@ class jtop(Thread):
 
         * **total** - The aggregate values for all cores of (user, nice, system, idle)
         * **cpu** - a list with a dictionary for each core
+        * **cluster** - for each CPU cluster the list of **cpus** and the average residency of the online cores :sup:`C`
 
         For each core the dictionary is defined:
 
@@ -740,6 +965,7 @@ class jtop(Thread):
         system     :py:class:`float` System percentage utilization :sup:`B`
         idle       :py:class:`float` Idle percentage :sup:`B`
         model      :py:class:`str`   Model core running
+        residency  :py:class:`dict`  Idle and frequency residency from the previous update :sup:`C`
         ========== ================= =======================================
 
         .. note::
@@ -758,6 +984,18 @@ class jtop(Thread):
             Note **B**
                 If a core is offline, this data is not key is not available
 
+            Note **C**
+                The residency dictionary is defined like below, empty on the first update:
+
+                =========== =================== ==============================================
+                Name        Type                Description
+                =========== =================== ==============================================
+                idle        :py:class:`dict`    Percentage of time in each idle state
+                usage       :py:class:`dict`    Entries per second in each idle state
+                freq        :py:class:`dict`    Percentage of time at each frequency in **kHz**
+                transitions :py:class:`float`   *(if available)* Frequency transitions per second
+                =========== =================== ==============================================
+
         .. admonition:: Reference
 
             #. https://docs.kernel.org/admin-guide/pm/cpuidle.html
@@ -790,6 +1028,9 @@ class jtop(Thread):
         7          :py:class:`int`   Memory occupied :sup:`C`
         8          :py:class:`int`   GPU Memory occupied :sup:`D`
         9          :py:class:`str`   Process name
+        10         :py:class:`dict`  Memory breakdown :sup:`G`
+        11         :py:class:`dict`  GPU utilization :sup:`H`
+        12         :py:class:`str`   cgroup of the process, key of :py:attr:`~containers`
         ========== ================= =======================================
 
         .. note::
@@ -842,6 +1083,31 @@ class jtop(Thread):
                     * **Graphic**: Graphic process
                     * **System**: System process (next release)
 
+            Note **G**
+                Empty if the per-process memory mode is disabled, read :py:func:`~set_process_memory`.
+                Values from :code:`/proc/[PID]/smaps_rollup` in **kB**, read every 5 seconds:
+
+                ========== ================= =======================================
+                Name       Type              Description
+                ========== ================= =======================================
+                rss        :py:class:`int`   Resident set size
+                pss        :py:class:`int`   Proportional set size, shared pages split between processes
+                anon       :py:class:`int`   PSS anonymous memory
+                file       :py:class:`int`   PSS file backed memory (libraries, mapped files)
+                shmem      :py:class:`int`   PSS shared memory
+                swap       :py:class:`int`   Memory in swap
+                gpu        :py:class:`dict`  GPU memory trend: *slope* in kB/s, *growth* in kB and *leak*
+                ========== ================= =======================================
+
+                The GPU memory trend uses the last 5 minutes, *leak* is **True** after at least 12 samples when,
+                in the recent half of the trend, the GPU memory never decreases, grows in most of the samples
+                and grows at least 1MB.
+
+            Note **H**
+                Only on Thor, from the NVML process utilization samples, empty if not supported.
+                Utilization in percent of **sm** (streaming multiprocessors), **mem** (memory controller),
+                **enc** (encoder) and **dec** (decoder) since the previous update.
+
         .. admonition:: Reference
 
             #. https://man7.org/linux/man-pages/man5/proc.5.html
@@ -873,6 +1139,7 @@ class jtop(Thread):
         type          :py:class:`str`     Type of GPU (integrated, discrete)
         status        :py:class:`dict`    Status of GPU :sup:`A`
         freq          :py:class:`dict`    Frequency GPU :sup:`B`
+        residency     :py:class:`dict`    *(Optional)* Time in each frequency since the last update :sup:`C`
         power_control :py:class:`dict`    *(Optional)* Type of power control
         ============= =================== ====================================================
 
@@ -903,6 +1170,17 @@ class jtop(Thread):
                 GPC        :py:class:`list`    List GPC frequency in **kHz** (Available for Orin series)
                 ========== =================== ==============================================
 
+            Note **C**
+                The residency is read from devfreq *trans_stat*, the dictionary is empty for the first update
+
+                =========== =================== ==============================================
+                Name        Type                Description
+                =========== =================== ==============================================
+                freq        :py:class:`list`    Frequencies available in **kHz**
+                time        :py:class:`list`    Percentage of time in each frequency
+                transitions :py:class:`float`   *(Optional)* Frequency changes per second
+                =========== =================== ==============================================
+
         :return: current status of your GPU.
         :rtype: GPU
         """
@@ -921,6 +1199,7 @@ class jtop(Thread):
         ============= =================== ====================================================
         rail          :py:class:`dict`    A dictionary with all thermal rails
         tot           :py:class:`dict`    Total estimate board power
+        cap           :py:class:`dict`    *(if enabled)* Power cap status, read :py:func:`~set_power_cap`
         ============= =================== ====================================================
 
         The total power is the **sum of all rails** or
@@ -956,6 +1235,170 @@ class jtop(Thread):
         """  # noqa
         return self._stats['power']
 
+    def set_power_cap(self, cap, window=2.0):
+        """
+        Keep the average total board power under a cap. The jtop service lowers the CPU and GPU
+        max frequencies with a feedback loop, never over the nvpmodel limits and never under the min frequencies.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                # Hold the board under 10W
+                jetson.set_power_cap(10000).result(timeout=2)
+                while jetson.ok():
+                    print(jetson.power['cap'])
+
+        The status in :py:attr:`~power` ``cap`` has the cap, the average power, the headroom (in milliwatt),
+        the frequency level between 0 (min frequency) and 1 (nvpmodel max frequency), the max frequency of each device
+        and ``jetson_clocks`` true while the cap is suspended from jetson_clocks.
+
+        :param cap: Power cap in milliwatt, **None** to remove the cap
+        :type cap: int
+        :param window: Time constant of the average power in seconds, defaults to 2.0
+        :type window: float, optional
+        :return: Job completed when the power cap is set
+        :rtype: ControlJob
+        """
+        return self._controller.put({'power': {'cap': cap, 'window': window}})
+
+    def expand_process(self, pid):
+        """
+        Sample all threads of a process, until :func:`~collapse_process` or the end of this jtop.
+        The service samples only the processes expanded from at least one client,
+        the subscription is renewed automatically and expires when no client is watching.
+        The job fails if the process is not running or the service already expands the max number of processes.
+        On a read only remote stream the subscription lasts at most 30 seconds without a renewal.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                jetson.expand_process(1234)
+                while jetson.ok():
+                    for tid, thread in jetson.threads.get(1234, {}).items():
+                        print(tid, thread['name'], thread['cpu'])
+
+        :param pid: PID of the process
+        :type pid: int
+        :return: Job completed when the subscription is active
+        :rtype: ControlJob
+        """
+        self._expanded.add(int(pid))
+        self._expanded_renew = time.time()
+        return self._controller.put({'threads': {'pids': list(self._expanded), 'lease': self._threads_lease()}})
+
+    def _threads_lease(self):
+        # The subscription is renewed once for each snapshot, the service samples at its own interval
+        return threads_lease(max(self._interval, self._server_interval))
+
+    def collapse_process(self, pid):
+        """
+        Stop to renew the threads subscription of a process, read :func:`~expand_process`
+
+        :param pid: PID of the process
+        :type pid: int
+        """
+        self._expanded.discard(int(pid))
+
+    @property
+    def expanded(self):
+        """
+        PID of all processes expanded from this client
+
+        :return: Processes expanded
+        :rtype: list
+        """
+        return sorted(self._expanded)
+
+    @property
+    def threads(self):
+        """
+        Threads of the processes expanded with :func:`~expand_process`, for each PID a dictionary with all threads (TID).
+        The values are from :code:`/proc/[PID]/task/[TID]/stat` and :code:`schedstat` since the previous update.
+
+        ============= =================== ====================================================
+        Name          Type                Description
+        ============= =================== ====================================================
+        name          :py:class:`str`     Thread name
+        state         :py:class:`str`     State thread, like the state of :py:attr:`~processes`
+        cpu           :py:class:`float`   CPU percent of one core
+        last_cpu      :py:class:`int`     Last CPU where the thread run
+        delay         :py:class:`float`   Percent of time waiting on a run queue
+        ============= =================== ====================================================
+
+        :return: Threads of each process expanded
+        :rtype: dict
+        """
+        return self._stats.get('threads', {})
+
+    @property
+    def containers(self):
+        """
+        Resources used from each container (Docker, containerd, podman, Kubernetes) and from each cgroup with GPU processes.
+        The key is the cgroup v2 path, like */system.slice/docker-<id>.scope*. The counters need cgroup v2,
+        on boards with cgroup v1 there are only the processes and the GPU memory.
+        In the jtop interface press **c** to group the process table for container.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                while jetson.ok():
+                    for cgroup, container in jetson.containers.items():
+                        print(container.get('name', cgroup), container.get('cpu'), container.get('gpu'))
+
+        ============= =================== ====================================================
+        Name          Type                Description
+        ============= =================== ====================================================
+        pids          :py:class:`list`    PID of all processes in the cgroup
+        gpu           :py:class:`int`     GPU memory of all processes in **kB**, from nvmap or NVML
+        runtime       :py:class:`str`     *(Only containers)* docker, containerd, podman, crio or kubernetes
+        id            :py:class:`str`     *(Only containers)* Short container ID
+        name          :py:class:`str`     *(Only containers)* Docker name, otherwise the short ID
+        cpu           :py:class:`float`   CPU percent of one core, from :code:`cpu.stat`
+        throttled     :py:class:`float`   Percent of time throttled from the CPU quota
+        memory        :py:class:`int`     Memory used in **kB**, from :code:`memory.current`
+        pressure      :py:class:`dict`    Memory pressure *some* and *full* avg10 in percent
+        io            :py:class:`dict`    *read* and *write* in bytes/s, from :code:`io.stat`
+        ============= =================== ====================================================
+
+        :return: Resources of each container and cgroup
+        :rtype: dict
+        """
+        return self._stats.get('containers', {})
+
+    @property
+    def energy(self):
+        """
+        Energy of the CPU and GPU rails for each process and each cgroup, in joules, cumulative from the start of the jtop service.
+
+        At every update the energy of each rail with *CPU* or *GPU* in the name (like *VDD_CPU_CV* and *VDD_GPU_SOC*)
+        is split across all processes with their share of the resource: the CPU time for the CPU rails and
+        the GPU utilization (only on Thor, otherwise the GPU memory of the GPU processes) for the GPU rails.
+        A rail with both names is split in equal parts.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                while jetson.ok():
+                    for pid, process in jetson.energy['processes'].items():
+                        print(pid, process['name'], process['total'])
+
+        ============= =================== ====================================================
+        Name          Type                Description
+        ============= =================== ====================================================
+        processes     :py:class:`dict`    For each PID: *name*, *cgroup*, *cpu*, *gpu* and *total* energy
+        cgroups       :py:class:`dict`    Energy of each cgroup, also of the processes closed
+        closed        :py:class:`list`    cgroups without processes, still in *cgroups*
+        unattributed  :py:class:`float`   Energy of the intervals without CPU or GPU processes
+        ============= =================== ====================================================
+
+        A closed process is removed from *processes*, its energy is kept in *cgroups*.
+        A cgroup without processes is kept for 5 minutes. A PID reused from a new process starts from zero.
+
+        :return: Energy of each process and cgroup
+        :rtype: dict
+        """
+        return self._stats.get('energy', {})
+
     @property
     def temperature(self):
         """
@@ -972,8 +1415,13 @@ class jtop(Thread):
         temp          :py:class:`int`     Gets rail voltage in Celsius. *(If offline show -256)*
         max           :py:class:`int`     *(if available)* Gets rail average current limit in Celsius
         crit          :py:class:`int`     *(if available)* Gets rail instantaneous current limit in Celsius
+        slope         :py:class:`float`   *(if online)* Temperature slope in Celsius/s in the last 10s
+        trip          :py:class:`dict`    *(if available)* Next thermal zone trip point over the temperature: type and temp
+        time_to_trip  :py:class:`float`   *(if available)* Seconds to reach the next trip point, only if the temperature is rising
         ============= =================== ====================================================
 
+        For thermal zones **max** and **crit** are the first *passive* and *critical* trip points.
+
         .. note::
 
             all measures are with a 0.5 °C precision margin
@@ -993,6 +1441,104 @@ class jtop(Thread):
         """  # noqa
         return self._stats['temperature']
 
+    @property
+    def throttle(self):
+        """
+        Throttling status. An engine (CPU or GPU) is throttled when is loaded over 80% and
+        the current frequency is lower than 90% of the max frequency.
+
+        ============= =================== ====================================================
+        Name          Type                Description
+        ============= =================== ====================================================
+        active        :py:class:`list`    Engines throttled now
+        events        :py:class:`list`    Last 20 throttle events
+        ============= =================== ====================================================
+
+        Each event has the **engine**, **start** and **end** time (None if still active) and the worst
+        **cur** and **max** frequency with the **ratio** between them.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                while jetson.ok():
+                    if jetson.throttle['active']:
+                        print("Throttled", jetson.throttle['active'])
+
+        :return: Throttle status
+        :rtype: dict
+        """
+        return self._stats.get('throttle', {})
+
+    @property
+    def pressure(self):
+        """
+        `Pressure Stall Information <https://docs.kernel.org/accounting/psi.html>`_ (Linux 4.20 or newer),
+        the share of time where tasks are stalled waiting the CPU, the memory or the IO.
+        On boards with little RAM the memory pressure grows long before the RAM is full.
+
+        For each resource (**cpu**, **memory**, **io**) there are two dictionaries: **some** (at least one task stalled)
+        and **full** (all tasks stalled)
+
+        ============= =================== ====================================================
+        Name          Type                Description
+        ============= =================== ====================================================
+        avg10         :py:class:`float`   Percentage of time stalled in the last 10 seconds
+        avg60         :py:class:`float`   Percentage of time stalled in the last 60 seconds
+        avg300        :py:class:`float`   Percentage of time stalled in the last 300 seconds
+        total         :py:class:`int`     Total stall time in **microseconds**
+        stall         :py:class:`float`   Percentage of time stalled since the last update
+        ============= =================== ====================================================
+
+        The key **events** has the last 20 triggers fired. The service registers kernel triggers
+        (by default memory *some* 300ms and *full* 100ms in a 2s window), each event has the trigger
+        (**resource**, **kind**, **stall** and **window** in milliseconds), the **time** and the averages.
+        Events are also sent immediately to the observers of :func:`~attach_event`.
+
+        :return: Pressure status, empty if not available
+        :rtype: dict
+        """
+        return self._stats.get('pressure', {})
+
+    def set_process_memory(self, enable, interval=5.0):
+        """
+        Enable the per-process memory mode: PSS, swap, anonymous and file memory for all GPU processes
+        and a leak detector on the GPU memory of each process. The mode is stored in the jtop configuration.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                jetson.set_process_memory(True).result(timeout=2)
+                while jetson.ok():
+                    for process in jetson.processes:
+                        if process[10].get('gpu', {}).get('leak'):
+                            print("Leak", process[0], process[9])
+
+        :param enable: Enable or disable the mode
+        :type enable: bool
+        :param interval: Seconds between two reads of each process, defaults to 5.0
+        :type interval: float, optional
+        :return: Job completed when the mode is set
+        :rtype: ControlJob
+        """
+        return self._controller.put({'processes': {'memory': enable, 'interval': interval}})
+
+    def set_pressure_triggers(self, triggers):
+        """
+        Replace the Pressure Stall Information triggers of the jtop service, the triggers are stored in the jtop configuration.
+
+        .. code-block:: python
+
+            with jtop() as jetson:
+                jetson.set_pressure_triggers([{'resource': 'memory', 'kind': 'some', 'stall': 200, 'window': 2000}])
+
+        :param triggers: List of triggers: *resource* (cpu, memory, io), *kind* (some, full),
+            *stall* and *window* (between 500 and 10000) in milliseconds
+        :type triggers: list
+        :return: Job completed when the triggers are registered, it fails with the triggers rejected from the kernel
+        :rtype: ControlJob
+        """
+        return self._controller.put({'pressure': {'triggers': triggers}})
+
     @property
     def local_interfaces(self):
         """
@@ -1003,10 +1549,12 @@ class jtop(Thread):
         * **hostname** - Hostname board
         * **interfaces** - A dictionary with name and IP address for all interfaces listed
 
+        This property is cached and updated every 30 seconds
+
         :return: Local interfaces and hostname
         :rtype: dict
         """
-        return get_local_interfaces()
+        return self._cached('local_interfaces', LOCAL_INTERFACES_TTL, get_local_interfaces)
 
     @property
     def disk(self):
@@ -1018,10 +1566,18 @@ class jtop(Thread):
         * **used** - Disk space used in GB
         * **available_no_root**
 
+        This property is cached and updated every 10 seconds
+
         :return: Disk information
         :rtype: dict
         """
-        return status_disk()
+        return self._cached('disk', DISK_TTL, status_disk)
+
+    def _cached(self, name, ttl, function):
+        now = time.time()
+        if name not in self._cache or now - self._cache[name][0] > ttl:
+            self._cache[name] = (now, function())
+        return self._cache[name][1]
 
     @property
     def uptime(self):
@@ -1044,6 +1600,11 @@ class jtop(Thread):
                 # Send alive message
                 if self._controller.empty():
                     self._controller.put({})
+                # Renew the threads subscription
+                lease = self._threads_lease()
+                if self._expanded and time.time() - self._expanded_renew >= lease / 2:
+                    self._expanded_renew = time.time()
+                    self._controller.put({'threads': {'pids': list(self._expanded), 'lease': lease}})
                 # Read stats from jtop service
                 self._get_data()
         except Exception:
@@ -1080,10 +1641,9 @@ class jtop(Thread):
             self._nvpmodel._update(self._stats['nvp'])
         # Set trigger
         self._trigger.set()
-        # Notify all observers
-        for observer in self._observers:
-            # Call all observer in list
-            observer(self)
+        # Notify all observers, each worker run the observer in its own thread
+        for worker in list(self._observers.values()):
+            worker.push(data)
 
     def _get_configuration(self):
         while True:
@@ -1109,31 +1669,7 @@ class jtop(Thread):
             not active or your user does not have the permission to connect to *jtop.service*
         """
         # Connected to broadcaster
-        try:
-            self._broadcaster.connect()
-        except FileNotFoundError as e:
-            if e.errno == 2 or e.errno == 111:  # Message error: 'No such file or directory' or 'Connection refused'
-                raise JtopException("The jtop.service is not active. Please run:\nsudo jtop --install-service")
-            elif e.errno == 13:  # Message error: 'Permission denied'
-                raise JtopException("I can't access jtop.service.\nPlease logout or reboot this board.")
-            else:
-                raise FileNotFoundError(e)
-        except ConnectionRefusedError as e:
-            if e.errno == 111:  # Connection refused
-                # When server is off but socket files exists in /run
-                raise JtopException("The jtop.service is not active. Please run:\nsudo jtop --install-service")
-            else:
-                raise ConnectionRefusedError(e)
-        except PermissionError as e:
-            if e.errno == 13:  # Permission denied
-                raise JtopException("I can't access jtop.service.\nPlease logout or reboot this board.")
-            else:
-                raise PermissionError(e)
-        except ValueError:
-            # https://stackoverflow.com/questions/54277946/queue-between-python2-and-python3
-            raise JtopException("Mismatch of Python versions between library and service")
-        except AuthenticationError:
-            raise JtopException("Authentication with jetson-stats server failed")
+        connect_service(self._broadcaster, self._remote)
         # Initialize synchronized data and condition
         self._controller = self._broadcaster.get_queue()
         self._sync_data = self._broadcaster.sync_data()
@@ -1154,6 +1690,10 @@ sudo jtop --install-service""".format(
         self._board['hardware'] = init['board']['hardware']
         if 'cpu' in init['board']:
             self._board['cpu'] = init['board']['cpu']
+        # Remote service send its own platform and libraries
+        for name in ['platform', 'libraries']:
+            if name in init['board'] and self._thread_libraries is None:
+                self._board[name] = init['board'][name]
         # Initialize gpu controller
         self._gpu._initialize(self._controller)
         # Initialize memory controller
@@ -1271,9 +1811,15 @@ sudo jtop --install-service""".format(
                 pass
         """
         # Wait thread end
-        self._thread_libraries.join()
+        if self._thread_libraries is not None:
+            self._thread_libraries.join()
         # Switch off broadcaster thread
         self._running = False
+        # Stop all observers
+        for worker in list(self._observers.values()) + list(self._event_observers.values()):
+            worker.close()
+        # Close connection
+        self._broadcaster.close()
 
     def __enter__(self):
         """ Enter function for 'with' statement """
@@ -0,0 +1,198 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import stat
+import time
+from grp import getgrnam
+from threading import Event, Lock
+# Logging
+import logging
+from .service import JTOP_PIPE, JTOP_USER
+from .jtop import connect_service, TIMEOUT_GAIN
+from .core.common import get_key
+from .core.exceptions import JtopException
+from .core.jobs import JOB_ERROR
+from .core.stream import StreamServer, StreamConnection, JTOP_PORT
+# Create logger
+logger = logging.getLogger(__name__)
+# Default Unix socket of the relay
+JTOP_RELAY_PIPE = '/run/jtop-relay.sock'
+# Time to wait before to reconnect to the jtop service
+RELAY_RECONNECT = 2.0
+
+
+class JtopRelay(object):
+    """
+    Share one connection to the jtop service with all jtop clients in a container.
+
+    The relay read each snapshot only once from the service and publish it on a Unix socket,
+    every local client receive the stats at its own rate. The upstream connection runs at the
+    fastest rate requested and control messages are forwarded with the name of the client.
+
+    Clients connect to the relay with :code:`JTOP_RELAY=/run/jtop-relay.sock` or :code:`jtop(host='/run/jtop-relay.sock')`,
+    like :code:`/run/jtop.sock` the socket is readable only from the users of the **group** (jtop by default)
+    """
+
+    def __init__(self, path=JTOP_RELAY_PIPE, interval=1.0, host=None, port=JTOP_PORT, token=None, tls=None, group=JTOP_USER):
+        self._path = path
+        self._group = group
+        self._interval = float(interval)
+        self._host = host
+        self._port = port
+        self._token = token
+        self._tls = tls
+        self._lock = Lock()
+        self._running = Event()
+        self._upstream = None
+        self._upstream_interval = None
+        self._init = None
+        self._server = StreamServer(self, path)
+
+    @property
+    def clients(self):
+        return self._server.clients
+
+    def _rate(self):
+        # Fastest rate requested, clients without rate use the relay default
+        intervals = [client['interval'] for client in self._server.clients if client['interval'] > 0]
+        return min(intervals + [self._interval])
+
+    def _connect(self, interval):
+        remote = self._host is not None
+        if remote:
+            broadcaster = StreamConnection((self._host, self._port), interval=interval, token=self._token, ssl_context=self._tls)
+        else:
+            broadcaster = StreamConnection(JTOP_PIPE, interval=interval, token=get_key(), name='relay')
+        # Forward the jobs status to all clients
+        broadcaster.on_job = self._server.notify
+        # Forward the events to all clients
+        broadcaster.on_event = self._server.event
+        connect_service(broadcaster, remote)
+        controller = broadcaster.get_queue()
+        # Initialize connection
+        while True:
+            controller.put({'interval': interval})
+            data = controller.get(interval * TIMEOUT_GAIN)
+            if 'init' in data:
+                break
+        with self._lock:
+            self._upstream = broadcaster
+            self._upstream_interval = interval
+            self._init = data['init']
+        logger.info("Relay connected to jtop service at {interval}s".format(interval=data['init']['interval']))
+        return broadcaster
+
+    def _disconnect(self):
+        with self._lock:
+            upstream, self._upstream = self._upstream, None
+            self._init = None
+        if upstream is not None:
+            upstream.close()
+
+    def stream_init(self, interval):
+        with self._lock:
+            if self._init is None:
+                return None
+            return dict(self._init)
+
+    def stream_control(self, control, name):
+        if not isinstance(control, dict):
+            return
+        control = {key: value for key, value in control.items() if key not in ['init', 'interval']}
+        with self._lock:
+            upstream = self._upstream
+        if not control:
+            return
+        if upstream is None:
+            if 'job' in control:
+                self._server.notify({'id': control['job'], 'status': JOB_ERROR, 'progress': 1.0, 'error': "Relay not connected"})
+            return
+        logger.info("Relay control from {name}: {control}".format(name=name, control=list(control.keys())))
+        # Attribution for the jtop service log
+        control['client'] = "relay:{name}".format(name=name)
+        upstream.get_queue().put(control)
+
+    def stream_alive(self):
+        pass
+
+    def start(self):
+        self._server.start()
+        # The relay forwards controls to the service, same permission of the jtop socket
+        try:
+            os.chown(self._path, os.getuid(), getgrnam(self._group).gr_gid)
+            # Equivalent permission 660 srw-rw----
+            os.chmod(self._path, stat.S_IREAD | stat.S_IWRITE | stat.S_IWGRP | stat.S_IRGRP)
+        except KeyError:
+            logger.warning("Group {group} does not exist, relay available only for {uid}".format(group=self._group, uid=os.getuid()))
+            os.chmod(self._path, stat.S_IREAD | stat.S_IWRITE)
+        except OSError as e:
+            # Without root the relay cannot change the group of the socket
+            logger.warning("Cannot share relay with group {group}, available only for {uid}: {error}".format(
+                group=self._group, uid=os.getuid(), error=e))
+            os.chmod(self._path, stat.S_IREAD | stat.S_IWRITE)
+        self._running.set()
+
+    def loop_for_ever(self):
+        self.start()
+        try:
+            while self._running.is_set():
+                try:
+                    self._relay()
+                except (JtopException, EOFError, OSError) as e:
+                    logger.warning("Relay lost connection with jtop service: {error}".format(error=e))
+                    self._disconnect()
+                    time.sleep(RELAY_RECONNECT)
+                    continue
+                self._disconnect()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            self.close()
+
+    def _relay(self):
+        # Without clients the service is not kept alive
+        while self._running.is_set() and not self._server.clients:
+            time.sleep(0.1)
+        if not self._running.is_set():
+            return
+        upstream = self._connect(self._rate())
+        controller = upstream.get_queue()
+        sync_data = upstream.sync_data()
+        sync_event = upstream.sync_event()
+        while self._running.is_set() and self._server.clients:
+            # A client want a faster rate, reconnect
+            if self._rate() < self._upstream_interval:
+                logger.info("Relay change rate to {interval}s".format(interval=self._rate()))
+                return
+            # Send alive message, one for all clients
+            if controller.empty():
+                controller.put({})
+            # Read stats from jtop service
+            if not sync_event.is_set():
+                sync_event.wait(self._upstream_interval * TIMEOUT_GAIN)
+            data = sync_data.copy()
+            if not data:
+                raise JtopException("Error connection")
+            sync_event.clear()
+            self._server.publish(data)
+
+    def close(self):
+        self._running.clear()
+        self._disconnect()
+        self._server.close(timeout=1.0)
+# EOF
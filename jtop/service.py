@@ -23,13 +23,14 @@ import re
 import os
 import sys
 import stat
+import time
 import shlex
 import subprocess as sp
 from copy import deepcopy
+from functools import partial
 from grp import getgrnam
 from shutil import copyfile, rmtree
 from multiprocessing import Process, Queue, Event, Value
-from multiprocessing.managers import SyncManager
 from pathlib import Path
 from importlib import metadata
 from typing import Optional, Dict, Any
@@ -38,16 +39,25 @@ from typing import Optional, Dict, Any
 from .core.exceptions import JtopException
 from .core.common import get_key, get_var, get_uptime
 from .core.hardware import get_hardware, get_platform_variables, get_cpu_static_info
+from .core.jetson_libraries import get_libraries, get_cuda, get_opencv
 from .core.command import Command
 from .core.config import Config
+from .core.jobs import ControlExecutor
+from .core.stream import StreamServer, JTOP_PORT, server_ssl_context
 from .core.timer_reader import TimerReader
 from .core.cpu import CPUService
-from .core.memory import MemoryService
-from .core.processes import ProcessService
+from .core.memory import MemoryService, ZRAM_PRIORITY
+from .core.processes import ProcessService, TaskTable, PROCESS_MEMORY_INTERVAL
 from .core.gpu import GPUService
 from .core.engine import EngineService
 from .core.temperature import TemperatureService
+from .core.throttle import ThrottleService
 from .core.power import PowerService
+from .core.power_cap import PowerCap, POWER_CAP_WINDOW
+from .core.energy import EnergyService
+from .core.containers import ContainerService
+from .core.threads import ThreadService, THREADS_LEASE, THREADS_LEASE_MAX, THREADS_LEASE_READ_ONLY
+from .core.pressure import PressureService, PRESSURE_PATH, PRESSURE_TRIGGERS_DEFAULT
 from .core.fan import FanService
 from .core.jetson_clocks import JetsonClocksService
 from .core.nvpmodel import NVPModelService
@@ -90,6 +100,14 @@ JTOP_SERVICE_NAME = 'jtop.service'
 # Gain timeout lost connection
 TIMEOUT_GAIN = 3
 TIMEOUT_SWITCHOFF = 3.0
+# Check of the stream servers without control messages (in seconds)
+STREAM_WATCHDOG = 5.0
+# Wait time for a jetson_clocks or nvpmodel thread in a control job
+JOB_WAIT_THREAD = 0.1
+# Operations of a control message, each one with its own part of the job
+CONTROL_OPERATIONS = ['swap', 'clear_cache', 'gpu', 'fan', 'jc', 'nvp', 'power', 'pressure', 'threads', 'processes', 'config']
+# Controls accepted from a read only remote stream, they don't change the board
+REMOTE_READ_ONLY_CONTROLS = ['job', 'client', 'threads']
 
 
 def overlay_jetsonpower_flat(
@@ -358,40 +376,49 @@ def set_service_permission(group=JTOP_USER):
         sp.call(shlex.split('usermod -a -G {group} {user}'.format(group=group, user=user)))
 
 
-class JtopManager(SyncManager):
+class RemoteStream(object):
+    """
+    Backend of the remote stream, a remote client cannot read platform and libraries from its own system.
+    A read only stream rejects all controls that change the board
+    """
 
-    def __init__(self, authkey=None):
-        if authkey is None:
-            authkey = get_key().encode("utf-8")
-        super(JtopManager, self).__init__(address=(JTOP_PIPE), authkey=authkey)
+    def __init__(self, server, read_only=False):
+        self._server = server
+        self._read_only = read_only
 
-    def get_queue(self):
-        pass
+    def stream_init(self, interval):
+        return self._server.stream_init(interval, remote=True)
 
-    def sync_data(self):
-        pass
+    def stream_control(self, control, name):
+        self._server.stream_control(control, name, read_only=self._read_only)
 
-    def sync_event(self):
-        pass
+    def stream_alive(self):
+        self._server.stream_alive()
 
 
 class JtopServer(Process):
     """
+        All clients are served from a stream server on :code:`/run/jtop.sock` (and optionally on TCP),
+        one thread with a selector push each snapshot to all clients and receive the control messages.
+
         - https://pymotw.com/2/multiprocessing/basics.html
         - https://pymotw.com/2/multiprocessing/communication.html
-        - https://stackoverflow.com/questions/1829116/how-to-share-variables-across-scripts-in-python
-        - https://stackoverflow.com/questions/45342200/how-to-use-syncmanager-lock-or-event-correctly
-        - https://stackoverflow.com/questions/2545961/how-to-synchronize-a-python-dict-with-multiprocessing
         - https://docs.python.org/2.7/reference/datamodel.html
     """
 
-    def __init__(self, force=False):
+    def __init__(self, force=False, remote=None):
         self.force = force
         # Check if running a root
         if os.getuid() != 0:
             raise JtopException("jtop service need sudo to work")
         # Load configuration
         self.config = Config()
+        # Remote stream configuration, disabled by default
+        self._remote = remote if remote is not None else self.config.get('remote', {})
+        self._stream = None
+        self._local_stream = None
+        self._stream_request = 0.0
+        self._board_remote = None
         # Save version jtop
         self._version = deepcopy(get_var(VERSION_RE))
         logger.info("jetson_stats {version} - server loaded".format(version=self._version))
@@ -401,19 +428,13 @@ class JtopServer(Process):
         self.q = Queue()
         # Speed interval
         self.interval = Value('d', -1.0)
-        # Dictionary to sync
+        # Last stats
         self.data = {}
-        # Event lock
-        self.event = Event()
+        # Set when the local stream is ready
+        self._ready = Event()
+        self._gid = None
         # Load super Thread constructor
         super(JtopServer, self).__init__()
-        # Register stats
-        # https://docs.python.org/2/library/multiprocessing.html#using-a-remote-manager
-        JtopManager.register('get_queue', callable=lambda: self.q)
-        JtopManager.register("sync_data", callable=lambda: self.data)
-        JtopManager.register('sync_event', callable=lambda: self.event)
-        # Generate key and open broadcaster
-        self.broadcaster = JtopManager()
         # Load board and platform variables
         data_platform = get_platform_variables()
         logger.info("Running on Python: {python_version}".format(python_version=data_platform['Python']))
@@ -431,14 +452,29 @@ class JtopServer(Process):
         self.engine = EngineService()
         # Setup Temperature service
         self.temperature = TemperatureService()
+        # Throttling detection
+        self.throttle = ThrottleService()
         # Setup Power meter service
         self.power = PowerService()
+        # Power cap with CPU and GPU max frequencies
+        self.power_cap = PowerCap(self.power.get_total_power, "/fake_sys" if os.getenv('JTOP_TESTING', False) else "/sys")
+        # All processes with CPU time and cgroup
+        self.tasks = TaskTable()
+        # Energy of the CPU and GPU rails for each process
+        self.energy = EnergyService(self.tasks)
+        # Containers and cgroups with GPU processes
+        self.containers = ContainerService(self.tasks)
+        # Threads of the processes expanded from the clients
+        self.threads = ThreadService()
+        # Pressure Stall Information with triggers
+        self.pressure = PressureService("/fake_sys/proc/pressure" if os.getenv('JTOP_TESTING', False) else PRESSURE_PATH,
+                                        on_event=self._pressure_event)
         # Initialize Fan
-        self.fan = FanService(self.config)
+        self.fan = FanService(self.config, self.temperature)
         # Initialize jetson_clocks controller
         self.jetson_clocks = JetsonClocksService(self.config, self.fan)
         # Initialize nvpmodel controller
-        self.nvpmodel = NVPModelService(self.jetson_clocks)
+        self.nvpmodel = NVPModelService(self.jetson_clocks, self.config)
         # Initialize JetsonPower provider
         if JetsonPowerProvider is not None:
             try:
@@ -452,9 +488,28 @@ class JtopServer(Process):
         self._timer_reader = TimerReader(self.jtop_stats)
 
     def run(self):
+        # Open local stream, clients can connect while the service is initialized
+        self._local_stream_open()
+        self._ready.set()
+        # Long control operations run in a worker pool
+        self._jobs = ControlExecutor(self._job_notify)
         logger.info("Initialization service")
         # Initialize jetson_fan
         self.fan.initialization()
+        # Restore the power cap
+        power_cap = self.config.get('power_cap', {})
+        if power_cap.get('cap') is not None and self.power_cap.exists():
+            self.power_cap.set_cap(power_cap['cap'], power_cap.get('window', POWER_CAP_WINDOW))
+        # Restore the per-process memory mode
+        process_memory = self.config.get('processes', {})
+        if process_memory.get('memory', False):
+            self.processes.set_memory_mode(True, process_memory.get('interval', PROCESS_MEMORY_INTERVAL))
+        # Register the pressure triggers
+        if self.pressure.exists():
+            try:
+                self.pressure.set_triggers(self.config.get('pressure', PRESSURE_TRIGGERS_DEFAULT))
+            except JtopException as e:
+                logger.error("Pressure triggers not registered: {error}".format(error=e))
         # Run setup
         if self.jetson_clocks.exists():
             # Decode for initialization and reset
@@ -465,132 +520,25 @@ class JtopServer(Process):
             self.power.reset_avg_power()
             # Initialization jetson_clocks
             self.jetson_clocks.initialization(self.nvpmodel, data)
+        # Start remote stream server
+        self._stream_open()
         logger.info("service ready")
         # Initialize variables
         timeout = None
         interval = 1
+        last_message = last_watchdog = time.time()
         try:
             while True:
+                # Restart the stream servers stopped from an error
+                if time.time() - last_watchdog >= STREAM_WATCHDOG:
+                    last_watchdog = time.time()
+                    self._stream_watchdog()
                 try:
-                    # Decode control message
-                    control = self.q.get(timeout=timeout)
-                    # Check if control is not empty
-                    if not control:
-                        continue
-                    # If service read the same init message resend it
-                    if 'init' in control:
-                        self.q.put(control)
-                        continue
-                    logger.debug("control message {control}".format(control=control))
-                    # Manage swap
-                    if 'swap' in control:
-                        swap = control['swap']
-                        if 'command' in swap:
-                            command = swap['command']
-                            if command == 'set':
-                                logger.info("Activating swap in {path}".format(path=swap['path']))
-                                self.memory.swap_set(swap['size'], swap['path'], swap['boot'])
-                            elif command == 'unset':
-                                logger.info("Deactivating swap in {path}".format(path=swap['path']))
-                                self.memory.swap_deactivate(swap['path'])
-                            else:
-                                logger.error("swap command not detected: {command}".format(command=command))
-                        else:
-                            logger.error("no swap command in this message {message}".format(message=swap))
-                    # Clear cache
-                    if 'clear_cache' in control:
-                        # Clear cache
-                        self.memory.clear_cache()
-                        logger.info("Clear cache")
-                    # Set GPU configuration
-                    if 'gpu' in control:
-                        gpu = control['gpu']
-                        if 'command' in gpu:
-                            command = gpu['command']
-                            name = gpu['name']
-                            if command == '3d_scaling':
-                                self.gpu.set_scaling_3D(name, gpu['value'])
-                            elif command == 'railgate':
-                                self.gpu.set_railgate(name, gpu['value'])
-                            else:
-                                logger.error("gpu command not detected: {command}".format(command=command))
-                        else:
-                            logger.error("no gpu command in this message {message}".format(message=gpu))
-                    # Speed Fan and configuration
-                    if 'fan' in control:
-                        fan = control['fan']
-                        if 'command' in fan:
-                            command = fan['command']
-                            if command == 'profile':
-                                name = fan['name']
-                                profile = fan['profile']
-                                logger.info('Fan \"{name}\" set profile {profile}'.format(name=name, profile=profile))
-                                self.fan.set_profile(name, profile)
-                            elif command == 'speed':
-                                name = fan['name']
-                                speed = fan['speed']
-                                idx = fan['idx']
-                                logger.info('Fan \"{name}[{idx}]\" set speed {speed}'.format(name=name, idx=idx, speed=speed))
-                                self.fan.set_speed(name, speed, idx)
-                            else:
-                                logger.error("fan command not detected: {command}".format(command=command))
-                        else:
-                            logger.error("no fan command in this message {message}".format(message=fan))
-                    if 'jc' in control:
-                        jc = control['jc']
-                        # Enable / disable jetson_clocks
-                        if 'enable' in jc:
-                            self.jetson_clocks.set_enable(jc['enable'])
-                        # Update jetson_clocks configuration
-                        if 'boot' in jc:
-                            self.jetson_clocks.set_boot(jc['boot'])
-                        # Clear configuration
-                        if 'clear' in jc:
-                            self.jetson_clocks.clear()
-                    # Decode nvp model
-                    if 'nvp' in control:
-                        nvpmodel = control['nvp']
-                        nvpmodel_id = nvpmodel['id']
-                        nvpmodel_force = nvpmodel['force']
-                        # Set new NV Power Mode
-                        logger.info("Set new NV Power Model ID {id}".format(id=nvpmodel_id))
-                        self.nvpmodel.set_nvpmodel_id(nvpmodel_id, nvpmodel_force)
-                    # Initialize tegrastats speed
-                    if 'interval' in control:
-                        interval = control['interval']
-                        # Run stats
-                        if self._timer_reader.open(interval=interval):
-                            # Set interval value
-                            self.interval.value = interval
-                            # Status start tegrastats
-                            logger.info("jtop timer thread started {interval}ms".format(interval=int(interval * 1000)))
-                        # send configuration board
-                        init = {
-                            'version': self._version,
-                            'board': self.board,
-                            'interval': self.interval.value,
-                            'memory': self.memory.swap_path(),
-                            'fan': self.fan.get_configs(),
-                            'jc': self.jetson_clocks.exists(),
-                        }
-                        # If nvpmodel exist load all modes
-                        if self.nvpmodel.exists():
-                            init['nvpmodel'] = {
-                                'models': self.nvpmodel.get_all_nvpmodels(),
-                                'default': self.nvpmodel.get_default()
-                            }
-                        # Push initialization string
-                        self.q.put({'init': init})
-                    # Manage jetson_clocks
-                    if 'config' in control:
-                        command = control['config']
-                        if command == 'reset':
-                            logger.info('Reset configuration')
-                            self.config.clear()
-                    # Update timeout interval
-                    timeout = TIMEOUT_GAIN if interval <= TIMEOUT_GAIN else interval * TIMEOUT_GAIN
+                    # Decode control message, without messages wake up to check the stream servers
+                    control = self.q.get(timeout=STREAM_WATCHDOG if timeout is None else min(timeout, STREAM_WATCHDOG))
                 except queue.Empty:
-                    self.sync_event.clear()
+                    if timeout is None or time.time() - last_message < timeout:
+                        continue
                     # Reset CPU estimation
                     self.cpu.reset_estimation()
                     # Reset avg temperatures
@@ -598,9 +546,33 @@ class JtopServer(Process):
                     # Close and log status
                     if self._timer_reader.close():
                         logger.info("jtop timer thread close")
+                    # Stop the engines clock sampler
+                    self.engine.close()
                     # Disable timeout
                     timeout = None
                     self.interval.value = -1.0
+                    continue
+                last_message = time.time()
+                # Check if control is not empty
+                if not control:
+                    continue
+                logger.debug("control message {control}".format(control=control))
+                # Control forwarded from a relay
+                if 'client' in control:
+                    logger.info("Control message from {client}".format(client=control['client']))
+                # Run all operations of the control message
+                self._control_operations(control)
+                # Initialize tegrastats speed
+                if 'interval' in control:
+                    interval = control['interval']
+                    # Run stats
+                    if self._timer_reader.open(interval=interval):
+                        # Set interval value
+                        self.interval.value = interval
+                        # Status start tegrastats
+                        logger.info("jtop timer thread started {interval}ms".format(interval=int(interval * 1000)))
+                # Update timeout interval
+                timeout = TIMEOUT_GAIN if interval <= TIMEOUT_GAIN else interval * TIMEOUT_GAIN
         except (KeyboardInterrupt, SystemExit):
             logger.warning("KeyboardInterrupt, SystemExit interrupt")
         except FileNotFoundError:
@@ -610,6 +582,17 @@ class JtopServer(Process):
             # Write error message
             self._error.put(sys.exc_info())
         finally:
+            self._jobs.close()
+            # Stop the fan closed loop
+            self.fan.close()
+            # Remove the power cap and restore the max frequencies
+            self.power_cap.close()
+            # Remove the pressure triggers
+            self.pressure.close()
+            # Close stream servers
+            for stream in [self._local_stream, self._stream]:
+                if stream is not None:
+                    stream.close(timeout=TIMEOUT_SWITCHOFF)
             # Close tegra
             if self._timer_reader.close(timeout=TIMEOUT_SWITCHOFF):
                 logger.info("FORCE jtop timer thread close")
@@ -617,6 +600,300 @@ class JtopServer(Process):
                 self.cpu.reset_estimation()
                 # Reset avg temperatures
                 self.power.reset_avg_power()
+            # Stop the engines clock sampler
+            self.engine.close()
+            self.containers.close()
+            self.threads.close()
+
+    def _control_operations(self, control):
+        # Job of this control, the client is notified when all its operations are completed
+        job = control.get('job')
+        names = [name for name in CONTROL_OPERATIONS if name in control]
+        jobs = self._jobs.split(job if isinstance(job, str) else None, names)
+        # A wrong operation fails only its part of the job
+        for name in names:
+            try:
+                self._control(name, control[name], jobs[name])
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                self._jobs.error(jobs[name], "Wrong {name} message {message}: {error}".format(
+                    name=name, message=control[name], error=repr(e)))
+
+    def _control(self, operation, message, job):
+        # Run one operation of a control message, a wrong message raise KeyError, TypeError, ValueError or AttributeError
+        # Manage swap
+        if operation == 'swap':
+            swap = message
+            if 'command' in swap:
+                command = swap['command']
+                if command == 'set':
+                    logger.info("Activating swap in {path}".format(path=swap['path']))
+                    self._jobs.submit(job, 'swap', partial(self._swap_set, swap['size'], swap['path'], swap['boot']))
+                elif command == 'unset':
+                    logger.info("Deactivating swap in {path}".format(path=swap['path']))
+                    self._jobs.submit(job, 'swap', partial(self._swap_deactivate, swap['path']))
+                elif command == 'zram':
+                    logger.info("Activating zram {size}GB".format(size=swap['size']))
+                    self._jobs.submit(job, 'swap', partial(self.memory.zram_set, swap['size'], swap.get('algorithm'),
+                                                           swap.get('priority', ZRAM_PRIORITY), swap.get('device')))
+                elif command == 'zram_unset':
+                    logger.info("Deactivating zram {device}".format(device=swap['device']))
+                    self._jobs.submit(job, 'swap', partial(self._zram_deactivate, swap['device']))
+                else:
+                    self._jobs.error(job, "swap command not detected: {command}".format(command=command))
+            else:
+                self._jobs.error(job, "no swap command in this message {message}".format(message=swap))
+        # Clear cache
+        elif operation == 'clear_cache':
+            # Clear cache
+            logger.info("Clear cache")
+            self._jobs.submit(job, 'cache', lambda progress: self.memory.clear_cache())
+        # Set GPU configuration
+        elif operation == 'gpu':
+            gpu = message
+            if 'command' in gpu:
+                command = gpu['command']
+                name = gpu['name']
+                if command == '3d_scaling':
+                    self._jobs.run(job, partial(self.gpu.set_scaling_3D, name, gpu['value']))
+                elif command == 'railgate':
+                    self._jobs.run(job, partial(self.gpu.set_railgate, name, gpu['value']))
+                else:
+                    self._jobs.error(job, "gpu command not detected: {command}".format(command=command))
+            else:
+                self._jobs.error(job, "no gpu command in this message {message}".format(message=gpu))
+        # Speed Fan and configuration
+        elif operation == 'fan':
+            fan = message
+            if 'command' in fan:
+                command = fan['command']
+                if command == 'profile':
+                    name = fan['name']
+                    profile = fan['profile']
+                    logger.info('Fan \"{name}\" set profile {profile}'.format(name=name, profile=profile))
+                    self._jobs.run(job, partial(self.fan.set_profile, name, profile))
+                elif command == 'speed':
+                    name = fan['name']
+                    speed = fan['speed']
+                    idx = fan['idx']
+                    logger.info('Fan \"{name}[{idx}]\" set speed {speed}'.format(name=name, idx=idx, speed=speed))
+                    self._jobs.run(job, partial(self.fan.set_speed, name, speed, idx))
+                elif command == 'curve':
+                    name = fan['name']
+                    logger.info('Fan \"{name}\" set curve {curve}'.format(name=name, curve=fan['curve']))
+                    self._jobs.run(job, partial(self.fan.set_curve, name, fan['curve']))
+                else:
+                    self._jobs.error(job, "fan command not detected: {command}".format(command=command))
+            else:
+                self._jobs.error(job, "no fan command in this message {message}".format(message=fan))
+        elif operation == 'jc':
+            # jetson_clocks and nvpmodel change the same clocks, run one operation at time
+            self._jobs.submit(job, 'clocks', partial(self._jetson_clocks, message))
+        # Decode nvp model
+        elif operation == 'nvp':
+            nvpmodel = message
+            # Set new NV Power Mode
+            logger.info("Set new NV Power Model ID {id}".format(id=nvpmodel['id']))
+            self._jobs.submit(job, 'clocks', partial(self._nvpmodel, nvpmodel['id'], nvpmodel['force']))
+        # Power cap
+        elif operation == 'power':
+            power = message
+            logger.info("Set power cap {cap}".format(cap=power.get('cap')))
+            self._jobs.run(job, partial(self._power_cap, power.get('cap'), power.get('window', POWER_CAP_WINDOW)))
+        # Pressure triggers
+        elif operation == 'pressure':
+            pressure = message
+            logger.info("Set pressure triggers {triggers}".format(triggers=pressure.get('triggers')))
+            self._jobs.run(job, partial(self._pressure_triggers, pressure.get('triggers', [])))
+        # Expand the threads of a process, renewed from the client
+        elif operation == 'threads':
+            threads = message
+            self._jobs.run(job, partial(self.threads.subscribe, threads.get('pids', []), threads.get('lease', THREADS_LEASE),
+                                        lease_max=threads.get('lease_max', THREADS_LEASE_MAX)))
+        # Per-process memory mode
+        elif operation == 'processes':
+            processes = message
+            self._jobs.run(job, partial(self._process_memory, processes.get('memory', False),
+                                        processes.get('interval', PROCESS_MEMORY_INTERVAL)))
+        # Manage jetson_clocks
+        elif operation == 'config':
+            command = message
+            if command == 'reset':
+                logger.info('Reset configuration')
+                self._jobs.run(job, self.config.clear)
+            else:
+                self._jobs.error(job, "config command not detected: {command}".format(command=command))
+
+    def _job_notify(self, job):
+        for stream in [self._local_stream, self._stream]:
+            if stream is not None:
+                stream.notify(job)
+
+    def _swap_set(self, size, path, on_boot, progress):
+        if not self.memory.swap_set(size, path, on_boot, progress):
+            raise JtopException("{path} already exist".format(path=path))
+
+    def _swap_deactivate(self, path, progress):
+        if not self.memory.swap_deactivate(path):
+            raise JtopException("{path} does not exist".format(path=path))
+
+    def _zram_deactivate(self, device, progress):
+        self.memory.zram_deactivate(device)
+
+    def _wait_thread(self, is_running):
+        while is_running():
+            time.sleep(JOB_WAIT_THREAD)
+
+    def _jetson_clocks(self, jc, progress):
+        # Enable / disable jetson_clocks
+        if 'enable' in jc:
+            if not self.jetson_clocks.set_enable(jc['enable']):
+                raise JtopException("jetson_clocks is {status}".format(status=self.jetson_clocks.is_running()))
+            self.jetson_clocks.wait()
+        # Update jetson_clocks configuration
+        if 'boot' in jc:
+            self.jetson_clocks.set_boot(jc['boot'])
+        # Clear configuration
+        if 'clear' in jc:
+            self.jetson_clocks.clear()
+
+    def _power_cap(self, cap, window):
+        self.power_cap.set_cap(cap, window)
+        self.config.set('power_cap', {'cap': cap, 'window': window})
+
+    def _pressure_triggers(self, triggers):
+        rejected = self.pressure.set_triggers(triggers)
+        # Only the triggers registered are restored at the next start
+        self.config.set('pressure', self.pressure.get_triggers())
+        if rejected:
+            raise JtopException("Pressure triggers rejected: {rejected}".format(
+                rejected=", ".join("{resource} {kind}: {error}".format(**trigger) for trigger in rejected)))
+
+    def _process_memory(self, enable, interval):
+        self.processes.set_memory_mode(enable, interval)
+        self.config.set('processes', {'memory': enable, 'interval': interval})
+
+    def _pressure_event(self, event):
+        # Events are sent immediately, without waiting the next snapshot
+        for stream in [self._local_stream, self._stream]:
+            if stream is not None:
+                stream.event({'pressure': event})
+
+    def _nvpmodel(self, nvpmodel_id, force, progress):
+        # The power cap reads the new max frequencies as ceilings
+        self.power_cap.pause()
+        try:
+            if self.nvpmodel.set_nvpmodel_id(nvpmodel_id, force) is False:
+                raise JtopException("NV Power Model ID {id} not set".format(id=nvpmodel_id))
+            self._wait_thread(self.nvpmodel.is_running)
+        finally:
+            self.power_cap.resume()
+
+    def _init_message(self, remote=False):
+        # send configuration board
+        init = {
+            'version': self._version,
+            'board': self.board,
+            'interval': self.interval.value,
+            'memory': self.memory.swap_path(),
+            'fan': self.fan.get_configs(),
+            'jc': self.jetson_clocks.exists(),
+        }
+        # If nvpmodel exist load all modes
+        if self.nvpmodel.exists():
+            init['nvpmodel'] = {
+                'models': self.nvpmodel.get_all_nvpmodels(),
+                'default': self.nvpmodel.get_default(),
+                'modes': self.nvpmodel.get_modes(),
+            }
+        # A remote client cannot read platform and libraries from its own system
+        if remote:
+            if self._board_remote is None:
+                cuda_version = get_cuda()
+                opencv_version, opencv_cuda = get_opencv()
+                libraries = {
+                    'CUDA': cuda_version,
+                    'OpenCV': opencv_version,
+                    'OpenCV-Cuda': opencv_cuda,
+                }
+                libraries.update(get_libraries())
+                self._board_remote = {'platform': get_platform_variables(), 'libraries': libraries}
+            init['board'] = dict(self.board, **self._board_remote)
+        return init
+
+    def _local_stream_open(self):
+        self._local_stream = StreamServer(self, JTOP_PIPE, token=get_key(), compress=0)
+        self._local_stream.start()
+        # Change owner
+        os.chown(JTOP_PIPE, os.getuid(), self._gid)
+        # Change mode controller and stats
+        # https://www.tutorialspoint.com/python/os_chmod.htm
+        # Equivalent permission 660 srw-rw----
+        os.chmod(JTOP_PIPE, stat.S_IREAD | stat.S_IWRITE | stat.S_IWGRP | stat.S_IRGRP)
+
+    def _stream_watchdog(self):
+        if self._local_stream is not None and not self._local_stream.is_alive():
+            logger.error("Local stream stopped, restart on {path}".format(path=JTOP_PIPE))
+            self._local_stream.close(timeout=TIMEOUT_SWITCHOFF)
+            self._local_stream_open()
+        if self._stream is not None and not self._stream.is_alive():
+            logger.error("Remote stream stopped, restart")
+            self._stream.close(timeout=TIMEOUT_SWITCHOFF)
+            self._stream = None
+            self._stream_open()
+
+    def _stream_open(self):
+        if not self._remote:
+            return
+        host = self._remote.get('host', '0.0.0.0')
+        port = int(self._remote.get('port', JTOP_PORT))
+        token = self._remote.get('token')
+        read_only = self._remote.get('read_only', False)
+        # Without a token or a client certificate everyone on the network could control the board
+        mutual_tls = bool(self._remote.get('certfile') and self._remote.get('cafile'))
+        if not token and not mutual_tls:
+            if not read_only:
+                logger.error("Remote stream on {host}:{port} not opened, set a token, mutual TLS (certfile and cafile) or read_only".format(
+                    host=host, port=port))
+                return
+            logger.warning("Remote stream on {host}:{port} without authentication, read only".format(host=host, port=port))
+        ssl_context = None
+        if self._remote.get('certfile'):
+            ssl_context = server_ssl_context(self._remote['certfile'], self._remote.get('keyfile'), self._remote.get('cafile'))
+        try:
+            self._stream = StreamServer(RemoteStream(self, read_only=read_only), (host, port), token=token, ssl_context=ssl_context)
+            self._stream.start()
+        except OSError as e:
+            logger.error("Remote stream not available on {host}:{port}: {error}".format(host=host, port=port, error=e))
+            self._stream = None
+
+    def stream_init(self, interval, remote=False):
+        if self.interval.value > 0:
+            return self._init_message(remote=remote)
+        # Ask to the service loop to start the timer, at most once for every second
+        now = time.time()
+        if now - self._stream_request > 1.0:
+            self._stream_request = now
+            self.q.put({'interval': interval if interval > 0 else 1.0})
+        return None
+
+    def stream_control(self, control, name, read_only=False):
+        if not isinstance(control, dict):
+            return
+        # Initialization and speed are managed only from the stream server
+        control = {key: value for key, value in control.items() if key not in ['init', 'interval']}
+        if read_only and any(key not in REMOTE_READ_ONLY_CONTROLS for key in control):
+            logger.warning("Control from {name} rejected, read only stream".format(name=name))
+            self._jobs.error(control.get('job'), "jtop remote stream is read only")
+            return
+        # Short subscriptions for the clients of a read only stream
+        if isinstance(control.get('threads'), dict):
+            control['threads'] = dict(control['threads'], lease_max=THREADS_LEASE_READ_ONLY if read_only else THREADS_LEASE_MAX)
+        if control:
+            logger.info("Remote control from {name}".format(name=name))
+            self.q.put(control)
+
+    def stream_alive(self):
+        self.q.put({})
 
     def start(self):
         # Initialize socket
@@ -631,22 +908,12 @@ class JtopServer(Process):
         # If exist JTOP pipe raise exception
         if os.path.exists(JTOP_PIPE):
             raise JtopException("Service already active! Please check before run it again")
-        # Start broadcaster
-        try:
-            self.broadcaster.start()
-        except EOFError:
-            raise JtopException("Server already alive")
-        # Initialize synchronized data and conditional
-        self.sync_data = self.broadcaster.sync_data()
-        self.sync_event = self.broadcaster.sync_event()
-        # Change owner
-        os.chown(JTOP_PIPE, os.getuid(), gid)
-        # Change mode controller and stats
-        # https://www.tutorialspoint.com/python/os_chmod.htm
-        # Equivalent permission 660 srw-rw----
-        os.chmod(JTOP_PIPE, stat.S_IREAD | stat.S_IWRITE | stat.S_IWGRP | stat.S_IRGRP)
+        self._gid = gid
         # Run the Control server
         super(JtopServer, self).start()
+        # Wait the stream server
+        if not self._ready.wait(TIMEOUT_SWITCHOFF):
+            logger.error("Stream server not ready")
 
     def loop_for_ever(self):
         try:
@@ -665,7 +932,6 @@ class JtopServer(Process):
 
     def close(self):
         self.q.close()
-        self.broadcaster.shutdown()
         # If process is alive wait to quit
         # logger.debug("Status subprocess {status}".format(status=self.is_alive()))
         if self.is_alive():
@@ -784,14 +1050,28 @@ class JtopServer(Process):
         # -- All processes
         total, table = self.processes.get_status()
         data['processes'] = table
+        # -- Containers --
+        self.tasks.update()
+        data['containers'] = self.containers.get_status(table)
+        # -- Threads of the processes expanded --
+        data['threads'] = self.threads.get_status()
         # -- RAM --
         data['mem'] = self.memory.get_status(total)
         # -- Engines --
         data['engines'] = self.engine.get_status()
         # -- Temperature --
         data['temperature'] = self.temperature.get_status()
+        # -- Throttle --
+        data['throttle'] = self.throttle.get_status(data['cpu'], data['gpu'])
+        # -- Pressure --
+        data['pressure'] = self.pressure.get_status()
         # -- Power --
         data['power'] = self.power.get_status()
+        power_cap = self.power_cap.get_status()
+        if power_cap:
+            data['power']['cap'] = power_cap
+        # -- Energy for each process --
+        data['energy'] = self.energy.get_status(data['power'], data['processes'])
         # -- FAN --
         data['fan'] = self.fan.get_status()
 
@@ -812,11 +1092,9 @@ class JtopServer(Process):
     def jtop_stats(self):
         # logger.info("jtop read")
         data = self.jtop_decode()
-        # Pack and send all data
-        # https://stackoverflow.com/questions/6416131/add-a-new-item-to-a-dictionary-in-python
-        self.sync_data.update(data)
-        # Set event for all clients
-        if not self.sync_event.is_set():
-            self.sync_event.set()
+        # Publish to all clients, each snapshot is encoded once for each stream
+        self._local_stream.publish(data)
+        if self._stream is not None:
+            self._stream.publish(data)
 
 # EOF
@@ -0,0 +1,106 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from threading import Event
+from ..core.observer import ObserverWorker, POLICY_DROP
+
+
+def wait_calls(worker, calls, timeout=2.0):
+    start = time.time()
+    while worker.get_stats()['calls'] < calls and time.time() - start < timeout:
+        time.sleep(0.01)
+    return worker.get_stats()
+
+
+def test_slow_observer_does_not_block_push():
+    """A blocked observer must not delay who is pushing new snapshots."""
+    release = Event()
+    worker = ObserverWorker(lambda jetson: release.wait(), None)
+    start = time.time()
+    for idx in range(100):
+        worker.push({'idx': idx})
+    assert time.time() - start < 0.5
+    release.set()
+    worker.close(timeout=1.0)
+    assert worker.get_stats()['dropped'] > 0
+
+
+class BlockedObserver(object):
+    """Observer blocked in the first call until release, to queue snapshots in a known state."""
+
+    def __init__(self):
+        self.entered = Event()
+        self.release = Event()
+        self.received = []
+        self.calls = []
+
+    def __call__(self, stats):
+        self.calls.append(time.time())
+        self.received.append(stats['idx'])
+        self.entered.set()
+        self.release.wait()
+
+    def block(self, worker):
+        worker.push({'idx': 0})
+        assert self.entered.wait(2.0)
+
+
+def test_coalesce_keep_only_latest():
+    observer = BlockedObserver()
+    worker = ObserverWorker(observer, None, snapshot=True)
+    observer.block(worker)
+    for idx in range(1, 10):
+        worker.push({'idx': idx})
+    assert worker.get_stats()['queue'] == 1
+    observer.release.set()
+    stats = wait_calls(worker, 2)
+    worker.close(timeout=1.0)
+    assert observer.received == [0, 9]
+    assert stats['dropped'] == 8
+
+
+def test_drop_oldest_and_rate():
+    observer = BlockedObserver()
+    worker = ObserverWorker(observer, None, queue_size=3, policy=POLICY_DROP, max_rate=20, snapshot=True)
+    observer.block(worker)
+    for idx in range(1, 10):
+        worker.push({'idx': idx})
+    assert worker.get_stats()['queue'] == 3
+    observer.release.set()
+    stats = wait_calls(worker, 4)
+    worker.close(timeout=1.0)
+    assert observer.received == [0, 7, 8, 9]
+    assert stats['dropped'] == 6
+    # Max 20 calls per second
+    intervals = [b - a for a, b in zip(observer.calls[1:], observer.calls[2:])]
+    assert all(interval >= 0.04 for interval in intervals)
+
+
+def test_observer_error():
+    errors = []
+
+    def observer(jetson):
+        raise ValueError("observer error")
+    worker = ObserverWorker(observer, None, on_error=errors.append)
+    worker.push({})
+    start = time.time()
+    while not errors and time.time() - start < 2.0:
+        time.sleep(0.01)
+    worker.close(timeout=1.0)
+    assert errors and errors[0][0] is ValueError
+# EOF
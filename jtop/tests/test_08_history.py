@@ -0,0 +1,72 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from ..gui.lib.history import History, bucket_values
+
+
+class FakeJetson:
+    interval = 1.0
+
+    def attach(self, observer):
+        self.observer = observer
+
+
+def test_bucket_values_min_max_and_hold():
+    samples = [(0.5, [10]), (1.2, [30]), (1.8, [20]), (4.1, [5])]
+    # Column 1 keep min and max, 2 and 3 hold the last value, 4 has its sample
+    assert bucket_values(samples, 0, 5, 1.0) == [([10], [10]), ([20], [30]), ([20], [20]), ([20], [20]), ([5], [5])]
+
+
+def test_history_ring_and_window():
+    jetson = FakeJetson()
+    history = History(jetson, history_time=5.0)
+    values = {'value': [0]}
+    history.register('key', 'name', lambda jetson, name: values)
+    for idx in range(20):
+        values['value'] = [idx]
+        history.update(jetson)
+    samples = history.samples('key', 0)
+    # Only the last samples fit in the ring
+    assert len(samples) == history.capacity
+    assert [value[0] for _, value in samples] == list(range(20 - history.capacity, 20))
+    # The same metric registered again keep its history
+    history.register('key', 'name', lambda jetson, name: values)
+    assert len(history.samples('key', 0)) == history.capacity
+
+
+def test_history_resize_with_interval():
+    jetson = FakeJetson()
+    history = History(jetson, history_time=10.0)
+    values = {'value': [0]}
+    history.register('key', 'name', lambda jetson, name: values)
+    for idx in range(20):
+        values['value'] = [idx]
+        history.update(jetson)
+    assert history.capacity == 11
+    # A slower interval keep the same time with less samples, the newest are kept
+    jetson.interval = 2.0
+    history.update(jetson)
+    assert history.capacity == 6
+    assert [value[0] for _, value in history.samples('key', 0)] == [15, 16, 17, 18, 19, 19]
+    # A faster interval grow the ring without losing samples
+    jetson.interval = 0.5
+    for idx in range(20, 25):
+        values['value'] = [idx]
+        history.update(jetson)
+    assert history.capacity == 21
+    assert [value[0] for _, value in history.samples('key', 0)] == [15, 16, 17, 18, 19, 19, 20, 21, 22, 23, 24]
+# EOF
@@ -0,0 +1,272 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import zlib
+import socket
+import pytest
+from jtop import jtop, JtopException
+from ..service import JtopServer
+from ..core.threads import THREADS_LEASE_READ_ONLY
+from ..core.stream import (encode, decode, pack_frame, FrameReader, StreamServer, StreamConnection, StreamException,
+                           FRAME_SNAPSHOT, FRAME_AUTH, FLAG_COMPRESSED, FRAME_HEADER, FRAME_AUTH_MAX_SIZE,
+                           DECODE_MAX_DEPTH)
+from .conftest import reset_environment, emulate_device
+TOKEN = 'test-token'
+
+
+class FakeBackend(object):
+
+    def __init__(self):
+        self.controls = []
+        self.alive = 0
+
+    def stream_init(self, interval):
+        return {'version': 'test', 'interval': interval}
+
+    def stream_control(self, control, name):
+        self.controls.append(control)
+
+    def stream_alive(self):
+        self.alive += 1
+
+
+def wait_for(check, timeout=3.0):
+    start = time.time()
+    while not check() and time.time() - start < timeout:
+        time.sleep(0.01)
+    return check()
+
+
+@pytest.fixture
+def stream_server():
+    backend = FakeBackend()
+    server = StreamServer(backend, ('127.0.0.1', 0), token=TOKEN)
+    server.start()
+    yield backend, server
+    server.close(timeout=1.0)
+
+
+def test_codec():
+    data = {'cpu': [{'online': True, 'freq': {'cur': 1420800}}, None], 'uptime': 12.5, 'big': 2 ** 70,
+            'neg': -2 ** 40, 'name': 'ü' * 300, 'raw': b'\x00\x01', 1: (1, 2)}
+    expected = dict(data)
+    # Tuples are decoded as list
+    expected[1] = [1, 2]
+    assert decode(encode(data)) == expected
+    with pytest.raises(StreamException):
+        decode(encode(data) + b'N')
+
+
+def test_frame_compressed():
+    data = {'processes': [[idx, 'python3', 0.5, 1024] for idx in range(200)]}
+    frame = pack_frame(FRAME_SNAPSHOT, data, compress=6)
+    size, kind, flags = FRAME_HEADER.unpack_from(frame, 0)
+    assert flags & FLAG_COMPRESSED
+    assert len(frame) < len(encode(data))
+    # Split the frame in small chunks like a slow connection
+    reader = FrameReader()
+    frames = []
+    for idx in range(0, len(frame), 7):
+        reader.feed(frame[idx:idx + 7])
+        frames += list(reader.frames())
+    assert frames == [(FRAME_SNAPSHOT, decode(encode(data)))]
+
+
+@pytest.mark.parametrize("data", [
+    b'm\x00\x00\x00\x01l\x00\x00\x00\x00N',
+    b'l\x00\x00\x00\x01' * (DECODE_MAX_DEPTH + 1) + b'N',
+    b'l\x00\x00\x00\x01' * 100000 + b'N',
+    b'I\x00\x00\x00\x01x',
+    b'u\x05ab',
+    b'x'])
+def test_codec_corrupted(data):
+    with pytest.raises(StreamException):
+        decode(data)
+
+
+def test_frame_decompression_limit():
+    payload = zlib.compress(encode(b'\x00' * (FRAME_AUTH_MAX_SIZE * 4)))
+    reader = FrameReader(FRAME_AUTH_MAX_SIZE)
+    reader.feed(FRAME_HEADER.pack(len(payload), FRAME_SNAPSHOT, FLAG_COMPRESSED) + payload)
+    with pytest.raises(StreamException):
+        list(reader.frames())
+
+
+@pytest.mark.parametrize("frame", [
+    FRAME_HEADER.pack(FRAME_AUTH_MAX_SIZE + 1, FRAME_AUTH, 0),
+    FRAME_HEADER.pack(11, FRAME_AUTH, 0) + b'm\x00\x00\x00\x01l\x00\x00\x00\x00N',
+    pack_frame(FRAME_AUTH, ['digest']),
+    pack_frame(FRAME_AUTH, {'digest': 1, 'interval': 'fast'})])
+def test_stream_corrupted_client(stream_server, frame):
+    backend, server = stream_server
+    sock = socket.create_connection(server.address, timeout=2.0)
+    sock.sendall(frame)
+    # The server close only the wrong client
+    assert wait_for(lambda: not server.clients)
+    sock.close()
+    assert server.is_alive()
+    connection = StreamConnection(server.address, token=TOKEN)
+    connection.connect()
+    assert connection.get_queue().get(timeout=2.0)['init']['version'] == 'test'
+    connection.close()
+
+
+def test_stream_connection(stream_server):
+    backend, server = stream_server
+    connection = StreamConnection(server.address, interval=0.1, token=TOKEN, name='test')
+    connection.connect()
+    init = connection.get_queue().get(timeout=2.0)
+    assert init == {'init': {'version': 'test', 'interval': 0.1}}
+    # Receive a snapshot
+    server.publish({'uptime': 1.0})
+    assert connection.sync_event().wait(2.0)
+    assert connection.sync_data().copy() == {'uptime': 1.0}
+    # Control messages and alive
+    job = connection.get_queue().put({'clear_cache': True})
+    connection.get_queue().put({})
+    assert wait_for(lambda: backend.controls == [{'clear_cache': True, 'job': job.id}])
+    assert wait_for(lambda: backend.alive > 0)
+    assert server.clients[0]['name'].startswith('test@')
+    connection.close()
+    assert wait_for(lambda: not server.clients)
+
+
+def test_stream_client_rate(stream_server):
+    backend, server = stream_server
+    slow = StreamConnection(server.address, interval=10.0, token=TOKEN)
+    slow.connect()
+    fast = StreamConnection(server.address, interval=0.0, token=TOKEN)
+    fast.connect()
+    slow.get_queue().get(timeout=2.0)
+    fast.get_queue().get(timeout=2.0)
+    for idx in range(5):
+        server.publish({'idx': idx})
+        assert wait_for(lambda: fast.sync_data().copy().get('idx') == idx)
+    # The slow client read only the first snapshot
+    assert slow.sync_data().copy() == {'idx': 0}
+    slow.close()
+    fast.close()
+
+
+def test_stream_wrong_token(stream_server):
+    backend, server = stream_server
+    connection = StreamConnection(server.address, token='wrong')
+    connection.connect()
+    with pytest.raises(JtopException):
+        connection.get_queue().get(timeout=2.0)
+    connection.close()
+    # Without token the client cannot connect
+    with pytest.raises(JtopException):
+        StreamConnection(server.address).connect()
+
+
+@pytest.mark.parametrize("nclients", [1, 50])
+def test_stream_fanout(tmp_path, nclients):
+    backend = FakeBackend()
+    server = StreamServer(backend, str(tmp_path / 'jtop.sock'), token=TOKEN, compress=0)
+    server.start()
+    connections = [StreamConnection(server.address, interval=0.0, token=TOKEN) for _ in range(nclients)]
+    try:
+        for connection in connections:
+            connection.connect()
+            connection.get_queue().get(timeout=2.0)
+        # All clients read each snapshot with the same latency
+        for idx in range(10):
+            start = time.time()
+            server.publish({'idx': idx})
+            assert wait_for(lambda: all(c.sync_data().copy().get('idx') == idx for c in connections))
+            assert time.time() - start < 0.5
+    finally:
+        for connection in connections:
+            connection.close()
+        server.close(timeout=1.0)
+
+
+def port_open(address):
+    try:
+        socket.create_connection(address, timeout=0.5).close()
+        return True
+    except OSError:
+        return False
+
+
+class FakeJobs(object):
+
+    def __init__(self):
+        self.errors = []
+
+    def error(self, job_id, message):
+        self.errors.append(job_id)
+
+
+def test_remote_stream_credentials():
+    server = JtopServer.__new__(JtopServer)
+    server._stream = None
+    # Without token or mutual TLS the remote stream is not opened
+    for remote in [{}, {'certfile': 'cert.pem', 'keyfile': 'key.pem'}]:
+        server._remote = dict(remote, host='127.0.0.1', port=0)
+        server._stream_open()
+        assert server._stream is None
+
+
+def test_remote_stream_watchdog():
+    server = JtopServer.__new__(JtopServer)
+    server._local_stream = None
+    server._stream = None
+    server._remote = {'host': '127.0.0.1', 'port': 0, 'token': TOKEN}
+    server._stream_open()
+    stream = server._stream
+    # The stream server thread is stopped
+    stream.close(timeout=1.0)
+    server._stream_watchdog()
+    try:
+        assert server._stream is not stream and server._stream.is_alive()
+    finally:
+        server._stream.close(timeout=1.0)
+
+
+def test_remote_stream_read_only():
+    controls = []
+    server = JtopServer.__new__(JtopServer)
+    server.q = type('Queue', (object,), {'put': lambda self, control: controls.append(control)})()
+    server._jobs = FakeJobs()
+    server.stream_control({'job': 'a', 'fan': {'command': 'speed'}}, 'remote', read_only=True)
+    server.stream_control({'job': 'b', 'threads': {'pids': [1]}}, 'remote', read_only=True)
+    assert server._jobs.errors == ['a']
+    assert controls == [{'job': 'b', 'threads': {'pids': [1], 'lease_max': THREADS_LEASE_READ_ONLY}}]
+
+
+def test_remote_service():
+    device = 'orin'
+    emulate_device(device)
+    # Start jtop Server with remote stream on localhost
+    jtop_server = JtopServer(remote={'host': '127.0.0.1', 'port': 9871, 'token': TOKEN})
+    jtop_server.start()
+    assert jtop_server.is_alive()
+    try:
+        # The remote stream is opened after the service initialization
+        assert wait_for(lambda: port_open(('127.0.0.1', 9871)), timeout=10.0)
+        with jtop(host='127.0.0.1', port=9871, token=TOKEN) as jetson:
+            assert jetson.ok()
+            assert isinstance(jetson.stats, dict)
+            assert 'platform' in jetson.board
+    finally:
+        jtop_server.close()
+        jtop_server.config_clear()
+        reset_environment(device)
+# EOF
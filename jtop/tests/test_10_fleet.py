@@ -0,0 +1,129 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import pytest
+from ..core.stream import StreamServer, encode
+from ..core.fleet import FleetAggregator, FleetNode, parse_node, node_summary, NODE_ONLINE, NODE_ERROR
+from .test_09_stream import FakeBackend, wait_for, TOKEN
+NUM_NODES = 50
+
+
+def fake_stats(idx):
+    return {
+        'uptime': 100.0 + idx,
+        'cpu': {'total': {'idle': 50.0}},
+        'gpu': {'gpu': {'status': {'load': float(idx)}}},
+        'mem': {'RAM': {'tot': 1000, 'used': 250}},
+        'temperature': {
+            'cpu': {'temp': 40.0 + idx, 'online': True},
+            'gpu': {'temp': 30.0, 'online': True, 'max': 25.0 if idx % 10 == 0 else 0.0},
+            'tj': {'temp': -256.0, 'online': False},
+        },
+        'power': {'rail': {}, 'tot': {'power': 1000 * idx}},
+    }
+
+
+@pytest.fixture
+def fake_services():
+    servers = []
+    for idx in range(NUM_NODES):
+        server = StreamServer(FakeBackend(), ('127.0.0.1', 0), token=TOKEN)
+        server.start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.close(timeout=1.0)
+
+
+def test_parse_node():
+    assert parse_node('jetson-01=10.0.0.1:9000') == ('jetson-01', ('10.0.0.1', 9000))
+    assert parse_node('10.0.0.2') == ('10.0.0.2', ('10.0.0.2', 9870))
+    assert parse_node('orin=[fe80::1]:9001') == ('orin', ('fe80::1', 9001))
+
+
+def test_node_summary():
+    summary = node_summary(fake_stats(10))
+    assert summary['temp'] == 50.0 and summary['sensor'] == 'cpu'
+    # The gpu sensor is over its max
+    assert summary['throttling']
+    assert summary['cpu'] == 50.0 and summary['gpu'] == 10.0 and summary['ram'] == 25.0
+    assert not node_summary(fake_stats(1))['throttling']
+
+
+def test_node_history():
+    node = FleetNode('test', None, history_time=100.0, history_step=10.0)
+    node.update(fake_stats(1), 1000.0, 90.0)
+    node.update(fake_stats(5), 1005.0, 90.0)
+    node.update(fake_stats(2), 1012.0, 90.0)
+    # A gap bigger than the history clear all old values
+    assert node.get_history('temp') == [(1000.0, 45.0), (1010.0, 42.0)]
+    node.update(fake_stats(3), 2000.0, 90.0)
+    assert node.get_history('temp') == [(2000.0, 43.0)]
+
+
+def test_fleet(fake_services):
+    nodes = [("node{idx}".format(idx=idx), server.address) for idx, server in enumerate(fake_services)]
+    fleet = FleetAggregator(nodes, interval=0.1, token=TOKEN)
+    batches = []
+    fleet.attach(lambda fleet: batches.append(time.time()))
+    fleet.start()
+    try:
+        assert wait_for(lambda: all(node['status'] == NODE_ONLINE for node in fleet.nodes), timeout=5.0)
+        for idx, server in enumerate(fake_services):
+            server.publish(fake_stats(idx))
+        assert wait_for(lambda: all(node['uptime'] > 0 for node in fleet.nodes), timeout=5.0)
+        # Snapshots are decoded in batch
+        assert len(batches) < NUM_NODES
+        top = fleet.top(3)
+        assert [node['name'] for node in top] == ['node49', 'node48', 'node47']
+        assert sorted(node['name'] for node in fleet.throttling()) == ['node0', 'node10', 'node20', 'node30', 'node40']
+        assert fleet.total_power() == 1000 * sum(range(NUM_NODES))
+        assert fleet.node('node3')['uptime'] == 103.0
+        assert fleet.summary()['online'] == NUM_NODES
+    finally:
+        fleet.close(timeout=1.0)
+
+
+def test_fleet_wrong_token(fake_services):
+    fleet = FleetAggregator([('node', fake_services[0].address)], token='wrong')
+    fleet.start()
+    try:
+        assert wait_for(lambda: fleet.nodes[0]['status'] == NODE_ERROR)
+    finally:
+        fleet.close(timeout=1.0)
+
+
+def test_fleet_ingest():
+    fleet = FleetAggregator()
+    fleet.ingest('exported', fake_stats(7))
+    assert fleet.top(1)[0]['name'] == 'exported'
+    assert fleet.total_power() == 7000
+
+
+def test_fleet_wrong_snapshot():
+    fleet = FleetAggregator()
+    for name in ['wrong', 'corrupted', 'good']:
+        fleet.add_node(name)
+    fleet._nodes['wrong'].pending = (0, encode(['not', 'a', 'snapshot']))
+    fleet._nodes['corrupted'].pending = (0, b'm\x00\x00\x00\x01l\x00\x00\x00\x00N')
+    fleet._nodes['good'].pending = (0, encode(fake_stats(3)))
+    fleet._decode_batch()
+    nodes = {node['name']: node for node in fleet.nodes}
+    assert nodes['wrong']['error'] and nodes['corrupted']['error']
+    assert fleet.node('wrong') == {}
+    assert fleet.node('good') == fake_stats(3)
@@ -0,0 +1,87 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+from threading import Thread, Event
+from ..relay import JtopRelay
+from ..core.stream import StreamServer, StreamConnection
+from .test_09_stream import FakeBackend, wait_for, TOKEN
+
+
+def test_relay(tmp_path):
+    # Fake jtop service
+    backend = FakeBackend()
+    service = StreamServer(backend, ('127.0.0.1', 0), token=TOKEN)
+    service.start()
+    stop = Event()
+
+    def publish():
+        idx = 0
+        while not stop.is_set():
+            service.publish({'idx': idx})
+            idx += 1
+            time.sleep(0.02)
+    publisher = Thread(target=publish)
+    publisher.start()
+    # Relay on a Unix socket
+    path = str(tmp_path / 'relay.sock')
+    relay = JtopRelay(path, interval=1.0, host='127.0.0.1', port=service.address[1], token=TOKEN)
+    thread = Thread(target=relay.loop_for_ever)
+    thread.start()
+    try:
+        assert wait_for(lambda: os.path.exists(path))
+        # Other users cannot send controls through the relay
+        assert wait_for(lambda: os.stat(path).st_mode & 0o007 == 0)
+        clients = [StreamConnection(path, interval=0.05, name='fast'), StreamConnection(path, interval=0.5, name='slow')]
+        for client in clients:
+            client.connect()
+            assert client.get_queue().get(timeout=3.0)['init']['version'] == 'test'
+        # One connection to the service at the fastest rate
+        assert wait_for(lambda: len(service.clients) == 1 and service.clients[0]['interval'] == 0.05)
+        for client in clients:
+            assert client.sync_event().wait(3.0)
+            assert 'idx' in client.sync_data().copy()
+        # Control messages are forwarded with the client name
+        clients[1].get_queue().put({'clear_cache': True})
+        assert wait_for(lambda: backend.controls)
+        assert backend.controls[0]['clear_cache']
+        assert backend.controls[0]['client'].startswith('relay:slow@')
+        for client in clients:
+            client.close()
+        # Without clients the relay close the connection with the service
+        assert wait_for(lambda: not service.clients)
+    finally:
+        relay.close()
+        thread.join(timeout=5.0)
+        stop.set()
+        publisher.join()
+        service.close(timeout=1.0)
+
+
+def test_relay_without_root(tmp_path, monkeypatch):
+    def chown(path, uid, gid):
+        raise PermissionError(1, "Operation not permitted")
+    monkeypatch.setattr(os, 'chown', chown)
+    path = str(tmp_path / 'relay.sock')
+    relay = JtopRelay(path, interval=1.0, host='127.0.0.1', port=1, token=TOKEN, group='root')
+    relay.start()
+    try:
+        # The socket is available only for the owner
+        assert os.stat(path).st_mode & 0o077 == 0
+    finally:
+        relay.close()
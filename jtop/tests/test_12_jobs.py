@@ -0,0 +1,153 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import pytest
+from threading import Event
+from jtop import JtopException
+from ..core.jobs import ControlExecutor, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_ERROR
+from ..core.stream import StreamServer, StreamConnection
+from ..service import JtopServer
+from .test_09_stream import FakeBackend, wait_for, TOKEN
+
+
+class JobBackend(FakeBackend):
+
+    def __init__(self):
+        super(JobBackend, self).__init__()
+        self.server = None
+        self.release = Event()
+        self.jobs = ControlExecutor(lambda job: self.server.notify(job))
+
+    def _swap(self, progress):
+        progress(0.5)
+        if not self.release.wait(5.0):
+            raise JtopException("timeout")
+        return True
+
+    def stream_control(self, control, name):
+        super(JobBackend, self).stream_control(control, name)
+        job = control.get('job')
+        if 'swap' in control:
+            self.jobs.submit(job, 'swap', self._swap)
+        elif 'fan' in control:
+            self.jobs.run(job, lambda: control['fan']['speed'])
+        else:
+            self.jobs.error(job, "command not detected")
+
+
+def test_control_executor():
+    messages = []
+    release = Event()
+    jobs = ControlExecutor(messages.append)
+
+    def slow(progress):
+        progress(0.5)
+        release.wait(5.0)
+    jobs.submit('slow', 'swap', slow)
+    # The next operation on the same resource wait the first one
+    jobs.submit('next', 'swap', lambda progress: 'ok')
+    assert wait_for(lambda: {'id': 'slow', 'status': JOB_RUNNING, 'progress': 0.5} in messages)
+    # Fast operations are not blocked from the long one
+    jobs.run('fast', lambda: 42)
+    assert {'id': 'fast', 'status': JOB_DONE, 'progress': 1.0, 'result': 42} in messages
+    assert not any(msg['id'] == 'next' and msg['status'] == JOB_DONE for msg in messages)
+    release.set()
+    assert wait_for(lambda: {'id': 'next', 'status': JOB_DONE, 'progress': 1.0, 'result': 'ok'} in messages)
+    status = [msg['status'] for msg in messages if msg['id'] == 'slow']
+    assert status == [JOB_QUEUED, JOB_RUNNING, JOB_RUNNING, JOB_DONE]
+    # Errors are reported on the job
+    jobs.run('error', lambda: 1 / 0)
+    assert messages[-1]['status'] == JOB_ERROR
+    jobs.close()
+
+
+def test_control_executor_split():
+    messages = []
+    release = Event()
+    jobs = ControlExecutor(messages.append)
+    parts = jobs.split('job', ['fan', 'swap'])
+    jobs.run(parts['fan'], lambda: 42)
+    jobs.submit(parts['swap'], 'swap', lambda progress: release.wait(5.0))
+    # The first part completed does not complete the job
+    assert all(msg['id'] == 'job' and msg['status'] not in [JOB_DONE, JOB_ERROR] for msg in messages)
+    release.set()
+    assert wait_for(lambda: messages[-1]['status'] == JOB_DONE)
+    assert messages[-1] == {'id': 'job', 'status': JOB_DONE, 'progress': 1.0, 'result': {'fan': 42, 'swap': True}}
+    # One part failed fails the job when all parts are completed
+    parts = jobs.split('fail', ['fan', 'gpu'])
+    jobs.error(parts['gpu'], "gpu command not detected")
+    assert messages[-1]['status'] == JOB_RUNNING
+    jobs.run(parts['fan'], lambda: 42)
+    assert messages[-1] == {'id': 'fail', 'status': JOB_ERROR, 'progress': 1.0, 'error': "gpu: gpu command not detected"}
+    # A job with one operation is not split
+    assert jobs.split('one', ['fan']) == {'fan': 'one'}
+    jobs.close()
+
+
+def test_control_job_stream():
+    backend = JobBackend()
+    server = StreamServer(backend, ('127.0.0.1', 0), token=TOKEN)
+    backend.server = server
+    server.start()
+    connection = StreamConnection(server.address, interval=0.1, token=TOKEN)
+    try:
+        connection.connect()
+        controller = connection.get_queue()
+        controller.get(timeout=2.0)
+        swap = controller.put({'swap': {'command': 'set'}})
+        assert wait_for(lambda: swap.progress == 0.5)
+        assert not swap.done()
+        # A fan command is completed while the swap is running
+        start = time.time()
+        assert controller.put({'fan': {'speed': 80}}).result(timeout=2.0) == 80
+        assert time.time() - start < 1.0
+        backend.release.set()
+        assert swap.result(timeout=2.0) is True
+        with pytest.raises(JtopException):
+            controller.put({'unknown': True}).result(timeout=2.0)
+        # Pending jobs fail when the connection is lost
+        backend.release.clear()
+        swap = controller.put({'swap': {'command': 'set'}})
+        assert wait_for(lambda: swap.progress == 0.5)
+        server.close(timeout=1.0)
+        with pytest.raises(JtopException):
+            swap.result(timeout=2.0)
+    finally:
+        backend.release.set()
+        connection.close()
+        server.close(timeout=1.0)
+        backend.jobs.close()
+
+
+def test_service_wrong_control():
+    server = JtopServer.__new__(JtopServer)
+    messages = []
+    server._jobs = ControlExecutor(messages.append)
+    controls = [{'swap': {'command': 'set'}}, {'nvp': {}}, {'gpu': {'command': 'x'}}, {'fan': 'speed'}, {'threads': [1]}]
+    try:
+        for idx, control in enumerate(controls):
+            server._control_operations(dict(control, job=str(idx)))
+        # Only the job of the wrong message fails
+        assert [(message['id'], message['status']) for message in messages] == [(str(idx), JOB_ERROR) for idx in range(len(controls))]
+        # Each part of a job fails on its own
+        server._control_operations({'job': 'parts', 'nvp': {}, 'config': 'wrong'})
+        assert messages[-1]['id'] == 'parts' and messages[-1]['status'] == JOB_ERROR
+        assert 'nvp:' in messages[-1]['error'] and 'config:' in messages[-1]['error']
+    finally:
+        server._jobs.close()
+# EOF
@@ -0,0 +1,91 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+from jtop import JtopException
+from ..core import dvfs
+from ..core.dvfs import DVFSEngine
+
+
+def write_file(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write("{value}\n".format(value=value))
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    root = str(tmp_path)
+    for idx in range(4):
+        path = os.path.join(root, "devices/system/cpu/cpu{idx}/cpufreq".format(idx=idx))
+        write_file(os.path.join(path, "scaling_min_freq"), 115200)
+        write_file(os.path.join(path, "scaling_max_freq"), 2035200)
+    # Offline CPU
+    os.makedirs(os.path.join(root, "devices/system/cpu/cpu4"))
+    path = os.path.join(root, "class/devfreq/17000000.ga10b")
+    write_file(os.path.join(path, "min_freq"), 306000000)
+    write_file(os.path.join(path, "max_freq"), 918000000)
+    write_file(os.path.join(path, "device/of_node/name"), "ga10b")
+    path = os.path.join(root, "kernel/debug/bpmp/debug/clk/emc")
+    write_file(os.path.join(path, "mrq_rate_locked"), 0)
+    write_file(os.path.join(path, "rate"), 665600000)
+    write_file(os.path.join(path, "max_rate"), 3199000000)
+    return root
+
+
+def test_dvfs_engines(sysfs):
+    engine = DVFSEngine(sysfs)
+    assert engine.exists()
+    assert engine.engines == ['CPU', 'GPU', 'EMC']
+    assert not DVFSEngine(os.path.join(sysfs, 'empty')).exists()
+
+
+def test_dvfs_max_restore(sysfs, tmp_path):
+    engine = DVFSEngine(sysfs)
+    profile = engine.snapshot()
+    engine.apply(engine.max_profile())
+    status = engine.snapshot()
+    assert status['cpu0'] == {'min': 2035200, 'max': 2035200}
+    assert status['17000000.ga10b'] == {'min': 918000000, 'max': 918000000}
+    assert status['EMC'] == {'lock': 1, 'rate': 3199000000}
+    # Restore from a profile on disk
+    path = str(tmp_path / 'profile.json')
+    DVFSEngine.save(path, profile)
+    engine.apply(DVFSEngine.load(path))
+    assert engine.snapshot() == profile
+    # The limits are read again from sysfs
+    assert engine.check(profile)
+    write_file(os.path.join(sysfs, "devices/system/cpu/cpu0/cpufreq/scaling_min_freq"), 2035200)
+    assert not engine.check(profile)
+
+
+def test_dvfs_rollback(sysfs, monkeypatch):
+    engine = DVFSEngine(sysfs)
+    profile = engine.snapshot()
+    write_value = dvfs.write_value
+
+    def fail_gpu(path, value):
+        if 'devfreq' in path and int(value) > 306000000:
+            raise OSError("Invalid argument")
+        write_value(path, value)
+    monkeypatch.setattr(dvfs, 'write_value', fail_gpu)
+    with pytest.raises(JtopException):
+        engine.apply(engine.max_profile())
+    # CPU limits already written are restored
+    assert engine.snapshot() == profile
+# EOF
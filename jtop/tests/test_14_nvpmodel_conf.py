@@ -0,0 +1,200 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+from ..core import nvpmodel
+from ..core.exceptions import JtopException
+from ..core.nvpmodel import (
+    NVPModelService,
+    nvpmodel_conf_decode,
+    nvpmodel_conf_apply,
+    nvpmodel_mode_info,
+    nvpmodel_status_read,
+    nvpmodel_status_write)
+
+NVPMODEL_CONF = """
+# Test configuration
+< PARAM TYPE=FILE NAME=CPU_ONLINE >
+CORE_0 {root}/cpu0/online
+CORE_1 {root}/cpu1/online
+CORE_2 {root}/cpu2/online
+
+< PARAM TYPE=FILE NAME=TPC_POWER_GATING >
+TPC_PG_MASK {root}/tpc_pg_mask
+
+< PARAM TYPE=CLOCK NAME=CPU_A78_0 >
+FREQ_TABLE {root}/cpu0/scaling_available_frequencies
+MAX_FREQ {root}/cpu0/scaling_max_freq
+MIN_FREQ {root}/cpu0/scaling_min_freq
+
+< PARAM TYPE=CLOCK NAME=GPU >
+FREQ_TABLE {root}/gpu/available_frequencies
+MAX_FREQ {root}/gpu/max_freq
+MIN_FREQ {root}/gpu/min_freq
+
+< PARAM TYPE=CLOCK NAME=EMC >
+MAX_FREQ {root}/emc_iso_cap
+
+< POWER_MODEL ID=0 NAME=MAXN >
+CPU_ONLINE CORE_0 1
+CPU_ONLINE CORE_1 1
+CPU_ONLINE CORE_2 1
+TPC_POWER_GATING TPC_PG_MASK 0
+CPU_A78_0 MIN_FREQ 729600
+CPU_A78_0 MAX_FREQ -1
+GPU MIN_FREQ 0
+GPU MAX_FREQ -1
+EMC MAX_FREQ 0
+
+< POWER_MODEL ID=1 NAME=15W >
+CPU_ONLINE CORE_0 1
+CPU_ONLINE CORE_1 1
+CPU_ONLINE CORE_2 0  # Core offline
+TPC_POWER_GATING TPC_PG_MASK 0
+CPU_A78_0 MIN_FREQ 729600
+CPU_A78_0 MAX_FREQ 1113600
+GPU MIN_FREQ 0
+GPU MAX_FREQ 420750000
+EMC MAX_FREQ 2133000000
+
+< PM_CONFIG DEFAULT=1 >
+"""
+
+
+def write_file(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write("{value}\n".format(value=value))
+
+
+def read_file(path):
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+
+@pytest.fixture
+def conf(tmp_path):
+    root = str(tmp_path / 'sys')
+    for idx in range(3):
+        write_file(os.path.join(root, "cpu{idx}/online".format(idx=idx)), 1)
+    write_file(os.path.join(root, "tpc_pg_mask"), 0)
+    write_file(os.path.join(root, "cpu0/scaling_available_frequencies"), "729600 1113600 2201600")
+    write_file(os.path.join(root, "cpu0/scaling_min_freq"), 729600)
+    write_file(os.path.join(root, "cpu0/scaling_max_freq"), 2201600)
+    write_file(os.path.join(root, "gpu/available_frequencies"), "306000000 420750000 1300500000")
+    write_file(os.path.join(root, "gpu/min_freq"), 306000000)
+    write_file(os.path.join(root, "gpu/max_freq"), 1300500000)
+    write_file(os.path.join(root, "emc_iso_cap"), 0)
+    path = str(tmp_path / 'nvpmodel.conf')
+    write_file(path, NVPMODEL_CONF.format(root=root))
+    return path, root
+
+
+def test_nvpmodel_conf_decode(conf):
+    path, root = conf
+    data = nvpmodel_conf_decode(path)
+    assert data['default'] == 1
+    assert data['params']['GPU']['type'] == 'CLOCK'
+    assert data['params']['CPU_ONLINE']['args']['CORE_2'] == os.path.join(root, "cpu2/online")
+    assert [mode['name'] for mode in data['modes']] == ['MAXN', '15W']
+    info = nvpmodel_mode_info(data, data['modes'][1])
+    assert info == {
+        'id': 1, 'name': '15W', 'cpu_online': [1, 1, 0], 'emc': 2133000000, 'tpc_pg_mask': '0',
+        'clocks': {'CPU_A78_0': {'min': 729600, 'max': 1113600}, 'GPU': {'min': 0, 'max': 420750000}}}
+
+
+def test_nvpmodel_conf_apply(conf):
+    path, root = conf
+    data = nvpmodel_conf_decode(path)
+    nvpmodel_conf_apply(data, 1)
+    assert read_file(os.path.join(root, "cpu2/online")) == '0'
+    assert read_file(os.path.join(root, "cpu0/scaling_max_freq")) == '1113600'
+    assert read_file(os.path.join(root, "gpu/max_freq")) == '420750000'
+    assert read_file(os.path.join(root, "emc_iso_cap")) == '2133000000'
+    # -1 is the max frequency in the frequency table
+    nvpmodel_conf_apply(data, 0)
+    assert read_file(os.path.join(root, "cpu2/online")) == '1'
+    assert read_file(os.path.join(root, "cpu0/scaling_max_freq")) == '2201600'
+    assert read_file(os.path.join(root, "gpu/max_freq")) == '1300500000'
+
+
+def test_nvpmodel_conf_apply_order(conf, monkeypatch):
+    path, root = conf
+    data = nvpmodel_conf_decode(path)
+
+    def write_sysfs(path, value):
+        # Like the kernel, a minimum over the maximum is refused
+        folder = os.path.dirname(path)
+        limits = {name: os.path.join(folder, name) for name in ['scaling_min_freq', 'scaling_max_freq']}
+        write_file(path, value)
+        if all(os.path.isfile(limit) for limit in limits.values()):
+            assert int(read_file(limits['scaling_min_freq'])) <= int(read_file(limits['scaling_max_freq']))
+    monkeypatch.setattr(nvpmodel, '_write_sysfs', write_sysfs)
+    # Current minimum over the new maximum
+    write_file(os.path.join(root, "cpu0/scaling_min_freq"), 2201600)
+    nvpmodel_conf_apply(data, 1)
+    assert read_file(os.path.join(root, "cpu0/scaling_min_freq")) == '729600'
+    assert read_file(os.path.join(root, "cpu0/scaling_max_freq")) == '1113600'
+    # New minimum over the current maximum
+    data['modes'][0]['settings'].append(('CPU_A78_0', 'MIN_FREQ', '2201600'))
+    nvpmodel_conf_apply(data, 0)
+    assert read_file(os.path.join(root, "cpu0/scaling_min_freq")) == '2201600'
+
+
+@pytest.mark.parametrize("wrong", [("ID=1 NAME=15W", "ID=3 NAME=15W"), ("DEFAULT=1", "DEFAULT=4")])
+def test_nvpmodel_conf_wrong(conf, wrong):
+    path, root = conf
+    write_file(path, read_file(path).replace(*wrong))
+    with pytest.raises(JtopException):
+        nvpmodel_conf_decode(path)
+
+
+def test_nvpmodel_status(tmp_path):
+    path = str(tmp_path / 'status')
+    write_file(path, "pmode:0000 fmode:quiet")
+    assert nvpmodel_status_read(path) == 0
+    nvpmodel_status_write(path, 2)
+    assert read_file(path) == "pmode:0002 fmode:quiet"
+    assert nvpmodel_status_read(path) == 2
+
+
+class FakeJetsonClocks(object):
+
+    def exists(self):
+        return False
+
+
+def test_nvpmodel_service_native(conf, tmp_path, monkeypatch):
+    path, root = conf
+    status = str(tmp_path / 'status')
+    write_file(status, "pmode:0001 fmode:quiet")
+    monkeypatch.setattr(nvpmodel, 'NVPMODEL_CONF', path)
+    monkeypatch.setattr(nvpmodel, 'NVPMODEL_STATUS', status)
+    # nvpmodel is not required with a native configuration
+    monkeypatch.setattr(nvpmodel, 'set_nvpmodel_level', lambda level, force: pytest.fail("nvpmodel called"))
+    service = NVPModelService(FakeJetsonClocks(), {'nvpmodel': {'native': True}})
+    assert service.exists()
+    assert service.get_all_nvpmodels() == ['MAXN', '15W']
+    assert service.get_default() == {'name': '15W', 'id': 1}
+    assert service.get_modes()[0]['cpu_online'] == [1, 1, 1]
+    assert service.get_status()['model'] == {'name': '15W', 'id': 1}
+    service.set_nvpmodel_id(0, False)
+    service.close()
+    assert service.get_status()['model'] == {'name': 'MAXN', 'id': 0}
+    assert read_file(os.path.join(root, "gpu/max_freq")) == '1300500000'
+# EOF
@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+from jtop import JtopException
+from ..core import fan
+from ..core.fan import FanService, FAN_CLOSED_LOOP_NAME, FAN_MANUAL_NAME
+from ..core.fan_control import FanController, check_curve, curve_speed
+from .test_09_stream import wait_for
+
+
+class FakeConfig(dict):
+
+    def set(self, instance, default=None):
+        self[instance] = default
+
+
+class FakeTemperature(object):
+
+    def __init__(self):
+        self.temp = {'cpu': 50.0, 'gpu': 40.0, 'offline': -256.0}
+
+    def get_status(self):
+        return {name: {'temp': temp, 'online': temp > -256} for name, temp in self.temp.items()}
+
+
+def test_curve_speed():
+    points = [[40.0, 0.0], [60.0, 40.0], [80.0, 100.0]]
+    assert curve_speed(points, 20.0) == 0.0
+    assert curve_speed(points, 50.0) == 20.0
+    assert curve_speed(points, 70.0) == 70.0
+    assert curve_speed(points, 90.0) == 100.0
+    with pytest.raises(JtopException):
+        check_curve({'mode': 'bang-bang'})
+    with pytest.raises(JtopException):
+        check_curve({'min': 80, 'max': 20})
+
+
+def test_curve_hysteresis_slew():
+    controller = FanController({'hysteresis': 5.0, 'slew': 10.0})
+    assert controller.update(60.0, 0.0) == 40.0
+    # The speed increase at most 10% per second
+    assert controller.update(80.0, 1.0) == 50.0
+    assert controller.status['request'] == 100.0
+    # The error is the speed of the curve not reached yet
+    assert controller.status['error'] == 50.0
+    assert controller.update(80.0, 6.0) == 100.0
+    # Inside the hysteresis the speed doesn't change
+    assert controller.update(76.0, 7.0) == 100.0
+    assert controller.status['error'] == 0.0
+    # Under the hysteresis the curve restart from temp + hysteresis
+    assert controller.update(70.0, 8.0) == 90.0
+    assert controller.status['request'] == 85.0
+
+
+def test_pid():
+    controller = FanController({'mode': 'pid', 'target': 60.0, 'pid': [5.0, 0.0, 0.0], 'slew': 1000.0})
+    assert controller.update(60.0, 0.0) == 0.0
+    assert controller.update(70.0, 1.0) == 50.0
+    assert controller.status['error'] == 10.0
+    # Saturated output
+    assert controller.update(90.0, 2.0) == 100.0
+
+
+def test_fan_service_closed_loop(tmp_path, monkeypatch):
+    pwm = tmp_path / 'pwm1'
+    pwm.write_text("0\n")
+    monkeypatch.setattr(fan, 'get_all_cooling_system', lambda root_dir: {'pwmfan': {'path': str(tmp_path), 'pwm': [str(pwm)]}})
+    monkeypatch.setattr(fan, 'get_all_legacy_fan', lambda: {})
+    config = FakeConfig()
+    temperature = FakeTemperature()
+    service = FanService(config, temperature)
+    monkeypatch.setattr(service, '_nvfancontrol', False)
+    assert FAN_CLOSED_LOOP_NAME in service.get_configs()['pwmfan']
+    service.set_curve('pwmfan', {'sensors': ['cpu', 'offline'], 'points': [[40, 0], [60, 100]]})
+    try:
+        assert service.set_profile('pwmfan', FAN_CLOSED_LOOP_NAME)
+        # The controller thread update the PWM at start
+        assert wait_for(lambda: pwm.read_text() == str(fan.ValueToPWM(50.0)))
+        status = service.get_status()['pwmfan']
+        assert status['profile'] == FAN_CLOSED_LOOP_NAME
+        assert status['closed_loop']['temp'] == 50.0
+        assert config['fan']['pwmfan']['profile'] == FAN_CLOSED_LOOP_NAME
+        # Back to manual stop the controller
+        assert service.set_profile('pwmfan', FAN_MANUAL_NAME)
+        assert 'closed_loop' not in service.get_status()['pwmfan']
+    finally:
+        service.close()
+# EOF
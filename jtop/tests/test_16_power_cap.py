@@ -0,0 +1,153 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+from jtop import JtopException
+from ..core import power_cap
+from ..core.power_cap import PowerCap
+from .test_13_dvfs import write_file
+
+CPU_FREQUENCIES = [729600, 1113600, 1420800, 1728000, 2035200]
+GPU_FREQUENCIES = [306000000, 510000000, 714000000, 918000000]
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    root = str(tmp_path)
+    for idx in range(4):
+        path = os.path.join(root, "devices/system/cpu/cpu{idx}/cpufreq".format(idx=idx))
+        write_file(os.path.join(path, "scaling_available_frequencies"), " ".join(str(freq) for freq in CPU_FREQUENCIES))
+        write_file(os.path.join(path, "scaling_min_freq"), 729600)
+        write_file(os.path.join(path, "scaling_max_freq"), 2035200)
+    path = os.path.join(root, "class/devfreq/17000000.ga10b")
+    write_file(os.path.join(path, "available_frequencies"), " ".join(str(freq) for freq in GPU_FREQUENCIES))
+    write_file(os.path.join(path, "min_freq"), 306000000)
+    write_file(os.path.join(path, "max_freq"), 918000000)
+    write_file(os.path.join(path, "device/of_node/name"), "ga10b")
+    return root
+
+
+def read_max(root, path):
+    with open(os.path.join(root, path), 'r') as f:
+        return int(f.read())
+
+
+class PowerModel(object):
+    """ Board power from the max frequencies, the load is always 100% """
+
+    def __init__(self, root):
+        self.root = root
+
+    def __call__(self):
+        cpu = sum(read_max(self.root, "devices/system/cpu/cpu{idx}/cpufreq/scaling_max_freq".format(idx=idx)) for idx in range(4))
+        gpu = read_max(self.root, "class/devfreq/17000000.ga10b/max_freq")
+        return 3000 + 8000 * cpu / (4 * 2035200) + 9000 * gpu / 918000000
+
+
+class ManualTimer(object):
+    """ The loop is updated from the test with a simulated time """
+
+    def __init__(self, callback):
+        pass
+
+    def open(self, interval=0.5):
+        return True
+
+    def close(self, timeout=None):
+        return True
+
+
+@pytest.fixture(autouse=True)
+def manual_timer(monkeypatch):
+    monkeypatch.setattr(power_cap, 'TimerReader', ManualTimer)
+
+
+def run(cap, model, start, seconds):
+    for step in range(int(seconds * 10)):
+        cap.update(start + step * 0.1)
+    return start + seconds
+
+
+def test_power_cap_loop(sysfs):
+    model = PowerModel(sysfs)
+    cap = PowerCap(model, sysfs)
+    assert cap.exists()
+    assert model() == 20000
+    cap.set_cap(12000)
+    now = run(cap, model, 0.0, 60.0)
+    status = cap.get_status()
+    assert status['cap'] == 12000
+    assert status['avg'] <= 12000 * 1.05
+    assert status['headroom'] >= -12000 * 0.05
+    assert 0.0 < status['level'] < 1.0
+    assert read_max(sysfs, "class/devfreq/17000000.ga10b/max_freq") in GPU_FREQUENCIES
+    # Other tools (e.g. a jetson_clocks restore) don't change the ceiling
+    write_file(os.path.join(sysfs, "devices/system/cpu/cpu0/cpufreq/scaling_max_freq"), 729600)
+    now = run(cap, model, now, 1.0)
+    assert cap.get_status()['ceiling']["cpu0"] == 2035200
+    # nvpmodel lower the CPU max frequency, it is the new ceiling
+    cap.pause()
+    assert read_max(sysfs, "devices/system/cpu/cpu1/cpufreq/scaling_max_freq") == 2035200
+    for idx in range(4):
+        write_file(os.path.join(sysfs, "devices/system/cpu/cpu{idx}/cpufreq/scaling_max_freq".format(idx=idx)), 1420800)
+    cap.resume()
+    run(cap, model, now, 1.0)
+    assert cap.get_status()['ceiling']["cpu0"] == 1420800
+    assert read_max(sysfs, "devices/system/cpu/cpu0/cpufreq/scaling_max_freq") <= 1420800
+    # Remove the cap restore all max frequencies
+    cap.set_cap(None)
+    assert cap.get_status() == {}
+    assert read_max(sysfs, "devices/system/cpu/cpu0/cpufreq/scaling_max_freq") == 1420800
+    assert read_max(sysfs, "class/devfreq/17000000.ga10b/max_freq") == 918000000
+
+
+def test_power_cap_floor(sysfs):
+    model = PowerModel(sysfs)
+    cap = PowerCap(model, sysfs)
+    with pytest.raises(JtopException):
+        cap.set_cap(0)
+    # A cap under the min frequencies power stop on the min frequencies
+    cap.set_cap(1000)
+    run(cap, model, 0.0, 30.0)
+    assert cap.get_status()['level'] == 0.0
+    assert read_max(sysfs, "devices/system/cpu/cpu0/cpufreq/scaling_max_freq") == 729600
+    assert read_max(sysfs, "class/devfreq/17000000.ga10b/max_freq") == 306000000
+    cap.close()
+
+
+def test_power_cap_jetson_clocks(sysfs):
+    model = PowerModel(sysfs)
+    cap = PowerCap(model, sysfs)
+    cap.set_cap(12000)
+    now = run(cap, model, 0.0, 30.0)
+    assert not cap.get_status()['jetson_clocks']
+    # jetson_clocks fix the min frequencies to the max frequencies
+    path = os.path.join(sysfs, "class/devfreq/17000000.ga10b")
+    write_file(os.path.join(path, "min_freq"), 918000000)
+    write_file(os.path.join(path, "max_freq"), 918000000)
+    now = run(cap, model, now, 5.0)
+    assert cap.get_status()['jetson_clocks']
+    assert read_max(sysfs, "class/devfreq/17000000.ga10b/max_freq") == 918000000
+    # jetson_clocks off, the power cap clamps again the GPU
+    write_file(os.path.join(path, "min_freq"), 306000000)
+    run(cap, model, now, 30.0)
+    assert not cap.get_status()['jetson_clocks']
+    assert read_max(sysfs, "class/devfreq/17000000.ga10b/max_freq") < 918000000
+    assert cap.get_status()['ceiling']['17000000.ga10b'] == 918000000
+    cap.close()
+# EOF
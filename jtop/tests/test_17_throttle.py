@@ -0,0 +1,92 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from collections import deque
+from ..core import temperature
+from ..core.temperature import TemperatureService, get_thermal_trip_points, temperature_slope
+from ..core.throttle import ThrottleService
+from .test_13_dvfs import write_file
+
+
+def thermal_zone(root, temp):
+    path = os.path.join(root, "thermal_zone0")
+    write_file(os.path.join(path, "type"), "cpu-thermal")
+    write_file(os.path.join(path, "temp"), temp)
+    for idx, (trip_type, trip_temp) in enumerate([('critical', 104500), ('passive', 99000), ('active', 60000)]):
+        write_file(os.path.join(path, "trip_point_{idx}_type".format(idx=idx)), trip_type)
+        write_file(os.path.join(path, "trip_point_{idx}_temp".format(idx=idx)), trip_temp)
+    return path
+
+
+def test_trip_points(tmp_path):
+    path = thermal_zone(str(tmp_path), 50000)
+    trips = get_thermal_trip_points(path)
+    assert trips == [{'type': 'active', 'temp': 60.0}, {'type': 'passive', 'temp': 99.0}, {'type': 'critical', 'temp': 104.5}]
+    assert temperature_slope([(0.0, 50.0), (1.0, 51.0), (2.0, 52.0)]) == 1.0
+    assert temperature_slope([(0.0, 50.0)]) == 0.0
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        return self.now
+
+
+def test_time_to_trip(tmp_path, monkeypatch):
+    path = thermal_zone(str(tmp_path), 80000)
+    service = TemperatureService()
+    service._temperature = {'cpu': {'temp': os.path.join(path, "temp")}}
+    service._trips = {'cpu': get_thermal_trip_points(path)}
+    service._history = {'cpu': deque()}
+    clock = Clock()
+    monkeypatch.setattr(temperature, 'time', clock)
+    # Temperature rising 0.5C/s
+    for idx in range(5):
+        clock.now = 100.0 + idx
+        write_file(os.path.join(path, "temp"), 80000 + idx * 500)
+        status = service.get_status()['cpu']
+    assert status['temp'] == 82.0
+    assert status['slope'] == 0.5
+    assert status['max'] == 99.0
+    assert status['crit'] == 104.5
+    # The active trip point is a fan level
+    assert status['trip'] == {'type': 'passive', 'temp': 99.0}
+    assert status['time_to_trip'] == 34.0
+
+
+def test_throttle_events():
+    throttle = ThrottleService()
+    cpu = {'cpu': [{'online': True, 'idle': 5.0, 'freq': {'cur': 2035200, 'max': 2035200}},
+                   {'online': False}]}
+    gpu = {'gpu': {'status': {'load': 99.0}, 'freq': {'cur': 918000, 'max': 918000}}}
+    assert throttle.get_status(cpu, gpu, now=0.0) == {'active': [], 'events': []}
+    # GPU loaded and under the max frequency
+    gpu['gpu']['freq']['cur'] = 612000
+    status = throttle.get_status(cpu, gpu, now=1.0)
+    assert status['active'] == ['gpu']
+    assert status['events'][0]['start'] == 1.0 and status['events'][0]['end'] is None
+    # Idle CPU at the min frequency is not throttled
+    cpu['cpu'][0].update({'idle': 95.0, 'freq': {'cur': 729600, 'max': 2035200}})
+    gpu['gpu']['freq']['cur'] = 918000
+    status = throttle.get_status(cpu, gpu, now=3.0)
+    assert status['active'] == []
+    assert status['events'] == [{'engine': 'gpu', 'start': 1.0, 'end': 3.0, 'cur': 612000, 'max': 918000, 'ratio': 612000 / 918000}]
+# EOF
@@ -0,0 +1,85 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from ..core.cpu import CPUService, CPUResidency, cluster_residency, read_cluster, CPU_STAT_LABEL
+from .test_13_dvfs import write_file
+
+
+def write_core(path, idle, usage, time_in_state, trans):
+    for idx, name in enumerate(['WFI', 'C7']):
+        write_file(os.path.join(path, "cpuidle/state{idx}/name".format(idx=idx)), name)
+        write_file(os.path.join(path, "cpuidle/state{idx}/time".format(idx=idx)), idle[idx])
+        write_file(os.path.join(path, "cpuidle/state{idx}/usage".format(idx=idx)), usage[idx])
+    lines = "\n".join("{freq} {time}".format(freq=freq, time=time) for freq, time in time_in_state.items())
+    write_file(os.path.join(path, "cpufreq/stats/time_in_state"), lines)
+    write_file(os.path.join(path, "cpufreq/stats/total_trans"), trans)
+
+
+def test_cpu_residency(tmp_path):
+    path = str(tmp_path / "cpu0")
+    write_core(path, [0, 0], [0, 0], {729600: 0, 2035200: 0}, 10)
+    write_file(os.path.join(path, "topology/cluster_id"), 1)
+    assert read_cluster(path) == 1
+    residency = CPUResidency(path)
+    assert residency.update(10.0) == {}
+    # In 2 seconds: 0.5s in WFI, 1s in C7, 150ms at 729MHz and 50ms at 2GHz
+    write_core(path, [500000, 1000000], [100, 20], {729600: 15, 2035200: 5}, 30)
+    status = residency.update(12.0)
+    assert status['idle'] == {'WFI': 25.0, 'C7': 50.0}
+    assert status['usage'] == {'WFI': 50.0, 'C7': 10.0}
+    assert status['freq'] == {729600: 75.0, 2035200: 25.0}
+    assert status['transitions'] == 10.0
+    # The cluster is the average of all online cores
+    cpu_list = [{'residency': status}, {'residency': {'idle': {'WFI': 75.0, 'C7': 0.0}, 'usage': {}, 'freq': {}}}, {'online': False}]
+    clusters = cluster_residency(cpu_list, [1, 1, 2])
+    assert clusters[1]['cpus'] == [0, 1]
+    assert clusters[1]['idle'] == {'C7': 25.0, 'WFI': 50.0}
+    assert clusters[1]['transitions'] == 10.0
+    assert clusters[2] == {'cpus': [2], 'idle': {}, 'usage': {}, 'freq': {}}
+
+
+def test_cpu_residency_online(tmp_path):
+    path = str(tmp_path / "cpu1")
+    stat = str(tmp_path / "stat")
+    write_file(stat, "cpu  10 0 10 80 0 0 0\ncpu0 10 0 10 80 0 0 0")
+    # Offline core, cpufreq is not available
+    write_file(os.path.join(path, "online"), 0)
+    service = CPUService.__new__(CPUService)
+    service._cpu = [{'path': path, 'last_cpu': [0.0] * len(CPU_STAT_LABEL), 'residency': None, 'cluster': 0}]
+    service._cpu_total = {'last_cpu': [0.0] * len(CPU_STAT_LABEL)}
+    service._cpu_online = []
+    service._list_cpu = {}
+    service._proc_stat = stat
+    assert 'residency' not in service.get_status()['cpu'][0]
+    # The core is back online with cpufreq
+    write_file(os.path.join(path, "online"), 1)
+    write_core(path, [0, 0], [0, 0], {729600: 0, 2035200: 0}, 10)
+    for idx in range(2):
+        write_file(os.path.join(path, "cpuidle/state{idx}/disable".format(idx=idx)), 0)
+    write_file(os.path.join(path, "cpufreq/scaling_governor"), "schedutil")
+    for name in ['scaling', 'cpuinfo']:
+        write_file(os.path.join(path, "cpufreq/{name}_min_freq".format(name=name)), 729600)
+        write_file(os.path.join(path, "cpufreq/{name}_max_freq".format(name=name)), 2035200)
+    # The estimators are reset when the number of online cores changes
+    for idx in range(2):
+        service.get_status()
+    write_core(path, [1000, 1000], [10, 10], {729600: 15, 2035200: 5}, 30)
+    residency = service.get_status()['cpu'][0]['residency']
+    assert residency['freq'] == {729600: 75.0, 2035200: 25.0}
+    assert 'transitions' in residency
+# EOF
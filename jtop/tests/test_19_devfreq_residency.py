@@ -0,0 +1,63 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+from ..core.common import CachedFile, DevfreqResidency, read_trans_stat
+from ..core.engine import EngineService
+from .test_13_dvfs import write_file
+
+TRANS_STAT = """     From  :   To
+           : 306000000 612000000 918000000   time(ms)
+* 306000000:         0         2         0      {t0}
+  612000000:         1         0         1      {t1}
+  918000000:         1         0         0      {t2}
+Total transition : {trans}
+"""
+
+
+def test_trans_stat(tmp_path):
+    path = str(tmp_path)
+    write_file(os.path.join(path, "trans_stat"), TRANS_STAT.format(t0=1000, t1=0, t2=0, trans=5))
+    assert read_trans_stat(TRANS_STAT.format(t0=1000, t1=0, t2=0, trans=5)) == ({306000: 1000, 612000: 0, 918000: 0}, 5)
+    residency = DevfreqResidency(path)
+    assert residency.update(10.0) == {}
+    # In 2 seconds: 500ms at 306MHz, 1s at 612MHz and 500ms at 918MHz
+    write_file(os.path.join(path, "trans_stat"), TRANS_STAT.format(t0=1500, t1=1000, t2=500, trans=15))
+    assert residency.update(12.0) == {'freq': [306000, 612000, 918000], 'time': [25.0, 50.0, 25.0], 'transitions': 5.0}
+    residency.close()
+    # Devices without trans_stat
+    assert DevfreqResidency(str(tmp_path / "missing")).update(10.0) == {}
+
+
+def test_engine_histogram(tmp_path):
+    path = str(tmp_path / "nvdec")
+    write_file(os.path.join(path, "clk_rate"), 115200000)
+    engine = EngineService()
+    engine.engines_path = {'NVDEC': [path]}
+    engine._rates = {path: CachedFile(os.path.join(path, "clk_rate"))}
+    for rate in [115200000, 115200000, 729600000, 115200000]:
+        write_file(os.path.join(path, "clk_rate"), rate)
+        engine._sample()
+    assert engine._get_histogram(path) == {'freq': [115200, 729600], 'time': [75.0, 25.0]}
+    # The histogram restart after every update
+    assert engine._get_histogram(path) == {}
+    # Samples are dropped when the service stops the updates
+    engine._sample()
+    engine.close()
+    assert engine._get_histogram(path) == {}
+# EOF
@@ -0,0 +1,106 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import pytest
+from jtop import JtopException
+from ..core.pressure import PressureService, read_pressure, check_trigger
+from ..core.stream import StreamConnection
+from ..service import JtopServer
+from .test_09_stream import stream_server, wait_for, TOKEN  # noqa: F401
+from .test_13_dvfs import write_file
+
+PRESSURE = """some avg10={avg:.2f} avg60=0.50 avg300=0.10 total={some}
+full avg10=0.00 avg60=0.00 avg300=0.00 total={full}
+"""
+
+
+def test_read_pressure(tmp_path):
+    pressure = read_pressure(PRESSURE.format(avg=1.25, some=1000, full=0))
+    assert pressure['some'] == {'avg10': 1.25, 'avg60': 0.5, 'avg300': 0.1, 'total': 1000}
+    assert pressure['full']['total'] == 0
+    root = str(tmp_path)
+    write_file(os.path.join(root, "memory"), PRESSURE.format(avg=0.0, some=0, full=0))
+    service = PressureService(root)
+    assert service.exists()
+    assert 'stall' not in service.get_status(now=10.0)['memory']['some']
+    # 500ms stalled in 2 seconds
+    write_file(os.path.join(root, "memory"), PRESSURE.format(avg=25.0, some=500000, full=100000))
+    status = service.get_status(now=12.0)
+    assert status['memory']['some']['stall'] == 25.0
+    assert status['memory']['full']['stall'] == 5.0
+    assert status['events'] == []
+    service.close()
+    assert PressureService(str(tmp_path / "missing")).get_status() == {}
+
+
+def test_check_trigger():
+    check_trigger({'resource': 'memory', 'kind': 'some', 'stall': 150, 'window': 1000})
+    with pytest.raises(JtopException):
+        check_trigger({'resource': 'gpu', 'kind': 'some', 'stall': 150, 'window': 1000})
+    with pytest.raises(JtopException):
+        check_trigger({'resource': 'io', 'kind': 'full', 'stall': 150, 'window': 100})
+    with pytest.raises(JtopException):
+        check_trigger({'resource': 'cpu', 'kind': 'some', 'stall': 2000, 'window': 1000})
+
+
+def test_pressure_event(tmp_path, stream_server):  # noqa: F811
+    backend, server = stream_server
+    connection = StreamConnection(server.address, interval=0.1, token=TOKEN)
+    events = []
+    connection.on_event = events.append
+    connection.connect()
+    connection.get_queue().get(timeout=2.0)
+    root = str(tmp_path)
+    write_file(os.path.join(root, "memory"), PRESSURE.format(avg=12.5, some=0, full=0))
+    service = PressureService(root, on_event=lambda event: server.event({'pressure': event}))
+    trigger = {'resource': 'memory', 'kind': 'some', 'stall': 150, 'window': 1000}
+    # The kernel poll the trigger, the event is sent immediately to all clients
+    service._event(trigger)
+    assert wait_for(lambda: events)
+    assert events[0]['pressure']['avg10'] == 12.5
+    assert events[0]['pressure']['resource'] == 'memory'
+    assert service.get_status()['events'][0]['stall'] == 150
+    connection.close()
+    service.close()
+
+
+class FakeConfig(dict):
+
+    def set(self, name, value):
+        self[name] = value
+
+
+def test_pressure_rejected(tmp_path):
+    root = str(tmp_path)
+    write_file(os.path.join(root, "memory"), PRESSURE.format(avg=0.0, some=0, full=0))
+    server = JtopServer.__new__(JtopServer)
+    server.pressure = PressureService(root)
+    server.config = FakeConfig()
+    memory = {'resource': 'memory', 'kind': 'some', 'stall': 150, 'window': 1000}
+    cpu = {'resource': 'cpu', 'kind': 'some', 'stall': 150, 'window': 1000}
+    try:
+        # The job fails with the rejected triggers, only the registered triggers are stored
+        with pytest.raises(JtopException, match="cpu some"):
+            server._pressure_triggers([memory, cpu])
+        assert server.pressure.get_triggers() == [memory]
+        assert server.config['pressure'] == [memory]
+        assert server.pressure.set_triggers([memory]) == []
+    finally:
+        server.pressure.close()
+# EOF
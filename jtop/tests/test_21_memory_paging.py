@@ -0,0 +1,55 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+from ..core.memory import PagingRate, read_buddyinfo, read_meminfo, read_vmstat
+
+MEMINFO = """MemTotal:        7620916 kB
+MemFree:         5123456 kB
+NvMapMemUsed:      88064 kB
+HugePages_Total:       0
+Hugepagesize:       2048 kB
+"""
+
+BUDDYINFO = """Node 0, zone      DMA     20     11      6      4      2      1      1      1      0      1     10
+Node 0, zone    Normal    301    154     73     25     14      7      3      2      2      1    800
+"""
+
+VMSTAT = """nr_free_pages 1280864
+pgfault {pgfault}
+pgmajfault 12
+pswpin {pswpin}
+pswpout 0
+compact_stall 0
+oom_kill {oom_kill}
+"""
+
+
+def test_procfs_memory():
+    assert read_meminfo(MEMINFO) == {'MemTotal': 7620916, 'MemFree': 5123456, 'NvMapMemUsed': 88064, 'Hugepagesize': 2048}
+    assert read_buddyinfo(BUDDYINFO) == 810
+    assert read_vmstat(VMSTAT.format(pgfault=100, pswpin=0, oom_kill=0)) == {
+        'pgfault': 100, 'pgmajfault': 12, 'pswpin': 0, 'pswpout': 0, 'compact_stall': 0, 'oom_kill': 0}
+
+
+def test_paging_rate():
+    paging = PagingRate()
+    assert paging.update(read_vmstat(VMSTAT.format(pgfault=100, pswpin=0, oom_kill=0)), 10.0) == {}
+    # Swap storm in 2 seconds
+    status = paging.update(read_vmstat(VMSTAT.format(pgfault=2100, pswpin=4000, oom_kill=1)), 12.0)
+    assert status == {'pgfault': 1000.0, 'pgmajfault': 0.0, 'pswpin': 2000.0, 'pswpout': 0.0, 'compact_stall': 0.0, 'oom_kill': 1}
+# EOF
@@ -0,0 +1,137 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+from ..core import memory
+from ..core.memory import MemoryService, read_zram, zram_effective, zram_set, zram_deactivate
+from ..core.exceptions import JtopException
+from .test_13_dvfs import write_file
+
+
+def zram_device(root, name, disksize):
+    path = os.path.join(root, "block", name)
+    write_file(os.path.join(path, "comp_algorithm"), "lzo lzo-rle [lz4] zstd")
+    write_file(os.path.join(path, "disksize"), disksize)
+    write_file(os.path.join(path, "reset"), 0)
+    return path
+
+
+def test_read_zram(tmp_path):
+    path = zram_device(str(tmp_path), "zram0", 4 * 1024 ** 3)
+    # 300MB stored in 100MB compressed, 120MB of RAM used
+    write_file(os.path.join(path, "mm_stat"), "314572800 104857600 125829120 0 125829120 12 0 3")
+    write_file(os.path.join(path, "bd_stat"), "10 2 8")
+    zram = read_zram(path)
+    assert zram['algorithm'] == 'lz4'
+    assert zram['algorithms'] == ['lzo', 'lzo-rle', 'lz4', 'zstd']
+    assert zram['disksize'] == 4 * 1024 ** 2
+    assert zram['orig'] == 307200 and zram['compr'] == 102400 and zram['mem_used'] == 122880
+    assert zram['ratio'] == 3.0
+    assert zram['same_pages'] == 12 and zram['huge_pages'] == 3
+    assert zram['bd'] == {'count': 40, 'reads': 8, 'writes': 32}
+    # A zram swap of 1GB with 2.5x from RAM adds 600MB
+    table = {'/dev/zram0': {'size': 1000000, 'zram': {'orig': 250000, 'mem_used': 100000, 'ratio': 3.0}},
+             '/swfile': {'size': 2000000}}
+    assert zram_effective(table) == 2600000
+
+
+def test_zram_set(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    path = zram_device(root, "zram1", 0)
+    write_file(os.path.join(root, "class/zram-control/hot_add"), 1)
+    write_file(os.path.join(root, "class/zram-control/hot_remove"), "")
+    commands = []
+    monkeypatch.setattr(memory.sp, 'call', lambda args: commands.append(' '.join(args)) or 0)
+    monkeypatch.setattr(memory, 'read_swapon', lambda: {'/dev/zram1': {}})
+    # New device from zram-control
+    assert zram_set(2, algorithm='zstd', priority=10, root=root) == 'zram1'
+    with open(os.path.join(path, "comp_algorithm")) as f:
+        assert f.read() == 'zstd'
+    with open(os.path.join(path, "disksize")) as f:
+        assert f.read() == str(2 * 1024 ** 3)
+    assert commands == ['mkswap /dev/zram1', 'swapon -p 10 /dev/zram1']
+    # Resize: swapoff and reset before the new size
+    del commands[:]
+    zram_set(1, device='zram1', root=root)
+    assert commands == ['swapoff /dev/zram1', 'mkswap /dev/zram1', 'swapon -p 5 /dev/zram1']
+    with open(os.path.join(path, "reset")) as f:
+        assert f.read() == '1'
+    # A wrong algorithm doesn't reset the active swap
+    del commands[:]
+    write_file(os.path.join(path, "reset"), 0)
+    with pytest.raises(JtopException):
+        zram_set(1, algorithm='deflate', device='zram1', root=root)
+    assert commands == []
+    with open(os.path.join(path, "reset")) as f:
+        assert f.read() == '0\n'
+    # Only zram devices
+    with pytest.raises(JtopException):
+        zram_set(1, device='../../kernel', root=root)
+    with pytest.raises(JtopException):
+        zram_deactivate('zram1/../zram0', root=root)
+    # Size and priority are checked before to create a device
+    for size, priority in [(0, 5), ('1', 5), (1, '5; reboot'), (1, 32768), (1, -2), (1, 2.5)]:
+        with pytest.raises(JtopException):
+            zram_set(size, priority=priority, root=root)
+    assert commands == []
+    # Disable a device without remove it, like the nvzramconfig devices
+    zram_deactivate('zram1', root=root)
+    assert commands == ['swapoff /dev/zram1']
+    with open(os.path.join(root, "class/zram-control/hot_remove")) as f:
+        assert f.read() == '\n'
+    # Disable and remove the device
+    zram_deactivate('zram1', remove=True, root=root)
+    with open(os.path.join(root, "class/zram-control/hot_remove")) as f:
+        assert f.read() == '1'
+
+
+def test_zram_service_created(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    zram_device(root, "zram0", 4 * 1024 ** 3)
+    zram_device(root, "zram1", 0)
+    write_file(os.path.join(root, "class/zram-control/hot_add"), 1)
+    write_file(os.path.join(root, "class/zram-control/hot_remove"), "")
+    monkeypatch.setattr(memory.sp, 'call', lambda args: 0)
+    monkeypatch.setattr(memory, 'read_swapon', lambda: {})
+    service = MemoryService.__new__(MemoryService)
+    service._sys_path = root
+    service._zram_created = set()
+    assert service.zram_set(1) == 'zram1'
+    # The boot device is only reset
+    service.zram_deactivate('zram0')
+    with open(os.path.join(root, "class/zram-control/hot_remove")) as f:
+        assert f.read() == '\n'
+    # The device created from jtop is removed
+    service.zram_deactivate('zram1')
+    with open(os.path.join(root, "class/zram-control/hot_remove")) as f:
+        assert f.read() == '1'
+
+
+def test_zram_set_remove_new_device(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    zram_device(root, "zram2", 0)
+    write_file(os.path.join(root, "class/zram-control/hot_add"), 2)
+    write_file(os.path.join(root, "class/zram-control/hot_remove"), "")
+    monkeypatch.setattr(memory.sp, 'call', lambda args: 1 if args[0] == 'swapon' else 0)
+    monkeypatch.setattr(memory, 'read_swapon', lambda: {})
+    # The device from hot_add is removed when swapon fails
+    with pytest.raises(JtopException):
+        zram_set(1, root=root)
+    with open(os.path.join(root, "class/zram-control/hot_remove")) as f:
+        assert f.read() == '2'
+# EOF
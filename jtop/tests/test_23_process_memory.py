@@ -0,0 +1,74 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+from ..core.exceptions import JtopException
+from ..core.processes import ProcessService, read_smaps_rollup, leak_trend
+
+SMAPS_ROLLUP = """563af4de1000-7fff6097a000 ---p 00000000 00:00 0                          [rollup]
+Rss:              204800 kB
+Pss:               51200 kB
+Pss_Anon:          40960 kB
+Pss_File:          10240 kB
+Pss_Shmem:             0 kB
+Swap:               2048 kB
+SwapPss:            1024 kB
+"""
+
+
+def test_smaps_rollup():
+    assert read_smaps_rollup(SMAPS_ROLLUP) == {'rss': 204800, 'pss': 51200, 'anon': 40960, 'file': 10240, 'shmem': 0, 'swap': 1024}
+
+
+def test_leak_trend():
+    # 512kB every 5 seconds
+    growing = [(idx * 5.0, 100000 + idx * 512) for idx in range(12)]
+    trend = leak_trend(growing)
+    assert trend['leak'] and trend['growth'] == 5632
+    assert abs(trend['slope'] - 102.4) < 1e-9
+    # Too few samples or a release
+    assert not leak_trend(growing[:11])['leak']
+    assert not leak_trend(growing[:8] + [(40.0, 100000)] + growing[9:])['leak']
+    assert leak_trend([]) == {'slope': 0.0, 'growth': 0, 'leak': False}
+    # Allocation at start and then flat memory
+    assert not leak_trend([(0.0, 0)] + [(idx * 5.0, 500000) for idx in range(1, 12)])['leak']
+    # One step in a flat trend
+    flat = [(idx * 5.0, 100000 + (2048 if idx >= 50 else 0)) for idx in range(60)]
+    assert not leak_trend(flat)['leak']
+    # A leak with a few flat samples
+    steps = [(idx * 5.0, 100000 + 512 * (idx - idx // 6)) for idx in range(60)]
+    assert leak_trend(steps)['leak']
+
+
+def test_process_memory_mode():
+    service = ProcessService()
+    pid = os.getpid()
+    service.set_memory_mode(True, interval=5.0)
+    memory = service._get_memory(pid, 1024, 10.0)
+    assert memory['pss'] > 0 and memory['gpu']['leak'] is False
+    # Cached until the next interval
+    assert service._get_memory(pid, 2048, 12.0) is memory
+    assert len(service._trend[pid]) == 1
+    service._get_memory(pid, 2048, 15.0)
+    assert list(service._trend[pid]) == [(10.0, 1024), (15.0, 2048)]
+    # The interval from a client must be positive
+    for interval in [0, -1.0, 'fast', None]:
+        with pytest.raises(JtopException):
+            service.set_memory_mode(True, interval=interval)
+    assert service._memory_interval == 5.0
+# EOF
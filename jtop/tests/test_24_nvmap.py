@@ -0,0 +1,56 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from ..core.processes import NvmapTable, read_process_table, NVMAP_BUFFER_SIZE
+from .test_13_dvfs import write_file
+
+
+def nvmap_maps(clients, mappings=2):
+    lines = ["CLIENT                        PROCESS      PID        SIZE"]
+    for user, process, pid, size in clients:
+        lines += ["{user:<20} {process:>16} {pid:>8} {size:>10}K".format(user=user, process=process, pid=pid, size=size)]
+        lines += ["          0x{idx:016x}  0x0000000000100000  rw".format(idx=idx) for idx in range(mappings)]
+    lines += ["total {total:>50}K".format(total=sum(client[3] for client in clients))]
+    return "\n".join(lines) + "\n"
+
+
+def test_read_process_table(tmp_path):
+    path = str(tmp_path / "maps")
+    # Two clients of the same process are summed
+    write_file(path, nvmap_maps([('user', 'gst-launch-1.0', 5968, 1024), ('user', 'Xorg', 2473, 512), ('user', 'gst-launch-1.0', 5968, 256)]))
+    total, table = read_process_table(path)
+    assert total == 1792
+    assert table == [['5968', 'user', 'gst-launch-1.0', 1280], ['2473', 'user', 'Xorg', 512]]
+
+
+def test_nvmap_table(tmp_path):
+    path = str(tmp_path / "maps")
+    clients = [('user', 'python3', 1000 + idx, 1024 + idx) for idx in range(100)]
+    write_file(path, nvmap_maps(clients, mappings=20))
+    nvmap = NvmapTable(path)
+    total, table = nvmap.read()
+    assert len(table) == 100 and total == sum(client[3] for client in clients)
+    # Larger than the first buffer
+    assert len(nvmap._buffer) > NVMAP_BUFFER_SIZE
+    # Same content, same result without decoding
+    assert nvmap.read()[1] is table
+    clients[0] = ('user', 'python3', 1000, 4096)
+    write_file(path, nvmap_maps(clients, mappings=20))
+    total, table = nvmap.read()
+    assert table[0] == ['1000', 'user', 'python3', 4096]
+    nvmap.close()
+# EOF
@@ -0,0 +1,81 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from ..core import thor_gpu
+from ..core.thor_gpu import NVMLProcessUtilization
+
+Sample = namedtuple('Sample', ['pid', 'timeStamp', 'smUtil', 'memUtil', 'encUtil', 'decUtil'])
+
+
+class NVMLError(Exception):
+
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeNVML(object):
+    """ Mock of pynvml with the process utilization samples """
+    NVMLError = NVMLError
+    NVML_ERROR_NOT_SUPPORTED = 3
+    NVML_ERROR_NOT_FOUND = 6
+
+    def __init__(self):
+        self.samples = []
+        self.calls = []
+
+    def nvmlInit(self):
+        pass
+
+    def nvmlDeviceGetCount(self):
+        return 1
+
+    def nvmlDeviceGetHandleByIndex(self, idx):
+        return idx
+
+    def nvmlDeviceGetProcessUtilization(self, handle, last_seen):
+        self.calls.append(last_seen)
+        if isinstance(self.samples, int):
+            raise NVMLError(self.samples)
+        return [sample for sample in self.samples if sample.timeStamp > last_seen]
+
+
+def test_process_utilization(monkeypatch):
+    nvml = FakeNVML()
+    monkeypatch.setattr(thor_gpu, '_pynvml', nvml)
+    monkeypatch.setattr(thor_gpu, '_NVML', True)
+    reader = NVMLProcessUtilization()
+    nvml.samples = [Sample(100, 1000, 20, 5, 0, 0), Sample(100, 2000, 60, 10, 0, 0), Sample(200, 1500, 0, 0, 30, 40)]
+    # Newest sample of each PID
+    assert reader.update() == {100: {'sm': 60, 'mem': 10, 'enc': 0, 'dec': 0}, 200: {'sm': 0, 'mem': 0, 'enc': 30, 'dec': 40}}
+    # Only the samples after the last seen
+    nvml.samples = FakeNVML.NVML_ERROR_NOT_FOUND
+    assert reader.update() == {}
+    assert nvml.calls == [0, 2000]
+    assert reader.supported
+    # Disabled when not supported
+    nvml.samples = FakeNVML.NVML_ERROR_NOT_SUPPORTED
+    assert reader.update() == {}
+    assert not reader.supported
+    assert reader.update() == {} and len(nvml.calls) == 3
+
+
+def test_process_utilization_without_nvml(monkeypatch):
+    monkeypatch.setattr(thor_gpu, '_NVML', False)
+    reader = NVMLProcessUtilization()
+    assert not reader.supported and reader.update() == {}
+# EOF
@@ -0,0 +1,108 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+from ..core.energy import EnergyService, rail_resources, ENERGY_CGROUP_RETENTION
+from ..core.processes import TaskTable, read_proc_stat, read_cgroup
+from .test_13_dvfs import write_file
+
+
+def write_task(root, pid, name, ticks, cgroup, starttime=100):
+    # utime and stime (#14, #15) and starttime (#22)
+    stat = "{pid} ({name}) S 1 1 1 0 -1 0 0 0 0 0 {utime} {stime} 0 0 20 0 1 0 {start} 0 0".format(
+        pid=pid, name=name, utime=ticks - ticks // 2, stime=ticks // 2, start=starttime)
+    write_file(os.path.join(root, str(pid), "stat"), stat)
+    write_file(os.path.join(root, str(pid), "cgroup"), "0::{cgroup}".format(cgroup=cgroup))
+
+
+def test_parsers():
+    assert read_proc_stat("42 (gst launch) R 1 1 1 0 -1 0 0 0 0 0 30 12 0 0 20 0 1 0 555 0 0") == ('gst launch', 42, 555)
+    assert read_cgroup("1:name=systemd:/user.slice\n0::/system.slice/docker-abc.scope") == '/system.slice/docker-abc.scope'
+    assert read_cgroup("4:memory:/docker/abc\n1:cpu:/") == '/docker/abc'
+    assert rail_resources('VDD_CPU_CV') == ['CPU']
+    assert rail_resources('VDD_CPU_GPU_CV') == ['CPU', 'GPU']
+    assert rail_resources('VDD_IN') == []
+
+
+def test_energy_attribution(tmp_path):
+    root = str(tmp_path)
+    write_task(root, 10, "python3", 100, "/teams/a")
+    write_task(root, 20, "gst-launch-1.0", 100, "/teams/b")
+    # Idle process in the same cgroup
+    write_task(root, 30, "bash", 50, "/teams/b")
+    tasks = TaskTable(proc_path=root)
+    energy = EnergyService(tasks)
+    power = {'rail': {'VDD_CPU_CV': {'power': 3000}, 'VDD_GPU_SOC': {'power': 2000}, 'VDD_IN': {'power': 8000}}}
+    # GPU memory share without GPU utilization
+    processes = [[20, 'user', 'I', 'Graphic', 20, 'S', 0.0, 1024, 4096, 'gst-launch-1.0', {}, {}]]
+    tasks.update()
+    assert energy.get_status(power, processes, now=0.0)['processes'] == {}
+    # In 2 seconds: python3 uses 3 times the CPU of gst-launch
+    write_task(root, 10, "python3", 130, "/teams/a")
+    write_task(root, 20, "gst-launch-1.0", 110, "/teams/b")
+    tasks.update()
+    status = energy.get_status(power, processes, now=2.0)
+    assert status['processes'][10] == {'name': 'python3', 'cgroup': '/teams/a', 'cpu': 4.5, 'gpu': 0.0, 'total': 4.5}
+    assert status['processes'][20]['cpu'] == 1.5 and status['processes'][20]['gpu'] == 4.0
+    assert status['cgroups'] == {'/teams/a': 4.5, '/teams/b': 5.5}
+    assert status['unattributed'] == 0.0
+    # Idle CPU and GPU utilization (Thor) only on python3
+    processes = [[10, 'user', 'I', 'Compute', 20, 'S', 0.0, 1024, 4096, 'python3', {}, {'sm': 50}],
+                 [20, 'user', 'I', 'Graphic', 20, 'S', 0.0, 1024, 4096, 'gst-launch-1.0', {}, {'sm': 0}]]
+    tasks.update()
+    status = energy.get_status(power, processes, now=3.0)
+    assert status['processes'][10]['gpu'] == 2.0
+    assert status['unattributed'] == 3.0
+    # A closed process keeps its energy in the cgroup
+    shutil.rmtree(os.path.join(root, "20"))
+    tasks.update()
+    status = energy.get_status(power, [], now=4.0)
+    assert 20 not in status['processes']
+    assert status['cgroups'] == {'/teams/a': 6.5, '/teams/b': 5.5}
+    # A cgroup without processes is kept for the retention time
+    shutil.rmtree(os.path.join(root, "30"))
+    tasks.update()
+    status = energy.get_status(power, [], now=5.0)
+    assert status['cgroups'] == {'/teams/a': 6.5, '/teams/b': 5.5}
+    assert status['closed'] == ['/teams/b']
+    status = energy.get_status(power, [], now=5.0 + ENERGY_CGROUP_RETENTION)
+    assert list(status['cgroups']) == ['/teams/a'] and status['closed'] == []
+
+
+def test_energy_pid_reused(tmp_path):
+    root = str(tmp_path)
+    write_task(root, 10, "python3", 100, "/teams/a")
+    tasks = TaskTable(proc_path=root)
+    energy = EnergyService(tasks)
+    power = {'rail': {'VDD_CPU_CV': {'power': 3000}}}
+    tasks.update()
+    energy.get_status(power, [], now=0.0)
+    write_task(root, 10, "python3", 130, "/teams/a")
+    tasks.update()
+    assert energy.get_status(power, [], now=2.0)['processes'][10]['cpu'] == 6.0
+    # Same PID from a new process, the energy restart from zero
+    write_task(root, 10, "worker", 10, "/teams/a", starttime=500)
+    tasks.update()
+    status = energy.get_status(power, [], now=3.0)
+    assert 10 not in status['processes']
+    write_task(root, 10, "worker", 20, "/teams/a", starttime=500)
+    tasks.update()
+    status = energy.get_status(power, [], now=4.0)
+    assert status['processes'][10] == {'name': 'worker', 'cgroup': '/teams/a', 'cpu': 3.0, 'gpu': 0.0, 'total': 3.0}
+    assert status['cgroups'] == {'/teams/a': 9.0}
+# EOF
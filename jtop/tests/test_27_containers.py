@@ -0,0 +1,83 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+from ..core.containers import ContainerService, read_container_id, read_io_stat
+from ..core.processes import TaskTable
+from .test_13_dvfs import write_file
+from .test_26_energy import write_task
+
+CONTAINER_ID = "4f2c" * 16
+
+
+def write_cgroup(root, cgroup, usage, memory, rbytes):
+    path = root + cgroup
+    write_file(os.path.join(path, "cpu.stat"), "usage_usec {usage}\nuser_usec 0\nsystem_usec 0\nthrottled_usec 0".format(usage=usage))
+    write_file(os.path.join(path, "memory.current"), memory)
+    write_file(os.path.join(path, "memory.pressure"), "some avg10=1.50 avg60=0.00 avg300=0.00 total=10\nfull avg10=0.50 avg60=0.00 avg300=0.00 total=5")
+    write_file(os.path.join(path, "io.stat"), "259:0 rbytes={rbytes} wbytes=0 rios=1 wios=0 dbytes=0 dios=0".format(rbytes=rbytes))
+
+
+def test_container_id():
+    assert read_container_id("/system.slice/docker-{id}.scope".format(id=CONTAINER_ID)) == ('docker', CONTAINER_ID)
+    assert read_container_id("/kubepods.slice/kubepods-pod1.slice/cri-containerd-{id}.scope".format(id=CONTAINER_ID))[0] == 'containerd'
+    assert read_container_id("/user.slice/user-1000.slice/session-2.scope") is None
+    assert read_io_stat("259:0 rbytes=10 wbytes=20 rios=1\n179:0 rbytes=5 wbytes=0 rios=1") == {'rbytes': 15, 'wbytes': 20}
+
+
+def test_containers(tmp_path):
+    proc = str(tmp_path / "proc")
+    cgroup_root = str(tmp_path / "cgroup")
+    docker = str(tmp_path / "docker")
+    container = "/system.slice/docker-{id}.scope".format(id=CONTAINER_ID)
+    write_file(os.path.join(cgroup_root, "cgroup.controllers"), "cpu io memory")
+    write_file(os.path.join(docker, CONTAINER_ID, "config.v2.json"), '{"Name": "/inference"}')
+    write_task(proc, 10, "python3", 100, container)
+    write_task(proc, 11, "python3", 100, container)
+    write_task(proc, 20, "sshd", 100, "/system.slice/ssh.service")
+    write_task(proc, 30, "Xorg", 100, "/system.slice/gdm.service")
+    write_cgroup(cgroup_root, container, 1000000, 1048576, 0)
+    tasks = TaskTable(proc_path=proc)
+    service = ContainerService(tasks, root=cgroup_root, docker_path=docker)
+    processes = [[10, 'user', 'I', 'Compute', 20, 'S', 0.0, 1024, 4096, 'python3', {}, {}, ''],
+                 [30, 'user', 'I', 'Graphic', 20, 'S', 0.0, 1024, 512, 'Xorg', {}, {}, '']]
+    tasks.update()
+    status = service.get_status(processes, now=0.0)
+    # Only containers and cgroups with GPU processes
+    assert sorted(status) == [container, "/system.slice/gdm.service"]
+    assert status[container]['name'] == 'inference' and status[container]['id'] == CONTAINER_ID[:12]
+    assert status[container]['pids'] == [10, 11] and status[container]['gpu'] == 4096
+    assert status[container]['memory'] == 1024
+    assert status[container]['pressure'] == {'some': 1.5, 'full': 0.5}
+    assert processes[0][12] == container
+    # Rates from the previous update
+    write_cgroup(cgroup_root, container, 1500000, 2097152, 4096)
+    tasks.update()
+    status = service.get_status(processes, now=2.0)
+    assert status[container]['cpu'] == 25.0
+    assert status[container]['io'] == {'read': 2048.0, 'write': 0.0}
+    # The counters are closed with the last process
+    shutil.rmtree(os.path.join(proc, "10"))
+    shutil.rmtree(os.path.join(proc, "11"))
+    tasks.update()
+    status = service.get_status(processes[1:], now=3.0)
+    assert container not in status and container not in service._stats
+    # Without cgroup v2 only processes and GPU memory
+    service = ContainerService(tasks, root=str(tmp_path / "v1"))
+    assert service.get_status(processes[1:], now=4.0) == {"/system.slice/gdm.service": {'pids': [30], 'gpu': 512}}
+# EOF
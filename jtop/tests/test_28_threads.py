@@ -0,0 +1,97 @@
+# -*- coding: UTF-8 -*-
+# This file is part of the jetson_stats package (https://github.com/rbonghi/jetson_stats or http://rnext.it).
+# Copyright (c) 2019-2026 Raffaello Bonghi.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import pytest
+from ..core.exceptions import JtopException
+from ..core.threads import ThreadService, read_thread_stat, threads_lease, THREADS_LEASE, THREADS_LEASE_MAX, THREADS_MAX_PROCESSES
+from .test_13_dvfs import write_file
+
+
+def write_thread(root, pid, tid, name, state, ticks, cpu, wait):
+    path = os.path.join(root, str(pid), "task", str(tid))
+    # utime and stime (#14, #15) and processor (#39)
+    fields = ['0'] * 49
+    fields[0], fields[11], fields[12], fields[36] = state, str(ticks - ticks // 2), str(ticks // 2), str(cpu)
+    write_file(os.path.join(path, "stat"), "{tid} ({name}) {fields}".format(tid=tid, name=name, fields=" ".join(fields)))
+    write_file(os.path.join(path, "schedstat"), "1000 {wait} 10".format(wait=wait))
+
+
+def test_thread_stat():
+    with open("/proc/self/task/{pid}/stat".format(pid=os.getpid())) as f:
+        name, state, ticks, cpu = read_thread_stat(f.read())
+    assert state in 'RSD' and ticks >= 0 and cpu >= 0
+
+
+def test_threads(tmp_path):
+    root = str(tmp_path)
+    clk_tck = os.sysconf('SC_CLK_TCK')
+    write_thread(root, 100, 100, "server", 'S', 0, 0, 0)
+    write_thread(root, 100, 101, "worker 1", 'R', 0, 3, 0)
+    service = ThreadService(proc_path=root)
+    assert service.get_status(now=0.0) == {}
+    service.subscribe([100], now=0.0)
+    assert service.get_status(now=0.0)[100][101] == {'name': 'worker 1', 'state': 'R', 'last_cpu': 3, 'cpu': 0.0, 'delay': 0.0}
+    # In 2 seconds the worker runs 1.5s and waits 0.2s on the run queue
+    write_thread(root, 100, 101, "worker 1", 'R', int(1.5 * clk_tck), 2, 200000000)
+    threads = service.get_status(now=2.0)[100]
+    assert threads[101]['cpu'] == 75.0 and threads[101]['delay'] == 10.0 and threads[101]['last_cpu'] == 2
+    assert threads[100]['cpu'] == 0.0
+    # A thread ended
+    shutil.rmtree(os.path.join(root, "100", "task", "101"))
+    assert list(service.get_status(now=3.0)[100]) == [100]
+    # Not renewed, the subscription expires
+    service.subscribe([100], now=3.0)
+    assert 100 in service.get_status(now=3.0 + THREADS_LEASE)
+    assert service.get_status(now=3.1 + THREADS_LEASE) == {}
+    # A client with a slow interval sends a longer lease
+    assert threads_lease(1.0) == THREADS_LEASE and threads_lease(10.0) == 30.0
+    assert threads_lease(3600.0) == THREADS_LEASE_MAX
+    service.subscribe([100], lease=threads_lease(10.0), now=10.0)
+    assert 100 in service.get_status(now=19.9)
+    assert 100 in service.get_status(now=40.0)
+    assert service.get_status(now=40.1) == {}
+    service.close()
+
+
+def test_threads_rejected(tmp_path):
+    root = str(tmp_path)
+    for pid in range(100, 100 + THREADS_MAX_PROCESSES + 1):
+        write_thread(root, pid, pid, "server", 'S', 0, 0, 0)
+    service = ThreadService(proc_path=root)
+    # A process not running is not expanded
+    with pytest.raises(JtopException):
+        service.subscribe([100, 99], now=0.0)
+    assert list(service.get_status(now=0.0)) == [100]
+    # Over the max processes the subscription fails
+    with pytest.raises(JtopException):
+        service.subscribe(range(100, 100 + THREADS_MAX_PROCESSES + 1), now=0.0)
+    assert len(service.get_status(now=0.0)) == THREADS_MAX_PROCESSES
+    service.close()
+
+
+def test_threads_lease_max(tmp_path):
+    root = str(tmp_path)
+    write_thread(root, 100, 100, "server", 'S', 0, 0, 0)
+    service = ThreadService(proc_path=root)
+    # A read only client cannot hold a subscription longer than lease_max
+    service.subscribe([100], lease=THREADS_LEASE_MAX, now=0.0, lease_max=30.0)
+    assert 100 in service.get_status(now=30.0)
+    assert service.get_status(now=30.1) == {}
+    service.close()
+# EOF